@@ -1,10 +1,16 @@
 """Crawler module."""
 
 from __future__ import annotations
-from saas.storage.index import Index, EmptySearchResultException
+from saas.storage.index import IndexBackend
+from saas.crawler.frontier import Frontier
 import saas.utils.console as console
-from saas.web.browser import Browser
+from saas.web.browser import Browser, AsyncBrowser
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Tuple
+from saas.crawler.source import UrlFile
+from saas.web.page import Page
 from saas.web.url import Url
+import asyncio
 import time
 import os
 
@@ -19,9 +25,10 @@ class Crawler:
     def __init__(
         self,
         url_file: str,
-        index: Index,
+        index: IndexBackend,
         ignore_found_urls: bool=False,
         stay_at_domain: bool=False,
+        frontier: Optional[Frontier]=None
     ):
         """Create crawler.
 
@@ -32,44 +39,34 @@ class Crawler:
                 pages it crawls
             stay_at_domain: if crawler should ignore urls from a different
                 domain than the one it was found at
+            frontier: Frontier to get urls from when url file is empty,
+                can be shared between crawlers (default: {None})
         """
-        self.source_is_open = False
-        self.source_path = ''
-        self.source_mode = ''
-        self._open_source('r', url_file)
+        self.source = self._open_source(url_file)
         self.ignore_found_urls = ignore_found_urls
         self.stay_at_domain = stay_at_domain
         self.index = index
+        if frontier is None:
+            frontier = Frontier(index)
+        self.frontier = frontier
 
-    def _open_source(self, mode: str, url_file: str=''):
+    def _open_source(self, url_file: str) -> UrlFile:
         """Open source file.
 
         Args:
-            mode: read or write
             url_file: path to url file
 
+        Returns:
+            The opened url file
+            UrlFile
+
         Raises:
             UrlFileNotFoundError: if file wasn't found
         """
-        if self.source_is_open and self.source_mode == mode:
-            return
-        if self.source_is_open and self.source_mode != mode:
-            self._close_source()
-        self.source_is_open = True
-
-        if self.source_path == '':
-            file = self._real_path(url_file)
-            if not os.path.isfile(file):
-                raise UrlFileNotFoundError(f'url file was not found at {file}')
-            self.source_path = file
-
-        self.source_mode = mode
-        self.source = open(self.source_path, mode)
-
-    def _close_source(self):
-        """Close url source file."""
-        self.source_is_open = False
-        self.source.close()
+        file = self._real_path(url_file)
+        if not os.path.isfile(file):
+            raise UrlFileNotFoundError(f'url file was not found at {file}')
+        return UrlFile(file)
 
     def _real_path(self, url_file: str) -> str:
         """Real path.
@@ -96,68 +93,75 @@ class Crawler:
         Check if there are any uncrawled urls, if none exists
         then sleep for a second, otherwise crawl url.
         """
-        url = self._next_url()
+        url, from_frontier = self._next_url()
 
         if not url:
             time.sleep(1)
             return
 
-        if url is not None:
+        timer = time.time()
+        try:
             self.index.add_crawled_url(url)
 
             console.dcr(f'crawling {url.to_string()}')
 
             page = Browser.get_page(url)
-            if 'text/html' not in page.content_type:
-                page.status_code = 0
+        finally:
+            # the domain of url is blocked until it is done
+            if from_frontier:
+                self.frontier.done(url, time.time() - timer)
+        self._handle_page(url, page)
 
-            console.dcr(f'{url.to_string()} responded with {page.status_code}')
+    def _handle_page(self, url: Url, page: Page):
+        """Handle a crawled page.
 
-            self.index.set_status_code_for_crawled_url(
-                url,
-                page.status_code
-            )
+        Store the status code of the page and queue
+        the urls found on it.
 
-            if self.ignore_found_urls:
-                return
+        Args:
+            url: Url that was crawled
+            page: Page found at url
+        """
+        if 'text/html' not in page.content_type:
+            page.status_code = 0
 
-            if page.status_code != 200:
-                return
+        console.dcr(f'{url.to_string()} responded with {page.status_code}')
 
-            if self.stay_at_domain:
-                page.remove_urls_not_from_domain(url.domain)
+        self.index.set_status_code_for_crawled_url(
+            url,
+            page.status_code
+        )
 
-            console.dcr(f'found {len(page.urls)} links at {url.to_string()}')
+        if self.ignore_found_urls:
+            return
 
-            self.index.add_uncrawled_urls(page.urls)
+        if page.status_code != 200:
+            return
 
-    def _next_url(self):
-        """Get next url to crawl.
+        if self.stay_at_domain:
+            page.remove_urls_not_from_domain(url.domain)
 
-        Returns:
-            A url to crawl, None if no url was found
-            Url or None
-        """
-        self._open_source('r')
-        lines = sum(1 for line in self.source)
+        console.dcr(f'found {len(page.urls)} links at {url.to_string()}')
+
+        self.index.add_uncrawled_urls(page.urls)
 
-        if lines == 0:
-            return self._next_url_in_index()
+    def _next_url(self) -> Tuple[Optional[Url], bool]:
+        """Get next url to crawl.
 
-        self.source.seek(0)
-        lines = self.source.read().split('\n')
+        Urls in the url file are crawled before urls in the frontier.
 
-        if lines[0] == '':
-            return self._next_url_in_index()
+        Returns:
+            A url to crawl, None if no url was found, and True if url
+            was handed out by the frontier and must be marked done
+            tuple
+        """
+        line = self.source.next_line()
 
-        self._open_source('w')
-        for line in lines:
-            if line != lines[0] and line.strip() != '':
-                self.source.write(line + '\n')
-        self._close_source()
+        if line is None:
+            url = self._next_url_in_index()
+            return url, url is not None
 
-        url = Url.from_string(lines[0])
-        return url
+        return Url.from_string(line), False
 
     def _next_url_in_index(self):
         """Get next url to crawl from index.
@@ -166,16 +170,153 @@ class Crawler:
             A url to crawl, None if no url was found
             Url or None
         """
-        try:
-            url = self.index.random_uncrawled_url()
-        except EmptySearchResultException:
-            return None
-        self.index.remove_uncrawled_url(url.hash())
-        return url
+        return self.frontier.next_url()
 
     def stop(self):
         """Stop crawler."""
-        self._close_source()
+        self.source.close()
+
+
+class AsyncCrawler(Crawler):
+    """Async crawler.
+
+    Crawls many urls concurrently from a single thread using
+    asyncio. Since crawling is mostly waiting on the network
+    this is a lot cheaper than running more crawler threads.
+    """
+
+    # number of threads used for blocking calls to index
+    # and url file, made from the event loop
+    INDEX_WORKERS = 8
+
+    def __init__(
+        self,
+        url_file: str,
+        index: IndexBackend,
+        ignore_found_urls: bool=False,
+        stay_at_domain: bool=False,
+        frontier: Optional[Frontier]=None,
+        concurrency: int=50,
+        connections_per_host: int=2
+    ):
+        """Create async crawler.
+
+        Args:
+            url_file: path to url file
+            index: Index storage for queued urls
+            ignore_found_urls: if crawler should ignore new urls found on
+                pages it crawls
+            stay_at_domain: if crawler should ignore urls from a different
+                domain than the one it was found at
+            frontier: Frontier to get urls from when url file is empty,
+                can be shared between crawlers (default: {None})
+            concurrency: number of urls crawled at the same time
+            connections_per_host: max number of open connections to a
+                single host
+        """
+        super().__init__(
+            url_file,
+            index,
+            ignore_found_urls,
+            stay_at_domain,
+            frontier
+        )
+        self.concurrency = concurrency
+        self.connections_per_host = connections_per_host
+        self.executor = None  # type: Optional[ThreadPoolExecutor]
+
+    def run(self, should_run: Callable[[], bool]):
+        """Run crawler until should_run returns False.
+
+        Args:
+            should_run: called before each url is crawled
+        """
+        browser = AsyncBrowser(
+            connections=self.concurrency,
+            connections_per_host=self.connections_per_host
+        )
+        asyncio.run(self._run(should_run, browser))
+
+    async def _run(self, should_run: Callable[[], bool], browser):
+        """Run crawler workers.
+
+        Args:
+            should_run: called before each url is crawled
+            browser: AsyncBrowser to fetch pages with
+        """
+        self.executor = ThreadPoolExecutor(
+            max_workers=AsyncCrawler.INDEX_WORKERS
+        )
+        await browser.open()
+        try:
+            await asyncio.gather(*[
+                self._worker(should_run, browser)
+                for i in range(self.concurrency)
+            ])
+        finally:
+            await browser.close()
+            self.executor.shutdown()
+
+    async def _worker(self, should_run: Callable[[], bool], browser):
+        """Crawl urls until should_run returns False.
+
+        A url that fails to be crawled is logged and skipped, so it
+        doesn't stop the other workers.
+
+        Args:
+            should_run: called before each url is crawled
+            browser: AsyncBrowser to fetch pages with
+        """
+        while should_run():
+            url = None
+            try:
+                url, from_frontier = await self._blocking(self._next_url)
+
+                if not url:
+                    await asyncio.sleep(1)
+                    continue
+
+                await self._crawl(url, browser, from_frontier)
+            except Exception as e:
+                if url is None:
+                    console.p(f'failed to get url to crawl: {e}')
+                    await asyncio.sleep(1)
+                else:
+                    console.p(f'failed to crawl {url.to_string()}: {e}')
+
+    async def _crawl(self, url: Url, browser, from_frontier: bool):
+        """Crawl url.
+
+        Args:
+            url: Url to crawl
+            browser: AsyncBrowser to fetch page with
+            from_frontier: if url was handed out by the frontier
+        """
+        timer = time.time()
+        try:
+            await self._blocking(self.index.add_crawled_url, url)
+
+            console.dcr(f'crawling {url.to_string()}')
+
+            page = await browser.get_page(url)
+        finally:
+            # the domain of url is blocked until it is done
+            if from_frontier:
+                self.frontier.done(url, time.time() - timer)
+        await self._blocking(self._handle_page, url, page)
+
+    async def _blocking(self, function: Callable, *args):
+        """Run blocking function without blocking the event loop.
+
+        Args:
+            function: function to run in executor
+            args: arguments to function
+
+        Returns:
+            Result of function
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, function, *args)
 
 
 class UrlFileNotFoundError(ValueError):
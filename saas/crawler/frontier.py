@@ -0,0 +1,148 @@
+"""Frontier module."""
+
+from __future__ import annotations
+from saas.storage.index import IndexBackend
+from collections import deque
+from saas.web.url import Url
+from typing import Optional
+from threading import Lock
+import heapq
+import time
+
+
+class Frontier:
+    """Frontier class.
+
+    The frontier holds urls that are waiting to be crawled,
+    partitioned by domain. Urls are checked out from the index
+    in batches and handed out in order of when their domain is
+    next allowed to be crawled. A domain is never handed out
+    again until the url previously handed out from it is done,
+    and not until the crawl delay has passed after that, so one
+    slow host can't hold up the crawlers and no host is crawled
+    faster than the crawl delay allows.
+
+    The frontier is safe to share between crawler threads.
+    """
+
+    BATCH_SIZE = 100
+
+    MAX_PENDING = 1000
+
+    # a domain that responded slowly is crawled less often,
+    # waiting this many times the response time
+    SLOWDOWN = 2
+
+    def __init__(self, index: IndexBackend, crawl_delay: float=1.0):
+        """Create new frontier.
+
+        Args:
+            index: Index where uncrawled urls are stored
+            crawl_delay: minimum number of seconds between two
+                requests to the same domain (default: {1.0})
+        """
+        self.index = index
+        self.crawl_delay = crawl_delay
+        self.queues = {}  # type: dict
+        self.ready_at = {}  # type: dict
+        self.in_flight = set()  # type: set
+        self.scheduled = set()  # type: set
+        self.heap = []  # type: list
+        self.pending = 0
+        self.lock = Lock()
+
+    def next_url(self) -> Optional[Url]:
+        """Get next url to crawl.
+
+        Returns:
+            A url from a domain that is allowed to be crawled,
+            None if no such url exists
+            Url or None
+        """
+        with self.lock:
+            full = self.pending >= Frontier.MAX_PENDING
+            if not self._has_ready_domain() and not full:
+                self._refill()
+
+            if not self._has_ready_domain():
+                return None
+
+            ready_at, domain = heapq.heappop(self.heap)
+            self.scheduled.remove(domain)
+            url = self.queues[domain].popleft()  # type: Url
+            if len(self.queues[domain]) == 0:
+                del self.queues[domain]
+            self.pending -= 1
+            self.in_flight.add(domain)
+            return url
+
+    def done(self, url: Url, elapsed: float):
+        """Mark url as crawled.
+
+        Args:
+            url: the url that was crawled
+            elapsed: number of seconds it took to crawl url
+        """
+        with self.lock:
+            domain = url.domain
+            delay = max(self.crawl_delay, elapsed * Frontier.SLOWDOWN)
+            self.ready_at[domain] = time.time() + delay
+            self.in_flight.discard(domain)
+            self._schedule(domain)
+
+    def close(self):
+        """Close frontier.
+
+        Urls still waiting in the frontier are put back
+        into the index.
+        """
+        with self.lock:
+            urls = []
+            for domain in self.queues:
+                urls.extend(self.queues[domain])
+            self.queues = {}
+            self.heap = []
+            self.scheduled = set()
+            self.pending = 0
+        if len(urls) > 0:
+            self.index.add_uncrawled_urls(urls)
+
+    def _has_ready_domain(self) -> bool:
+        """Check if any domain is allowed to be crawled now.
+
+        Returns:
+            True if a url can be handed out, otherwise False
+            bool
+        """
+        return len(self.heap) > 0 and self.heap[0][0] <= time.time()
+
+    def _refill(self):
+        """Check out a batch of urls from index."""
+        urls = self.index.checkout_uncrawled_urls(Frontier.BATCH_SIZE)
+        for url in urls:
+            if url.domain not in self.queues:
+                self.queues[url.domain] = deque()
+            self.queues[url.domain].append(url)
+            self.pending += 1
+            self._schedule(url.domain)
+        self._forget_idle_domains()
+
+    def _schedule(self, domain: str):
+        """Schedule domain to be handed out when it's allowed.
+
+        Args:
+            domain: domain to schedule
+        """
+        if domain in self.scheduled or domain in self.in_flight:
+            return
+        if domain not in self.queues:
+            return
+        heapq.heappush(self.heap, (self.ready_at.get(domain, 0), domain))
+        self.scheduled.add(domain)
+
+    def _forget_idle_domains(self):
+        """Forget crawl times that no longer hold back a domain."""
+        now = time.time()
+        for domain in list(self.ready_at.keys()):
+            if domain not in self.queues and self.ready_at[domain] < now:
+                del self.ready_at[domain]
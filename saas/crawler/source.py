@@ -0,0 +1,205 @@
+"""Url source module."""
+
+from __future__ import annotations
+from typing import Optional
+from threading import Lock
+import hashlib
+import fcntl
+import os
+
+
+class UrlFile:
+    """Url file class.
+
+    Reads the url file line by line from a byte offset that is
+    persisted in a small journal next to the url file. The url
+    file itself is never rewritten, so consuming a url costs a
+    constant amount of io no matter how large the file is. Lines
+    appended to the file are picked up by following reads.
+
+    The journal is locked while a line is consumed, which makes it
+    safe for several crawlers, in one or many processes, to share
+    the same url file.
+    """
+
+    JOURNAL_PREFIX = '.'
+
+    JOURNAL_SUFFIX = '.saas-journal'
+
+    JOURNAL_RECORD_SIZE = 128
+
+    # number of bytes at the start of the url file used to
+    # detect if the file was replaced or truncated
+    FINGERPRINT_SIZE = 64
+
+    locks = {}  # type: dict
+
+    locks_lock = Lock()
+
+    def __init__(self, path: str):
+        """Create new url file.
+
+        Args:
+            path: absolute path to url file
+        """
+        self.path = path
+        directory, filename = os.path.split(path)
+        self.journal_path = os.path.join(
+            directory,
+            UrlFile.JOURNAL_PREFIX + filename + UrlFile.JOURNAL_SUFFIX
+        )
+        self.source = open(self.path, 'rb')
+        self.journal = os.open(self.journal_path, os.O_RDWR | os.O_CREAT)
+        self.lock = UrlFile._lock_for(self.path)
+        self.is_open = True
+        self.pending = None  # type: Optional[tuple]
+
+    @staticmethod
+    def _lock_for(path: str) -> Lock:
+        """Get lock shared by all readers of path in this process.
+
+        Args:
+            path: path to url file
+
+        Returns:
+            A lock for given path
+            Lock
+        """
+        with UrlFile.locks_lock:
+            if path not in UrlFile.locks:
+                UrlFile.locks[path] = Lock()
+            lock = UrlFile.locks[path]  # type: Lock
+            return lock
+
+    def next_line(self) -> Optional[str]:
+        """Consume next non-empty line from url file.
+
+        Returns:
+            The next line, None if no new line has been added
+            str or None
+        """
+        with self.lock:
+            fcntl.flock(self.journal, fcntl.LOCK_EX)
+            try:
+                return self._next_line()
+            finally:
+                fcntl.flock(self.journal, fcntl.LOCK_UN)
+
+    def _next_line(self) -> Optional[str]:
+        """Consume next non-empty line, journal must be locked.
+
+        Returns:
+            The next line, None if no new line has been added
+            str or None
+        """
+        self._reopen_if_replaced()
+        inode, offset, fingerprint = self._read_journal()
+        size = os.fstat(self.source.fileno()).st_size
+
+        if inode != self._inode() or offset > size:
+            offset = 0
+        elif fingerprint != self._fingerprint(offset):
+            offset = 0
+
+        self.source.seek(offset)
+        while True:
+            raw = self.source.readline()
+            if raw == b'':
+                return None
+
+            if raw[-1:] != b'\n' and not self._is_stale(offset, size):
+                # the line might still be written to, wait until it is
+                # terminated or has stayed the same for one read
+                self.pending = (offset, size)
+                return None
+
+            self.pending = None
+            offset += len(raw)
+            self._write_journal(offset)
+
+            line = raw.decode(errors='replace').strip()
+            if line != '':
+                return line
+
+    def _is_stale(self, offset: int, size: int) -> bool:
+        """Check if an unterminated line was seen unchanged before.
+
+        Args:
+            offset: where the unterminated line starts
+            size: current size of url file
+
+        Returns:
+            True if the line was seen unchanged in previous read
+            bool
+        """
+        return self.pending == (offset, size)
+
+    def _reopen_if_replaced(self):
+        """Reopen url file if it was replaced at its path."""
+        try:
+            current = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return
+        if current != self._inode():
+            self.source.close()
+            self.source = open(self.path, 'rb')
+
+    def _inode(self) -> int:
+        """Get inode of open url file.
+
+        Returns:
+            Inode number
+            int
+        """
+        return os.fstat(self.source.fileno()).st_ino
+
+    def _fingerprint(self, offset: int) -> str:
+        """Make fingerprint of the consumed start of the url file.
+
+        Args:
+            offset: number of consumed bytes
+
+        Returns:
+            A hash of the first consumed bytes
+            str
+        """
+        length = min(offset, UrlFile.FINGERPRINT_SIZE)
+        head = os.pread(self.source.fileno(), length, 0)
+        return hashlib.sha1(head).hexdigest()
+
+    def _read_journal(self) -> tuple:
+        """Read journal record.
+
+        Returns:
+            Inode, offset and fingerprint, defaults if journal is empty
+            tuple
+        """
+        record = os.pread(self.journal, UrlFile.JOURNAL_RECORD_SIZE, 0)
+        try:
+            inode, offset, fingerprint = record.decode().split()
+            return int(inode), int(offset), fingerprint
+        except ValueError:
+            return 0, 0, ''
+
+    def _write_journal(self, offset: int):
+        """Write journal record.
+
+        The record is fixed size and written in place.
+
+        Args:
+            offset: number of consumed bytes
+        """
+        record = '{} {} {}'.format(
+            self._inode(),
+            offset,
+            self._fingerprint(offset)
+        ).ljust(UrlFile.JOURNAL_RECORD_SIZE - 1) + '\n'
+        os.pwrite(self.journal, record.encode(), 0)
+
+    def close(self):
+        """Close url file and journal."""
+        if not self.is_open:
+            return
+        self.is_open = False
+        self.source.close()
+        os.close(self.journal)
@@ -0,0 +1,165 @@
+"""Cache module."""
+
+from __future__ import annotations
+from saas.mount.file import LastCapture
+from collections import OrderedDict
+from typing import Optional
+from threading import Lock
+import time
+
+
+class AttributeCache:
+    """Attribute cache class.
+
+    Keeps attributes of recently looked up paths, and that paths
+    did not exist, so the kernel's repeated lookups of the same path
+    do not query the index. Entries expire after max age, the least
+    recently used entries are evicted when the cache is full.
+
+    Entries are grouped by the domain and capture of their path, a
+    group is dropped when a photo is saved in it. Nothing is cached
+    in a dropped group until the change has settled, since the index
+    may not show the saved photo until its writes are flushed and
+    refreshed.
+    """
+
+    MAX_SIZE = 10000
+
+    MAX_AGE = 10.0
+
+    SETTLE_TIME = 2.0
+
+    def __init__(self, max_size: int=MAX_SIZE, max_age: float=MAX_AGE):
+        """Create new attribute cache.
+
+        Args:
+            max_size: max number of paths cached (default: {10000})
+            max_age: number of seconds an entry is valid
+                (default: {10.0})
+        """
+        self.max_size = max_size
+        self.max_age = max_age
+        self.lock = Lock()
+
+        # path => (attributes, time it was cached)
+        self.entries = OrderedDict()  # type: OrderedDict
+
+        # (domain, captured_at) => paths
+        self.groups = {}  # type: dict
+
+        # (domain, captured_at) => time changes have settled
+        self.unsettled = {}  # type: dict
+
+    def get(self, path: str) -> tuple:
+        """Get cached attributes of path.
+
+        Args:
+            path: path in filesystem
+
+        Returns:
+            If path was cached, and its attributes, None if path
+            did not exist
+            bool, Optional[dict]
+        """
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is None:
+                return False, None
+            attributes, cached_at = entry
+            if time.time() - cached_at > self.max_age:
+                self._remove(path)
+                return False, None
+            self.entries.move_to_end(path)
+            return True, attributes
+
+    def set(self, path: str, attributes: Optional[dict]):
+        """Cache attributes of path.
+
+        Args:
+            path: path in filesystem
+            attributes: attributes of path, None if path does not exist
+        """
+        group = AttributeCache._group(path)
+        with self.lock:
+            settled_at = self.unsettled.get(group)
+            if settled_at is not None:
+                if time.time() < settled_at:
+                    return
+                del self.unsettled[group]
+
+            if path in self.entries:
+                self._remove(path)
+            self.entries[path] = (attributes, time.time())
+            self.groups.setdefault(group, set()).add(path)
+
+            while len(self.entries) > self.max_size:
+                oldest, _ = self.entries.popitem(last=False)
+                self._forget(oldest)
+
+    def invalidate(self, domain: str, captured_at: str):
+        """Drop cached paths a photo saved in capture could change.
+
+        Drops the domain directory, the capture and the latest
+        capture of domain.
+
+        Args:
+            domain: domain of saved photo
+            captured_at: capture photo was saved in
+        """
+        now = time.time()
+        groups = [
+            (domain, None),
+            (domain, captured_at),
+            (domain, LastCapture.FILENAME),
+        ]
+        with self.lock:
+            self.unsettled = {
+                group: settled_at
+                for group, settled_at in self.unsettled.items()
+                if settled_at > now
+            }
+            for group in groups:
+                self.unsettled[group] = now + AttributeCache.SETTLE_TIME
+                for path in self.groups.pop(group, set()):
+                    del self.entries[path]
+
+    def _remove(self, path: str):
+        """Remove path from cache.
+
+        Args:
+            path: cached path
+        """
+        del self.entries[path]
+        self._forget(path)
+
+    def _forget(self, path: str):
+        """Remove path from its group.
+
+        Args:
+            path: path no longer cached
+        """
+        group = AttributeCache._group(path)
+        paths = self.groups.get(group)
+        if paths is None:
+            return
+        paths.discard(path)
+        if len(paths) == 0:
+            del self.groups[group]
+
+    @staticmethod
+    def _group(path: str) -> tuple:
+        """Get group of path.
+
+        Args:
+            path: path in filesystem eg.
+                /example.com/2019-01-13H20:00/foo/bar.png
+
+        Returns:
+            Domain and captured_at of path, captured_at is None
+            if path does not include it
+            str, Optional[str]
+        """
+        pieces = path.split('/')
+        if len(pieces) >= 3:
+            return pieces[1], pieces[2]
+        return pieces[1], None
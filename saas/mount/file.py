@@ -4,6 +4,8 @@ from __future__ import annotations
 from saas.storage.refresh import RefreshRate
 import saas.storage.index as idx
 from typing import Optional, Type
+from threading import Lock
+import hashlib
 import time
 import os
 
@@ -146,6 +148,23 @@ class InvalidPathException(Exception):
     pass
 
 
+def inode(key: str) -> int:
+    """Make inode number of file.
+
+    The number is stable across mounts, so tools can recognize a file
+    they have seen before.
+
+    Args:
+        key: what identifies file, eg. id of a photo or a path
+
+    Returns:
+        Inode number, a positive 63 bit integer
+        int
+    """
+    digest = hashlib.sha256(key.encode()).digest()
+    return int.from_bytes(digest[:8], 'big') >> 1
+
+
 class Directory:
     """Directory class."""
 
@@ -164,17 +183,18 @@ class Directory:
         if Directory.TIME == 0.0:
             Directory.TIME = time.time()
 
-    def attributes(self: Optional['Directory']=None) -> dict:
+    def attributes(self: Optional['Directory']=None, ino: int=0) -> dict:
         """Get attributes of file.
 
         Args:
             self: Self (default: {None})
+            ino: inode number, left out if 0 (default: {0})
 
         Returns:
             File attributes
             dict
         """
-        return {
+        attributes = {
             'st_atime': Directory.TIME,
             'st_ctime': Directory.TIME,
             'st_gid': os.getgid(),
@@ -183,6 +203,9 @@ class Directory:
             'st_size': 0,
             'st_uid': os.getuid(),
         }
+        if ino != 0:
+            attributes['st_ino'] = ino
+        return attributes
 
 
 class File:
@@ -203,26 +226,39 @@ class File:
         if File.TIME == 0.0:
             File.TIME = time.time()
 
-    def attributes(self: Optional['File']=None, filesize: int=0) -> dict:
+    def attributes(
+        self: Optional['File']=None,
+        filesize: int=0,
+        mtime: float=0.0,
+        ino: int=0
+    ) -> dict:
         """Get attributes of file.
 
         Args:
             self: Self (default: {None})
             filesize: size of file on disk (default: {0})
+            mtime: when file was last modified, the time files were
+                first listed if 0 (default: {0.0})
+            ino: inode number, left out if 0 (default: {0})
 
         Returns:
             File attributes
             dict
         """
-        return {
-            'st_atime': File.TIME,
-            'st_ctime': File.TIME,
+        if mtime == 0.0:
+            mtime = File.TIME
+        attributes = {
+            'st_atime': mtime,
+            'st_ctime': mtime,
             'st_gid': os.getgid(),
             'st_mode': File.ST_MODE,
-            'st_mtime': File.TIME,
+            'st_mtime': mtime,
             'st_size': filesize,
             'st_uid': os.getuid(),
         }
+        if ino != 0:
+            attributes['st_ino'] = ino
+        return attributes
 
 
 class LastCapture:
@@ -230,22 +266,24 @@ class LastCapture:
 
     The last capture is the most recent capture of a domain.
     This class helps convert last capture placeholder to
-    real captured_at value.
+    real captured_at value. The cache is shared by the threads
+    serving the filesystem.
     """
 
     FILENAME = 'latest'
 
     CACHE_AGE_LIMIT = 60
 
+    # domain => (captured_at, time it was cached)
     captures = {}  # type: dict
 
-    cached_at = {}  # type: dict
+    lock = Lock()
 
     @staticmethod
     def translate(
         captured_at: str,
         domain: str,
-        index: idx.Index,
+        index: idx.IndexBackend,
         refresh_rate: Type[RefreshRate]
     ) -> str:
         """Translate captured_at to cached value.
@@ -267,64 +305,61 @@ class LastCapture:
         """
         try:
             if captured_at == LastCapture.FILENAME:
-                if not LastCapture._is_cached(domain):
-                    LastCapture._update(domain, index, refresh_rate)
-                captured_at = LastCapture._from_cache(domain)
+                cached = LastCapture._from_cache(domain)
+                if cached is None:
+                    cached = LastCapture._update(domain, index, refresh_rate)
+                captured_at = cached
         except idx.EmptySearchResultException:
             pass
         return captured_at
 
     @staticmethod
-    def _from_cache(domain: str) -> str:
+    def _from_cache(domain: str) -> Optional[str]:
         """Get last capture of domain from cache.
 
         Args:
             domain: last capture of domain
 
         Returns:
-            Last captured_at value
-            str
+            Last captured_at value, None if it isn't cached or
+            the cache is too old
+            Optional[str]
         """
-        captured_at = LastCapture.captures[domain]  # type: str
-        return captured_at
+        with LastCapture.lock:
+            cached = LastCapture.captures.get(domain)
+        if cached is None:
+            return None
 
-    @staticmethod
-    def _is_cached(domain: str) -> bool:
-        """Check if last capture has a valid cache.
+        captured_at, cached_at = cached  # type: str, float
+        if time.time() - cached_at > LastCapture.CACHE_AGE_LIMIT:
+            return None
 
-        Args:
-            domain: last capture of domain
-
-        Returns:
-            True if a valid cache exists, otherwise False
-            bool
-        """
-        if domain not in LastCapture.captures:
-            return False
-
-        cache_age = time.time() - LastCapture.cached_at[domain]
-
-        if cache_age > LastCapture.CACHE_AGE_LIMIT:
-            return False
-
-        return True
+        return captured_at
 
     @staticmethod
     def _update(
         domain: str,
-        index: idx.Index,
+        index: idx.IndexBackend,
         refresh_rate: Type[RefreshRate]
-    ):
+    ) -> str:
         """Update cache.
 
+        The index is queried without holding the lock, threads
+        that miss the cache at the same time all query it.
+
         Args:
             domain: domain to cache
             index: Index photos are stored in
             refresh_rate: refresh rate capture should be for
+
+        Returns:
+            Last captured_at value
+            str
         """
         capture = index.photos_most_recent_capture_of_domain(
             domain,
             refresh_rate
         )
-        LastCapture.captures[domain] = capture
-        LastCapture.cached_at[domain] = time.time()
+        with LastCapture.lock:
+            LastCapture.captures[domain] = (capture, time.time())
+        return capture
@@ -1,30 +1,80 @@
 """Filesystem module."""
 
 from __future__ import annotations
-from saas.mount.file import Path, Directory, File, LastCapture
-from saas.storage.index import Index, PhotoNotFoundException
+from saas.storage.index import IndexBackend, PhotoNotFoundException
+from saas.mount.file import Path, Directory, File, LastCapture, inode
+from saas.mount.cache import AttributeCache
+from saas.mount.replica import Replica
+from saas.storage.thumbnails import Thumbnails
 from saas.storage.refresh import RefreshRate
+from typing import Type, Generator, Optional, Union
+from threading import BoundedSemaphore, Lock
 from saas.utils.files import real_path
 import saas.utils.console as console
-from typing import Type, Generator
+from collections import OrderedDict
 from fuse import FUSE, Operations
 import errno
+import time
 import os
 
 
-def mount(mountpoint: str, index: Index, refresh_rate: Type[RefreshRate]):
+def mount(
+    mountpoint: str,
+    index: IndexBackend,
+    refresh_rate: Type[RefreshRate],
+    thumbnails: Optional[Thumbnails]=None,
+    threads: int=10,
+    cache: Optional[AttributeCache]=None,
+    replica: Optional[Replica]=None,
+    entry_timeout: float=1.0,
+    attr_timeout: float=1.0,
+    kernel_cache: str='auto'
+):
     """Mount filesystem.
 
-    Mount filesystem at given path.
+    Mount filesystem at given path. Requests from the kernel are
+    served by multiple threads, so a slow request doesn't hold
+    up the others. Files have stable inode numbers and the time
+    their photo was saved as mtime, so the kernel and tools like
+    rsync can tell unchanged files apart.
 
     Args:
         mountpoint: where to mount filesystem
-        index: index to read data from
+        index: index to read data from, shared by the threads
         refresh_rate: Which refresh rate filesystem should use
             for fetching photos
+        thumbnails: Optional thumbnails to expose beside photos
+        threads: max number of requests served at once (default: {10})
+        cache: Optional cache of file attributes, shared by the threads
+        replica: Optional in-memory replica of photos to look paths up in
+        entry_timeout: number of seconds the kernel caches names
+            (default: {1.0})
+        attr_timeout: number of seconds the kernel caches attributes
+            of files (default: {1.0})
+        kernel_cache: how the kernel caches content of files, 'off',
+            'auto' to drop it when a file's mtime or size changes, or
+            'always' (default: {'auto'})
     """
-    filesystem = Filesystem(index, refresh_rate)
-    FUSE(filesystem, real_path(mountpoint), nothreads=True, foreground=True)
+    filesystem = Filesystem(
+        index,
+        refresh_rate,
+        thumbnails,
+        threads,
+        cache,
+        replica
+    )
+    FUSE(
+        filesystem,
+        real_path(mountpoint),
+        nothreads=False,
+        foreground=True,
+        use_ino=True,
+        entry_timeout=entry_timeout,
+        attr_timeout=attr_timeout,
+        **Filesystem.KERNEL_CACHE[kernel_cache]
+    )
+    if thumbnails is not None:
+        thumbnails.close()
 
 
 class Filesystem(Operations):
@@ -39,20 +89,82 @@ class Filesystem(Operations):
 
     ROOT_PATH = '/'
 
-    def __init__(self, index: Index, refresh_rate: Type[RefreshRate]):
+    # mount options of each way the kernel can cache content of files
+    KERNEL_CACHE = {
+        'off': {},
+        'auto': {'auto_cache': True},
+        'always': {'kernel_cache': True},
+    }
+
+    # number of seconds a resolved file is reused, so that the kernel
+    # opening a file right after getting its attributes resolves
+    # it once
+    RESOLVE_AGE = 1.0
+
+    MAX_RESOLVED = 1000
+
+    def __init__(
+        self,
+        index: IndexBackend,
+        refresh_rate: Type[RefreshRate],
+        thumbnails: Optional[Thumbnails]=None,
+        threads: int=10,
+        cache: Optional[AttributeCache]=None,
+        replica: Optional[Replica]=None
+    ):
         """Create new filesystem.
 
         Args:
             index: Index where photos are stored
             refresh_rate: Which refresh rate filesystem should use
                 for fetching photos
+            thumbnails: Optional thumbnails to expose as sibling files
+                of photos, eg. index.320w.png beside index.png
+            threads: max number of requests served at once
+                (default: {10})
+            cache: Optional cache of attributes of looked up paths,
+                paths are looked up in the index every time if None
+            replica: Optional in-memory replica of photos, paths are
+                looked up in it instead of the index
         """
         self.index = index
         self.refresh_rate = refresh_rate
+        self.thumbnails = thumbnails
+        self.workers = BoundedSemaphore(threads)
+        self.cache = cache
+        self.photos = index  # type: Union[IndexBackend, Replica]
+        if replica is not None:
+            self.photos = replica
+        self.lock = Lock()
+
+        # path => (path in data dir, attributes, time it was resolved)
+        self.resolved = OrderedDict()  # type: OrderedDict
+
+        # file descriptor => (path in data dir, attributes)
+        self.handles = {}  # type: dict
+
+    def __call__(self, op: str, *args):
+        """Serve request from the kernel.
+
+        Waits for a free worker if max number of requests are
+        being served.
+
+        Args:
+            op: name of operation eg. getattr
+            *args: arguments of operation
+
+        Returns:
+            Result of operation
+            any
+        """
+        with self.workers:
+            return super().__call__(op, *args)
 
     def getattr(self, path: str, fh=None) -> dict:
         """Get attributes of file.
 
+        Attributes of an open file are taken from its handle.
+
         Args:
             path: path to file
             fh: file descriptor
@@ -65,13 +177,40 @@ class Filesystem(Operations):
             FileNotFoundError: If a file was not found at path
         """
         console.df(f'getattr {path}')
+        if fh is not None:
+            with self.lock:
+                handle = self.handles.get(fh)
+            if handle is not None:
+                handle_attributes = handle[1]  # type: dict
+                return handle_attributes
+
+        attributes = None  # type: Optional[dict]
+        if self.cache is not None:
+            cached, attributes = self.cache.get(path)
+            if cached and attributes is not None:
+                return attributes
+            if cached:
+                raise FileNotFoundError(
+                    errno.ENOENT,
+                    os.strerror(errno.ENOENT),
+                    path
+                )
+
+        final = True
         try:
-            return self._attributes(path)
-        except PhotoNotFoundException:
-            pass
-        except FileNotFoundError:
-            pass
-        raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+            attributes, final = self._attributes(path)
+        except (PhotoNotFoundException, FileNotFoundError):
+            attributes = None
+
+        if self.cache is not None and final:
+            self.cache.set(path, attributes)
+        if attributes is None:
+            raise FileNotFoundError(
+                errno.ENOENT,
+                os.strerror(errno.ENOENT),
+                path
+            )
+        return attributes
 
     def readdir(self, path: str, fh: int) -> Generator:
         """Read directory.
@@ -93,6 +232,9 @@ class Filesystem(Operations):
     def open(self, path: str, flags: int) -> int:
         """Open file for low level io.
 
+        The file is kept in the table of handles, so requests for
+        the open file are served without looking it up again.
+
         Args:
             path: path to file
             flags: flags
@@ -102,7 +244,11 @@ class Filesystem(Operations):
             int
         """
         console.df(f'open {path}')
-        return os.open(self._translate_path(path), flags)
+        full_path, attributes = self._resolve(path, make=True)
+        fh = os.open(full_path, flags)
+        with self.lock:
+            self.handles[fh] = (full_path, attributes)
+        return fh
 
     def release(self, path: str, fh: int):
         """Release file.
@@ -115,6 +261,8 @@ class Filesystem(Operations):
             fh: file descriptor
         """
         console.df(f'release {path}')
+        with self.lock:
+            self.handles.pop(fh, None)
         os.close(fh)
 
     def read(self, path: str, length: int, offset: int, fh: int) -> bytes:
@@ -131,8 +279,9 @@ class Filesystem(Operations):
             bytes
         """
         console.df(f'read {path}')
-        os.lseek(fh, offset, os.SEEK_SET)
-        return os.read(fh, length)
+        # the file descriptor can be read by several threads at once,
+        # so the offset is passed instead of seeking
+        return os.pread(fh, length, offset)
 
     def write(self, path: str, data: str, offset: int, fh: int):
         """Write to file.
@@ -155,70 +304,69 @@ class Filesystem(Operations):
             path
         )
 
-    def _attributes(self, path: str) -> dict:
+    def _attributes(self, path: str) -> tuple:
         """Get attributes of file at path.
 
         Args:
             path: path to file
 
         Returns:
-            Dictionary with file attributes, see files module
-            dict
+            Dictionary with file attributes, see files module, and
+            False if they are estimated as the file is being made
+            dict, bool
 
         Raises:
-            FileNotFoundError: if no file exists at given path
+            FileNotFoundError: if no directory exists at given path
+            PhotoNotFoundException: if no photo exists at given path
         """
         if path == Filesystem.ROOT_PATH:
-            return Directory.attributes()
+            return Directory.attributes(None, inode(path)), True
 
         parsed = Path(path)
 
         if parsed.includes_domain() and not parsed.includes_captured_at():
-            domains = self.index.photos_unique_domains(self.refresh_rate)
-            if parsed.domain not in domains:
+            if not self.photos.photos_domain_exists(
+                parsed.domain,
+                self.refresh_rate
+            ):
                 raise FileNotFoundError(f'Unkown domain: {parsed.domain}')
-            return Directory.attributes()
+            return Directory.attributes(None, inode(path)), True
 
         if parsed.includes_captured_at() and not parsed.includes_end():
-            captures = self.index.photos_unique_captures_of_domain(
-                parsed.domain,
-                self.refresh_rate
-            )
-            captures.append(LastCapture.FILENAME)
-            if parsed.captured_at not in captures:
+            if parsed.captured_at != LastCapture.FILENAME and \
+                    not self.photos.photos_capture_exists(
+                        parsed.domain,
+                        parsed.captured_at,
+                        self.refresh_rate
+                    ):
                 raise FileNotFoundError(
                     f'Unkown capture: {parsed.captured_at}'
                 )
-            return Directory.attributes()
+            return Directory.attributes(None, inode(path)), True
 
-        if self.index.photos_directory_exists(
+        if self.photos.photos_directory_exists(
             domain=parsed.domain,
             captured_at=parsed.captured_at,
             directory=parsed.end_as_directory(),
             refresh_rate=self.refresh_rate
         ):
-            return Directory.attributes()
-
-        file_exists = self.index.photos_file_exists(
-            domain=parsed.domain,
-            captured_at=parsed.captured_at,
-            full_filename=parsed.end_as_file(),
-            refresh_rate=self.refresh_rate
-        )
-        if file_exists:
-            return File.attributes(None, file_exists)
+            return Directory.attributes(None, inode(path)), True
 
-        raise FileNotFoundError(f'No file at path: {path}')
+        full_path, attributes = self._resolve(path)
+        return attributes, full_path is not None
 
-    def _list(self, path: str) -> list:
+    def _list(self, path: str) -> Generator:
         """List directory.
 
+        Entries are listed as they are read from the index, so
+        large directories aren't held in memory.
+
         Args:
             path: path to directory
 
         Returns:
-            List of directory content
-            list
+            Directory content, files and directories
+            Generator
         """
         if path == Filesystem.ROOT_PATH:
             return self._list_root()
@@ -234,47 +382,44 @@ class Filesystem(Operations):
             parsed.end_as_directory()
         )
 
-    def _list_root(self) -> list:
+    def _list_root(self) -> Generator:
         """List root directory.
 
-        Returns:
-            List of domains
-            list
+        Yields:
+            Domain
+            Directory
         """
-        files = self._current_and_parent_dirs()
-        for domain in self.index.photos_unique_domains(self.refresh_rate):
-            files.append(Directory(domain))
-        return files
+        yield from self._current_and_parent_dirs()
+        for domain in self.photos.photos_unique_domains(self.refresh_rate):
+            yield Directory(domain)
 
-    def _list_unique_captures(self, domain: str) -> list:
+    def _list_unique_captures(self, domain: str) -> Generator:
         """List unique captures of domain.
 
         Args:
             domain: domain name to list
 
-        Returns:
-            List of captures.
-            list
+        Yields:
+            Capture
+            Directory
         """
-        files = self._current_and_parent_dirs()
+        yield from self._current_and_parent_dirs()
 
-        captures = self.index.photos_unique_captures_of_domain(
+        captures = self.photos.photos_unique_captures_of_domain(
             domain,
             self.refresh_rate
         )
         for file in captures:
-            files.append(Directory(file))
+            yield Directory(file)
 
-        files.append(Directory(LastCapture.FILENAME))
-
-        return files
+        yield Directory(LastCapture.FILENAME)
 
     def _list_directory(
         self,
         domain: str,
         captured_at: str,
         directory: str
-    ) -> list:
+    ) -> Generator:
         """List contents of a directory.
 
         Args:
@@ -282,31 +427,35 @@ class Filesystem(Operations):
             captured_at: filter by capture time
             directory: directory path
 
-        Returns:
-            A list of files and directories
-            list
+        Yields:
+            File or directory
+            File or Directory
         """
-        files = self._current_and_parent_dirs()
+        yield from self._current_and_parent_dirs()
 
-        result = self.index.photos_list_files_in_directory(
+        result = self.photos.photos_list_files_in_directory(
             domain,
             captured_at,
             directory,
             self.refresh_rate
         )
         for file in result:
-            files.append(File(file))
-
-        result = self.index.photos_list_directories_in_directory(
+            yield File(file)
+            if self.thumbnails is None:
+                continue
+            if file.endswith(Path.RENDERING_EXTENSION):
+                continue
+            for width in self.thumbnails.sizes:
+                yield File(self.thumbnails.filename(file, width))
+
+        result = self.photos.photos_list_directories_in_directory(
             domain,
             captured_at,
             directory,
             self.refresh_rate
         )
         for file in result:
-            files.append(Directory(file))
-
-        return files
+            yield Directory(file)
 
     def _current_and_parent_dirs(self) -> list:
         """Get current and parent directory.
@@ -320,35 +469,108 @@ class Filesystem(Operations):
             Directory('..'),
         ]
 
-    def _translate_path(self, path: str) -> str:
-        """Translate path to path in data dir.
+    def _resolve(self, path: str, make: bool=False) -> tuple:
+        """Resolve file at path.
+
+        Files resolved less than RESOLVE_AGE seconds ago are reused.
 
         Args:
             path: Path in mounted directory eg.
                 /example.com/2019-01-13H20:00/foo/bar.png
+            make: wait for a thumbnail to be made if it doesn't
+                exist yet (default: {False})
 
         Returns:
-            Path in data directory to raw data
-            str
+            Path in data directory to raw data, and attributes of file,
+            path is None if file is a thumbnail that is being made
+            Optional[str], dict
+
+        Raises:
+            FileNotFoundError: If file at given path does not exist
+        """
+        with self.lock:
+            resolved = self.resolved.get(path)
+        if resolved is not None and \
+                time.time() - resolved[2] < Filesystem.RESOLVE_AGE:
+            return resolved[0], resolved[1]
+
+        full_path, attributes = self._lookup(path, make)
+        if full_path is None:
+            return full_path, attributes
+        with self.lock:
+            self.resolved.pop(path, None)
+            self.resolved[path] = (full_path, attributes, time.time())
+            while len(self.resolved) > Filesystem.MAX_RESOLVED:
+                self.resolved.popitem(last=False)
+        return full_path, attributes
+
+    def _lookup(self, path: str, make: bool=False) -> tuple:
+        """Look up photo of file at path.
+
+        A thumbnail that doesn't exist yet is made in the background,
+        unless make is True, and its size is estimated by the size
+        of its photo meanwhile.
+
+        Args:
+            path: Path in mounted directory eg.
+                /example.com/2019-01-13H20:00/foo/bar.png
+            make: wait for a thumbnail to be made if it doesn't
+                exist yet (default: {False})
+
+        Returns:
+            Path in data directory to raw data, and attributes of file,
+            path is None if file is a thumbnail that is being made
+            Optional[str], dict
 
         Raises:
             FileNotFoundError: If file at given path does not exist
         """
         parsed = Path(path)
-        exists = self.index.photos_file_exists(
-            domain=parsed.domain,
-            captured_at=parsed.captured_at,
-            full_filename=parsed.end_as_file(),
-            refresh_rate=self.refresh_rate
-        )
-        if not exists:
+        full_filename = parsed.end_as_file()
+        width = 0
+        if self.thumbnails is not None:
+            full_filename, width = self.thumbnails.parse(full_filename)
+
+        try:
+            photo = self.photos.photos_get_photo(
+                domain=parsed.domain,
+                captured_at=parsed.captured_at,
+                full_filename=full_filename,
+                refresh_rate=self.refresh_rate
+            )
+        except PhotoNotFoundException:
             raise FileNotFoundError('photo do not exist in index')
 
-        photo = self.index.photos_get_photo(
-            domain=parsed.domain,
-            captured_at=parsed.captured_at,
-            full_filename=parsed.end_as_file(),
-            refresh_rate=self.refresh_rate
-        )
+        if self.thumbnails is not None and width != 0:
+            try:
+                if make:
+                    thumbnail = self.thumbnails.get(photo.path, width)
+                else:
+                    found = self.thumbnails.find(photo.path, width)
+                    if found is None:
+                        # estimated, thumbnails are smaller than photos
+                        return None, File.attributes(
+                            None,
+                            photo.filesize(),
+                            photo.timestamp or 0.0,
+                            inode(path)
+                        )
+                    thumbnail = found
+            except Exception as e:
+                raise FileNotFoundError(f'failed to make thumbnail: {e}')
+            stat = os.stat(thumbnail)
+            return thumbnail, File.attributes(
+                None,
+                stat.st_size,
+                stat.st_mtime,
+                inode(path)
+            )
 
-        return photo.path.full_path()
+        # a photo keeps its id when it is done rendering, so its
+        # inode stays the same while its size and mtime change
+        return photo.path.full_path(), File.attributes(
+            None,
+            photo.filesize(),
+            photo.timestamp or 0.0,
+            inode(photo.path.uuid)
+        )
@@ -0,0 +1,725 @@
+"""Replica module."""
+
+from __future__ import annotations
+from saas.storage.index import IndexBackend, PhotoNotFoundException
+from saas.storage.index import EmptySearchResultException
+from saas.storage.refresh import RefreshRate
+from saas.mount.file import Path, LastCapture
+from typing import Type, Optional, Generator
+from saas.photographer.photo import Photo
+import saas.utils.console as console
+from threading import Thread, Lock
+import time
+import sys
+
+
+class Node:
+    """Directory node of replica."""
+
+    # a node is made for every directory of every capture
+    __slots__ = ['files', 'dirs']
+
+    def __init__(self):
+        """Create new empty directory node."""
+        # filename => entry of photo
+        self.files = {}  # type: dict
+
+        # name => child directory node
+        self.dirs = {}  # type: dict
+
+
+# number of bytes a dict takes up for every item it holds,
+# not counting the key and value themselves
+_SLOT_SIZE = sys.getsizeof(dict.fromkeys(range(1 << 10))) >> 10
+
+_NODE_SIZE = sys.getsizeof(Node()) + 2 * sys.getsizeof({})
+
+
+class Replica:
+    """Replica class.
+
+    In-memory copy of the photos of a refresh rate, kept as a tree of
+    domains, captures and directories so the mounted filesystem can
+    look up paths without querying the index. The replica is loaded
+    with every photo, then kept up to date by polling the photos saved
+    since the last poll.
+
+    The memory the replica takes up is estimated from the size of its
+    nodes, entries and the dicts holding them, when it exceeds max
+    memory the domain being added is dropped. Lookups of dropped
+    domains, and of any domain before the replica is loaded, are
+    passed on to the index.
+
+    Removed photos can't be polled, a capture a photo was removed
+    from is reloaded, until then lookups of it are passed on.
+    """
+
+    # fields of photo documents kept in the entry of a photo
+    FIELDS = [
+        'url_id',
+        'filesize',
+        'timestamp',
+        'format',
+        'blob',
+        'phash',
+        'change',
+    ]
+
+    SYNC_INTERVAL = 2
+
+    # photos are not searchable in the index right away, poll
+    # a few seconds before the last poll to not miss any
+    SYNC_OVERLAP = 5
+
+    # number of seconds before a capture a photo was removed
+    # from is reloaded, so the index shows the removal
+    SETTLE_TIME = 2.0
+
+    MAX_MEMORY = 256 << 20
+
+    def __init__(
+        self,
+        index: IndexBackend,
+        refresh_rate: Type[RefreshRate],
+        max_memory: int=MAX_MEMORY
+    ):
+        """Create new replica.
+
+        Args:
+            index: Index photos are stored in
+            refresh_rate: refresh rate of photos to replicate
+            max_memory: max number of bytes replica can take up
+                (default: {268435456})
+        """
+        self.index = index
+        self.refresh_rate = refresh_rate
+        self.max_memory = max_memory
+        self.lock = Lock()
+
+        # domain => captured_at => root directory node
+        self.domains = {}  # type: dict
+
+        # domain => estimated number of bytes its photos take up
+        self.sizes = {}  # type: dict
+
+        # domains that did not fit in replica
+        self.cold = set()  # type: set
+
+        # id of photo => node and filename of its entry
+        self.ids = {}  # type: dict
+
+        # (domain, captured_at) => time it can be reloaded
+        self.stale = {}  # type: dict
+
+        self.memory = 0
+        self.photos = 0
+        self.synced_at = 0
+        self.warm = False
+
+    def start(self) -> Thread:
+        """Load replica and poll for new photos in a thread.
+
+        Returns:
+            Daemon thread keeping replica up to date
+            Thread
+        """
+        thread = Thread(target=self._sync_periodically, daemon=True)
+        thread.start()
+        return thread
+
+    def sync(self):
+        """Add photos saved since last sync, and reload stale captures."""
+        started = int(time.time())
+        since = max(0, self.synced_at - Replica.SYNC_OVERLAP)
+        if not self.warm:
+            console.p('loading replica of photos')
+
+        photos = self.index.photos_since(since, self.refresh_rate)
+        for id, source in photos:
+            with self.lock:
+                self._add(id, source)
+
+        now = time.time()
+        for capture, reload_at in list(self.stale.items()):
+            if reload_at <= now:
+                self._reload(capture, reload_at)
+
+        self.synced_at = started
+        if not self.warm:
+            self.warm = True
+            console.p(self.report())
+        else:
+            console.dp(self.report())
+
+    def report(self) -> str:
+        """Report memory replica takes up.
+
+        Returns:
+            Number of photos and domains replicated, and estimated
+            memory they take up
+            str
+        """
+        with self.lock:
+            msg = '{} photos of {} domains in replica ({} of {} MB)'.format(
+                self.photos,
+                len(self.domains),
+                self.memory >> 20,
+                self.max_memory >> 20
+            )
+            if len(self.cold) > 0:
+                msg += f', {len(self.cold)} domains looked up in index'
+        return msg
+
+    def invalidate(self, domain: str, captured_at: str):
+        """Reload capture a photo was removed from.
+
+        Args:
+            domain: domain photo was removed from
+            captured_at: capture photo was removed from
+        """
+        with self.lock:
+            self.stale[(domain, captured_at)] = \
+                time.time() + Replica.SETTLE_TIME
+
+    def photos_unique_domains(
+        self,
+        refresh_rate: Type[RefreshRate]
+    ) -> Generator:
+        """Get unique domains that pictures have been taken of.
+
+        Args:
+            refresh_rate: Given refresh rate photo was taken with
+
+        Yields:
+            Domain, in alphabetical order
+            str
+        """
+        if not self.warm:
+            yield from self.index.photos_unique_domains(refresh_rate)
+            return
+        with self.lock:
+            domains = sorted(self.cold.union(self.domains))
+        yield from domains
+
+    def photos_unique_captures_of_domain(
+        self,
+        domain: str,
+        refresh_rate: Type[RefreshRate]
+    ) -> Generator:
+        """Get unique captures for a domain.
+
+        Args:
+            domain: The given domain to check
+            refresh_rate: Given refresh rate photo was taken with
+
+        Yields:
+            Capture, oldest first
+            str
+        """
+        if not self._covers(domain):
+            yield from self.index.photos_unique_captures_of_domain(
+                domain,
+                refresh_rate
+            )
+            return
+        with self.lock:
+            captures = sorted(self.domains.get(domain, {}))
+        yield from captures
+
+    def photos_most_recent_capture_of_domain(
+        self,
+        domain: str,
+        refresh_rate: Type[RefreshRate]
+    ) -> str:
+        """Get most recently captured_at value of domain.
+
+        Args:
+            domain: domain to check
+            refresh_rate: Given refresh rate photo was taken with
+
+        Returns:
+            The most recent capture_at value
+            str
+
+        Raises:
+            EmptySearchResultException: if domain has no captures
+        """
+        if not self._covers(domain):
+            return self.index.photos_most_recent_capture_of_domain(
+                domain,
+                refresh_rate
+            )
+        with self.lock:
+            captures = list(self.domains.get(domain, {}))
+        if len(captures) == 0:
+            raise EmptySearchResultException(
+                f'no capture for given refresh rate and {domain} was found'
+            )
+        # captured_at values of a refresh rate sort by time
+        latest = max(captures)  # type: str
+        return latest
+
+    def photos_domain_exists(
+        self,
+        domain: str,
+        refresh_rate: Type[RefreshRate]
+    ) -> bool:
+        """Check if any photo of domain is stored.
+
+        Args:
+            domain: domain to check
+            refresh_rate: Given refresh rate photo was taken with
+
+        Returns:
+            True if domain has been photographed, otherwise False
+            bool
+        """
+        if not self._covers(domain):
+            return self.index.photos_domain_exists(domain, refresh_rate)
+        with self.lock:
+            return domain in self.domains
+
+    def photos_capture_exists(
+        self,
+        domain: str,
+        captured_at: str,
+        refresh_rate: Type[RefreshRate]
+    ) -> bool:
+        """Check if domain has been photographed in capture.
+
+        Args:
+            domain: domain to check
+            captured_at: capture to check
+            refresh_rate: Given refresh rate photo was taken with
+
+        Returns:
+            True if capture has photos of domain, otherwise False
+            bool
+        """
+        if not self._covers(domain, captured_at):
+            return self.index.photos_capture_exists(
+                domain,
+                captured_at,
+                refresh_rate
+            )
+        with self.lock:
+            return captured_at in self.domains.get(domain, {})
+
+    def photos_get_photo(
+        self,
+        domain: str,
+        captured_at: str,
+        full_filename: str,
+        refresh_rate: Type[RefreshRate]
+    ) -> Photo:
+        """Get photo.
+
+        Args:
+            domain: domain photo belongs to
+            captured_at: when photo was captured
+            full_filename: full filename of photo
+                eg. /some/path/some-filename.png
+            refresh_rate: Given refresh rate photo was taken with
+
+        Returns:
+            Requested photo metadata
+            Photo
+
+        Raises:
+            PhotoNotFoundException: If photo was not found
+        """
+        captured_at = self._translate(domain, captured_at)
+        if not self._covers(domain, captured_at):
+            return self.index.photos_get_photo(
+                domain,
+                captured_at,
+                full_filename,
+                refresh_rate
+            )
+
+        directory, filename = self.index._split_filename(full_filename)
+        with self.lock:
+            node = self._node(domain, captured_at, directory)
+            entry = None if node is None else node.files.get(filename)
+        if entry is None:
+            raise PhotoNotFoundException('no photo was found')
+
+        source = dict(zip(Replica.FIELDS, entry[1:]))
+        return self.index._photo(entry[0], source, refresh_rate)
+
+    def photos_file_exists(
+        self,
+        domain: str,
+        captured_at: str,
+        full_filename: str,
+        refresh_rate: Type[RefreshRate]
+    ):
+        """Check if photo exists.
+
+        Args:
+            domain: domain photo belongs to
+            captured_at: when photo was captured
+            full_filename: full filename of photo
+                eg. /some/path/some-filename.png
+            refresh_rate: Given refresh rate photo was taken with
+
+        Returns:
+            False if file was not found, if found it's filesize
+            is returned
+            bool or int
+        """
+        try:
+            photo = self.photos_get_photo(
+                domain,
+                captured_at,
+                full_filename,
+                refresh_rate
+            )
+            return photo.filesize()
+        except PhotoNotFoundException:
+            return False
+
+    def photos_directory_exists(
+        self,
+        domain: str,
+        captured_at: str,
+        directory: str,
+        refresh_rate: Type[RefreshRate]
+    ) -> bool:
+        """Check if directory exists.
+
+        Args:
+            domain: domain photo belongs to
+            captured_at: when photo was captured
+            directory: directory path eg. /some/path/to/dir/
+            refresh_rate: Given refresh rate photo was taken with
+
+        Returns:
+            True if directory was found, else False
+            bool
+        """
+        captured_at = self._translate(domain, captured_at)
+        if not self._covers(domain, captured_at):
+            return self.index.photos_directory_exists(
+                domain,
+                captured_at,
+                directory,
+                refresh_rate
+            )
+        with self.lock:
+            return self._node(domain, captured_at, directory) is not None
+
+    def photos_list_files_in_directory(
+        self,
+        domain: str,
+        captured_at: str,
+        directory: str,
+        refresh_rate: Type[RefreshRate]
+    ) -> Generator:
+        """List photos in a directory.
+
+        Args:
+            domain: domain photos should belong to
+            captured_at: when photos should have been captured
+            directory: directory files should be located in
+            refresh_rate: Given refresh rate photo was taken with
+
+        Yields:
+            Filename
+            str
+        """
+        captured_at = self._translate(domain, captured_at)
+        if not self._covers(domain, captured_at):
+            yield from self.index.photos_list_files_in_directory(
+                domain,
+                captured_at,
+                directory,
+                refresh_rate
+            )
+            return
+        with self.lock:
+            node = self._node(domain, captured_at, directory)
+            files = [] if node is None else sorted(node.files.items())
+        for filename, entry in files:
+            if entry[2] < 100:
+                yield filename + Path.RENDERING_EXTENSION
+            else:
+                yield filename
+
+    def photos_list_directories_in_directory(
+        self,
+        domain: str,
+        captured_at: str,
+        directory: str,
+        refresh_rate: Type[RefreshRate]
+    ) -> Generator:
+        """List directories in a directory.
+
+        Args:
+            domain: domain directory should belong to
+            captured_at: when directory should have been captured
+            directory: directory should be located in
+            refresh_rate: given refresh rate photo was taken with
+
+        Yields:
+            Name of directory
+            str
+        """
+        captured_at = self._translate(domain, captured_at)
+        if not self._covers(domain, captured_at):
+            yield from self.index.photos_list_directories_in_directory(
+                domain,
+                captured_at,
+                directory,
+                refresh_rate
+            )
+            return
+        with self.lock:
+            node = self._node(domain, captured_at, directory)
+            dirs = [] if node is None else sorted(node.dirs)
+        yield from dirs
+
+    def _sync_periodically(self):
+        """Sync replica every SYNC_INTERVAL seconds."""
+        while True:
+            try:
+                self.sync()
+            except Exception as e:
+                console.p(f'failed to sync replica of photos: {e}')
+            time.sleep(Replica.SYNC_INTERVAL)
+
+    def _covers(self, domain: str, captured_at: Optional[str]=None) -> bool:
+        """Check if replica can answer lookups of domain or capture.
+
+        Args:
+            domain: domain looked up
+            captured_at: capture looked up (default: {None})
+
+        Returns:
+            True if replica is loaded and has domain, and capture
+            isn't waiting to be reloaded, otherwise False
+            bool
+        """
+        if not self.warm:
+            return False
+        with self.lock:
+            if domain in self.cold:
+                return False
+            return captured_at is None or \
+                (domain, captured_at) not in self.stale
+
+    def _translate(self, domain: str, captured_at: str) -> str:
+        """Translate last capture placeholder to captured_at value.
+
+        Args:
+            domain: domain of capture
+            captured_at: captured_at value, or LastCapture.FILENAME
+
+        Returns:
+            Most recent captured_at value of domain if captured_at
+            was LastCapture.FILENAME, otherwise captured_at
+            str
+        """
+        if captured_at != LastCapture.FILENAME:
+            return captured_at
+        if not self._covers(domain):
+            return LastCapture.translate(
+                captured_at,
+                domain,
+                self.index,
+                self.refresh_rate
+            )
+        try:
+            return self.photos_most_recent_capture_of_domain(
+                domain,
+                self.refresh_rate
+            )
+        except EmptySearchResultException:
+            return captured_at
+
+    def _node(
+        self,
+        domain: str,
+        captured_at: str,
+        directory: str
+    ) -> Optional[Node]:
+        """Find node of directory, lock must be held.
+
+        Args:
+            domain: domain of directory
+            captured_at: capture of directory
+            directory: directory path eg. /some/path/to/dir/
+
+        Returns:
+            Node of directory, None if it doesn't exist
+            Optional[Node]
+        """
+        captures = self.domains.get(domain, {})
+        node = captures.get(captured_at)  # type: Optional[Node]
+        for name in directory.split('/'):
+            if node is None:
+                return None
+            if name != '':
+                node = node.dirs.get(name)
+        return node
+
+    def _add(self, id: str, source: dict):
+        """Add photo to replica, lock must be held.
+
+        A photo replaces an older photo at the same path, and the
+        entry of a photo saved before under another filename.
+
+        Args:
+            id: id of photo
+            source: fields of photo document
+        """
+        domain = source['domain']
+        if domain in self.cold:
+            return
+
+        entry = (id,) + tuple(source.get(field) for field in Replica.FIELDS)
+        filename = source['filename']
+        size = 0
+        captures = self.domains.get(domain)
+        if captures is None:
+            captures = self.domains[domain] = {}
+            size += _sizeof_node(domain)
+        node = captures.get(source['captured_at'])
+        if node is None:
+            node = captures[source['captured_at']] = Node()
+            size += _sizeof_node(source['captured_at'])
+        for name in source['directory'].split('/'):
+            if name == '':
+                continue
+            if name not in node.dirs:
+                node.dirs[name] = Node()
+                size += _sizeof_node(name)
+            node = node.dirs[name]
+        self._grow(domain, size)
+
+        moved = self.ids.get(id)
+        if moved is not None and (moved[0] is not node or
+                                  moved[1] != filename):
+            self._remove(domain, moved[0], moved[1])
+
+        size = _sizeof(entry, filename)
+        previous = node.files.get(filename)
+        if previous is not None:
+            if previous[3] > entry[3]:
+                return
+            size -= _sizeof(previous, filename)
+            if previous[0] != id:
+                self.ids.pop(previous[0], None)
+        else:
+            self.photos += 1
+        node.files[filename] = entry
+        self.ids[id] = (node, filename)
+        self._grow(domain, size)
+
+        if self.memory > self.max_memory:
+            console.dp(f'replica is full, {domain} is looked up in index')
+            self._drop(domain)
+            self.cold.add(domain)
+
+    def _remove(self, domain: str, node: Node, filename: str):
+        """Remove entry of photo from node, lock must be held.
+
+        Args:
+            domain: domain of photo
+            node: node of photo's directory
+            filename: filename of photo
+        """
+        entry = node.files.pop(filename)
+        self.ids.pop(entry[0], None)
+        self.photos -= 1
+        self._grow(domain, -_sizeof(entry, filename))
+
+    def _grow(self, domain: str, size: int):
+        """Add to memory domain takes up, lock must be held.
+
+        Args:
+            domain: domain that grew
+            size: number of bytes domain grew by, negative if
+                it shrunk
+        """
+        self.sizes[domain] = self.sizes.get(domain, 0) + size
+        self.memory += size
+
+    def _drop(self, domain: str, captured_at: Optional[str]=None):
+        """Drop domain, or a capture of domain, lock must be held.
+
+        Args:
+            domain: domain to drop
+            captured_at: only drop capture of domain (default: {None})
+        """
+        captures = self.domains.get(domain, {})
+        for capture in list(captures):
+            if captured_at is not None and capture != captured_at:
+                continue
+            nodes = [(capture, captures.pop(capture))]
+            while len(nodes) > 0:
+                name, node = nodes.pop()
+                nodes.extend(node.dirs.items())
+                for filename in list(node.files):
+                    self._remove(domain, node, filename)
+                self._grow(domain, -_sizeof_node(name))
+        if len(captures) == 0 and domain in self.domains:
+            self._grow(domain, -_sizeof_node(domain))
+            del self.domains[domain]
+            del self.sizes[domain]
+
+    def _reload(self, capture: tuple, reload_at: float):
+        """Reload capture a photo was removed from.
+
+        Args:
+            capture: domain and captured_at of capture
+            reload_at: time capture was marked to be reloaded at
+        """
+        domain, captured_at = capture
+        photos = list(self.index.photos_since(
+            0,
+            self.refresh_rate,
+            domain=domain,
+            captured_at=captured_at
+        ))
+        with self.lock:
+            if domain not in self.cold:
+                self._drop(domain, captured_at)
+                for id, source in photos:
+                    self._add(id, source)
+            # capture is still stale if a photo was removed meanwhile
+            if self.stale.get(capture) == reload_at:
+                del self.stale[capture]
+
+
+def _sizeof(entry: tuple, filename: str) -> int:
+    """Estimate number of bytes entry of photo takes up.
+
+    Args:
+        entry: entry of photo
+        filename: filename entry is stored by
+
+    Returns:
+        Size of entry, its values, its filename and its slots in
+        the files of its node and in the ids of the replica
+        int
+    """
+    return sys.getsizeof(entry) + \
+        sum(sys.getsizeof(v) for v in entry) + \
+        sys.getsizeof(filename) + \
+        sys.getsizeof((None, filename)) + \
+        2 * _SLOT_SIZE
+
+
+def _sizeof_node(name: str) -> int:
+    """Estimate number of bytes a node takes up.
+
+    Args:
+        name: name node is stored by, eg. name of directory
+
+    Returns:
+        Size of node, its empty dicts, its name and its slot in
+        its parent
+        int
+    """
+    return _NODE_SIZE + sys.getsizeof(name) + _SLOT_SIZE
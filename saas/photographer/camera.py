@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 from selenium.webdriver.firefox.firefox_binary import FirefoxBinary
+from saas.photographer.pool import BrowserPool, BrowserSession
 from urllib3.exceptions import ProtocolError, MaxRetryError
 from saas.photographer.javascript import JavascriptSnippets
 from selenium.common.exceptions import JavascriptException
@@ -9,13 +10,15 @@ from saas.photographer.photo import PhotoPath, Screenshot
 from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.firefox.options import Options
 from saas.storage.refresh import RefreshRate
+from saas.photographer.png import PngWriter
 from http.client import RemoteDisconnected
 import saas.utils.console as console
 from typing import Type, Optional
 from selenium import webdriver
-import saas.threads as threads
 from saas.web.url import Url
+from PIL import Image
 import time
+import io
 
 
 class Camera:
@@ -30,7 +33,12 @@ class Camera:
         dpi: float=1.0,
         user_agent: str=None,
         profile: str=None,
-        headless: bool=True
+        headless: bool=True,
+        pool: Optional[BrowserPool]=None,
+        quiet_window: float=0.5,
+        ready_timeout: float=30,
+        lazy_loading: str='activate',
+        capture: str='resize'
     ):
         """Create new camera.
 
@@ -51,6 +59,20 @@ class Camera:
             headless: If camera should start firefox in headless mode or not,
                 note captures larger than display is not possible if not in
                 headless mode
+            pool: Optional pool to take warm browser sessions from, if
+                None a new firefox is launched for every picture
+            quiet_window: number of seconds the page must be quiet
+                before it is considered ready (default: 0.5)
+            ready_timeout: max number of seconds to wait for the page
+                to be ready (default: 30)
+            lazy_loading: how lazy loaded content is loaded for full
+                height screenshots, 'activate' to load it all at once
+                and scroll through the page only if that fails,
+                'scroll' to always scroll (default: 'activate')
+            capture: how full height screenshots are captured, 'resize'
+                to resize the viewport to the height of the page or
+                'tiled' to stitch together screenshots of the viewport
+                as it is scrolled down the page (default: 'resize')
         """
         self.webdriver = None  # type: webdriver.FirefoxProfile
         self.width = 0
@@ -65,6 +87,32 @@ class Camera:
             user_agent = UserAgents.DEFAULT
         self.user_agent = user_agent
         self.headless = headless
+        self.pool = pool
+        self.quiet_window = quiet_window
+        self.ready_timeout = ready_timeout
+        self.readiness = {}  # type: dict
+        self.metrics = None  # type: Optional[dict]
+        self.lazy_loading = lazy_loading
+        self.lazy_strategy = None  # type: Optional[str]
+        self.capture = capture
+
+    def launch(self) -> webdriver.Firefox:
+        """Launch firefox with addons installed.
+
+        Returns:
+            A webdriver for the launched firefox
+            webdriver.Firefox
+        """
+        console.dca('launching firefox, camera: {}x{} [{}]'.format(
+            self.viewport_width,
+            self.viewport_height if self.viewport_height != 0 else 'full',
+            self.dpi
+        ))
+
+        profile = self._create_webdriver_profile()
+        self.webdriver = self._create_webdriver(profile)
+        self._install_webdriver_addons(self.addons)
+        return self.webdriver
 
     def take_picture(
         self,
@@ -77,7 +125,8 @@ class Camera:
 
         Uses the selenium webdriver to load url in firefox,
         make sure the entire page and it's assets are loaded
-        then write it to data directory as a png.
+        then capture it as a png. The png is kept in memory, it is
+        not written to data directory until the screenshot is saved.
 
         Args:
             url: Url to take picture of
@@ -90,76 +139,72 @@ class Camera:
             A picture of the given url
             Screenshot
         """
-        try:
-            console.dca('launching firefox, camera: {}x{} [{}]'.format(
-                self.viewport_width,
-                self.viewport_height if self.viewport_height != 0 else 'full',
-                self.dpi
-            ))
-
-            profile = self._create_webdriver_profile()
-            self.webdriver = self._create_webdriver(profile)
-            self._install_webdriver_addons(self.addons)
-
-            threads.Controller.webdrivers.append(
-                self.webdriver.service.process.pid
-            )
+        if self.pool is None:
+            session = BrowserSession(self.launch())
+        else:
+            session = self.pool.acquire(self.launch)
+        self.webdriver = session.webdriver
+        self.readiness = {}
+        self.lazy_strategy = None
+        image = None  # type: Optional[bytes]
+        broken = True
 
+        try:
             console.dca(f'routing camera to {url.to_string()}')
 
-            try:
-                self._route_to_blank()
-                self._route(url)
-                self._route(url)
-                self._route(url)
-            except TimeoutException as e:
-                retry = retry - 1
-                if retry < 0:
-                    raise e
-                console.dca('routing reached timeout, retrying')
-                self.webdriver.quit()
-                return self.take_picture(url, path, refresh_rate, retry)
+            while True:
+                try:
+                    self._route_to_blank()
+                    self._route(url)
+                    self._route(url)
+                    self._route(url)
+                    break
+                except TimeoutException as e:
+                    retry = retry - 1
+                    if retry < 0:
+                        raise e
+                    console.dca('routing reached timeout, retrying')
 
             if self.viewport_height != 0:
                 # fixed height
                 console.dca('taking fixed screenshot')
                 self._set_resolution(self.viewport_width, self.viewport_height)
-                self._start_images_monitor()
-                self._wait_for_images_to_load()
+                self._wait_until_ready('load')
+            elif self.capture == 'tiled':
+                # fullpage screenshot stitched from tiles, lazy content
+                # is loaded as the tiles are scrolled into view
+                console.dca('taking tiled fullpage screenshot')
+                self._set_resolution(self.viewport_width, 1080)
+                self._wait_until_ready('load')
+                if self.lazy_loading == 'activate':
+                    self._execute_script(JavascriptSnippets.LAZY_ACTIVATE)
+                self.lazy_strategy = 'tiles'
             else:
                 # fullpage screenshot
                 console.dca('taking fullpage screenshot')
                 self._set_resolution(self.viewport_width, 1080)
-                self._start_images_monitor()
-                self._wait_for_images_to_load()
+                self._wait_until_ready('load')
 
-                # scroll down the page to trigger load of images
                 console.dca('making sure all images have loaded')
-                steps = int(self._document_height() / 800)
-                for i in range(1, steps):
-                    scroll_to = i * 800
-                    self._scroll_y_axis(scroll_to)
-                    self._wait_for_images_to_load()
-                    time.sleep(0.5)
+                self._load_lazy_content()
 
                 # resize the viewport and make sure that it's scrolled
                 # all the way to the top
                 console.dca(f'resizing camera viewport for {url.to_string()}')
-                self._scroll_y_axis(self._document_height() * -1)
-                if self.viewport_max_height is None:
-                    height = self._document_height()
-                elif self._document_height() > self.viewport_max_height:
-                    height = self.viewport_max_height
-                else:
-                    height = self._document_height()
-                self._wait_for_images_to_load()
+                height = self._document_height()
+                self._scroll_y_axis(height * -1)
+                if self.viewport_max_height is not None:
+                    height = min(height, self.viewport_max_height)
                 self._set_resolution(self.viewport_width, height)
-                self._wait_for_images_to_load()
                 self._scroll_y_axis(-height)
-                self._wait_for_resize()
+                self._wait_until_ready('resize')
 
-            console.dca(f'saving screenshot of {url.to_string()}')
-            self._save(path)
+            console.dca(f'capturing screenshot of {url.to_string()}')
+            if self.lazy_strategy == 'tiles':
+                image = self._capture_tiled()
+            else:
+                image = self._capture()
+            broken = False
         except RemoteDisconnected:
             pass
         except ProtocolError:
@@ -167,20 +212,16 @@ class Camera:
         except MaxRetryError:
             pass
         finally:
-            if self.webdriver:
-                self.webdriver.quit()
-
-        if path.should_optimize():
-            console.dca(f'optimizing screenshot of {url.to_string()}')
-            timer = time.time()
-            path.optimize()
-            seconds = int(time.time() - timer)
-            console.dca(f'optimizing of {url.to_string()} took {seconds}s')
+            if self.pool is None:
+                session.quit()
+            else:
+                self.pool.release(session, broken)
 
         return Screenshot(
             url=url,
             path=path,
-            refresh_rate=refresh_rate
+            refresh_rate=refresh_rate,
+            image=image
         )
 
     def _create_webdriver_profile(self) -> webdriver.FirefoxProfile:
@@ -258,19 +299,21 @@ class Camera:
         Args:
             url: A Url to route camera to
         """
+        self.metrics = None
         self.webdriver.set_page_load_timeout(10)
         self.webdriver.get(url.to_string())
 
     def _route_to_blank(self):
         """Route to blank page."""
+        self.metrics = None
         self.webdriver.get('about:blank')
 
-    def _save(self, path: PhotoPath):
-        """Save screen shot.
+    def _capture(self) -> bytes:
+        """Capture screenshot.
 
-        Args:
-            path: PhotoPath object used to retrieve path in data directory
-            to save png file in
+        Returns:
+            Screenshot encoded as png
+            bytes
         """
         height = self.webdriver.get_window_size()['height']
         width = self.webdriver.get_window_size()['width']
@@ -279,7 +322,77 @@ class Camera:
             int(width * self.dpi),
             int(height * self.dpi)
         ))
-        self.webdriver.save_screenshot(path.full_path())
+        png = self.webdriver.get_screenshot_as_png()  # type: bytes
+        return png
+
+    def _capture_tiled(self) -> bytes:
+        """Capture screenshot stitched from tiles.
+
+        The page is scrolled one viewport at a time and each tile
+        is compressed into the png as it is captured, so only one
+        decoded tile is held in memory at a time.
+
+        Returns:
+            Screenshot encoded as png
+            bytes
+        """
+        height = self._document_height()
+        if self.viewport_max_height is not None:
+            height = min(height, self.viewport_max_height)
+
+        writer = None  # type: Optional[PngWriter]
+        with io.BytesIO() as file:
+            y = 0
+            tile = 0
+            while y < height:
+                offset, viewport = self._scroll_to(y)
+                if offset + viewport <= y:
+                    # page got shorter than it was measured to be
+                    break
+                if tile == 1:
+                    self._execute_script(JavascriptSnippets.HIDE_FIXED)
+                self._wait_until_ready(f'tile {tile}')
+
+                image = Image.open(io.BytesIO(
+                    self.webdriver.get_screenshot_as_png()
+                )).convert('RGB')
+                scale = image.height / viewport
+                if writer is None:
+                    writer = PngWriter(file, image.width, int(height * scale))
+                    console.dca('png output resolution [{}x{}]'.format(
+                        writer.width,
+                        writer.height
+                    ))
+
+                top = int((y - offset) * scale)
+                bottom = int(min(viewport, height - offset) * scale)
+                writer.write_rows(
+                    image.crop((0, top, writer.width, bottom)).tobytes()
+                )
+
+                y = offset + viewport
+                tile += 1
+
+            if writer is not None:
+                writer.close()
+            return file.getvalue()
+
+    def _scroll_to(self, y: int) -> tuple:
+        """Scroll page to vertical offset.
+
+        Args:
+            y: offset in pixels from top of page
+
+        Returns:
+            Offset the page was scrolled to and height of viewport
+            tuple
+        """
+        self.metrics = None
+        offset, viewport = self.webdriver.execute_script(
+            JavascriptSnippets.SCROLL_TO,
+            y
+        )
+        return int(offset), int(viewport)
 
     def _set_resolution(self, width: int, height: int):
         """Set camera resolution.
@@ -292,7 +405,62 @@ class Camera:
         self.height = height
         self.webdriver.set_window_size(width, height)
 
-    def _execute_script(self, script: str, retry: int=40):
+    def _load_lazy_content(self):
+        """Load content that is loaded when scrolled into view.
+
+        The strategy that was used is recorded in lazy_strategy.
+        """
+        if self.lazy_loading == 'activate' and self._activate_lazy_content():
+            console.dca(f'lazy content loaded by {self.lazy_strategy}')
+            return
+
+        console.dca('scrolling through page to load lazy content')
+        self.lazy_strategy = 'scroll'
+        self._scroll_through_page()
+
+    def _activate_lazy_content(self) -> bool:
+        """Make lazy content load without scrolling.
+
+        Lazy attributes are rewritten so lazy images load right away,
+        then the viewport is expanded to the height of the document
+        so that content loaded by intersection observers is in view.
+
+        Returns:
+            True if all lazy content loaded, False if the page still
+            has images that has not loaded
+            bool
+        """
+        activated = self._execute_script(
+            JavascriptSnippets.LAZY_ACTIVATE
+        )  # type: int
+
+        height = self._document_height()
+        if self.viewport_max_height is not None:
+            height = min(height, self.viewport_max_height)
+
+        if height > self.height:
+            self.lazy_strategy = 'viewport'
+            self._set_resolution(self.viewport_width, height)
+        elif activated > 0:
+            self.lazy_strategy = 'attributes'
+        else:
+            self.lazy_strategy = 'none'
+            return True
+
+        self._wait_until_ready('activate')
+        if self.probe()['images_loaded'] < 1:
+            self._set_resolution(self.viewport_width, 1080)
+            return False
+        return True
+
+    def _scroll_through_page(self):
+        """Scroll through page 800px at a time."""
+        steps = int(self._document_height() / 800)
+        for i in range(1, steps):
+            self._scroll_y_axis(800)
+            self._wait_until_ready(f'scroll {i}')
+
+    def _execute_script(self, script: str, retry: int=5):
         """Execute script in browser.
 
         Args:
@@ -307,9 +475,26 @@ class Camera:
         except JavascriptException as e:
             if retry < 1:
                 raise e
-            time.sleep(0.75)
+            time.sleep(0.2)
             return self._execute_script(script, retry - 1)
 
+    def probe(self) -> dict:
+        """Probe page for metrics.
+
+        All metrics are measured in one round trip to the browser.
+        The result is cached until the camera navigates or waits
+        for the page to load more content.
+
+        Returns:
+            Document height, number of images, scripts and stylesheets
+            and the ratio of images that have loaded
+            dict
+        """
+        if self.metrics is None:
+            self.metrics = self._execute_script(JavascriptSnippets.PAGE_PROBE)
+        metrics = self.metrics  # type: dict
+        return metrics
+
     def _document_height(self) -> int:
         """Get document height from webdriver.
 
@@ -317,9 +502,7 @@ class Camera:
             The height of the document at the page routed to
             int
         """
-        height = self._execute_script(
-            JavascriptSnippets.DOCUMENT_HEIGHT
-        )  # type: int
+        height = self.probe()['height']  # type: int
         return height
 
     def _image_count(self) -> int:
@@ -329,9 +512,7 @@ class Camera:
             The number of images the webpage has requested
             int
         """
-        images = self._execute_script(
-            JavascriptSnippets.IMAGE_COUNT
-        )  # type: int
+        images = self.probe()['images']  # type: int
         return images
 
     def _script_count(self) -> int:
@@ -341,9 +522,7 @@ class Camera:
             The number of scripts the page has requested
             int
         """
-        scripts = self._execute_script(
-            JavascriptSnippets.SCRIPT_COUNT
-        )  # type: int
+        scripts = self.probe()['scripts']  # type: int
         return scripts
 
     def _stylesheet_count(self) -> int:
@@ -353,9 +532,7 @@ class Camera:
             The number of stylesheets the page has requested
             int
         """
-        stylesheets = self._execute_script(
-            JavascriptSnippets.STYLESHEET_COUNT
-        )  # type: int
+        stylesheets = self.probe()['stylesheets']  # type: int
         return stylesheets
 
     def _scroll_y_axis(self, pixels: int):
@@ -368,96 +545,48 @@ class Camera:
             JavascriptSnippets.SCROLL_Y_AXIS.replace('Y_PIXELS', str(pixels))
         )
 
-    def _start_images_monitor(self):
-        """Start images monitor script on page."""
-        self._execute_script(
-            JavascriptSnippets.IMAGES_MONITOR
-        )
-
-    def _wait_for_images_to_load(self):
-        """Wait for all images to load on page."""
-        while self._execute_script(
-            JavascriptSnippets.IMAGES_LOADED
-        ) is None:
-            time.sleep(Limits.SLEEP_BETWEEN_IMAGE_LOAD_CHECK)
-
-        try:
-            while self._execute_script(
-                JavascriptSnippets.IMAGES_LOADED
-            ) < Limits.ALL_IMAGES_LOADED:
-                time.sleep(Limits.SLEEP_BETWEEN_IMAGE_LOAD_CHECK)
-        except TypeError:
-            self._start_images_monitor()
-
-    def _wait_for_resize(self):
-        """Wait for resoultion resize to be completed.
-
-        When the camera resizes and the entire page is shown
-        in the viewport all assets will be loaded. This takes
-        longer time to complete for more complex pages.
-
-        Some examples:
-
-            Tabloids (generally filled with crap)
-            https://www.dailymail.co.uk/        score: 321
-            https://www.expressen.se/           score: 124
-            https://aftonbladet.se/             score: 35
+    def _wait_until_ready(self, step: str) -> dict:
+        """Wait until page is ready to be photographed.
 
-            Image heavy news sites
-            https://dn.se/                      score: 39
-            https://www.di.se/                  score: 44
-            https://svd.se/                     score: 31
+        The page is ready once the document, fonts, images and
+        network activity have been settled for the quiet window.
 
-            Non image heavy news sites
-            https://wsj.com/                    score: 12
-            https://www.nytimes.com/            score: 10
-
-            Blogs and non image + script heavy news sites
-            https://www.ft.com/                 score: 3
-            https://daringfireball.net/         score: 3
-            https://www.recode.net/             score: 7
-            https://www.schneier.com/           score: 2
-
-            Zero or next to zero images
-            https://news.ycombinator.com/       score: 0
-            https://example.com/                score: 0
-
-            * These are only examples and may change,
-              captured at Sun Jan 13 00:37:26 CET 2019
+        Args:
+            step: name of capture step, timings are recorded
+                in readiness under this name
 
+        Returns:
+            Milliseconds until each phase was settled, the total time
+            and if the page timed out before it was ready
+            dict
         """
-        images = self._image_count()
-        scripts = self._script_count()
-        stylesheets = self._stylesheet_count()
-        height = self.height
-
-        complexity = (images * 10) + (scripts / 5) + (stylesheets / 10)
-        score = complexity * (height * 10)
-        score = round(score / 8000000)  # arbitrary number
-
-        if score > Limits.RESIZE_MAX_WAIT_TIME:
-            score = Limits.RESIZE_MAX_WAIT_TIME
-
-        # The score can generally be thought of as the number
-        # of seconds to wait
-        while score > 0:
-            time.sleep(Limits.RESIZE_WAIT_TIME)
-            score -= 1
-
-
-class Limits:
-    """Limits class.
-
-    Various limits used in rendering page.
-    """
-
-    ALL_IMAGES_LOADED = 15
-
-    SLEEP_BETWEEN_IMAGE_LOAD_CHECK = 1
-
-    RESIZE_WAIT_TIME = 1
-
-    RESIZE_MAX_WAIT_TIME = 25
+        timeout = int(self.ready_timeout * 1000)
+        self.webdriver.set_script_timeout(self.ready_timeout + 5)
+        try:
+            timings = self.webdriver.execute_async_script(
+                JavascriptSnippets.PAGE_READY,
+                int(self.quiet_window * 1000),
+                timeout
+            )  # type: dict
+        except (TimeoutException, JavascriptException) as e:
+            console.dca(f'failed to check if page was ready: {e}')
+            timings = {
+                'document': None,
+                'fonts': None,
+                'images': None,
+                'network': None,
+                'total': timeout,
+                'timed_out': True,
+            }
+
+        self.readiness[step] = timings
+        self.metrics = None
+        console.dca('page ready after {}ms [{}]{}'.format(
+            timings['total'],
+            step,
+            ' (timed out)' if timings['timed_out'] else ''
+        ))
+        return timings
 
 
 class UserAgents:
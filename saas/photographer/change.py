@@ -0,0 +1,104 @@
+"""Change module."""
+
+from __future__ import annotations
+from typing import Any
+from PIL import Image
+import numpy as np
+import io
+
+
+# width and height of the grayscale block each band of a page is
+# reduced to, and of the low frequency corner kept from its DCT
+BLOCK_SIZE = 32
+
+HASH_SIZE = 8
+
+# max number of bands a page is split into
+MAX_BANDS = 64
+
+# Image.BILINEAR
+RESAMPLE = 2  # type: Any
+
+
+def _dct_matrix(size: int) -> np.ndarray:
+    """Make orthonormal DCT-II matrix.
+
+    Args:
+        size: number of rows and columns
+
+    Returns:
+        Matrix that transforms a column vector to its DCT
+        np.ndarray
+    """
+    k = np.arange(size).reshape(-1, 1)
+    n = np.arange(size).reshape(1, -1)
+    matrix = np.cos(np.pi * (2 * n + 1) * k / (2 * size))
+    matrix[0] /= np.sqrt(2)
+    orthonormal = matrix * np.sqrt(2 / size)  # type: np.ndarray
+    return orthonormal
+
+
+DCT = _dct_matrix(BLOCK_SIZE)
+
+
+def perceptual_hash(png: bytes) -> str:
+    """Make perceptual hash of screenshot.
+
+    Full height screenshots are much taller than they are wide, so
+    the page is split into square bands which are hashed separately,
+    a change at the bottom of the page is as visible in the hash as
+    a change at the top. Every band is reduced to a small grayscale
+    block and hashed by comparing its lowest DCT frequencies to their
+    median. All bands are transformed at once.
+
+    Args:
+        png: screenshot encoded as png
+
+    Returns:
+        Hash of each band as hex, 16 characters per band
+        str
+    """
+    image = Image.open(io.BytesIO(png))
+    bands = max(1, min(MAX_BANDS, round(image.height / image.width)))
+
+    gray = image.convert('L').resize(
+        (BLOCK_SIZE, BLOCK_SIZE * bands),
+        RESAMPLE
+    )
+    blocks = np.asarray(gray, dtype=np.float64).reshape(
+        bands,
+        BLOCK_SIZE,
+        BLOCK_SIZE
+    )
+
+    low = (DCT @ blocks @ DCT.T)[:, :HASH_SIZE, :HASH_SIZE]
+    low = low.reshape(bands, HASH_SIZE * HASH_SIZE)
+    bits = low > np.median(low, axis=1, keepdims=True)
+    digest = np.packbits(bits, axis=1).tobytes().hex()  # type: str
+    return digest
+
+
+def difference(previous: str, current: str) -> float:
+    """Score difference between two perceptual hashes.
+
+    Bands are compared pairwise, bands only one of the pages has
+    count as entirely changed.
+
+    Args:
+        previous: perceptual hash of previous capture
+        current: perceptual hash of current capture
+
+    Returns:
+        Share of hash bits that differ, 0.0 if the captures look
+        the same and 1.0 if they have nothing in common
+        float
+    """
+    a = np.frombuffer(bytes.fromhex(previous), dtype=np.uint8)
+    b = np.frombuffer(bytes.fromhex(current), dtype=np.uint8)
+    if len(a) == 0 and len(b) == 0:
+        return 0.0
+
+    shared = min(len(a), len(b))
+    changed = np.unpackbits(a[:shared] ^ b[:shared]).sum()
+    changed += 8 * (max(len(a), len(b)) - shared)
+    return float(changed) / (8 * max(len(a), len(b)))
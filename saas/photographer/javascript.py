@@ -7,43 +7,38 @@ from os.path import dirname
 class JavascriptSnippets:
     """Javascript snippets class."""
 
-    DOCUMENT_HEIGHT = ''
+    PAGE_READY = ''
 
-    IMAGES_MONITOR = ''
+    PAGE_PROBE = ''
 
-    IMAGES_LOADED = ''
+    LAZY_ACTIVATE = ''
 
     SCROLL_Y_AXIS = ''
 
-    IMAGE_COUNT = ''
+    SCROLL_TO = ''
 
-    SCRIPT_COUNT = ''
-
-    STYLESHEET_COUNT = ''
+    HIDE_FIXED = ''
 
     @staticmethod
     def load():
         """Load javscript snippets."""
-        JavascriptSnippets.DOCUMENT_HEIGHT = JavascriptSnippets._load_snippet(
-            'document_height.js'
+        JavascriptSnippets.PAGE_READY = JavascriptSnippets._load_snippet(
+            'page_ready.js'
         )
-        JavascriptSnippets.IMAGES_MONITOR = JavascriptSnippets._load_snippet(
-            'images_monitor.js'
+        JavascriptSnippets.PAGE_PROBE = JavascriptSnippets._load_snippet(
+            'page_probe.js'
         )
-        JavascriptSnippets.IMAGES_LOADED = JavascriptSnippets._load_snippet(
-            'images_loaded.js'
+        JavascriptSnippets.LAZY_ACTIVATE = JavascriptSnippets._load_snippet(
+            'lazy_activate.js'
         )
         JavascriptSnippets.SCROLL_Y_AXIS = JavascriptSnippets._load_snippet(
             'scroll_y.js'
         )
-        JavascriptSnippets.IMAGE_COUNT = JavascriptSnippets._load_snippet(
-            'image_count.js'
-        )
-        JavascriptSnippets.SCRIPT_COUNT = JavascriptSnippets._load_snippet(
-            'script_count.js'
+        JavascriptSnippets.SCROLL_TO = JavascriptSnippets._load_snippet(
+            'scroll_to.js'
         )
-        JavascriptSnippets.STYLESHEET_COUNT = JavascriptSnippets._load_snippet(
-            'stylesheet_count.js'
+        JavascriptSnippets.HIDE_FIXED = JavascriptSnippets._load_snippet(
+            'hide_fixed.js'
         )
 
     def _load_snippet(filename) -> str:
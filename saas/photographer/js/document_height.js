@@ -1 +0,0 @@
-return document.body.parentNode.scrollHeight;
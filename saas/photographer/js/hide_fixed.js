@@ -0,0 +1,20 @@
+/**
+ * Hide fixed.
+ *
+ * Hides elements that stay in the same place in the viewport when
+ * the page is scrolled, such as sticky headers and cookie banners,
+ * so they show up once in a tiled screenshot instead of in
+ * every tile.
+ *
+ * @return {Number} The number of elements that were hidden
+ */
+var hidden = 0;
+var elements = document.body ? document.body.getElementsByTagName('*') : [];
+for (var i = 0; i < elements.length; i++) {
+    var position = window.getComputedStyle(elements[i]).position;
+    if (position === 'fixed' || position === 'sticky') {
+        elements[i].style.setProperty('visibility', 'hidden', 'important');
+        hidden++;
+    }
+}
+return hidden;
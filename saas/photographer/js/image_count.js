@@ -1,7 +0,0 @@
-/**
- * Get image count
- *
- * @return {Number} The number of images requested by the webpage
- * @see images_monitor.js
- */
-return window.__selenium_images;
@@ -0,0 +1,61 @@
+/**
+ * Lazy activate.
+ *
+ * Makes lazy loaded images and frames load right away, instead of
+ * when they are scrolled into view. Native lazy loading is turned
+ * off and the attributes common lazy loading libraries keep the
+ * real source in are copied to where the browser reads them.
+ *
+ * Loaders that use an IntersectionObserver without any of these
+ * attributes are activated by expanding the viewport afterwards.
+ *
+ * @return {Number} The number of elements that were activated
+ */
+
+var SOURCES = [
+    'data-src',
+    'data-lazy-src',
+    'data-original',
+    'data-lazy',
+    'data-url'
+];
+
+var SOURCE_SETS = [
+    'data-srcset',
+    'data-lazy-srcset'
+];
+
+function copy(element, attributes, target) {
+    for (var i = 0; i < attributes.length; i++) {
+        var value = element.getAttribute(attributes[i]);
+        if (value && element.getAttribute(target) !== value) {
+            element.setAttribute(target, value);
+            return true;
+        }
+    }
+    return false;
+}
+
+var activated = 0;
+var elements = document.querySelectorAll('img, iframe, source');
+for (var i = 0; i < elements.length; i++) {
+    var element = elements[i];
+    var changed = false;
+
+    if (element.loading === 'lazy') {
+        element.loading = 'eager';
+        changed = true;
+    }
+    if (element.tagName !== 'SOURCE' && copy(element, SOURCES, 'src')) {
+        changed = true;
+    }
+    if (copy(element, SOURCE_SETS, 'srcset')) {
+        changed = true;
+    }
+
+    if (changed) {
+        activated++;
+    }
+}
+
+return activated;
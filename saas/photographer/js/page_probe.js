@@ -0,0 +1,28 @@
+/**
+ * Page probe.
+ *
+ * Measures everything the camera needs to know about the
+ * current page in a single round trip.
+ *
+ * @return {Object} Document height, number of images, scripts
+ *                  and stylesheets and the ratio of images
+ *                  that have loaded
+ */
+
+var root = document.documentElement;
+var images = document.images;
+
+var loaded = 0;
+for (var i = images.length - 1; i >= 0; i--) {
+    if (images[i].complete) {
+        loaded++;
+    }
+}
+
+return {
+    height: root ? root.scrollHeight : 0,
+    images: images.length,
+    scripts: document.scripts.length,
+    stylesheets: document.styleSheets.length,
+    images_loaded: images.length === 0 ? 1 : loaded / images.length
+};
@@ -0,0 +1,146 @@
+/**
+ * Page ready.
+ *
+ * Resolves once the document, fonts, images and network activity
+ * of the page have all been settled for a quiet window. Progress is
+ * tracked with events inside the page, so no round trip to the
+ * webdriver is made until the page is ready.
+ *
+ * Run with execute_async_script.
+ *
+ * @param {Number} arguments[0] quiet window in milliseconds
+ * @param {Number} arguments[1] timeout in milliseconds
+ * @param {Function} arguments[2] callback
+ *
+ * @return {Object} Milliseconds until each phase was first settled,
+ *                  null if it never was, the total time and
+ *                  if the timeout was reached
+ */
+
+var quietWindow = arguments[0];
+var timeout = arguments[1];
+var done = arguments[arguments.length - 1];
+
+var start = performance.now();
+var lastActivity = start;
+var timings = {
+    document: null,
+    fonts: null,
+    images: null,
+    network: null
+};
+
+function activity() {
+    lastActivity = performance.now();
+}
+
+/**
+ * Number of fetch and XMLHttpRequest requests in flight.
+ *
+ * Counted from when the page was first checked, requests started
+ * before that are covered by the resource timing entries.
+ *
+ * @type {Number}
+ */
+if (window.__saas_requests === undefined) {
+    window.__saas_requests = 0;
+
+    if (window.fetch) {
+        var fetch = window.fetch;
+        window.fetch = function() {
+            window.__saas_requests++;
+            return fetch.apply(this, arguments).finally(function() {
+                window.__saas_requests--;
+            });
+        };
+    }
+
+    var send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function() {
+        window.__saas_requests++;
+        this.addEventListener('loadend', function() {
+            window.__saas_requests--;
+        });
+        return send.apply(this, arguments);
+    };
+}
+
+var resources = 0;
+if (window.PerformanceObserver) {
+    var observer = new PerformanceObserver(function(list) {
+        resources += list.getEntries().length;
+        activity();
+    });
+    observer.observe({entryTypes: ['resource']});
+}
+
+document.addEventListener('load', activity, true);
+document.addEventListener('error', activity, true);
+
+var fontsLoaded = !document.fonts;
+if (document.fonts) {
+    document.fonts.ready.then(function() {
+        fontsLoaded = true;
+        activity();
+    });
+}
+
+var images = 0;
+
+function imagesSettled() {
+    var imgs = document.images;
+    if (imgs.length !== images) {
+        images = imgs.length;
+        activity();
+    }
+    for (var i = imgs.length - 1; i >= 0; i--) {
+        if (imgs[i].complete) {
+            continue;
+        }
+        // lazy images outside the viewport are never fetched
+        var rect = imgs[i].getBoundingClientRect();
+        if (imgs[i].loading === 'lazy' && rect.top > window.innerHeight) {
+            continue;
+        }
+        return false;
+    }
+    return true;
+}
+
+function settle(phase, settled) {
+    if (settled && timings[phase] === null) {
+        timings[phase] = Math.round(performance.now() - start);
+    }
+    return settled;
+}
+
+function finish(timedOut) {
+    if (observer) {
+        observer.disconnect();
+    }
+    document.removeEventListener('load', activity, true);
+    document.removeEventListener('error', activity, true);
+    timings.total = Math.round(performance.now() - start);
+    timings.timed_out = timedOut;
+    done(timings);
+}
+
+function check() {
+    var now = performance.now();
+    var ready = [
+        settle('document', document.readyState === 'complete'),
+        settle('fonts', fontsLoaded),
+        settle('images', imagesSettled()),
+        settle('network', window.__saas_requests === 0)
+    ].every(Boolean);
+
+    if (ready && now - lastActivity >= quietWindow) {
+        return finish(false);
+    }
+    if (now - start >= timeout) {
+        return finish(true);
+    }
+    setTimeout(check, 50);
+}
+
+check();
@@ -0,0 +1,11 @@
+/**
+ * Scroll to.
+ *
+ * @param {Number} arguments[0] vertical offset to scroll to
+ *
+ * @return {Array} The vertical offset the page was scrolled to,
+ *                 which is less than requested at the bottom of the
+ *                 page, and the height of the viewport
+ */
+window.scrollTo(0, arguments[0]);
+return [window.scrollY, window.innerHeight];
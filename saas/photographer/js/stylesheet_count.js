@@ -1 +0,0 @@
-return document.scripts.length;
@@ -3,9 +3,9 @@
 from __future__ import annotations
 import saas.storage.datadir as DataDirectory
 import saas.storage.refresh as refresh
+from typing import Type, Optional
 from saas.web.url import Url
 from abc import ABCMeta
-from typing import Type
 import uuid
 import os
 
@@ -18,7 +18,11 @@ class Photo(metaclass=ABCMeta):
         url: Url,
         path: 'PhotoPath',
         refresh_rate: Type[refresh.RefreshRate],
-        index_filesize: int=None
+        index_filesize: int=None,
+        image: Optional[bytes]=None,
+        phash: str='',
+        change: Optional[float]=None,
+        timestamp: Optional[int]=None
     ):
         """Create new photo.
 
@@ -29,11 +33,23 @@ class Photo(metaclass=ABCMeta):
             index_filesize: If photo have been stored in index, filesize is
                 already stored there. To speed up performance this takes
                 priority over filesize in datadir. see self.filesize()
+            image: Optional encoded image held in memory until it is
+                written to data directory, see self.save_image()
+            phash: perceptual hash of the photo's image
+            change: how much the photo differs from the previous
+                capture of its url, None if there is no previous
+                capture, see saas.photographer.change.difference()
+            timestamp: when photo was saved in index, None if it
+                was not read from index
         """
         self.url = url
         self.path = path
         self.refresh_rate = refresh_rate
         self.index_filesize = index_filesize
+        self.image = image
+        self.phash = phash
+        self.change = change
+        self.timestamp = timestamp
 
     def get_raw(self) -> str:
         """Get raw content of photos file in data directory.
@@ -54,7 +70,7 @@ class Photo(metaclass=ABCMeta):
             A filename based on the photos url
             str
         """
-        return self.url.make_filename()
+        return self.url.make_filename(self.path.extension)
 
     def directory(self) -> str:
         """Get photo directory.
@@ -83,8 +99,40 @@ class Photo(metaclass=ABCMeta):
         """
         if self.index_filesize:
             return self.index_filesize
+        if self.image is not None:
+            return len(self.image)
         return self.path.filesize()
 
+    def save_image(self):
+        """Store image held in memory in data directory.
+
+        The image is stored as a content addressed blob and the
+        photo's path is pointed at it. The loading photo's file
+        is removed once it has.
+        """
+        if self.image is None:
+            return
+
+        blob = self.path.datadir.store_blob(
+            self.image,
+            self.path.extension
+        )
+        self.remove_loading_text()
+        self.path.blob = blob
+
+    def remove_loading_text(self):
+        """Remove loading photo's file from data directory.
+
+        Photos stored as blobs have no file of their own, their
+        blob is left as is.
+        """
+        if self.path.blob != '':
+            return
+        try:
+            os.remove(self.path.full_path())
+        except FileNotFoundError:
+            pass
+
 
 class LoadingPhoto(Photo):
     """Loading photo class.
@@ -113,7 +161,9 @@ class PhotoPath:
     def __init__(
         self,
         datadir: DataDirectory.DataDirectory,
-        uuid: str=''
+        uuid: str='',
+        extension: str='png',
+        blob: str=''
     ):
         """Create new path to a photo.
 
@@ -122,8 +172,14 @@ class PhotoPath:
             uuid: If an PhotoPath should represent an existing
                 path, use uuid argument, otherwise a new uuid
                 will be generated
+            extension: file extension of the photo's image
+                format (default: {'png'})
+            blob: sha256 of the photo's content if it is stored
+                as a blob, see DataDirectory.store_blob()
         """
         self.datadir = datadir
+        self.extension = extension
+        self.blob = blob
         if uuid != '':
             self.uuid = uuid
         else:
@@ -155,16 +211,3 @@ class PhotoPath:
             int
         """
         return os.path.getsize(self.full_path())
-
-    def should_optimize(self) -> bool:
-        """If photo file should be optimized.
-
-        Returns:
-            True if should be optimize, otherwise False
-            bool
-        """
-        return self.datadir.optimize_storage
-
-    def optimize(self):
-        """Optimize png file in data directory."""
-        self.datadir.optimize_file(self.full_path())
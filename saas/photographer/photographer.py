@@ -1,14 +1,18 @@
 """Photographer module."""
 
 from __future__ import annotations
-from saas.photographer.photo import PhotoPath, LoadingPhoto
+from saas.photographer.photo import Photo, PhotoPath, LoadingPhoto, Screenshot
 from saas.storage.index import EmptySearchResultException
 from saas.storage.datadir import DataDirectory
+from saas.photographer.pool import BrowserPool
+from saas.storage.thumbnails import Thumbnails
+from saas.storage.optimizer import Optimizer
+from saas.storage.index import IndexBackend
 from saas.photographer.addons import Addons
+import saas.photographer.change as change
 import saas.storage.refresh as refresh
 import saas.photographer.camera as c
 import saas.utils.console as console
-from saas.storage.index import Index
 from typing import Type, Optional
 import saas.threads as threads
 from saas.web.url import Url
@@ -19,14 +23,26 @@ import time
 class Photographer:
     """Photographer class."""
 
+    # max number of times the refresh interval of a url that does
+    # not change is doubled
+    MAX_BACKOFF = 4
+
     def __init__(
         self,
-        index: Index,
+        index: IndexBackend,
         refresh_rate: Type[refresh.RefreshRate],
         datadir: DataDirectory,
         viewport_width: int=1920,
         viewport_height: int=0,
-        viewport_max_height: Optional[int]=None
+        viewport_max_height: Optional[int]=None,
+        pool: Optional[BrowserPool]=None,
+        quiet_window: float=0.5,
+        lazy_loading: str='activate',
+        capture: str='resize',
+        optimizer: Optional[Optimizer]=None,
+        change_policy: str='store',
+        change_threshold: float=0.02,
+        thumbnails: Optional[Thumbnails]=None
     ):
         """Create new photographer.
 
@@ -40,6 +56,25 @@ class Photographer:
             viewport_width: width of camera viewport
             viewport_height: height of camera viewport
             viewport_max_height: max height of camera viewport
+            pool: Optional pool of warm browser sessions, if None
+                firefox is launched for every photo
+            quiet_window: number of seconds a page must be quiet
+                before it is photographed
+            lazy_loading: how lazy loaded content is loaded, 'activate'
+                or 'scroll'
+            capture: how full height screenshots are captured, 'resize'
+                or 'tiled'
+            optimizer: Optional optimizer to hand photos off to once
+                they are taken
+            change_policy: what to do with photos that changed less
+                than change_threshold since the previous capture,
+                'store' them, 'link' them to the previous capture's
+                file or 'skip' them
+            change_threshold: share of perceptual hash that must
+                differ for a photo to have changed
+            thumbnails: Optional thumbnails to make of photos once
+                they are stored, if None thumbnails are made when
+                they are first accessed
         """
         self.index = index
         self.refresh_rate = refresh_rate
@@ -47,6 +82,24 @@ class Photographer:
         self.viewport_width = viewport_width
         self.viewport_height = viewport_height
         self.viewport_max_height = viewport_max_height
+        self.optimizer = optimizer
+        self.change_policy = change_policy
+        self.change_threshold = change_threshold
+        self.thumbnails = thumbnails
+        self.camera = c.Camera(
+            viewport_width=self.viewport_width,
+            viewport_height=self.viewport_height,
+            viewport_max_height=self.viewport_max_height,
+            addons={
+                'IDCAC': Addons.IDCAC,
+                'REFERER_HEADER': Addons.REFERER_HEADER,
+                'UBLOCK_ORIGIN': Addons.UBLOCK_ORIGIN,
+            },
+            pool=pool,
+            quiet_window=quiet_window,
+            lazy_loading=lazy_loading,
+            capture=capture
+        )
 
     def tick(self):
         """Tick.
@@ -70,18 +123,40 @@ class Photographer:
             photo.save_loading_text()
             self.index.save_photo(photo)
 
-            camera = c.Camera(
-                viewport_width=self.viewport_width,
-                viewport_height=self.viewport_height,
-                viewport_max_height=self.viewport_max_height,
-                addons={
-                    'IDCAC': Addons.IDCAC,
-                    'REFERER_HEADER': Addons.REFERER_HEADER,
-                    'UBLOCK_ORIGIN': Addons.UBLOCK_ORIGIN,
-                }
-            )
-            photo = camera.take_picture(url, path, self.refresh_rate)
-            self.index.save_photo(photo)
+            photo = self.camera.take_picture(url, path, self.refresh_rate)
+            if photo.image is not None:
+                previous = self._compare_to_previous(photo)
+                changed = self._changed(photo)
+                self.index.schedule_crawled_url(
+                    url,
+                    self.refresh_rate,
+                    changed,
+                    Photographer.MAX_BACKOFF
+                )
+                if not changed and self.change_policy == 'skip':
+                    console.dp(f'skipping unchanged {url.to_string()}')
+                    photo.remove_loading_text()
+                    self.index.remove_photo(photo)
+                    return
+                # photos taken before blobs were introduced can't be linked
+                if not changed and self.change_policy == 'link' and \
+                        previous is not None and previous.path.blob != '':
+                    console.dp(f'linking unchanged {url.to_string()}')
+                    self.index.save_photo(
+                        self._link(photo, previous),
+                        replaces=photo
+                    )
+                    return
+
+            if self.optimizer is not None and photo.image is not None:
+                # the optimizer writes the photo to datadir and
+                # saves it in index once it has been encoded
+                self.optimizer.submit(photo, self.index)
+            else:
+                photo.save_image()
+                self.index.save_photo(photo)
+                if self.thumbnails is not None and photo.path.blob != '':
+                    self.thumbnails.submit(photo.path)
 
             timer = int(time.time() - timer)
             console.p(
@@ -93,6 +168,75 @@ class Photographer:
         finally:
             time.sleep(1)
 
+    def _compare_to_previous(self, photo: Screenshot) -> Optional[Photo]:
+        """Compare photo to previous capture of its url.
+
+        The perceptual hash of the photo and how much it differs
+        from the previous capture are stored on the photo.
+
+        Args:
+            photo: Screenshot with image held in memory
+
+        Returns:
+            The previous capture, None if url has not been
+            captured before
+            Photo
+        """
+        if photo.image is None:
+            return None
+
+        photo.phash = change.perceptual_hash(photo.image)
+        try:
+            previous = self.index.photos_previous_capture(
+                photo.url,
+                self.refresh_rate
+            )
+        except EmptySearchResultException:
+            return None
+
+        photo.change = change.difference(previous.phash, photo.phash)
+        return previous
+
+    def _changed(self, photo: Screenshot) -> bool:
+        """Check if photo changed since previous capture.
+
+        Args:
+            photo: Screenshot compared to previous capture
+
+        Returns:
+            True if photo changed or there is no previous capture
+            bool
+        """
+        if photo.change is None:
+            return True
+        return photo.change >= self.change_threshold
+
+    def _link(self, photo: Screenshot, previous: Photo) -> Screenshot:
+        """Link photo to the file of previous capture.
+
+        Args:
+            photo: Screenshot that did not change since previous capture
+            previous: The previous capture
+
+        Returns:
+            Screenshot stored in previous capture's file
+            Screenshot
+        """
+        photo.remove_loading_text()
+        return Screenshot(
+            url=photo.url,
+            path=PhotoPath(
+                self.datadir,
+                photo.path.uuid,
+                extension=previous.path.extension,
+                blob=previous.path.blob
+            ),
+            refresh_rate=self.refresh_rate,
+            index_filesize=previous.filesize(),
+            phash=photo.phash,
+            change=photo.change
+        )
+
     def _checkout_url(self) -> Url:
         """Checkout url.
 
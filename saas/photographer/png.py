@@ -0,0 +1,111 @@
+"""PNG module."""
+
+from __future__ import annotations
+from typing import BinaryIO
+import struct
+import zlib
+
+
+class PngWriter:
+    """PNG writer class.
+
+    Encodes an RGB image to PNG a few rows at a time. Rows are
+    compressed and written to the file as they are added, so only
+    the rows being added are ever held in memory, no matter how
+    tall the image is.
+    """
+
+    SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+    # size of IDAT chunks written to file
+    CHUNK_SIZE = 1024 * 1024
+
+    # bit depth 8, color type 2 (RGB), default compression,
+    # filter and no interlacing
+    BIT_DEPTH = 8
+
+    COLOR_TYPE = 2
+
+    def __init__(
+        self,
+        file: BinaryIO,
+        width: int,
+        height: int,
+        level: int=6
+    ):
+        """Create new png writer.
+
+        Args:
+            file: binary file to write png to
+            width: width of image in pixels
+            height: height of image in pixels
+            level: zlib compression level (default: {6})
+        """
+        self.file = file
+        self.width = width
+        self.height = height
+        self.rows = 0
+        self.stride = width * 3
+        self.compressor = zlib.compressobj(level)
+        self.pending = bytearray()
+        self.file.write(PngWriter.SIGNATURE)
+        self._write_chunk(b'IHDR', struct.pack(
+            '>IIBBBBB',
+            width,
+            height,
+            PngWriter.BIT_DEPTH,
+            PngWriter.COLOR_TYPE,
+            0,
+            0,
+            0
+        ))
+
+    def write_rows(self, pixels: bytes):
+        """Add rows to image.
+
+        Rows past the height of the image are ignored.
+
+        Args:
+            pixels: RGB pixels of one or more whole rows
+        """
+        if len(pixels) % self.stride != 0:
+            raise ValueError('pixels must contain whole rows')
+
+        for start in range(0, len(pixels), self.stride):
+            if self.rows >= self.height:
+                return
+            # every row is prefixed with its filter type, 0 is none
+            self.pending += self.compressor.compress(b'\x00')
+            self.pending += self.compressor.compress(
+                pixels[start:start + self.stride]
+            )
+            self.rows += 1
+            if len(self.pending) >= PngWriter.CHUNK_SIZE:
+                self._write_chunk(b'IDAT', bytes(self.pending))
+                self.pending = bytearray()
+
+    def close(self):
+        """Finish image.
+
+        Rows that were never added are filled with white.
+        """
+        white = b'\xff' * self.stride
+        while self.rows < self.height:
+            self.write_rows(white)
+        self.pending += self.compressor.flush()
+        self._write_chunk(b'IDAT', bytes(self.pending))
+        self._write_chunk(b'IEND', b'')
+        self.pending = bytearray()
+
+    def _write_chunk(self, kind: bytes, data: bytes):
+        """Write chunk to file.
+
+        Args:
+            kind: chunk type
+            data: chunk data
+        """
+        self.file.write(struct.pack('>I', len(data)))
+        self.file.write(kind)
+        self.file.write(data)
+        checksum = zlib.crc32(kind + data) & 0xffffffff
+        self.file.write(struct.pack('>I', checksum))
@@ -0,0 +1,240 @@
+"""Browser pool module."""
+
+from __future__ import annotations
+from urllib3.exceptions import ProtocolError, MaxRetryError
+from selenium.common.exceptions import WebDriverException
+from http.client import RemoteDisconnected
+from typing import Callable, Optional
+import saas.utils.console as console
+from selenium import webdriver
+from threading import Lock
+import signal
+import psutil
+import os
+
+
+class BrowserSession:
+    """Browser session class.
+
+    A running firefox, driven by a webdriver, that is reused
+    for many captures.
+    """
+
+    def __init__(self, driver: webdriver.Firefox):
+        """Create new browser session.
+
+        Args:
+            driver: webdriver of a launched firefox
+        """
+        self.webdriver = driver
+        self.pages = 0
+        self.pid = driver.service.process.pid
+
+    def processes(self) -> list:
+        """Get processes of session.
+
+        Returns:
+            The geckodriver process and every process it started,
+            processes that has exited are left out
+            list
+        """
+        try:
+            driver = psutil.Process(self.pid)
+            children = driver.children(recursive=True)  # type: list
+            return [driver] + children
+        except psutil.NoSuchProcess:
+            return []
+
+    def rss(self) -> int:
+        """Get memory used by session.
+
+        Returns:
+            Resident set size of all processes of session in bytes
+            int
+        """
+        rss = 0
+        for process in self.processes():
+            try:
+                rss += process.memory_info().rss
+            except psutil.NoSuchProcess:
+                pass
+        return rss
+
+    def is_healthy(self) -> bool:
+        """Check if session can still be driven.
+
+        Returns:
+            True if firefox responds to the webdriver, otherwise False
+            bool
+        """
+        try:
+            result = self.webdriver.execute_script('return 1;')  # type: int
+            return result == 1
+        except (
+            WebDriverException,
+            RemoteDisconnected,
+            ProtocolError,
+            MaxRetryError,
+        ):
+            return False
+
+    def reset(self) -> bool:
+        """Reset browser state left by previous page.
+
+        Returns:
+            True if session was reset, False if it failed
+            bool
+        """
+        try:
+            self.webdriver.get('about:blank')
+            self.webdriver.delete_all_cookies()
+            return True
+        except (
+            WebDriverException,
+            RemoteDisconnected,
+            ProtocolError,
+            MaxRetryError,
+        ):
+            return False
+
+    def quit(self):
+        """Quit firefox, killing it if it doesn't quit."""
+        processes = self.processes()
+        try:
+            self.webdriver.quit()
+        except Exception:
+            pass
+        for process in processes:
+            try:
+                if process.is_running():
+                    os.kill(process.pid, signal.SIGTERM)
+            except (ProcessLookupError, psutil.NoSuchProcess):
+                pass
+
+
+class BrowserPool:
+    """Browser pool class.
+
+    Keeps launched browser sessions warm between captures, so that
+    firefox and its addons doesn't have to be started for every
+    photo. A session is health checked before it is handed out and
+    recycled once it has loaded max_pages pages or uses more than
+    max_rss bytes of memory.
+
+    The pool tracks every session it launched, idle or in use, so
+    that all of them can be quit on shutdown. The pool is safe to
+    share between photographer threads.
+    """
+
+    MAX_PAGES = 50
+
+    MAX_RSS = 1024 * 1024 * 1024
+
+    def __init__(self, max_pages: int=MAX_PAGES, max_rss: int=MAX_RSS):
+        """Create new browser pool.
+
+        Args:
+            max_pages: number of pages a session loads before it is
+                recycled (default: {50})
+            max_rss: number of bytes of memory a session can use before
+                it is recycled (default: {1073741824})
+        """
+        self.max_pages = max_pages
+        self.max_rss = max_rss
+        self.idle = []  # type: list
+        self.sessions = []  # type: list
+        self.lock = Lock()
+        self.closed = False
+
+    def acquire(self, launch: Callable) -> BrowserSession:
+        """Acquire a browser session.
+
+        Args:
+            launch: function that launches a new webdriver, used
+                if no healthy idle session is available
+
+        Returns:
+            A browser session reserved for the caller
+            BrowserSession
+        """
+        while True:
+            session = self._pop_idle()
+            if session is None:
+                break
+            if session.is_healthy():
+                return session
+            console.dca('browser session failed health check, recycling')
+            self._retire(session)
+
+        session = BrowserSession(launch())
+        with self.lock:
+            self.sessions.append(session)
+        return session
+
+    def release(self, session: BrowserSession, broken: bool=False):
+        """Release browser session back to pool.
+
+        Args:
+            session: session acquired from pool
+            broken: if session should be recycled because it is
+                not usable anymore (default: {False})
+        """
+        session.pages += 1
+        if broken or self.closed or not self._is_reusable(session):
+            self._retire(session)
+            return
+        with self.lock:
+            self.idle.append(session)
+
+    def close(self):
+        """Quit every session launched by pool."""
+        with self.lock:
+            self.closed = True
+            sessions = self.sessions
+            self.sessions = []
+            self.idle = []
+        for session in sessions:
+            session.quit()
+
+    def _pop_idle(self) -> Optional[BrowserSession]:
+        """Take most recently used idle session.
+
+        Returns:
+            An idle session, None if no session is idle
+            BrowserSession or None
+        """
+        with self.lock:
+            if len(self.idle) == 0:
+                return None
+            session = self.idle.pop()  # type: BrowserSession
+            return session
+
+    def _is_reusable(self, session: BrowserSession) -> bool:
+        """Check if session is below its limits and can be reset.
+
+        Args:
+            session: session to check
+
+        Returns:
+            True if session can be used for another page
+            bool
+        """
+        if session.pages >= self.max_pages:
+            console.dca(f'recycling browser after {session.pages} pages')
+            return False
+        rss = session.rss()
+        if rss > self.max_rss:
+            console.dca(f'recycling browser using {rss >> 20}MB of memory')
+            return False
+        return session.reset()
+
+    def _retire(self, session: BrowserSession):
+        """Quit session and stop tracking it.
+
+        Args:
+            session: session to retire
+        """
+        with self.lock:
+            if session in self.sessions:
+                self.sessions.remove(session)
+        session.quit()
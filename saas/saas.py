@@ -1,8 +1,10 @@
 """saas entry point."""
 
-from saas.storage.index import Index, EmptySearchResultException
+from saas.storage.index import Index, EmptySearchResultException, connect
 from saas.photographer.javascript import JavascriptSnippets
 from saas.storage.datadir import DataDirectory
+from saas.storage.optimizer import Optimizer
+from saas.storage.sqlite import SqliteIndex
 import saas.storage.refresh as refresh
 import saas.utils.console as console
 import saas.utils.args as arguments
@@ -15,6 +17,10 @@ def main():
     """Entry point for saas."""
     try:
 
+        if sys.argv[1:2] == ['reindex']:
+            reindex(sys.argv[2:])
+            return
+
         parser = arguments.get_argument_parser()
         args = parser.parse_args(sys.argv[1:])
 
@@ -22,10 +28,32 @@ def main():
 
         JavascriptSnippets.load()
 
-        index = Index(host=args.elasticsearch_host)
+        if args.optimize_storage and not Optimizer.supports(args.image_format):
+            console.p(f'ERROR: cannot store images as {args.image_format}')
+            console.p('       Pillow was built without support for it')
+            sys.exit()
+
+        datadir = DataDirectory(args.data_dir, args.optimize_storage)
+
+        refresh_rate = {
+            'day': refresh.Daily,
+            'hour': refresh.Hourly,
+            'minute': refresh.EveryMinute,
+        }[args.refresh_rate]
+
+        # the sqlite index is stored in the data directory, it is
+        # cleared before the index is opened
+        if args.clear_data_dir:
+            datadir.clear()
+
+        index_host = args.elasticsearch_host
+        if args.index_backend == 'sqlite':
+            index_host = SqliteIndex.SCHEME + datadir.path_for_index()
+
+        index = connect(index_host)
 
         if not index.ping():
-            console.p('ERROR: failed to connect to elasticsearch')
+            console.p(f'ERROR: failed to connect to {args.index_backend}')
             sys.exit()
 
         if not index.verify():
@@ -36,14 +64,13 @@ def main():
                     'to configure elasticsearch'
                 ))
                 sys.exit()
-
-        datadir = DataDirectory(args.data_dir, args.optimize_storage)
-
-        refresh_rate = {
-            'day': refresh.Daily,
-            'hour': refresh.Hourly,
-            'minute': refresh.EveryMinute,
-        }[args.refresh_rate]
+        elif not args.clear_elasticsearch:
+            outdated = index.outdated_indices()
+            if len(outdated) > 0:
+                console.p('WARNING: {} {}'.format(
+                    ', '.join(outdated),
+                    'use old mappings, run saas reindex to upgrade them'
+                ))
 
         if args.setup_elasticsearch:
             index.create_indices()
@@ -52,30 +79,49 @@ def main():
             index.clear()
             index.create_indices()
 
-        if args.clear_data_dir:
-            datadir.clear()
-
         if not Controller.start_filesystem(
             mountpoint=args.mountpoint,
             datadir=datadir,
             refresh_rate=refresh_rate,
-            elasticsearch_host=args.elasticsearch_host
+            index_host=index_host,
+            thumbnail_sizes=args.thumbnail_sizes,
+            thumbnail_cache=args.thumbnail_cache,
+            threads=args.mount_threads,
+            attribute_cache_age=args.attribute_cache_age,
+            replica_memory=args.replica_memory,
+            entry_timeout=args.mount_entry_timeout,
+            attr_timeout=args.mount_attr_timeout,
+            kernel_cache=args.mount_kernel_cache
         ):
             sys.exit()
 
         Controller.start_stats(
-            elasticsearch_host=args.elasticsearch_host
+            index_host=index_host
         )
 
+        # sqlite is written directly, in a transaction per write
+        if args.index_backend == 'elasticsearch':
+            Controller.start_write_buffer(
+                elasticsearch_host=args.elasticsearch_host
+            )
+
         Controller.start_crawlers(
             amount=args.crawler_threads,
             url_file=args.url_file,
             ignore_found_urls=args.ignore_found_urls,
             stay_at_domain=args.stay_at_domain,
-            elasticsearch_host=args.elasticsearch_host,
-            debug=args.debug
+            index_host=index_host,
+            debug=args.debug,
+            concurrency=args.crawler_concurrency,
+            connections_per_host=args.crawler_connections_per_host,
+            crawl_delay=args.crawl_delay,
+            seen_urls_path=datadir.path_for_seen_urls()
         )
 
+        thumbnail_sizes = []  # type: list
+        if args.thumbnails_at_capture:
+            thumbnail_sizes = args.thumbnail_sizes
+
         Controller.start_photographers(
             amount=args.photographer_threads,
             refresh_rate=refresh_rate,
@@ -83,8 +129,19 @@ def main():
             viewport_width=args.viewport_width,
             viewport_height=args.viewport_height,
             viewport_max_height=args.viewport_max_height,
-            elasticsearch_host=args.elasticsearch_host,
-            debug=args.debug
+            index_host=index_host,
+            debug=args.debug,
+            browser_max_pages=args.browser_max_pages,
+            browser_max_memory=args.browser_max_memory,
+            quiet_window=args.quiet_window,
+            lazy_loading=args.lazy_loading,
+            capture=args.capture,
+            optimizer_processes=args.optimizer_processes,
+            image_format=args.image_format,
+            change_policy=args.change_policy,
+            change_threshold=args.change_threshold,
+            thumbnail_sizes=thumbnail_sizes,
+            thumbnail_cache=args.thumbnail_cache
         )
 
         while True:
@@ -122,6 +179,24 @@ def main():
         console.p('')
 
 
+def reindex(argv: list):
+    """Reindex elasticsearch indices into current mappings.
+
+    Args:
+        argv: arguments of reindex command
+    """
+    parser = arguments.get_reindex_argument_parser()
+    args = parser.parse_args(argv)
+
+    index = Index(host=args.elasticsearch_host)
+    if not index.ping():
+        console.p('ERROR: failed to connect to elasticsearch')
+        sys.exit()
+
+    index.reindex()
+    console.p('done.')
+
+
 class StopIfIdleTimeoutExpired(Exception):
     """Idle timeout expired."""
 
@@ -0,0 +1,277 @@
+"""Write buffer module."""
+
+from __future__ import annotations
+from threading import Thread, Lock, Condition
+from elasticsearch import Elasticsearch
+from elasticsearch.helpers import bulk
+from collections import OrderedDict
+import saas.utils.console as console
+import time
+
+
+class WriteBuffer:
+    """Write buffer class.
+
+    Buffers writes to elasticsearch and flushes them in bulk.
+    Writes to the same document are coalesced into a single
+    action, so indexing a document and then updating it a few
+    times costs one write. Pending writes are flushed when
+    enough documents are waiting or when the oldest pending
+    write has waited long enough.
+
+    The buffer is bounded, a write to a full buffer flushes it
+    before returning. The buffer is safe to share between threads.
+    """
+
+    MAX_SIZE = 500
+
+    MAX_AGE = 1.0
+
+    def __init__(
+        self,
+        es: Elasticsearch,
+        max_size: int=MAX_SIZE,
+        max_age: float=MAX_AGE
+    ):
+        """Create new write buffer.
+
+        Args:
+            es: Elasticsearch client to flush writes with
+            max_size: max number of pending documents (default: {500})
+            max_age: max number of seconds a write is pending
+                (default: {1.0})
+        """
+        self.es = es
+        self.max_size = max_size
+        self.max_age = max_age
+        self.pending = OrderedDict()  # type: OrderedDict
+        self.oldest = 0.0
+        self.lock = Lock()
+        self.flush_lock = Lock()
+        self.wakeup = Condition(self.lock)
+        self.closed = False
+        self.thread = Thread(target=self._flush_periodically, daemon=True)
+        self.thread.start()
+
+    def index(self, index: str, doc_type: str, id: str, source: dict):
+        """Index document.
+
+        Replaces any pending writes to the document.
+
+        Args:
+            index: index to store document in
+            doc_type: document type
+            id: document id
+            source: document source
+        """
+        with self.lock:
+            self._put({
+                '_op_type': 'index',
+                '_index': index,
+                '_type': doc_type,
+                '_id': id,
+                '_source': dict(source),
+            })
+            full = self._added()
+        if full:
+            self.flush()
+
+    def update(
+        self,
+        index: str,
+        doc_type: str,
+        id: str,
+        doc: dict,
+        upsert: bool=False
+    ):
+        """Partially update document.
+
+        Merged into any pending write to the document, objects are
+        merged recursively the way elasticsearch merges them.
+
+        Args:
+            index: index document is stored in
+            doc_type: document type
+            id: document id
+            doc: fields to update
+            upsert: create document from doc if it doesn't exist
+                (default: {False})
+        """
+        action = {
+            '_op_type': 'update',
+            '_index': index,
+            '_type': doc_type,
+            '_id': id,
+            'doc': _merge({}, doc),
+            'retry_on_conflict': 3,
+        }
+        if upsert:
+            action['doc_as_upsert'] = True
+        with self.lock:
+            self._put(action)
+            full = self._added()
+        if full:
+            self.flush()
+
+    def delete(self, index: str, doc_type: str, id: str):
+        """Delete document.
+
+        Replaces any pending writes to the document.
+
+        Args:
+            index: index document is stored in
+            doc_type: document type
+            id: document id
+        """
+        with self.lock:
+            self._put({
+                '_op_type': 'delete',
+                '_index': index,
+                '_type': doc_type,
+                '_id': id,
+            })
+            full = self._added()
+        if full:
+            self.flush()
+
+    def _put(self, action: dict):
+        """Add write to pending writes, lock must be held.
+
+        Index and delete replace any pending write to the document,
+        updates are merged into it.
+
+        Args:
+            action: bulk action of write
+        """
+        key = (action['_index'], action['_id'])
+        pending = self.pending.get(key)
+        if action['_op_type'] != 'update' or pending is None:
+            self.pending.pop(key, None)
+            self.pending[key] = action
+            return
+
+        upsert = action.get('doc_as_upsert', False)
+        if pending['_op_type'] == 'index':
+            _merge(pending['_source'], action['doc'])
+        elif pending['_op_type'] == 'update':
+            _merge(pending['doc'], action['doc'])
+            if upsert:
+                pending['doc_as_upsert'] = True
+        elif upsert:
+            self.pending[key] = {
+                '_op_type': 'index',
+                '_index': action['_index'],
+                '_type': action['_type'],
+                '_id': action['_id'],
+                '_source': action['doc'],
+            }
+
+    def _added(self) -> bool:
+        """Register that a write was added, lock must be held.
+
+        Returns:
+            True if buffer is full and should be flushed
+            bool
+        """
+        if self.oldest == 0.0:
+            self.oldest = time.time()
+            self.wakeup.notify()
+        return len(self.pending) >= self.max_size
+
+    def flush(self):
+        """Flush pending writes to elasticsearch.
+
+        If the bulk request fails, eg. elasticsearch can't be
+        reached, the writes are put back in the buffer to be
+        flushed again.
+        """
+        with self.flush_lock:
+            with self.lock:
+                actions = list(self.pending.values())
+                oldest = self.oldest
+                self.pending = OrderedDict()
+                self.oldest = 0.0
+
+            if len(actions) == 0:
+                return
+
+            try:
+                success, errors = bulk(
+                    self.es,
+                    actions,
+                    raise_on_error=False,
+                    request_timeout=80
+                )
+            except Exception:
+                with self.lock:
+                    self._restore(actions, oldest)
+                raise
+            if errors:
+                console.p(f'failed to write {len(errors)} documents')
+                console.dcr(f'first failed write: {errors[0]}')
+
+    def _restore(self, actions: list, oldest: float):
+        """Put writes that failed to flush back, lock must be held.
+
+        Writes added while the flush was running are newer, so
+        they are applied on top of the failed ones.
+
+        Args:
+            actions: bulk actions that failed to flush
+            oldest: time the oldest of the actions was added
+        """
+        newer = self.pending
+        self.pending = OrderedDict()
+        for action in actions:
+            self._put(action)
+        for action in newer.values():
+            self._put(action)
+        self.oldest = oldest
+
+    def close(self):
+        """Flush pending writes and stop flushing periodically."""
+        with self.lock:
+            self.closed = True
+            self.wakeup.notify()
+        self.thread.join()
+        self.flush()
+
+    def _flush_periodically(self):
+        """Flush pending writes once they reach max age."""
+        while True:
+            with self.lock:
+                if self.closed:
+                    return
+                if self.oldest == 0.0:
+                    self.wakeup.wait()
+                    continue
+                age = time.time() - self.oldest
+                if age < self.max_age:
+                    self.wakeup.wait(self.max_age - age)
+                    continue
+            try:
+                self.flush()
+            except Exception as e:
+                console.p(f'failed to flush writes to elasticsearch: {e}')
+                time.sleep(self.max_age)
+
+
+def _merge(target: dict, doc: dict) -> dict:
+    """Merge doc into target.
+
+    Args:
+        target: dict to merge into
+        doc: fields to merge
+
+    Returns:
+        The target
+        dict
+    """
+    for key, value in doc.items():
+        if isinstance(value, dict):
+            if not isinstance(target.get(key), dict):
+                target[key] = {}
+            _merge(target[key], value)
+        else:
+            target[key] = value
+    return target
@@ -0,0 +1,68 @@
+"""Changes module."""
+
+from __future__ import annotations
+from typing import Callable
+from threading import Thread
+import os
+
+
+class Changes:
+    """Changes class.
+
+    Publishes the captures photos are saved in and removed from to
+    another process over a pipe, one line per photo.
+    Publishing never blocks, a change is dropped if the pipe is full
+    or the other process is gone.
+    """
+
+    def __init__(self, fd: int):
+        """Create new changes.
+
+        Args:
+            fd: write end of pipe, inherited by the other process
+        """
+        self.fd = fd
+        os.set_blocking(fd, False)
+
+    def publish(self, domain: str, captured_at: str, removed: bool=False):
+        """Publish that a photo was saved in capture.
+
+        Args:
+            domain: domain of photo
+            captured_at: capture photo was saved in
+            removed: if photo was removed from capture (default: {False})
+        """
+        line = f'{domain}\t{captured_at}\t{int(removed)}\n'.encode()
+        try:
+            os.write(self.fd, line)
+        except (BlockingIOError, BrokenPipeError):
+            pass
+
+    @staticmethod
+    def subscribe(
+        fd: int,
+        callback: Callable[[str, str, bool], None]
+    ) -> Thread:
+        """Call callback for every change published to pipe.
+
+        Args:
+            fd: read end of pipe
+            callback: called with domain and captured_at of change,
+                and if a photo was removed
+
+        Returns:
+            Daemon thread reading pipe, stops when the pipe is closed
+            Thread
+        """
+        def read():
+            """Read changes until the pipe is closed."""
+            with os.fdopen(fd, 'rb') as pipe:
+                for line in pipe:
+                    domain, captured_at, removed = line.decode().rstrip(
+                        '\n'
+                    ).split('\t')
+                    callback(domain, captured_at, removed == '1')
+
+        thread = Thread(target=read, daemon=True)
+        thread.start()
+        return thread
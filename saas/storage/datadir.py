@@ -2,8 +2,9 @@
 
 from __future__ import annotations
 import saas.photographer.photo as PhotoPath
-from saas.utils.files import create_dir
+from saas.utils.files import create_dir, write_file
 import saas.utils.console as console
+import hashlib
 import shutil
 import os
 
@@ -35,6 +36,9 @@ class DataDirectory:
     def path_for_photo(self, photo_path: PhotoPath.PhotoPath) -> str:
         """Get path for photo in data directory.
 
+        Photos that have been captured are stored as blobs, photos
+        that are still loading are stored under their unique id.
+
         Args:
             photo_path: A photo path object
 
@@ -42,35 +46,90 @@ class DataDirectory:
             An absolute path to the file in data dir where photo is stored
             str
         """
+        if photo_path.blob != '':
+            return self.path_for_blob(photo_path.blob, photo_path.extension)
+
         first_char = photo_path.uuid[0]
         second_char = photo_path.uuid[1]
         directory = self.root + '/' + first_char + second_char + '/'
         if not os.path.exists(directory):
             os.mkdir(directory)
-        return directory + photo_path.uuid + '.png'
+        return directory + photo_path.uuid + '.' + photo_path.extension
+
+    def path_for_thumbnail(
+        self,
+        photo_path: PhotoPath.PhotoPath,
+        width: int
+    ) -> str:
+        """Get path for thumbnail of photo in data directory.
+
+        Thumbnails are stored beside the photo's file.
+
+        Args:
+            photo_path: A photo path object
+            width: width of thumbnail in pixels
+
+        Returns:
+            An absolute path to the thumbnail
+            str
+        """
+        stem, extension = os.path.splitext(self.path_for_photo(photo_path))
+        return f'{stem}.{width}w{extension}'
+
+    def path_for_blob(self, blob: str, extension: str) -> str:
+        """Get path for blob in data directory.
+
+        Args:
+            blob: sha256 of blob content
+            extension: file extension of the blob's image format
+
+        Returns:
+            An absolute path to the blob
+            str
+        """
+        directory = f'{self.root}/blobs/{blob[:2]}/'
+        if not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        return f'{directory}{blob}.{extension}'
+
+    def store_blob(self, data: bytes, extension: str) -> str:
+        """Store content addressed blob.
 
-    def optimize_file(self, path: str):
-        """Optimize file at path.
+        Blobs are named by the sha256 of their content, so identical
+        photos share one file. If the blob is already stored nothing
+        is written.
 
         Args:
-            path: full path to file in data directory
+            data: content of blob
+            extension: file extension of the blob's image format
+
+        Returns:
+            sha256 of blob content
+            str
+        """
+        blob = hashlib.sha256(data).hexdigest()
+        path = self.path_for_blob(blob, extension)
+        if not os.path.exists(path):
+            write_file(path, data)
+        return blob
 
-        Raises:
-            MissingDependencyException: if imagemagick is not installed
+    def path_for_seen_urls(self) -> str:
+        """Get path for snapshot of seen urls cache.
+
+        Returns:
+            An absolute path to the snapshot file
+            str
+        """
+        return self.root + '/seen_urls.bloom'
+
+    def path_for_index(self) -> str:
+        """Get path for sqlite index database.
+
+        Returns:
+            An absolute path to the database file
+            str
         """
-        if os.system('command -v mogrify > /dev/null') != 0:
-            raise MissingDependencyException('missing dependency imagemagick')
-
-        cmd = 'mogrify -filter Triangle -define filter:support=2'
-        cmd += ' -unsharp 0.25x0.08+8.3+0.045 -dither None -posterize 136'
-        cmd += ' -quality 82 -define png:compression-filter=5'
-        cmd += ' -define png:compression-level=9'
-        cmd += ' -define png:compression-strategy=1'
-        cmd += ' -define png:exclude-chunk=all -interlace none'
-        cmd += ' -colorspace sRGB'
-        cmd += ' ' + path
-
-        os.system(cmd)
+        return self.root + '/index.sqlite'
 
 
 class MissingDependencyException(Exception):
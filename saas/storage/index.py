@@ -8,21 +8,32 @@ from saas.storage.refresh import RefreshRate
 from urllib.error import HTTPError, URLError
 from datetime import datetime, timedelta
 from elasticsearch import Elasticsearch
-from elasticsearch.helpers import bulk
+from elasticsearch.helpers import bulk, scan
+from typing import Type, Optional, Generator
+from abc import ABCMeta, abstractmethod
+from saas.storage.buffer import WriteBuffer
+from saas.storage.changes import Changes
+from saas.storage.seen import SeenUrls
 import saas.utils.console as console
 from saas.web.url import Url, UrlId
 import saas.mount.file as file
-from typing import Type
 import urllib.request
+import hashlib
 import random
 import json
 import time
 
 
-class Index:
-    """Index storage.
+class IndexBackend(metaclass=ABCMeta):
+    """Index backend.
 
-    Wrapper around elasticsearch api
+    Interface of the storage crawled urls and photo metadata are
+    kept in. Backends store urls that are waiting to be crawled,
+    urls that have been crawled and photos of them, what is shared
+    between backends is implemented here.
+
+    See:
+        Index for elasticsearch and SqliteIndex for sqlite
     """
 
     UNCRAWLED = 'uncrawled'
@@ -31,11 +42,496 @@ class Index:
 
     PHOTOS = 'photos'
 
+    datadir = None  # type: Optional[DataDirectory]
+
+    seen_urls = None  # type: Optional[SeenUrls]
+
+    changes = None  # type: Optional[Changes]
+
+    @abstractmethod
+    def ping(self) -> bool:
+        """Check if backend can be reached."""
+        pass
+
+    @abstractmethod
+    def verify(self) -> bool:
+        """Check if backend is configured properly."""
+        pass
+
+    @abstractmethod
+    def clear(self):
+        """Clear all documents."""
+        pass
+
+    @abstractmethod
+    def create_indices(self):
+        """Create indices of urls and photos."""
+        pass
+
+    @abstractmethod
+    def calculate_throughput(self, timeframe: int) -> int:
+        """Count photos stored during last timeframe minutes."""
+        pass
+
+    @abstractmethod
+    def timestamp_of_most_recent_document(self, index: str) -> int:
+        """Get timestamp of most recent document in given index."""
+        pass
+
+    @abstractmethod
+    def _add_urls(self, urls: list, index: str):
+        """Add urls to given index, replacing existing documents."""
+        pass
+
+    @abstractmethod
+    def _crawled_url_ids(self, hashes: list) -> set:
+        """Get which of the given url hashes have been crawled."""
+        pass
+
+    @abstractmethod
+    def crawled_url_ids_since(self, timestamp: int) -> Generator:
+        """Get hashes of urls crawled since timestamp."""
+        pass
+
+    @abstractmethod
+    def checkout_uncrawled_urls(self, amount: int) -> list:
+        """Checkout and remove a random batch of uncrawled urls."""
+        pass
+
+    @abstractmethod
+    def recently_crawled_url(self, refresh_rate=RefreshRate) -> Url:
+        """Get recently crawled url that can be photographed."""
+        pass
+
+    @abstractmethod
+    def crawled_urls_count(self, refresh_rate=RefreshRate) -> int:
+        """Count crawled urls that can be photographed."""
+        pass
+
+    @abstractmethod
+    def remove_uncrawled_url(self, id: str):
+        """Remove url from uncrawled index."""
+        pass
+
+    @abstractmethod
+    def set_status_code_for_crawled_url(self, url: Url, status_code: int):
+        """Set status code for a crawled url."""
+        pass
+
+    @abstractmethod
+    def lock_crawled_url(self, url: Url, refresh_rate: Type[RefreshRate]):
+        """Lock a crawled url for a given refresh rate."""
+        pass
+
+    @abstractmethod
+    def schedule_crawled_url(
+        self,
+        url: Url,
+        refresh_rate: Type[RefreshRate],
+        changed: bool,
+        max_backoff: int
+    ):
+        """Schedule next capture of crawled url."""
+        pass
+
+    @abstractmethod
+    def save_photo(self, photo: Photo, replaces: Optional[Photo]=None):
+        """Save photo metadata."""
+        pass
+
+    @abstractmethod
+    def remove_photo(self, photo: Photo):
+        """Remove photo metadata."""
+        pass
+
+    @abstractmethod
+    def photos_previous_capture(
+        self,
+        url: Url,
+        refresh_rate: Type[RefreshRate]
+    ) -> Photo:
+        """Get most recent capture of url that is not loading."""
+        pass
+
+    @abstractmethod
+    def photos_unique_domains(
+        self,
+        refresh_rate: Type[RefreshRate]
+    ) -> Generator:
+        """Get unique domains that pictures have been taken of."""
+        pass
+
+    @abstractmethod
+    def photos_unique_captures_of_domain(
+        self,
+        domain: str,
+        refresh_rate: Type[RefreshRate]
+    ) -> Generator:
+        """Get unique captures for a domain."""
+        pass
+
+    @abstractmethod
+    def photos_most_recent_capture_of_domain(
+        self,
+        domain: str,
+        refresh_rate: Type[RefreshRate]
+    ) -> str:
+        """Get most recently captured_at value of domain."""
+        pass
+
+    @abstractmethod
+    def photos_get_photo(
+        self,
+        domain: str,
+        captured_at: str,
+        full_filename: str,
+        refresh_rate: Type[RefreshRate]
+    ) -> Photo:
+        """Get photo by its path in the filesystem."""
+        pass
+
+    @abstractmethod
+    def photos_directory_exists(
+        self,
+        domain: str,
+        captured_at: str,
+        directory: str,
+        refresh_rate: Type[RefreshRate]
+    ) -> bool:
+        """Check if any photo is stored in or below directory."""
+        pass
+
+    @abstractmethod
+    def photos_list_files_in_directory(
+        self,
+        domain: str,
+        captured_at: str,
+        directory: str,
+        refresh_rate: Type[RefreshRate]
+    ) -> Generator:
+        """List photos in a directory."""
+        pass
+
+    @abstractmethod
+    def photos_list_directories_in_directory(
+        self,
+        domain: str,
+        captured_at: str,
+        directory: str,
+        refresh_rate: Type[RefreshRate]
+    ) -> Generator:
+        """List directories in a directory."""
+        pass
+
+    @abstractmethod
+    def photos_since(
+        self,
+        timestamp: int,
+        refresh_rate: Type[RefreshRate],
+        domain: Optional[str]=None,
+        captured_at: Optional[str]=None
+    ) -> Generator:
+        """Get photos saved since timestamp."""
+        pass
+
+    def photos_domain_exists(
+        self,
+        domain: str,
+        refresh_rate: Type[RefreshRate]
+    ) -> bool:
+        """Check if any photo of domain is stored.
+
+        Args:
+            domain: domain to check
+            refresh_rate: Given refresh rate photo was taken with
+
+        Returns:
+            True if domain was found, else False
+            bool
+        """
+        return domain in self.photos_unique_domains(refresh_rate)
+
+    def photos_capture_exists(
+        self,
+        domain: str,
+        captured_at: str,
+        refresh_rate: Type[RefreshRate]
+    ) -> bool:
+        """Check if any photo of domain was captured at given time.
+
+        Args:
+            domain: domain to check
+            captured_at: capture to check
+            refresh_rate: Given refresh rate photo was taken with
+
+        Returns:
+            True if capture was found, else False
+            bool
+        """
+        captures = self.photos_unique_captures_of_domain(domain, refresh_rate)
+        return captured_at in captures
+
+    def outdated_indices(self) -> list:
+        """Get indices not stored with current version of schema.
+
+        Returns:
+            Names of outdated indices, backends without versioned
+            schemas are never outdated
+            list
+        """
+        return []
+
+    def publish_change(self, photo: Photo, removed: bool=False):
+        """Publish that a photo was saved or removed.
+
+        Lets a mounted filesystem drop what it cached of the capture
+        photo is in, nothing is published if changes is None.
+
+        Args:
+            photo: Photo that was saved or removed
+            removed: if photo was removed (default: {False})
+        """
+        if self.changes is not None:
+            self.changes.publish(
+                photo.domain(),
+                photo.refresh_rate().lock(),
+                removed
+            )
+
+    def add_crawled_url(self, url: Url):
+        """Add crawled url.
+
+        Args:
+            url: A url that have been crawled
+        """
+        self.add_crawled_urls([url])
+
+    def add_crawled_urls(self, urls: list):
+        """Add crawled urls.
+
+        Args:
+            urls: A list of urls that have been crawled
+        """
+        self._add_urls(urls, IndexBackend.CRAWLED)
+        if self.seen_urls is not None:
+            self.seen_urls.add([url.hash() for url in urls])
+
+    def add_uncrawled_urls(self, urls: list):
+        """Add uncrawled urls.
+
+        Args:
+            urls: A list of urls that have NOT been crawled yet
+        """
+        urls = self.remove_already_crawled_urls(urls)
+        self._add_urls(urls, IndexBackend.UNCRAWLED)
+
+    def remove_already_crawled_urls(self, urls: list) -> list:
+        """Remove already crawled urls from a list of urls.
+
+        Args:
+            urls: A list of urls
+
+        Returns:
+            A cleaned list of uncrawled urls
+            list
+        """
+        hashes = [url.hash() for url in urls]
+
+        if self.seen_urls is not None:
+            self.seen_urls.sync(self)
+            unseen, seen, uncertain = self.seen_urls.partition(hashes)
+        else:
+            unseen, uncertain = [], hashes
+
+        crawled = self._crawled_url_ids(uncertain)
+        if self.seen_urls is not None:
+            self.seen_urls.add(list(crawled))
+
+        uncrawled = set(unseen)
+        for digest in uncertain:
+            if digest not in crawled:
+                uncrawled.add(digest)
+
+        out = []
+        for url in urls:
+            if url.hash() in uncrawled:
+                out.append(url)
+        return out
+
+    def photos_file_exists(
+        self,
+        domain: str,
+        captured_at: str,
+        full_filename: str,
+        refresh_rate: Type[RefreshRate]
+    ):
+        """Check if photo exists in photos index.
+
+        Args:
+            domain: domain photo belongs to
+            captured_at: when photo was captured
+            full_filename: full filename of photo
+                eg. /some/path/some-filename.png
+            refresh_rate: Given refresh rate photo was taken with
+
+        Returns:
+            False if file was not found, if found it's filesize
+            is returned
+            bool or int
+        """
+        captured_at = file.LastCapture.translate(
+            captured_at,
+            domain,
+            self,
+            refresh_rate
+        )
+        try:
+            photo = self.photos_get_photo(
+                domain,
+                captured_at,
+                full_filename,
+                refresh_rate
+            )
+            return photo.filesize()
+        except PhotoNotFoundException:
+            return False
+
+    def _split_filename(self, full_filename: str) -> tuple:
+        """Split full filename of photo into directory and filename.
+
+        Args:
+            full_filename: full filename of photo
+                eg. /some/path/some-filename.png
+
+        Returns:
+            Directory with a trailing slash and filename
+            eg. /some/path/ and some-filename.png
+            tuple
+        """
+        directory = '/'.join(full_filename.split('/')[:-1])
+        directory = directory.rstrip('/') + '/'
+        filename = full_filename.split('/')[-1:][0]
+        return directory, filename
+
+    def _photo(
+        self,
+        id: str,
+        source: dict,
+        refresh_rate: Type[RefreshRate]
+    ) -> Photo:
+        """Make photo from stored photo document.
+
+        Args:
+            id: id of photo document
+            source: fields of photo document
+            refresh_rate: Given refresh rate photo was taken with
+
+        Returns:
+            Photo metadata of document
+            Photo
+
+        Raises:
+            Exception: if index has no data dir to find photo in
+        """
+        if self.datadir is None:
+            raise Exception('Cannot get photo from Index without a data dir')
+
+        path = PhotoPath(
+            self.datadir,
+            uuid=id,
+            extension=source.get('format') or 'png',
+            blob=source.get('blob') or ''
+        )
+
+        photo = Screenshot(
+            url=UrlId(source['url_id']),
+            path=path,
+            refresh_rate=refresh_rate,
+            index_filesize=source['filesize'],
+            phash=source.get('phash') or '',
+            change=source.get('change'),
+            timestamp=source.get('timestamp')
+        )
+
+        return photo
+
+
+def connect(
+    host: str,
+    datadir: Optional[DataDirectory]=None,
+    seen_urls: Optional[SeenUrls]=None,
+    write_buffer: Optional[WriteBuffer]=None,
+    changes: Optional[Changes]=None
+) -> IndexBackend:
+    """Connect to index.
+
+    Args:
+        host: elasticsearch host eg. localhost:9200, or path to
+            sqlite database eg. sqlite:///path/to/index.sqlite
+        datadir: Data directory (default: {None})
+        seen_urls: cache of crawled urls (default: {None})
+        write_buffer: buffer to write elasticsearch documents
+            through, not used by sqlite (default: {None})
+        changes: where saved photos are published (default: {None})
+
+    Returns:
+        Index backend at host
+        IndexBackend
+    """
+    # imported here since the sqlite backend depends on this module
+    from saas.storage.sqlite import SqliteIndex
+
+    if host.startswith(SqliteIndex.SCHEME):
+        return SqliteIndex(
+            host[len(SqliteIndex.SCHEME):],
+            datadir=datadir,
+            seen_urls=seen_urls,
+            changes=changes
+        )
+    return Index(
+        datadir,
+        host=host,
+        seen_urls=seen_urls,
+        write_buffer=write_buffer,
+        changes=changes
+    )
+
+
+class Index(IndexBackend):
+    """Index storage.
+
+    Wrapper around elasticsearch api
+    """
+
+    # photos are stored by their unique id, and a copy of every photo
+    # is stored by its key, so that a photo can be fetched by its path
+    # in the filesystem with a realtime get instead of a search
+    PHOTO_KEYS = 'photo_keys'
+
+    # every directory of a capture is stored as a node listing its
+    # files and child directories, which is kept up to date as
+    # photos are saved so a directory can be listed with a get
+    DIRECTORIES = 'directories'
+
+    INDICES = [
+        IndexBackend.UNCRAWLED,
+        IndexBackend.CRAWLED,
+        IndexBackend.PHOTOS,
+        PHOTO_KEYS,
+        DIRECTORIES,
+    ]
+
+    # number of unique values fetched per request when listing
+    PAGE_SIZE = 1000
+
     def __init__(
         self,
-        datadir: DataDirectory=None,
+        datadir: Optional[DataDirectory]=None,
         es_client: Elasticsearch=None,
-        host: str='localhost:9200'
+        host: str='localhost:9200',
+        seen_urls: Optional[SeenUrls]=None,
+        write_buffer: Optional[WriteBuffer]=None,
+        changes: Optional[Changes]=None
     ):
         """Create new index.
 
@@ -44,9 +540,18 @@ class Index:
             es_client: Elasticsearch client,
                 useful in testing (default: {None})
             host: elasticsearch host (default: {'localhost:9200'})
+            seen_urls: cache of crawled urls, checked before
+                elasticsearch is queried (default: {None})
+            write_buffer: buffer to write url and photo documents
+                through, written directly if None (default: {None})
+            changes: where saved and removed photos are published
+                (default: {None})
         """
         self.datadir = datadir
         self.host = host
+        self.seen_urls = seen_urls
+        self.write_buffer = write_buffer
+        self.changes = changes
         if es_client is not None:
             self.es = es_client
         else:
@@ -74,18 +579,21 @@ class Index:
     def verify(self):
         """Verify elasticsearch is configured properly.
 
+        Indices can be stored under their own name, as they were
+        before their mappings were versioned, or behind an alias.
+
         Returns:
             True if configured correctly, otherwise False
             bool
         """
-        url = f'http://{self.host}/_mapping'
+        url = f'http://{self.host}/_alias'
         with urllib.request.urlopen(url) as response:
-            mappings = json.loads(response.read())
-            if Index.UNCRAWLED not in mappings:
-                return False
-            if Index.CRAWLED not in mappings:
-                return False
-            if Index.PHOTOS not in mappings:
+            indices = json.loads(response.read())
+        names = set(indices.keys())
+        for index in indices.values():
+            names.update(index['aliases'].keys())
+        for name in Index.INDICES:
+            if name not in names:
                 return False
         return True
 
@@ -96,22 +604,312 @@ class Index:
         console.p('indices cleared')
 
     def create_indices(self):
-        """Create indices in elasticsearch."""
+        """Create indices in elasticsearch.
+
+        Indices are named by the version of their mappings and are
+        read and written through an alias, eg. photos_v2 behind
+        the alias photos. Indices that already exist are skipped.
+        """
         console.p('creating indices')
-        try:
-            self.es.indices.create(Index.UNCRAWLED, body={
-                'mappings': Mappings.uncrawled
-            })
-            self.es.indices.create(Index.CRAWLED, body={
-                'mappings': Mappings.crawled
-            })
-            self.es.indices.create(Index.PHOTOS, body={
-                'mappings': Mappings.photos,
-                'settings': Settings.photos,
+        created = []
+        for name in Index.INDICES:
+            try:
+                self.es.indices.create(Index.versioned(name), body={
+                    'mappings': Mappings.of(name),
+                    'aliases': {
+                        name: {}
+                    }
+                })
+                created.append(name)
+            except RequestError:
+                console.p(f'{name} already exists, skipping.')
+        if Index.PHOTOS not in created:
+            self._add_photos_to(created)
+        console.p('done.')
+
+    def _add_photos_to(self, created: list):
+        """Add photos saved before an index was introduced.
+
+        Args:
+            created: names of indices that were just created
+        """
+        keys = Index.PHOTO_KEYS in created
+        directories = Index.DIRECTORIES in created
+        if not keys and not directories:
+            return
+        actions = []  # type: list
+        for hit in scan(self.es, index=Index.PHOTOS, size=5000, query={
+            'query': {
+                'match_all': {}
+            }
+        }):
+            if keys:
+                actions.append(
+                    self._photo_key_action(hit['_id'], hit['_source'])
+                )
+            if directories:
+                actions += self._directory_actions(hit['_source'])
+            if len(actions) >= 5000:
+                bulk(self.es, actions, request_timeout=80)
+                actions = []
+        if len(actions) > 0:
+            bulk(self.es, actions, request_timeout=80)
+
+    @staticmethod
+    def photo_key(
+        domain: str,
+        refresh_rate: str,
+        captured_at: str,
+        directory: str,
+        filename: str
+    ) -> str:
+        """Make key of photo's path in the filesystem.
+
+        Args:
+            domain: domain photo belongs to
+            refresh_rate: lock format of refresh rate
+            captured_at: when photo was captured
+            directory: directory of photo eg. /some/path/
+            filename: filename of photo eg. some-filename.png
+
+        Returns:
+            sha256 of path
+            str
+        """
+        return Index._hash([
+            domain,
+            refresh_rate,
+            captured_at,
+            directory,
+            filename
+        ])
+
+    @staticmethod
+    def directory_key(
+        domain: str,
+        refresh_rate: str,
+        captured_at: str,
+        directory: str
+    ) -> str:
+        """Make key of directory in the filesystem.
+
+        Args:
+            domain: domain directory belongs to
+            refresh_rate: lock format of refresh rate
+            captured_at: when directory was captured
+            directory: directory eg. /some/path/
+
+        Returns:
+            sha256 of path
+            str
+        """
+        return Index._hash([domain, refresh_rate, captured_at, directory])
+
+    @staticmethod
+    def _hash(parts: list) -> str:
+        """Hash parts of a path.
+
+        Args:
+            parts: parts of path, which can't contain newlines
+
+        Returns:
+            sha256 of parts
+            str
+        """
+        return hashlib.sha256('\n'.join(parts).encode()).hexdigest()
+
+    def _photo_key_action(self, id: str, source: dict) -> dict:
+        """Make bulk action storing photo by its key.
+
+        Args:
+            id: id of photo document
+            source: photo document
+
+        Returns:
+            Action indexing copy of photo document
+            dict
+        """
+        key = Index.photo_key(
+            source['domain'],
+            source['refresh_rate'],
+            source['captured_at'],
+            source['directory'],
+            source['filename']
+        )
+        return {
+            '_index': Index.PHOTO_KEYS,
+            '_type': 'photo',
+            '_id': key,
+            '_source': dict(source, photo_id=id),
+        }
+
+    @staticmethod
+    def _replaced_key(source: dict, replaced: str) -> str:
+        """Make key photo was stored by before it got a new filename.
+
+        Args:
+            source: photo document
+            replaced: filename photo was saved with before
+
+        Returns:
+            sha256 of old path
+            str
+        """
+        return Index.photo_key(
+            source['domain'],
+            source['refresh_rate'],
+            source['captured_at'],
+            source['directory'],
+            replaced
+        )
+
+    def _directory_actions(
+        self,
+        source: dict,
+        replaced: Optional[str]=None
+    ) -> list:
+        """Make bulk actions adding photo to its directory nodes.
+
+        The photo is added to the files of its directory with its
+        filesize, and every directory above it gets its child
+        directory. Nodes are merged into, so saving a photo twice
+        is harmless.
+
+        Args:
+            source: photo document
+            replaced: filename photo was saved with before, it is
+                marked as removed in the photo's directory
+                (default: {None})
+
+        Returns:
+            Actions upserting directory nodes
+            list
+        """
+        directory = source['directory']  # type: str
+        files = {source['filename']: source['filesize']}
+        if replaced is not None:
+            files[replaced] = None
+        nodes = [(directory, {'files': files})]
+        parent = '/'
+        for name in directory.strip('/').split('/'):
+            if name != '':
+                nodes.append((parent, {'dirs': {name: True}}))
+            parent += name + '/'
+        actions = []
+        for node, doc in nodes:
+            actions.append({
+                '_op_type': 'update',
+                '_index': Index.DIRECTORIES,
+                '_type': 'directory',
+                '_id': Index.directory_key(
+                    source['domain'],
+                    source['refresh_rate'],
+                    source['captured_at'],
+                    node
+                ),
+                'doc': doc,
+                'doc_as_upsert': True,
+                'retry_on_conflict': 5,
             })
-            console.p('done.')
-        except RequestError:
-            console.p('indices already exist, skipping.')
+        return actions
+
+    @staticmethod
+    def versioned(name: str) -> str:
+        """Get name of index with current version of mappings.
+
+        Args:
+            name: name of index eg. photos
+
+        Returns:
+            Versioned name of index eg. photos_v2
+            str
+        """
+        return f'{name}_v{Mappings.VERSION}'
+
+    def outdated_indices(self) -> list:
+        """Get indices not stored with current version of mappings.
+
+        Indices that don't exist yet are created by setting up
+        elasticsearch, not by reindexing.
+
+        Returns:
+            Names of outdated indices
+            list
+        """
+        outdated = []
+        for name in Index.INDICES:
+            if not self.es.indices.exists(index=name):
+                continue
+            if self._concrete_index(name) != Index.versioned(name):
+                outdated.append(name)
+        return outdated
+
+    def _concrete_index(self, name: str) -> str:
+        """Get index an alias points to.
+
+        Args:
+            name: name of alias or index
+
+        Returns:
+            Name of index behind alias, the name itself if
+            it is not an alias
+            str
+        """
+        if not self.es.indices.exists_alias(name=name):
+            return name
+        aliases = self.es.indices.get_alias(name=name)
+        concrete = list(aliases.keys())[0]  # type: str
+        return concrete
+
+    def reindex(self):
+        """Reindex outdated indices into current version of mappings.
+
+        Documents are copied into a new index while saas keeps
+        reading and writing the old one through its alias. The copy
+        uses external versioning, so a second pass only copies the
+        documents that were written during the first. The alias is
+        then moved to the new index in one atomic update, which
+        also deletes an old index that was stored under the alias'
+        name. Writes made between the second pass and the swap are
+        lost, which at worst makes saas crawl or photograph a url
+        again.
+        """
+        for name in self.outdated_indices():
+            source = self._concrete_index(name)
+            target = Index.versioned(name)
+            console.p(f'reindexing {source} into {target}')
+            if not self.es.indices.exists(index=target):
+                self.es.indices.create(target, body={
+                    'mappings': Mappings.of(name)
+                })
+
+            for copy in ['copying documents', 'copying recent writes']:
+                console.p(f'{copy} to {target}')
+                res = self.es.reindex(
+                    body={
+                        'conflicts': 'proceed',
+                        'source': {
+                            'index': source
+                        },
+                        'dest': {
+                            'index': target,
+                            'version_type': 'external'
+                        }
+                    },
+                    request_timeout=1000000
+                )
+                created, updated = res['created'], res['updated']
+                console.p(f'{created} created, {updated} updated')
+
+            actions = [{'add': {'index': target, 'alias': name}}]
+            if source == name:
+                actions.append({'remove_index': {'index': source}})
+            else:
+                actions.append({'remove': {'index': source, 'alias': name}})
+            self.es.indices.update_aliases(body={'actions': actions})
+            if source != name:
+                self.es.indices.delete(index=source)
+            console.p(f'{name} now points at {target}')
 
     def calculate_throughput(self, timeframe: int) -> int:
         """Calculate throughput.
@@ -142,23 +940,6 @@ class Index:
         throughput = res['hits']['total']  # type: int
         return throughput
 
-    def add_crawled_url(self, url: Url):
-        """Add crawled url.
-
-        Args:
-            url: A url that have been crawled
-        """
-        self.add_crawled_urls([url])
-
-    def add_crawled_urls(self, urls: list):
-        """Add crawled urls.
-
-        Args:
-            urls: A list of urls that have been crawled
-        """
-        prepared = self._prepare_urls(urls, Index.CRAWLED)
-        bulk(self.es, prepared, request_timeout=80)
-
     def timestamp_of_most_recent_document(self, index: str) -> int:
         """Get timestamp of most recent document in given index.
 
@@ -193,49 +974,99 @@ class Index:
         timestamp = doc['_source']['timestamp']  # type: int
         return timestamp
 
-    def add_uncrawled_urls(self, urls: list):
-        """Add uncrawled urls.
+    def _add_urls(self, urls: list, index: str):
+        """Add urls to given index.
 
         Args:
-            urls: A list of urls that have NOT been crawled yet
+            urls: list of Urls
+            index: index to add urls to
         """
-        urls = self.remove_already_crawled_urls(urls)
-        prepared = self._prepare_urls(urls, Index.UNCRAWLED)
-        bulk(self.es, prepared, request_timeout=80)
+        self._bulk(self._prepare_urls(urls, index))
 
-    def remove_already_crawled_urls(self, urls: list) -> list:
-        """Remove already crawled urls from a list of urls.
+    def _bulk(self, prepared: list):
+        """Index prepared documents in bulk.
 
         Args:
-            urls: A list of urls
+            prepared: list of prepared documents
+        """
+        if self.write_buffer is None:
+            bulk(self.es, prepared, request_timeout=80)
+            return
+        for doc in prepared:
+            self.write_buffer.index(
+                doc['_index'],
+                doc['_type'],
+                doc['_id'],
+                doc['_source']
+            )
+
+    def _update(self, index: str, doc_type: str, id: str, doc: dict):
+        """Partially update document.
+
+        Args:
+            index: index document is stored in
+            doc_type: document type
+            id: document id
+            doc: fields to update
+        """
+        if self.write_buffer is None:
+            self.es.update(
+                index=index,
+                doc_type=doc_type,
+                id=id,
+                retry_on_conflict=3,
+                body={
+                    'doc': doc
+                }
+            )
+            return
+        self.write_buffer.update(index, doc_type, id, doc)
+
+    def _crawled_url_ids(self, hashes: list) -> set:
+        """Get which of the given url hashes have been crawled.
+
+        Args:
+            hashes: list of url hashes
 
         Returns:
-            A cleaned list of uncrawled urls
-            list
+            The hashes found in the crawled index
+            set
         """
-        hashes = []
-        for url in urls:
-            hashes.append(url.hash())
-        res = self.es.search(index=Index.CRAWLED, body={
-            'query': {
-                'bool': {
-                    'filter': {
-                        'terms': {
-                            '_id': hashes
-                        }
+        if len(hashes) == 0:
+            return set()
+        res = self.es.mget(
+            index=Index.CRAWLED,
+            doc_type='url',
+            body={'ids': hashes},
+            _source=False
+        )
+        crawled = set()
+        for doc in res['docs']:
+            if doc.get('found'):
+                crawled.add(doc['_id'])
+        return crawled
+
+    def crawled_url_ids_since(self, timestamp: int) -> Generator:
+        """Get hashes of urls crawled since timestamp.
+
+        Args:
+            timestamp: unix timestamp
+
+        Yields:
+            Hash of a crawled url
+            str
+        """
+        for doc in scan(self.es, index=Index.CRAWLED, size=5000, query={
+            'query': {
+                'range': {
+                    'timestamp': {
+                        'gte': timestamp,
                     }
                 }
             },
-            'stored_fields': []
-        })
-        for doc in res['hits']['hits']:
-            while doc['_id'] in hashes:
-                hashes.remove(doc['_id'])
-        out = []
-        for url in urls:
-            if url.hash() in hashes:
-                out.append(url)
-        return out
+            '_source': False
+        }):
+            yield doc['_id']
 
     def _prepare_urls(self, urls: list, index: str) -> list:
         """Prepare urls for bulk add.
@@ -260,6 +1091,7 @@ class Index:
             else:
                 source = {
                     'url': url.to_string(),
+                    'domain': url.domain,
                     'timestamp': int(time.time()),
                 }
             prepared.append({
@@ -270,38 +1102,55 @@ class Index:
             })
         return prepared
 
-    def random_uncrawled_url(self) -> Url:
-        """Get random uncrawled url.
+    def checkout_uncrawled_urls(self, amount: int) -> list:
+        """Checkout a random batch of uncrawled urls.
 
-        Returns:
-            An uncrawled url
-            Url
+        The urls are removed from the uncrawled index. If another
+        process checks out the same url at the same time, only one
+        of them will get it.
 
-        Raises:
-            EmptySearchResultException: if index is empty
+        Args:
+            amount: max number of urls to checkout
+
+        Returns:
+            A list of uncrawled urls, empty if index is empty
+            list
         """
-        res = self.es.search(index=Index.UNCRAWLED, size=1, body={
+        res = self.es.search(index=Index.UNCRAWLED, size=amount, body={
             'query': {
                 'function_score': {
                     'query': {
-                        'bool': {
-                            'must_not': {
-                                'term': {
-                                    'crawled': True
-                                }
-                            }
-                        }
+                        'match_all': {}
                     },
                     'random_score': {}
                 }
             }
         })
 
-        if res['hits']['total'] == 0:
-            raise EmptySearchResultException('uncrawled index is empty')
+        hits = res['hits']['hits']
+        if len(hits) == 0:
+            return []
+
+        res = self.es.bulk(body=[
+            {
+                'delete': {
+                    '_index': Index.UNCRAWLED,
+                    '_type': 'url',
+                    '_id': hit['_id'],
+                }
+            } for hit in hits
+        ])
 
-        url = Url.from_string(res['hits']['hits'][0]['_source']['url'])
-        return url
+        deleted = set()
+        for item in res['items']:
+            if item['delete'].get('result') == 'deleted':
+                deleted.add(item['delete']['_id'])
+
+        urls = []
+        for hit in hits:
+            if hit['_id'] in deleted:
+                urls.append(Url.from_string(hit['_source']['url']))
+        return urls
 
     def recently_crawled_url(self, refresh_rate=RefreshRate):
         """Get recently crawled url.
@@ -321,22 +1170,7 @@ class Index:
             EmptySearchResultException: if no url was found
         """
         res = self.es.search(index=Index.CRAWLED, size=5, body={
-            'query': {
-                'bool': {
-                    'must': {
-                        'term': {
-                            'status_code': 200,
-                        }
-                    },
-                    'must_not': [
-                        {
-                            'term': {
-                                'lock_value': refresh_rate().lock(),
-                            }
-                        }
-                    ]
-                }
-            },
+            'query': self._checkout_query(refresh_rate),
             'sort': [
                 {
                     'timestamp': {
@@ -353,34 +1187,57 @@ class Index:
 
         return Url.from_string(random.choice(hits)['_source']['url'])
 
-    def crawled_urls_count(self, refresh_rate=RefreshRate) -> int:
-        """Crawled url count.
+    def _checkout_query(self, refresh_rate: Type[RefreshRate]) -> dict:
+        """Make query for crawled urls that can be checked out.
+
+        Urls must have been crawled successfully, not be locked for
+        refresh rate and not be scheduled for a later capture.
 
         Args:
             refresh_rate: the refresh reate to search for and
                 use to avoid locked urls
 
         Returns:
-            number of crawled urls with status code 200
-            int
+            Elasticsearch query
+            dict
         """
-        res = self.es.search(index=Index.CRAWLED, size=0, body={
-            'query': {
-                'bool': {
-                    'must': {
+        return {
+            'bool': {
+                'must': {
+                    'term': {
+                        'status_code': 200,
+                    }
+                },
+                'must_not': [
+                    {
                         'term': {
-                            'status_code': 200,
+                            'lock_value': refresh_rate().lock(),
                         }
                     },
-                    'must_not': [
-                        {
-                            'term': {
-                                'lock_value': refresh_rate().lock(),
+                    {
+                        'range': {
+                            'next_capture': {
+                                'gt': int(time.time())
                             }
                         }
-                    ]
-                }
-            },
+                    }
+                ]
+            }
+        }
+
+    def crawled_urls_count(self, refresh_rate=RefreshRate) -> int:
+        """Crawled url count.
+
+        Args:
+            refresh_rate: the refresh reate to search for and
+                use to avoid locked urls
+
+        Returns:
+            number of crawled urls with status code 200
+            int
+        """
+        res = self.es.search(index=Index.CRAWLED, size=0, body={
+            'query': self._checkout_query(refresh_rate),
             'sort': [
                 {
                     'timestamp': {
@@ -413,6 +1270,21 @@ class Index:
             url: Url to set status code of
             status_code: the status code of the http request to the url
         """
+        self._update(Index.CRAWLED, 'url', url.hash(), {
+            'status_code': status_code
+        })
+
+    def lock_crawled_url(self, url: Url, refresh_rate: Type[RefreshRate]):
+        """Lock a crawld url.
+
+        Place a lock on a crawled url for a given refresh rate.
+
+        Args:
+            url: Url to lock
+            refresh_rate: Refresh rate to use (Hourly, Daily, etc.)
+        """
+        # not written through the write buffer, other photographers
+        # must see the lock before they checkout their next url
         self.es.update(
             index=Index.CRAWLED,
             doc_type='url',
@@ -420,34 +1292,54 @@ class Index:
             retry_on_conflict=3,
             body={
                 'doc': {
-                    'status_code': status_code
+                    'lock_format': refresh_rate.lock_format(),
+                    'lock_value': refresh_rate().lock(),
                 }
             }
         )
 
-    def lock_crawled_url(self, url: Url, refresh_rate: Type[RefreshRate]):
-        """Lock a crawld url.
+    def schedule_crawled_url(
+        self,
+        url: Url,
+        refresh_rate: Type[RefreshRate],
+        changed: bool,
+        max_backoff: int
+    ):
+        """Schedule next capture of crawled url.
 
-        Place a lock on a crawled url for a given refresh rate.
+        Urls that are captured without changing are captured less
+        often, every unchanged capture in a row doubles the number
+        of refreshes until the url is checked out again. A changed
+        capture resets the url to be captured every refresh.
 
         Args:
-            url: Url to lock
-            refresh_rate: Refresh rate to use (Hourly, Daily, etc.)
+            url: Url that was captured
+            refresh_rate: Refresh rate url was captured with
+            changed: if the capture changed since the previous capture
+            max_backoff: max number of times the interval is doubled
         """
+        # the counter is incremented by a script, so that concurrent
+        # photographers do not overwrite each others counts
         self.es.update(
             index=Index.CRAWLED,
             doc_type='url',
             id=url.hash(),
             retry_on_conflict=3,
             body={
-                'doc': {
-                    'lock_format': refresh_rate.lock_format(),
-                    'lock_value': refresh_rate().lock(),
+                'script': {
+                    'source': Scripts.SCHEDULE,
+                    'lang': 'painless',
+                    'params': {
+                        'changed': changed,
+                        'now': int(time.time()),
+                        'interval': refresh_rate.interval(),
+                        'max_backoff': max_backoff,
+                    }
                 }
             }
         )
 
-    def save_photo(self, photo: Photo):
+    def save_photo(self, photo: Photo, replaces: Optional[Photo]=None):
         """Save photo in index.
 
         Will not store the actual photo data, this should be stored
@@ -455,94 +1347,452 @@ class Index:
 
         Args:
             photo: Photo to store
+            replaces: Photo saved before with the same id, eg. the
+                loading photo of a screenshot that was optimized,
+                its filename and key are dropped if photo has a
+                new one (default: {None})
         """
+        body = {
+            'url_id': photo.url.hash(),
+            'refresh_rate': photo.refresh_rate.lock_format(),
+            'captured_at': photo.refresh_rate().lock(),
+            'filesize': photo.filesize(),
+            'filename': photo.filename(),
+            'directory': photo.directory(),
+            'domain': photo.domain(),
+            'timestamp': int(time.time()),
+            'format': photo.path.extension,
+            'blob': photo.path.blob,
+            'phash': photo.phash,
+            'change': photo.change
+        }
+        replaced = None  # type: Optional[str]
+        if replaces is not None and replaces.filename() != photo.filename():
+            replaced = replaces.filename()
+        key = self._photo_key_action(photo.path.uuid, body)
+        directories = self._directory_actions(body, replaced)
+        self.publish_change(photo)
+        if self.write_buffer is not None:
+            self.write_buffer.index(
+                Index.PHOTOS,
+                'photo',
+                photo.path.uuid,
+                body
+            )
+            self.write_buffer.index(
+                key['_index'],
+                key['_type'],
+                key['_id'],
+                key['_source']
+            )
+            if replaced is not None:
+                self.write_buffer.delete(
+                    Index.PHOTO_KEYS,
+                    'photo',
+                    self._replaced_key(body, replaced)
+                )
+            for action in directories:
+                self.write_buffer.update(
+                    action['_index'],
+                    action['_type'],
+                    action['_id'],
+                    action['doc'],
+                    upsert=True
+                )
+            return
+        self.es.index(
+            index=Index.PHOTOS,
+            doc_type='photo',
+            id=photo.path.uuid,
+            body=body
+        )
         self.es.index(
+            index=key['_index'],
+            doc_type=key['_type'],
+            id=key['_id'],
+            body=key['_source']
+        )
+        if replaced is not None:
+            self.es.delete(
+                index=Index.PHOTO_KEYS,
+                doc_type='photo',
+                id=self._replaced_key(body, replaced),
+                ignore=404
+            )
+        lines = []  # type: list
+        for action in directories:
+            lines.append({
+                'update': {
+                    '_index': action['_index'],
+                    '_type': action['_type'],
+                    '_id': action['_id'],
+                    'retry_on_conflict': action['retry_on_conflict'],
+                }
+            })
+            lines.append({
+                'doc': action['doc'],
+                'doc_as_upsert': True,
+            })
+        self.es.bulk(body=lines)
+
+    def remove_photo(self, photo: Photo):
+        """Remove photo from index.
+
+        Args:
+            photo: Photo to remove
+        """
+        refresh_rate = photo.refresh_rate.lock_format()
+        captured_at = photo.refresh_rate().lock()
+        key = Index.photo_key(
+            photo.domain(),
+            refresh_rate,
+            captured_at,
+            photo.directory(),
+            photo.filename()
+        )
+        # the photo is left in its directory node marked as removed,
+        # as deleting a key from a node would need a script
+        directory = Index.directory_key(
+            photo.domain(),
+            refresh_rate,
+            captured_at,
+            photo.directory()
+        )
+        removed = {'files': {photo.filename(): None}}
+        self.publish_change(photo, removed=True)
+        if self.write_buffer is not None:
+            self.write_buffer.delete(Index.PHOTOS, 'photo', photo.path.uuid)
+            self.write_buffer.delete(Index.PHOTO_KEYS, 'photo', key)
+            self.write_buffer.update(
+                Index.DIRECTORIES,
+                'directory',
+                directory,
+                removed
+            )
+            return
+        self.es.delete(
             index=Index.PHOTOS,
             doc_type='photo',
             id=photo.path.uuid,
+            ignore=404
+        )
+        self.es.delete(
+            index=Index.PHOTO_KEYS,
+            doc_type='photo',
+            id=key,
+            ignore=404
+        )
+        self.es.update(
+            index=Index.DIRECTORIES,
+            doc_type='directory',
+            id=directory,
+            retry_on_conflict=5,
             body={
-                'url_id': photo.url.hash(),
-                'refresh_rate': photo.refresh_rate.lock_format(),
-                'captured_at': photo.refresh_rate().lock(),
-                'filesize': photo.filesize(),
-                'filename': photo.filename(),
-                'directory': photo.directory(),
-                'domain': photo.domain(),
-                'timestamp': int(time.time())
-            }
+                'doc': removed
+            },
+            ignore=404
         )
 
-    def photos_unique_domains(self, refresh_rate: Type[RefreshRate]) -> list:
-        """Get unique domains that pictures have been taken of.
+    def photos_previous_capture(
+        self,
+        url: Url,
+        refresh_rate: Type[RefreshRate]
+    ) -> Photo:
+        """Get most recent capture of url.
+
+        Photos that were still loading are not considered.
 
         Args:
+            url: Url to get capture of
             refresh_rate: Given refresh rate photo was taken with
+
+        Returns:
+            The most recent photo of url
+            Photo
+
+        Raises:
+            EmptySearchResultException: if url has not been captured
         """
-        res = self.es.search(index=Index.PHOTOS, size=0, body={
+        res = self.es.search(index=Index.PHOTOS, size=1, body={
             'query': {
                 'bool': {
-                    'must': {
+                    'must': [
+                        {
+                            'term': {
+                                'url_id': url.hash()
+                            }
+                        },
+                        {
+                            'term': {
+                                'refresh_rate': refresh_rate.lock_format()
+                            }
+                        },
+                        {
+                            'exists': {
+                                'field': 'phash'
+                            }
+                        }
+                    ],
+                    'must_not': {
                         'term': {
-                            'refresh_rate': refresh_rate.lock_format(),
+                            'phash': ''
                         }
-                    },
+                    }
                 }
             },
-            'aggs': {
-                'photos': {
-                    'terms': {
-                        'field': 'domain',
-                        'size': 10000
+            'sort': [
+                {
+                    'timestamp': {
+                        'order': 'desc'
                     }
                 }
+            ]
+        })
+
+        if res['hits']['total'] == 0:
+            raise EmptySearchResultException(
+                f'no capture of {url.to_string()} was found'
+            )
+
+        return self._photo_from_hit(res['hits']['hits'][0], refresh_rate)
+
+    def photos_unique_domains(
+        self,
+        refresh_rate: Type[RefreshRate]
+    ) -> Generator:
+        """Get unique domains that pictures have been taken of.
+
+        Args:
+            refresh_rate: Given refresh rate photo was taken with
+
+        Yields:
+            Domain, in alphabetical order
+            str
+        """
+        yield from self._unique('domain', {
+            'bool': {
+                'must': {
+                    'term': {
+                        'refresh_rate': refresh_rate.lock_format(),
+                    }
+                },
             }
         })
-        unique = []
-        for bucket in res['aggregations']['photos']['buckets']:
-            unique.append(bucket['key'])
-        return unique
 
     def photos_unique_captures_of_domain(
         self,
         domain: str,
         refresh_rate: Type[RefreshRate]
-    ) -> list:
+    ) -> Generator:
         """Get unique captures for a domain.
 
         Args:
             domain: The given domain to check
             refresh_rate: Given refresh rate photo was taken with
+
+        Yields:
+            Capture, oldest first
+            str
         """
-        res = self.es.search(index=Index.PHOTOS, size=0, body={
+        yield from self._unique('captured_at', self._domain_query(
+            domain,
+            refresh_rate
+        ))
+
+    def photos_domain_exists(
+        self,
+        domain: str,
+        refresh_rate: Type[RefreshRate]
+    ) -> bool:
+        """Check if any photo of domain is stored.
+
+        Args:
+            domain: domain to check
+            refresh_rate: Given refresh rate photo was taken with
+
+        Returns:
+            True if domain was found, else False
+            bool
+        """
+        return self._exists(self._domain_query(domain, refresh_rate))
+
+    def photos_capture_exists(
+        self,
+        domain: str,
+        captured_at: str,
+        refresh_rate: Type[RefreshRate]
+    ) -> bool:
+        """Check if any photo of domain was captured at given time.
+
+        Args:
+            domain: domain to check
+            captured_at: capture to check
+            refresh_rate: Given refresh rate photo was taken with
+
+        Returns:
+            True if capture was found, else False
+            bool
+        """
+        query = self._domain_query(domain, refresh_rate)
+        query['bool']['must'].append({
+            'term': {
+                'captured_at': captured_at,
+            }
+        })
+        return self._exists(query)
+
+    def photos_since(
+        self,
+        timestamp: int,
+        refresh_rate: Type[RefreshRate],
+        domain: Optional[str]=None,
+        captured_at: Optional[str]=None
+    ) -> Generator:
+        """Get photos saved since timestamp.
+
+        Photos are paged through in the order they were saved with
+        search_after, so no scroll is kept open between pages.
+
+        Args:
+            timestamp: unix timestamp
+            refresh_rate: Given refresh rate photos were taken with
+            domain: only get photos of domain (default: {None})
+            captured_at: only get photos of capture (default: {None})
+
+        Yields:
+            Id and fields of photo document
+            str, dict
+        """
+        filters = [
+            {'term': {'refresh_rate': refresh_rate.lock_format()}},
+            {'range': {'timestamp': {'gte': timestamp}}},
+        ]  # type: list
+        if domain is not None:
+            filters.append({'term': {'domain': domain}})
+        if captured_at is not None:
+            filters.append({'term': {'captured_at': captured_at}})
+
+        body = {
             'query': {
                 'bool': {
-                    'must': [
-                        {
-                            'term': {
-                                'domain': domain,
-                            }
-                        },
-                        {
-                            'term': {
-                                'refresh_rate': refresh_rate.lock_format(),
-                            }
-                        },
-                    ],
+                    'filter': filters
+                }
+            },
+            # a url is photographed once per capture, so photos saved
+            # in the same second are told apart by url and capture
+            'sort': [
+                {'timestamp': 'asc'},
+                {'url_id': 'asc'},
+                {'captured_at': 'asc'},
+            ]
+        }  # type: dict
+        while True:
+            res = self.es.search(
+                index=Index.PHOTOS,
+                size=Index.PAGE_SIZE,
+                body=body
+            )
+            hits = res['hits']['hits']
+            for hit in hits:
+                yield hit['_id'], hit['_source']
+            if len(hits) < Index.PAGE_SIZE:
+                return
+            body = dict(body, search_after=hits[-1]['sort'])
+
+    def _domain_query(
+        self,
+        domain: str,
+        refresh_rate: Type[RefreshRate]
+    ) -> dict:
+        """Make query of photos of domain.
+
+        Args:
+            domain: domain photos belong to
+            refresh_rate: Given refresh rate photo was taken with
+
+        Returns:
+            Bool query matching photos of domain
+            dict
+        """
+        return {
+            'bool': {
+                'must': [
+                    {
+                        'term': {
+                            'domain': domain,
+                        }
+                    },
+                    {
+                        'term': {
+                            'refresh_rate': refresh_rate.lock_format(),
+                        }
+                    },
+                ],
+            }
+        }
+
+    def _unique(self, field: str, query: dict) -> Generator:
+        """Get unique values of field in photos matching query.
+
+        Values are paged through with a composite aggregation, so
+        every value is found and only a page is held in memory.
+
+        Args:
+            field: keyword field to get values of
+            query: query photos should match
+
+        Yields:
+            Value of field, in order
+            str
+        """
+        composite = {
+            'size': Index.PAGE_SIZE,
+            'sources': [
+                {
+                    field: {
+                        'terms': {
+                            'field': field
+                        }
+                    }
                 }
-            },
-            'aggs': {
-                'photos': {
-                    'terms': {
-                        'field': 'captured_at',
-                        'size': 10000
+            ]
+        }  # type: dict
+        while True:
+            res = self.es.search(index=Index.PHOTOS, size=0, body={
+                'query': query,
+                'aggs': {
+                    'photos': {
+                        'composite': composite
                     }
                 }
+            })
+            buckets = res['aggregations']['photos']['buckets']
+            for bucket in buckets:
+                yield bucket['key'][field]
+            if len(buckets) < Index.PAGE_SIZE:
+                return
+            composite = dict(composite, after=buckets[-1]['key'])
+
+    def _exists(self, query: dict) -> bool:
+        """Check if any photo matches query.
+
+        Args:
+            query: query photo should match
+
+        Returns:
+            True if a photo matched, else False
+            bool
+        """
+        res = self.es.search(
+            index=Index.PHOTOS,
+            size=0,
+            terminate_after=1,
+            body={
+                'query': query
             }
-        })
-        unique = []
-        for bucket in res['aggregations']['photos']['buckets']:
-            unique.append(bucket['key'])
-        return unique
+        )
+        total = res['hits']['total']  # type: int
+        return total > 0
 
     def photos_most_recent_capture_of_domain(
         self,
@@ -620,9 +1870,7 @@ class Index:
         Raises:
             PhotoNotFoundException: If photo was not found
         """
-        directory = '/'.join(full_filename.split('/')[:-1])
-        directory = directory.rstrip('/') + '/'
-        filename = full_filename.split('/')[-1:][0]
+        directory, filename = self._split_filename(full_filename)
 
         captured_at = file.LastCapture.translate(
             captured_at,
@@ -631,97 +1879,41 @@ class Index:
             refresh_rate
         )
 
-        res = self.es.search(index=Index.PHOTOS, size=1, body={
-            'query': {
-                'bool': {
-                    'must': [
-                        {
-                            'term': {
-                                'domain': domain
-                            }
-                        },
-                        {
-                            'term': {
-                                'refresh_rate': refresh_rate.lock_format()
-                            }
-                        },
-                        {
-                            'term': {
-                                'captured_at': captured_at
-                            }
-                        },
-                        {
-                            'term': {
-                                'directory': directory
-                            }
-                        },
-                        {
-                            'term': {
-                                'filename': filename
-                            }
-                        }
-                    ]
-                }
-            },
-        })
+        res = self.es.get(
+            index=Index.PHOTO_KEYS,
+            doc_type='photo',
+            id=Index.photo_key(
+                domain,
+                refresh_rate.lock_format(),
+                captured_at,
+                directory,
+                filename
+            ),
+            ignore=404
+        )
 
-        if res['hits']['total'] == 0:
+        if not res.get('found', False):
             raise PhotoNotFoundException('no photo was found')
 
-        res = res['hits']['hits'][0]
-        uuid = res['_id']
-
-        if self.datadir is None:
-            raise Exception('Cannot get photo from Index without a data dir')
-
-        path = PhotoPath(self.datadir, uuid=uuid)
-
-        photo = Screenshot(
-            url=UrlId(res['_source']['url_id']),
-            path=path,
-            refresh_rate=refresh_rate,
-            index_filesize=res['_source']['filesize']
-        )
+        return self._photo(res['_source']['photo_id'], res['_source'],
+                           refresh_rate)
 
-        return photo
-
-    def photos_file_exists(
+    def _photo_from_hit(
         self,
-        domain: str,
-        captured_at: str,
-        full_filename: str,
+        hit: dict,
         refresh_rate: Type[RefreshRate]
-    ):
-        """Check if photo exists in photos index.
+    ) -> Photo:
+        """Make photo from search hit in photos index.
 
         Args:
-            domain: domain photo belongs to
-            captured_at: when photo was captured
-            full_filename: full filename of photo
-                eg. /some/path/some-filename.png
+            hit: search hit of photo document
             refresh_rate: Given refresh rate photo was taken with
 
         Returns:
-            False if file was not found, if found it's filesize
-            is returned
-            bool or int
+            Photo metadata of hit
+            Photo
         """
-        captured_at = file.LastCapture.translate(
-            captured_at,
-            domain,
-            self,
-            refresh_rate
-        )
-        try:
-            photo = self.photos_get_photo(
-                domain,
-                captured_at,
-                full_filename,
-                refresh_rate
-            )
-            return photo.filesize()
-        except PhotoNotFoundException:
-            return False
+        return self._photo(hit['_id'], hit['_source'], refresh_rate)
 
     def photos_directory_exists(
         self,
@@ -742,52 +1934,12 @@ class Index:
             True if photo was found, else False
             bool
         """
-        captured_at = file.LastCapture.translate(
-            captured_at,
+        return self._directory(
             domain,
-            self,
+            captured_at,
+            directory,
             refresh_rate
-        )
-        res = self.es.search(index=Index.PHOTOS, size=0, body={
-            'query': {
-                'bool': {
-                    'must': [
-                        {
-                            'term': {
-                                'domain': domain,
-                            }
-                        },
-                        {
-                            'term': {
-                                'refresh_rate': refresh_rate.lock_format(),
-                            }
-                        },
-                        {
-                            'term': {
-                                'captured_at': captured_at,
-                            }
-                        },
-                        {
-                            'wildcard': {
-                                'directory': directory + '*',
-                            }
-                        }
-                    ],
-                }
-            },
-            'aggs': {
-                'photos': {
-                    'terms': {
-                        'field': 'directory',
-                        'size': 10000
-                    }
-                }
-            }
-        })
-        for bucket in res['aggregations']['photos']['buckets']:
-            if directory in bucket['key']:
-                return True
-        return False
+        ) is not None
 
     def photos_list_files_in_directory(
         self,
@@ -795,7 +1947,7 @@ class Index:
         captured_at: str,
         directory: str,
         refresh_rate: Type[RefreshRate]
-    ) -> list:
+    ) -> Generator:
         """List photos in a directory.
 
         Args:
@@ -804,53 +1956,20 @@ class Index:
             directory: directory files should be located in
             refresh_rate: Given refresh rate photo was taken with
 
-        Returns:
-            A list of files
-            list
+        Yields:
+            Filename
+            str
         """
-        captured_at = file.LastCapture.translate(
-            captured_at,
-            domain,
-            self,
-            refresh_rate
-        )
-        res = self.es.search(index=Index.PHOTOS, size=10000, body={
-            'query': {
-                'bool': {
-                    'must': [
-                        {
-                            'term': {
-                                'domain': domain
-                            }
-                        },
-                        {
-                            'term': {
-                                'refresh_rate': refresh_rate.lock_format()
-                            }
-                        },
-                        {
-                            'term': {
-                                'captured_at': captured_at
-                            }
-                        },
-                        {
-                            'term': {
-                                'directory': directory
-                            }
-                        }
-                    ]
-                }
-            }
-        })
-        files = []
-        for doc in res['hits']['hits']:
-            if doc['_source']['filesize'] < 100:
-                files.append(
-                    doc['_source']['filename'] + file.Path.RENDERING_EXTENSION
-                )
+        node = self._directory(domain, captured_at, directory, refresh_rate)
+        if node is None:
+            return
+        for filename, filesize in node.get('files', {}).items():
+            if filesize is None:
+                continue
+            if filesize < 100:
+                yield filename + file.Path.RENDERING_EXTENSION
             else:
-                files.append(doc['_source']['filename'])
-        return files
+                yield filename
 
     def photos_list_directories_in_directory(
         self,
@@ -858,7 +1977,7 @@ class Index:
         captured_at: str,
         directory: str,
         refresh_rate: Type[RefreshRate]
-    ) -> list:
+    ) -> Generator:
         """List directories in a directory.
 
         Args:
@@ -867,9 +1986,34 @@ class Index:
             directory: directory should be located in
             refresh_rate: given refresh rate photo was taken with
 
+        Yields:
+            Name of directory
+            str
+        """
+        node = self._directory(domain, captured_at, directory, refresh_rate)
+        if node is None:
+            return
+        yield from node.get('dirs', {}).keys()
+
+    def _directory(
+        self,
+        domain: str,
+        captured_at: str,
+        directory: str,
+        refresh_rate: Type[RefreshRate]
+    ) -> Optional[dict]:
+        """Get directory node.
+
+        Args:
+            domain: domain directory belongs to
+            captured_at: when directory was captured
+            directory: directory path eg. /some/path/to/dir/
+            refresh_rate: given refresh rate photo was taken with
+
         Returns:
-            A list of directories
-            list
+            Files and child directories of directory, None if
+            the directory doesn't exist
+            Optional[dict]
         """
         captured_at = file.LastCapture.translate(
             captured_at,
@@ -877,52 +2021,21 @@ class Index:
             self,
             refresh_rate
         )
-        res = self.es.search(index=Index.PHOTOS, size=0, body={
-            'query': {
-                'bool': {
-                    'must': [
-                        {
-                            'term': {
-                                'domain': domain,
-                            }
-                        },
-                        {
-                            'term': {
-                                'refresh_rate': refresh_rate.lock_format(),
-                            }
-                        },
-                        {
-                            'term': {
-                                'captured_at': captured_at,
-                            }
-                        },
-                        {
-                            'wildcard': {
-                                'directory': directory + '*',
-                            }
-                        }
-                    ],
-                }
-            },
-            'aggs': {
-                'photos': {
-                    'terms': {
-                        'field': 'directory',
-                        'size': 10000
-                    }
-                }
-            }
-        })
-        directories = []  # type: list
-        for bucket in res['aggregations']['photos']['buckets']:
-            # trim the parent directories from the path,
-            # and strip it's child directories
-            path = bucket['key']
-            path = path.replace(directory, '', 1)
-            path = path.split('/')[0]
-            if path not in directories and path != '':
-                directories.append(path)
-        return directories
+        res = self.es.get(
+            index=Index.DIRECTORIES,
+            doc_type='directory',
+            id=Index.directory_key(
+                domain,
+                refresh_rate.lock_format(),
+                captured_at,
+                directory
+            ),
+            ignore=404
+        )
+        if not res.get('found', False):
+            return None
+        node = res['_source']  # type: dict
+        return node
 
 
 class PhotoNotFoundException(Exception):
@@ -932,7 +2045,15 @@ class PhotoNotFoundException(Exception):
 
 
 class Mappings:
-    """Mappings for elasticsearch indices."""
+    """Mappings for elasticsearch indices.
+
+    Fields that are searched for exact values or aggregated are
+    keywords, which are aggregated from doc values on disk instead
+    of fielddata on the heap. Indices created with an older version
+    of the mappings are upgraded with saas reindex.
+    """
+
+    VERSION = 2
 
     uncrawled = {
         'url': {
@@ -946,6 +2067,9 @@ class Mappings:
                         }
                     }
                 },
+                'domain': {
+                    'type': 'keyword'
+                },
                 'timestamp': {
                     'type': 'date',
                     'format': 'epoch_second',
@@ -973,11 +2097,21 @@ class Mappings:
                     'type': 'date',
                     'format': 'epoch_second',
                 },
+                'status_code': {
+                    'type': 'short'
+                },
                 'lock_format': {
-                    'type': 'text'
+                    'type': 'keyword'
                 },
                 'lock_value': {
-                    'type': 'text'
+                    'type': 'keyword'
+                },
+                'unchanged': {
+                    'type': 'integer'
+                },
+                'next_capture': {
+                    'type': 'date',
+                    'format': 'epoch_second',
                 }
             }
         }
@@ -987,64 +2121,105 @@ class Mappings:
         'photo': {
             'properties': {
                 'url_id': {
-                    'type': 'text',
+                    'type': 'keyword',
                 },
                 'refresh_rate': {
-                    'type': 'text'
+                    'type': 'keyword'
                 },
                 'captured_at': {
-                    'type': 'text',
-                    'fielddata': True
+                    'type': 'keyword'
                 },
                 'filesize': {
                     'type': 'integer',
                 },
                 'filename': {
-                    'type': 'text',
-                    'analyzer': 'analyzer_filename',
+                    'type': 'keyword'
                 },
                 'directory': {
-                    'type': 'text',
-                    'analyzer': 'analyzer_directory',
-                    'fielddata': True
+                    'type': 'keyword'
                 },
                 'domain': {
-                    'type': 'text',
-                    'analyzer': 'analyzer_domain',
-                    'fielddata': True
+                    'type': 'keyword'
                 },
                 'timestamp': {
                     'type': 'date',
                     'format': 'epoch_second',
+                },
+                'format': {
+                    'type': 'keyword',
+                    'index': False
+                },
+                'blob': {
+                    'type': 'keyword'
+                },
+                'phash': {
+                    'type': 'keyword'
+                },
+                'change': {
+                    'type': 'float'
                 }
             }
         }
     }
 
+    # photo keys are only fetched by id, nothing has to be indexed
+    photo_keys = {
+        'photo': {
+            'dynamic': False,
+            'properties': {}
+        }
+    }
 
-class Settings:
-    """Settings for elasticsearch indices."""
-
-    photos = {
-        'index': {
-            'analysis': {
-                'analyzer': {
-                    'analyzer_domain': {
-                        'tokenizer': 'whitespace',
-                        'filter': 'lowercase'
-                    },
-                    'analyzer_directory': {
-                        'tokenizer': 'path_hierarchy'
-                    },
-                    'analyzer_filename': {
-                        'tokenizer': 'whitespace',
-                        'filter': 'lowercase'
-                    }
+    # files and dirs are keyed by name, which aren't valid field
+    # names, so they're only kept in the source
+    directories = {
+        'directory': {
+            'dynamic': False,
+            'properties': {
+                'files': {
+                    'type': 'object',
+                    'enabled': False
+                },
+                'dirs': {
+                    'type': 'object',
+                    'enabled': False
                 }
             }
         }
     }
 
+    @staticmethod
+    def of(name: str) -> dict:
+        """Get mappings of index.
+
+        Args:
+            name: name of index eg. photos
+
+        Returns:
+            Mappings of index
+            dict
+        """
+        mappings = getattr(Mappings, name)  # type: dict
+        return mappings
+
+
+class Scripts:
+    """Painless scripts for elasticsearch updates."""
+
+    SCHEDULE = '''
+        if (params.changed || ctx._source.unchanged == null) {
+            ctx._source.unchanged = params.changed ? 0 : 1;
+        } else {
+            ctx._source.unchanged += 1;
+        }
+        int backoff = Math.min(
+            (int) ctx._source.unchanged,
+            params.max_backoff
+        );
+        ctx._source.next_capture = params.now +
+            ((1L << backoff) - 1) * params.interval;
+    '''
+
 
 class EmptySearchResultException(Exception):
     """Empty search result."""
@@ -0,0 +1,245 @@
+"""Optimizer module."""
+
+from __future__ import annotations
+from saas.storage.datadir import MissingDependencyException, DataDirectory
+from concurrent.futures import ProcessPoolExecutor, Future
+from saas.photographer.photo import PhotoPath, Screenshot
+from saas.storage.thumbnails import Thumbnails
+from multiprocessing.shared_memory import SharedMemory
+import saas.utils.console as console
+from threading import Lock
+from typing import Any, Optional
+from PIL import Image
+import multiprocessing
+import io
+
+
+class Optimizer:
+    """Optimizer class.
+
+    Optimizes photos in a pool of worker processes, so that
+    photographers can hand off a screenshot and move on to the next
+    one. The png captured by the camera is handed to the workers in
+    shared memory, without being written to disk first. It is
+    decoded, quantized and encoded in memory, stored in data
+    directory as a content addressed blob and the photo is saved
+    in the index once it has.
+
+    Photos can be stored as png, webp or avif.
+    """
+
+    FORMATS = ['png', 'webp', 'avif']
+
+    # number of colors png files are quantized to
+    COLORS = 256
+
+    QUALITY = 82
+
+    # quantization method and dither of png files,
+    # Image.FASTOCTREE and Image.NONE
+    QUANTIZE_METHOD = 2
+
+    DITHER = 0  # type: Any
+
+    def __init__(
+        self,
+        processes: int=2,
+        image_format: str='png',
+        thumbnails: Optional[Thumbnails]=None
+    ):
+        """Create new optimizer.
+
+        Args:
+            processes: number of worker processes (default: {2})
+            image_format: format to store photos in (default: {'png'})
+            thumbnails: Optional thumbnails to make once photos
+                have been optimized
+
+        Raises:
+            MissingDependencyException: if Pillow was built without
+                support for image format
+        """
+        if not Optimizer.supports(image_format):
+            raise MissingDependencyException(
+                f'Pillow was built without support for {image_format}'
+            )
+        self.image_format = image_format
+        self.thumbnails = thumbnails
+        self.pending = 0
+        self.lock = Lock()
+
+        # forking a process with running threads is unsafe,
+        # workers are started from a fresh interpreter instead
+        self.executor = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+
+    @staticmethod
+    def supports(image_format: str) -> bool:
+        """Check if photos can be stored in image format.
+
+        Args:
+            image_format: png, webp or avif
+
+        Returns:
+            True if Pillow can encode image format, otherwise False
+            bool
+        """
+        if image_format not in Optimizer.FORMATS:
+            return False
+        if image_format == 'avif':
+            _register_avif_plugin()
+        Image.init()
+        return image_format.upper() in Image.SAVE
+
+    def submit(self, photo: Screenshot, index):
+        """Optimize photo in the background.
+
+        Args:
+            photo: screenshot with image held in memory to optimize
+            index: Index to save optimized photo in
+
+        Raises:
+            ValueError: if photo has no image held in memory
+        """
+        if photo.image is None:
+            raise ValueError('photo has no image to optimize')
+        size = len(photo.image)
+        buffer = SharedMemory(create=True, size=size)
+        memory = buffer.buf  # type: Any
+        memory[:size] = photo.image
+        # the image is read back from shared memory if optimization
+        # fails, no need to hold on to two copies of it
+        photo.image = None
+
+        with self.lock:
+            self.pending += 1
+        future = self.executor.submit(
+            _encode,
+            buffer.name,
+            size,
+            photo.path.datadir,
+            self.image_format
+        )
+        future.add_done_callback(
+            lambda future: self._done(future, photo, index, buffer, size)
+        )
+
+    def close(self):
+        """Wait for pending photos to be optimized and stop workers."""
+        if self.pending > 0:
+            console.p(f'waiting for {self.pending} photos to be optimized')
+        self.executor.shutdown(wait=True)
+
+    def _done(
+        self,
+        future: Future,
+        photo: Screenshot,
+        index,
+        buffer: SharedMemory,
+        size: int
+    ):
+        """Save optimized photo in index.
+
+        If the photo could not be optimized the png is saved as is.
+
+        Args:
+            future: future of optimization
+            photo: screenshot that was optimized
+            index: Index to save optimized photo in
+            buffer: shared memory the png was handed off in
+            size: size of png in bytes
+        """
+        with self.lock:
+            self.pending -= 1
+        try:
+            blob, filesize = future.result()
+        except Exception as e:
+            console.p(f'failed to optimize {photo.url.to_string()}: {e}')
+            memory = buffer.buf  # type: Any
+            photo.image = bytes(memory[:size])
+            photo.save_image()
+            index.save_photo(photo)
+            if self.thumbnails is not None:
+                self.thumbnails.submit(photo.path)
+            return
+        finally:
+            buffer.close()
+            buffer.unlink()
+
+        path = PhotoPath(
+            photo.path.datadir,
+            photo.path.uuid,
+            extension=self.image_format,
+            blob=blob
+        )
+        index.save_photo(Screenshot(
+            url=photo.url,
+            path=path,
+            refresh_rate=photo.refresh_rate,
+            index_filesize=filesize,
+            phash=photo.phash,
+            change=photo.change
+        ), replaces=photo)
+        photo.remove_loading_text()
+        if self.thumbnails is not None:
+            self.thumbnails.submit(path)
+        console.dca(f'optimized {photo.url.to_string()} to {filesize} bytes')
+
+
+def _encode(
+    name: str,
+    size: int,
+    datadir: DataDirectory,
+    image_format: str
+) -> tuple:
+    """Encode png in optimized format.
+
+    Runs in a worker process. The png is read from shared memory,
+    the optimized image is encoded in memory and then stored as a
+    blob in one atomic write, unless an identical blob is already
+    stored.
+
+    Args:
+        name: name of shared memory holding the png
+        size: size of png in bytes
+        datadir: Data directory to store optimized blob in
+        image_format: png, webp or avif
+
+    Returns:
+        sha256 of optimized blob and its size in bytes
+        tuple
+    """
+    if image_format == 'avif':
+        _register_avif_plugin()
+
+    buffer = SharedMemory(name=name)
+    memory = buffer.buf  # type: Any
+    try:
+        with memory[:size] as png:
+            image = Image.open(io.BytesIO(png)).convert('RGB')
+    finally:
+        buffer.close()
+
+    output = io.BytesIO()
+    if image_format == 'png':
+        quantized = image.quantize(
+            colors=Optimizer.COLORS,
+            method=Optimizer.QUANTIZE_METHOD,
+            dither=Optimizer.DITHER
+        )
+        quantized.save(output, 'PNG', optimize=True)
+    else:
+        image.save(output, image_format.upper(), quality=Optimizer.QUALITY)
+
+    data = output.getvalue()
+    return datadir.store_blob(data, image_format), len(data)
+
+
+def _register_avif_plugin():
+    """Register avif plugin for Pillow versions without avif support."""
+    try:
+        import pillow_avif  # noqa: F401
+    except ImportError:
+        pass
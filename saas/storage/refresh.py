@@ -14,6 +14,12 @@ class RefreshRate(metaclass=ABCMeta):
         """Get the human readable format of lock."""
         pass
 
+    @staticmethod
+    @abstractmethod
+    def interval():
+        """Get the number of seconds between refreshes."""
+        pass
+
     @abstractmethod
     def _lock_datetime_format(self):
         """Get the format of lock used to make lock."""
@@ -40,6 +46,11 @@ class Daily(RefreshRate):
         """Get the human readable format of lock."""
         return 'daily'
 
+    @staticmethod
+    def interval():
+        """Get the number of seconds between refreshes."""
+        return 86400
+
     def _lock_datetime_format(self):
         """Get the format of lock used to make lock."""
         return '%Y%m%d'
@@ -56,6 +67,11 @@ class Hourly(RefreshRate):
         """Get the human readable format of lock."""
         return 'hourly'
 
+    @staticmethod
+    def interval():
+        """Get the number of seconds between refreshes."""
+        return 3600
+
     def _lock_datetime_format(self):
         """Get the format of lock used to make lock."""
         return '%Y%m%d%H'
@@ -72,6 +88,11 @@ class EveryMinute(RefreshRate):
         """Get the human readable format of lock."""
         return 'minute'
 
+    @staticmethod
+    def interval():
+        """Get the number of seconds between refreshes."""
+        return 60
+
     def _lock_datetime_format(self):
         """Get the format of lock used to make lock."""
         return '%Y%m%d%H%M'
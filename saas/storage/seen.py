@@ -0,0 +1,250 @@
+"""Seen urls module."""
+
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Optional
+from threading import Lock
+import saas.utils.console as console
+import json
+import math
+import time
+import os
+
+
+class BloomFilter:
+    """Bloom filter class.
+
+    A probabilistic set of sha256 hex digests. A lookup that misses
+    is certain, a lookup that hits might be a false positive.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        """Create new bloom filter.
+
+        Args:
+            capacity: number of items the filter is sized for
+            error_rate: rate of false positives at capacity
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = int(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, digest: str) -> list:
+        """Get bit positions of digest.
+
+        The digest is already uniformly distributed, two slices of it
+        are combined to make the positions (double hashing).
+
+        Args:
+            digest: sha256 hex digest
+
+        Returns:
+            List of bit positions
+            list
+        """
+        first = int(digest[:16], 16)
+        second = int(digest[16:32], 16) | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, digest: str):
+        """Add digest to filter.
+
+        Args:
+            digest: sha256 hex digest
+        """
+        for position in self._positions(digest):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, digest: str) -> bool:
+        """Check if digest might have been added.
+
+        Args:
+            digest: sha256 hex digest
+
+        Returns:
+            False if digest was never added, True if it might have been
+            bool
+        """
+        for position in self._positions(digest):
+            if not self.bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class SeenUrls:
+    """Seen urls class.
+
+    Process-local cache of which urls have been crawled, keyed on
+    Url.hash(). A bloom filter answers lookups of urls that have
+    not been crawled and a bounded set of confirmed hashes answers
+    recently seen urls. Only lookups the cache is uncertain about
+    need to be checked against the index.
+
+    Urls crawled by other processes are pulled from the index
+    periodically. The filter is snapshotted to disk so it is warm
+    after a restart.
+    """
+
+    CAPACITY = 10000000
+
+    ERROR_RATE = 0.01
+
+    CONFIRMED_SIZE = 100000
+
+    SYNC_INTERVAL = 10
+
+    # urls are not searchable in the index right away, resync
+    # a few seconds before the last sync to not miss any
+    SYNC_OVERLAP = 5
+
+    SNAPSHOT_INTERVAL = 300
+
+    def __init__(self, path: Optional[str]=None):
+        """Create new seen urls cache.
+
+        Args:
+            path: where to snapshot cache to, cache is loaded from
+                path if a snapshot exists (default: {None})
+        """
+        self.path = path
+        self.filter = BloomFilter(SeenUrls.CAPACITY, SeenUrls.ERROR_RATE)
+        self.confirmed = OrderedDict()  # type: OrderedDict
+        self.synced_at = 0
+        self.last_sync = 0.0
+        self.last_snapshot = time.time()
+        self.warm = False
+        self.lock = Lock()
+        self.sync_lock = Lock()
+        if self.path is not None and os.path.isfile(self.path):
+            self._load()
+
+    def add(self, digests: list):
+        """Add hashes of urls known to be crawled.
+
+        Args:
+            digests: list of url hashes
+        """
+        with self.lock:
+            for digest in digests:
+                self.filter.add(digest)
+                self._confirm(digest)
+
+    def partition(self, digests: list) -> tuple:
+        """Partition hashes by what the cache knows about them.
+
+        Args:
+            digests: list of url hashes
+
+        Returns:
+            Hashes certainly not crawled, hashes certainly crawled and
+            hashes that might have been crawled
+            tuple
+        """
+        unseen = []
+        seen = []
+        uncertain = []
+        with self.lock:
+            for digest in digests:
+                if not self.warm:
+                    uncertain.append(digest)
+                elif digest in self.confirmed:
+                    self.confirmed.move_to_end(digest)
+                    seen.append(digest)
+                elif digest in self.filter:
+                    uncertain.append(digest)
+                else:
+                    unseen.append(digest)
+        return unseen, seen, uncertain
+
+    def sync(self, index):
+        """Pull urls crawled by other processes from index.
+
+        Only runs if SYNC_INTERVAL has passed since last sync, and
+        only in one thread at a time.
+
+        Args:
+            index: Index crawled urls are stored in
+        """
+        if time.time() - self.last_sync < SeenUrls.SYNC_INTERVAL:
+            return
+        if not self.sync_lock.acquire(blocking=False):
+            return
+        try:
+            started = int(time.time())
+            since = max(0, self.synced_at - SeenUrls.SYNC_OVERLAP)
+            if not self.warm:
+                console.dcr('warming seen urls cache')
+            digests = []
+            for digest in index.crawled_url_ids_since(since):
+                digests.append(digest)
+                if len(digests) >= 10000:
+                    self._add_unconfirmed(digests)
+                    digests = []
+            self._add_unconfirmed(digests)
+            self.synced_at = started
+            self.last_sync = time.time()
+            self.warm = True
+        finally:
+            self.sync_lock.release()
+
+        if time.time() - self.last_snapshot > SeenUrls.SNAPSHOT_INTERVAL:
+            self.snapshot()
+
+    def snapshot(self):
+        """Write cache to disk."""
+        if self.path is None or not self.warm:
+            return
+        with self.lock:
+            header = json.dumps({
+                'capacity': self.filter.capacity,
+                'error_rate': self.filter.error_rate,
+                'count': self.filter.count,
+                'synced_at': self.synced_at,
+            })
+            tmp = f'{self.path}.{os.getpid()}.tmp'
+            with open(tmp, 'wb') as file:
+                file.write(header.encode() + b'\n')
+                file.write(self.filter.bits)
+            os.replace(tmp, self.path)
+            self.last_snapshot = time.time()
+
+    def _load(self):
+        """Load cache from snapshot."""
+        with open(self.path, 'rb') as file:
+            header = json.loads(file.readline())
+            bits = file.read()
+        if header['capacity'] != self.filter.capacity:
+            return
+        if header['error_rate'] != self.filter.error_rate:
+            return
+        if len(bits) != len(self.filter.bits):
+            return
+        self.filter.bits = bytearray(bits)
+        self.filter.count = header['count']
+        self.synced_at = header['synced_at']
+        self.warm = True
+
+    def _add_unconfirmed(self, digests: list):
+        """Add hashes to filter without confirming them.
+
+        Args:
+            digests: list of url hashes
+        """
+        with self.lock:
+            for digest in digests:
+                self.filter.add(digest)
+
+    def _confirm(self, digest: str):
+        """Add hash to bounded set of confirmed hashes.
+
+        Args:
+            digest: url hash
+        """
+        self.confirmed[digest] = True
+        self.confirmed.move_to_end(digest)
+        if len(self.confirmed) > SeenUrls.CONFIRMED_SIZE:
+            self.confirmed.popitem(last=False)
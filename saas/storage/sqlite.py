@@ -0,0 +1,999 @@
+"""Sqlite index module."""
+
+from __future__ import annotations
+from saas.storage.index import IndexBackend, PhotoNotFoundException
+from saas.storage.index import EmptySearchResultException
+from typing import Type, Optional, Generator, Iterator
+from saas.storage.datadir import DataDirectory
+from saas.storage.refresh import RefreshRate
+from saas.photographer.photo import Photo
+from datetime import datetime, timedelta
+from saas.storage.changes import Changes
+from saas.storage.seen import SeenUrls
+from contextlib import contextmanager
+import saas.utils.console as console
+import saas.mount.file as file
+from saas.web.url import Url
+from threading import Lock, local
+import sqlite3
+import random
+import time
+
+
+class SqliteIndex(IndexBackend):
+    """Sqlite index.
+
+    Index backend embedded in the saas process, urls and photo
+    metadata are stored in a single sqlite database, no external
+    service is needed. The database is opened in write-ahead logging
+    mode so that readers never block the writer. Every process opens
+    its own connection for writes, writes that have to be atomic
+    are made in a transaction holding the database's write lock.
+    Reads are made on a connection of the reading thread, so the
+    threads serving the filesystem don't wait for each other.
+    """
+
+    SCHEME = 'sqlite://'
+
+    # number of seconds to wait for another connection to release
+    # the write lock
+    TIMEOUT = 30.0
+
+    # max number of variables bound to a single statement
+    MAX_VARIABLES = 500
+
+    # number of rows fetched per query when listing
+    PAGE_SIZE = 1000
+
+    def __init__(
+        self,
+        path: str,
+        datadir: Optional[DataDirectory]=None,
+        seen_urls: Optional[SeenUrls]=None,
+        changes: Optional[Changes]=None
+    ):
+        """Create new sqlite index.
+
+        The database and its tables are created if they do not exist.
+
+        Args:
+            path: path to sqlite database
+            datadir: Data directory (default: {None})
+            seen_urls: cache of crawled urls, checked before
+                the database is queried (default: {None})
+            changes: where saved and removed photos are published
+                (default: {None})
+        """
+        self.path = path
+        self.datadir = datadir
+        self.seen_urls = seen_urls
+        self.changes = changes
+        self.lock = Lock()
+        self.readers = local()
+
+        # transactions are started explicitly, the connection is
+        # shared by the threads of an async crawler
+        self.db = sqlite3.connect(
+            path,
+            timeout=SqliteIndex.TIMEOUT,
+            isolation_level=None,
+            check_same_thread=False
+        )
+        self.db.row_factory = sqlite3.Row
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self._create_tables()
+
+    def ping(self) -> bool:
+        """Ping database.
+
+        Returns:
+            True if database could be queried, otherwise False
+            bool
+        """
+        try:
+            self._query('SELECT 1')
+            return True
+        except sqlite3.Error:
+            return False
+
+    def verify(self) -> bool:
+        """Verify database has all tables.
+
+        Returns:
+            True if configured correctly, otherwise False
+            bool
+        """
+        rows = self._query(
+            'SELECT name FROM sqlite_master WHERE type = \'table\''
+        )
+        tables = set(row['name'] for row in rows)
+        for table in Schema.TABLES:
+            if table not in tables:
+                return False
+        return True
+
+    def clear(self):
+        """Clear all documents."""
+        console.p('clearing all tables')
+        with self._transaction() as db:
+            for table in Schema.TABLES:
+                db.execute(f'DELETE FROM {table}')
+        console.p('tables cleared')
+
+    def create_indices(self):
+        """Create tables and their indices."""
+        console.p('creating tables')
+        self._create_tables()
+        console.p('done.')
+
+    def _create_tables(self):
+        """Create tables and their indices if they do not exist."""
+        with self.lock:
+            self.db.executescript(Schema.CREATE)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run statements in a write transaction.
+
+        The write lock is taken when the transaction begins, so
+        rows read in it can't be changed by another connection
+        before it is committed.
+
+        Yields:
+            Connection to run statements with
+            sqlite3.Connection
+        """
+        with self.lock:
+            self.db.execute('BEGIN IMMEDIATE')
+            try:
+                yield self.db
+            except BaseException:
+                self.db.execute('ROLLBACK')
+                raise
+            self.db.execute('COMMIT')
+
+    def _query(self, sql: str, params: tuple=()) -> list:
+        """Run query.
+
+        Args:
+            sql: sql statement
+            params: values of the statement's placeholders
+
+        Returns:
+            List of rows
+            list
+        """
+        return self._reader().execute(sql, params).fetchall()
+
+    def _reader(self) -> sqlite3.Connection:
+        """Get read connection of current thread.
+
+        Returns:
+            Connection opened by and only used by current thread
+            sqlite3.Connection
+        """
+        reader = getattr(self.readers, 'db', None)
+        if reader is None:
+            reader = sqlite3.connect(
+                self.path,
+                timeout=SqliteIndex.TIMEOUT,
+                isolation_level=None
+            )
+            reader.row_factory = sqlite3.Row
+            self.readers.db = reader
+        return reader
+
+    def _pages(self, sql: str, params: tuple, key: str) -> Generator:
+        """Run query a page at a time.
+
+        Pages are found by the last key of the previous page, the
+        lock isn't held between pages so writes aren't blocked by
+        long listings.
+
+        Args:
+            sql: select statement ending in its where clause
+            params: values of the statement's placeholders
+            key: unique column rows are ordered by
+
+        Yields:
+            Row
+            sqlite3.Row
+        """
+        last = ''
+        while True:
+            rows = self._query(
+                f'{sql} AND {key} > ? ORDER BY {key} LIMIT ?',
+                params + (last, SqliteIndex.PAGE_SIZE)
+            )
+            yield from rows
+            if len(rows) < SqliteIndex.PAGE_SIZE:
+                return
+            last = rows[-1][key]
+
+    def calculate_throughput(self, timeframe: int) -> int:
+        """Calculate throughput.
+
+        Number of photos stored in index during timeframe
+
+        Args:
+            timeframe: timeframe in minutes
+
+        Returns:
+            number of photos stored in index during timeframe
+            int
+        """
+        now = datetime.now()
+        start = int((now - timedelta(minutes=timeframe)).timestamp())
+        end = now.timestamp()
+
+        rows = self._query(
+            'SELECT COUNT(*) FROM photos WHERE timestamp BETWEEN ? AND ?',
+            (start, end)
+        )
+        throughput = rows[0][0]  # type: int
+        return throughput
+
+    def timestamp_of_most_recent_document(self, index: str) -> int:
+        """Get timestamp of most recent document in given index.
+
+        Args:
+            index: the index the most recent document should be in
+
+        Returns:
+            Timestamp of most recent document in given index
+            int
+
+        Raises:
+            ValueError: if there is no such index
+            EmptySearchResultException: if index is empty
+        """
+        if index not in Schema.TABLES:
+            raise ValueError(f'no index named {index}')
+
+        rows = self._query(f'SELECT MAX(timestamp) FROM {index}')
+        if rows[0][0] is None:
+            raise EmptySearchResultException('index is empty')
+
+        timestamp = rows[0][0]  # type: int
+        return timestamp
+
+    def _add_urls(self, urls: list, index: str):
+        """Add urls to given index.
+
+        Urls already in the index are replaced.
+
+        Args:
+            urls: list of Urls
+            index: index to add urls to
+        """
+        if len(urls) == 0:
+            return
+
+        now = int(time.time())
+        if index == SqliteIndex.CRAWLED:
+            sql = 'INSERT OR REPLACE INTO crawled (id, url, timestamp) ' \
+                'VALUES (?, ?, ?)'
+            rows = [
+                (url.hash(), url.to_string(), now) for url in urls
+            ]  # type: list
+        else:
+            sql = 'INSERT OR REPLACE INTO uncrawled ' \
+                '(id, url, domain, timestamp) VALUES (?, ?, ?, ?)'
+            rows = [
+                (url.hash(), url.to_string(), url.domain, now)
+                for url in urls
+            ]
+
+        with self._transaction() as db:
+            db.executemany(sql, rows)
+
+    def _crawled_url_ids(self, hashes: list) -> set:
+        """Get which of the given url hashes have been crawled.
+
+        Args:
+            hashes: list of url hashes
+
+        Returns:
+            The hashes found in the crawled index
+            set
+        """
+        crawled = set()
+        for i in range(0, len(hashes), SqliteIndex.MAX_VARIABLES):
+            chunk = hashes[i:i + SqliteIndex.MAX_VARIABLES]
+            placeholders = ', '.join('?' * len(chunk))
+            rows = self._query(
+                f'SELECT id FROM crawled WHERE id IN ({placeholders})',
+                tuple(chunk)
+            )
+            for row in rows:
+                crawled.add(row['id'])
+        return crawled
+
+    def crawled_url_ids_since(self, timestamp: int) -> Generator:
+        """Get hashes of urls crawled since timestamp.
+
+        Args:
+            timestamp: unix timestamp
+
+        Yields:
+            Hash of a crawled url
+            str
+        """
+        rows = self._query(
+            'SELECT id FROM crawled WHERE timestamp >= ?',
+            (timestamp,)
+        )
+        for row in rows:
+            yield row['id']
+
+    def checkout_uncrawled_urls(self, amount: int) -> list:
+        """Checkout a random batch of uncrawled urls.
+
+        The urls are removed from the uncrawled index in the same
+        transaction they are selected in, a url is never checked
+        out twice.
+
+        Args:
+            amount: max number of urls to checkout
+
+        Returns:
+            A list of uncrawled urls, empty if index is empty
+            list
+        """
+        with self._transaction() as db:
+            last = db.execute('SELECT MAX(rowid) FROM uncrawled').fetchone()
+            if last[0] is None:
+                return []
+
+            # urls are read from a random position, wrapping around to
+            # the start, instead of shuffling the whole table
+            start = random.randint(0, last[0])
+            rows = db.execute(
+                'SELECT rowid, url FROM uncrawled WHERE rowid >= ? '
+                'ORDER BY rowid LIMIT ?',
+                (start, amount)
+            ).fetchall()
+            if len(rows) < amount:
+                rows += db.execute(
+                    'SELECT rowid, url FROM uncrawled WHERE rowid < ? '
+                    'ORDER BY rowid LIMIT ?',
+                    (start, amount - len(rows))
+                ).fetchall()
+
+            db.executemany(
+                'DELETE FROM uncrawled WHERE rowid = ?',
+                [(row['rowid'],) for row in rows]
+            )
+
+        return [Url.from_string(row['url']) for row in rows]
+
+    def recently_crawled_url(self, refresh_rate=RefreshRate) -> Url:
+        """Get recently crawled url.
+
+        Picks from the last 5 crawled to prevent two running
+        photograpers to fetch the same one.
+
+        Args:
+            refresh_rate: the refresh reate to search for and
+                use to avoid locked urls
+
+        Returns:
+            A url that has been crawled with status code 200
+            Url
+
+        Raises:
+            EmptySearchResultException: if no url was found
+        """
+        where, params = self._checkout_query(refresh_rate)
+        rows = self._query(
+            f'SELECT url FROM crawled WHERE {where} '
+            'ORDER BY timestamp DESC LIMIT 5',
+            params
+        )
+
+        if len(rows) == 0:
+            raise EmptySearchResultException('no crawled url was found')
+
+        return Url.from_string(random.choice(rows)['url'])
+
+    def _checkout_query(self, refresh_rate: Type[RefreshRate]) -> tuple:
+        """Make condition for crawled urls that can be checked out.
+
+        Urls must have been crawled successfully, not be locked for
+        refresh rate and not be scheduled for a later capture.
+
+        Args:
+            refresh_rate: the refresh reate to search for and
+                use to avoid locked urls
+
+        Returns:
+            Where clause and its parameters
+            tuple
+        """
+        where = 'status_code = 200 AND lock_value != ? ' \
+            'AND (next_capture IS NULL OR next_capture <= ?)'
+        return where, (refresh_rate().lock(), int(time.time()))
+
+    def crawled_urls_count(self, refresh_rate=RefreshRate) -> int:
+        """Crawled url count.
+
+        Args:
+            refresh_rate: the refresh reate to search for and
+                use to avoid locked urls
+
+        Returns:
+            number of crawled urls with status code 200
+            int
+        """
+        where, params = self._checkout_query(refresh_rate)
+        rows = self._query(
+            f'SELECT COUNT(*) FROM crawled WHERE {where}',
+            params
+        )
+        count = rows[0][0]  # type: int
+        return count
+
+    def remove_uncrawled_url(self, id: str):
+        """Remove url from uncrawled index.
+
+        Args:
+            id: Id of url to delete
+        """
+        with self._transaction() as db:
+            db.execute('DELETE FROM uncrawled WHERE id = ?', (id,))
+
+    def set_status_code_for_crawled_url(self, url: Url, status_code: int):
+        """Set status code for a crawled url.
+
+        Args:
+            url: Url to set status code of
+            status_code: the status code of the http request to the url
+        """
+        with self._transaction() as db:
+            db.execute(
+                'UPDATE crawled SET status_code = ? WHERE id = ?',
+                (status_code, url.hash())
+            )
+
+    def lock_crawled_url(self, url: Url, refresh_rate: Type[RefreshRate]):
+        """Lock a crawld url.
+
+        Place a lock on a crawled url for a given refresh rate.
+
+        Args:
+            url: Url to lock
+            refresh_rate: Refresh rate to use (Hourly, Daily, etc.)
+        """
+        with self._transaction() as db:
+            db.execute(
+                'UPDATE crawled SET lock_format = ?, lock_value = ? '
+                'WHERE id = ?',
+                (refresh_rate.lock_format(), refresh_rate().lock(), url.hash())
+            )
+
+    def schedule_crawled_url(
+        self,
+        url: Url,
+        refresh_rate: Type[RefreshRate],
+        changed: bool,
+        max_backoff: int
+    ):
+        """Schedule next capture of crawled url.
+
+        Urls that are captured without changing are captured less
+        often, every unchanged capture in a row doubles the number
+        of refreshes until the url is checked out again. A changed
+        capture resets the url to be captured every refresh.
+
+        Args:
+            url: Url that was captured
+            refresh_rate: Refresh rate url was captured with
+            changed: if the capture changed since the previous capture
+            max_backoff: max number of times the interval is doubled
+        """
+        with self._transaction() as db:
+            row = db.execute(
+                'SELECT unchanged FROM crawled WHERE id = ?',
+                (url.hash(),)
+            ).fetchone()
+            if row is None:
+                return
+
+            unchanged = 0 if changed else (row['unchanged'] or 0) + 1
+            backoff = min(unchanged, max_backoff)
+            next_capture = int(time.time()) + \
+                ((1 << backoff) - 1) * refresh_rate.interval()
+            db.execute(
+                'UPDATE crawled SET unchanged = ?, next_capture = ? '
+                'WHERE id = ?',
+                (unchanged, next_capture, url.hash())
+            )
+
+    def save_photo(self, photo: Photo, replaces: Optional[Photo]=None):
+        """Save photo in index.
+
+        Will not store the actual photo data, this should be stored
+        in the data directory. A photo is replaced by its id, so
+        the filename it was saved with before is dropped.
+
+        Args:
+            photo: Photo to store
+            replaces: Photo saved before with the same id
+                (default: {None})
+        """
+        row = (
+            photo.path.uuid,
+            photo.url.hash(),
+            photo.refresh_rate.lock_format(),
+            photo.refresh_rate().lock(),
+            photo.filesize(),
+            photo.filename(),
+            photo.directory(),
+            photo.domain(),
+            int(time.time()),
+            photo.path.extension,
+            photo.path.blob,
+            photo.phash,
+            photo.change,
+        )
+        with self._transaction() as db:
+            db.execute(
+                'INSERT OR REPLACE INTO photos (id, url_id, refresh_rate, '
+                'captured_at, filesize, filename, directory, domain, '
+                'timestamp, format, blob, phash, change) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                row
+            )
+        self.publish_change(photo)
+
+    def remove_photo(self, photo: Photo):
+        """Remove photo from index.
+
+        Args:
+            photo: Photo to remove
+        """
+        with self._transaction() as db:
+            db.execute('DELETE FROM photos WHERE id = ?', (photo.path.uuid,))
+        self.publish_change(photo, removed=True)
+
+    def photos_previous_capture(
+        self,
+        url: Url,
+        refresh_rate: Type[RefreshRate]
+    ) -> Photo:
+        """Get most recent capture of url.
+
+        Photos that were still loading are not considered.
+
+        Args:
+            url: Url to get capture of
+            refresh_rate: Given refresh rate photo was taken with
+
+        Returns:
+            The most recent photo of url
+            Photo
+
+        Raises:
+            EmptySearchResultException: if url has not been captured
+        """
+        rows = self._query(
+            'SELECT * FROM photos WHERE url_id = ? AND refresh_rate = ? '
+            'AND phash != \'\' ORDER BY timestamp DESC LIMIT 1',
+            (url.hash(), refresh_rate.lock_format())
+        )
+
+        if len(rows) == 0:
+            raise EmptySearchResultException(
+                f'no capture of {url.to_string()} was found'
+            )
+
+        return self._photo(rows[0]['id'], dict(rows[0]), refresh_rate)
+
+    def photos_unique_domains(
+        self,
+        refresh_rate: Type[RefreshRate]
+    ) -> Generator:
+        """Get unique domains that pictures have been taken of.
+
+        Args:
+            refresh_rate: Given refresh rate photo was taken with
+
+        Yields:
+            Domain, in alphabetical order
+            str
+        """
+        rows = self._pages(
+            'SELECT DISTINCT domain FROM photos WHERE refresh_rate = ?',
+            (refresh_rate.lock_format(),),
+            'domain'
+        )
+        for row in rows:
+            yield row['domain']
+
+    def photos_unique_captures_of_domain(
+        self,
+        domain: str,
+        refresh_rate: Type[RefreshRate]
+    ) -> Generator:
+        """Get unique captures for a domain.
+
+        Args:
+            domain: The given domain to check
+            refresh_rate: Given refresh rate photo was taken with
+
+        Yields:
+            Capture, oldest first
+            str
+        """
+        rows = self._pages(
+            'SELECT DISTINCT captured_at FROM photos '
+            'WHERE refresh_rate = ? AND domain = ?',
+            (refresh_rate.lock_format(), domain),
+            'captured_at'
+        )
+        for row in rows:
+            yield row['captured_at']
+
+    def photos_domain_exists(
+        self,
+        domain: str,
+        refresh_rate: Type[RefreshRate]
+    ) -> bool:
+        """Check if any photo of domain is stored.
+
+        Args:
+            domain: domain to check
+            refresh_rate: Given refresh rate photo was taken with
+
+        Returns:
+            True if domain was found, else False
+            bool
+        """
+        rows = self._query(
+            'SELECT 1 FROM photos WHERE refresh_rate = ? AND domain = ? '
+            'LIMIT 1',
+            (refresh_rate.lock_format(), domain)
+        )
+        return len(rows) > 0
+
+    def photos_capture_exists(
+        self,
+        domain: str,
+        captured_at: str,
+        refresh_rate: Type[RefreshRate]
+    ) -> bool:
+        """Check if any photo of domain was captured at given time.
+
+        Args:
+            domain: domain to check
+            captured_at: capture to check
+            refresh_rate: Given refresh rate photo was taken with
+
+        Returns:
+            True if capture was found, else False
+            bool
+        """
+        rows = self._query(
+            'SELECT 1 FROM photos WHERE refresh_rate = ? AND domain = ? '
+            'AND captured_at = ? LIMIT 1',
+            (refresh_rate.lock_format(), domain, captured_at)
+        )
+        return len(rows) > 0
+
+    def photos_since(
+        self,
+        timestamp: int,
+        refresh_rate: Type[RefreshRate],
+        domain: Optional[str]=None,
+        captured_at: Optional[str]=None
+    ) -> Generator:
+        """Get photos saved since timestamp.
+
+        Args:
+            timestamp: unix timestamp
+            refresh_rate: Given refresh rate photos were taken with
+            domain: only get photos of domain (default: {None})
+            captured_at: only get photos of capture (default: {None})
+
+        Yields:
+            Id and fields of photo row
+            str, dict
+        """
+        sql = 'SELECT * FROM photos WHERE refresh_rate = ? AND timestamp >= ?'
+        params = (refresh_rate.lock_format(), timestamp)  # type: tuple
+        if domain is not None:
+            sql += ' AND domain = ?'
+            params += (domain,)
+        if captured_at is not None:
+            sql += ' AND captured_at = ?'
+            params += (captured_at,)
+        for row in self._pages(sql, params, 'id'):
+            yield row['id'], dict(row)
+
+    def photos_most_recent_capture_of_domain(
+        self,
+        domain: str,
+        refresh_rate: Type[RefreshRate]
+    ) -> str:
+        """Get most recently captured_at value of domain.
+
+        Args:
+            domain: domain to check
+            refresh_rate: Given refresh rate photo was taken with
+
+        Returns:
+            The most recent capture_at value in photos index
+            str
+
+        Raises:
+            EmptySearchResultException: if no capture_at value was found
+        """
+        rows = self._query(
+            'SELECT captured_at FROM photos '
+            'WHERE refresh_rate = ? AND domain = ? '
+            'ORDER BY timestamp DESC LIMIT 1',
+            (refresh_rate.lock_format(), domain)
+        )
+
+        if len(rows) == 0:
+            raise EmptySearchResultException(
+                f'no capture for given refresh rate and {domain} was found'
+            )
+
+        captured_at = rows[0]['captured_at']  # type: str
+        return captured_at
+
+    def photos_get_photo(
+        self,
+        domain: str,
+        captured_at: str,
+        full_filename: str,
+        refresh_rate: Type[RefreshRate]
+    ) -> Photo:
+        """Get photo from photos index.
+
+        Args:
+            domain: domain photo belongs to
+            captured_at: when photo was captured
+            full_filename: full filename of photo
+                eg. /some/path/some-filename.png
+            refresh_rate: Given refresh rate photo was taken with
+
+        Returns:
+            Requested photo metadata
+            Photo
+
+        Raises:
+            PhotoNotFoundException: If photo was not found
+        """
+        directory, filename = self._split_filename(full_filename)
+
+        captured_at = file.LastCapture.translate(
+            captured_at,
+            domain,
+            self,
+            refresh_rate
+        )
+
+        rows = self._query(
+            'SELECT * FROM photos WHERE refresh_rate = ? AND domain = ? '
+            'AND captured_at = ? AND directory = ? AND filename = ? '
+            'LIMIT 1',
+            (
+                refresh_rate.lock_format(),
+                domain,
+                captured_at,
+                directory,
+                filename
+            )
+        )
+
+        if len(rows) == 0:
+            raise PhotoNotFoundException('no photo was found')
+
+        return self._photo(rows[0]['id'], dict(rows[0]), refresh_rate)
+
+    def photos_directory_exists(
+        self,
+        domain: str,
+        captured_at: str,
+        directory: str,
+        refresh_rate: Type[RefreshRate]
+    ) -> bool:
+        """Check if directory exists in photos index.
+
+        Args:
+            domain: domain photo belongs to
+            captured_at: when photo was captured
+            directory: directory path eg. /some/path/to/dir/
+            refresh_rate: Given refresh rate photo was taken with
+
+        Returns:
+            True if photo was found, else False
+            bool
+        """
+        captured_at = file.LastCapture.translate(
+            captured_at,
+            domain,
+            self,
+            refresh_rate
+        )
+        rows = self._query(
+            'SELECT 1 FROM photos WHERE refresh_rate = ? AND domain = ? '
+            'AND captured_at = ? AND directory >= ? AND directory < ? '
+            'LIMIT 1',
+            (
+                refresh_rate.lock_format(),
+                domain,
+                captured_at,
+                *_prefix_range(directory)
+            )
+        )
+        return len(rows) > 0
+
+    def photos_list_files_in_directory(
+        self,
+        domain: str,
+        captured_at: str,
+        directory: str,
+        refresh_rate: Type[RefreshRate]
+    ) -> Generator:
+        """List photos in a directory.
+
+        Args:
+            domain: domain photos should belong to
+            captured_at: when photos should have been captured
+            directory: directory files should be located in
+            refresh_rate: Given refresh rate photo was taken with
+
+        Yields:
+            Filename
+            str
+        """
+        captured_at = file.LastCapture.translate(
+            captured_at,
+            domain,
+            self,
+            refresh_rate
+        )
+        rows = self._pages(
+            'SELECT filename, filesize FROM photos '
+            'WHERE refresh_rate = ? AND domain = ? AND captured_at = ? '
+            'AND directory = ?',
+            (refresh_rate.lock_format(), domain, captured_at, directory),
+            'filename'
+        )
+        for row in rows:
+            if row['filesize'] < 100:
+                yield row['filename'] + file.Path.RENDERING_EXTENSION
+            else:
+                yield row['filename']
+
+    def photos_list_directories_in_directory(
+        self,
+        domain: str,
+        captured_at: str,
+        directory: str,
+        refresh_rate: Type[RefreshRate]
+    ) -> Generator:
+        """List directories in a directory.
+
+        Args:
+            domain: domain directory should belong to
+            captured_at: when directory should have been captured
+            directory: directory should be located in
+            refresh_rate: given refresh rate photo was taken with
+
+        Yields:
+            Name of directory
+            str
+        """
+        captured_at = file.LastCapture.translate(
+            captured_at,
+            domain,
+            self,
+            refresh_rate
+        )
+        rows = self._pages(
+            'SELECT DISTINCT directory FROM photos '
+            'WHERE refresh_rate = ? AND domain = ? AND captured_at = ? '
+            'AND directory >= ? AND directory < ?',
+            (
+                refresh_rate.lock_format(),
+                domain,
+                captured_at,
+                *_prefix_range(directory)
+            ),
+            'directory'
+        )
+        # directories are sorted, so the paths below a child
+        # directory follow each other and only the last is kept
+        previous = ''
+        for row in rows:
+            # trim the parent directories from the path,
+            # and strip it's child directories
+            path = row['directory'][len(directory):]
+            path = path.split('/')[0]
+            if path != previous and path != '':
+                yield path
+            previous = path
+
+
+def _prefix_range(prefix: str) -> tuple:
+    """Make range of strings starting with prefix.
+
+    Unlike LIKE, a range can be looked up in an index.
+
+    Args:
+        prefix: prefix of strings
+
+    Returns:
+        Lowest and upper bound (exclusive) of strings with prefix
+        tuple
+    """
+    return prefix, prefix + chr(0x10ffff)
+
+
+class Schema:
+    """Schema of sqlite database."""
+
+    TABLES = [
+        IndexBackend.UNCRAWLED,
+        IndexBackend.CRAWLED,
+        IndexBackend.PHOTOS,
+    ]
+
+    CREATE = '''
+        CREATE TABLE IF NOT EXISTS uncrawled (
+            id TEXT PRIMARY KEY,
+            url TEXT NOT NULL,
+            domain TEXT NOT NULL,
+            timestamp INTEGER NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS crawled (
+            id TEXT PRIMARY KEY,
+            url TEXT NOT NULL,
+            timestamp INTEGER NOT NULL,
+            status_code INTEGER,
+            lock_format TEXT NOT NULL DEFAULT '',
+            lock_value TEXT NOT NULL DEFAULT '',
+            unchanged INTEGER,
+            next_capture INTEGER
+        );
+
+        CREATE INDEX IF NOT EXISTS crawled_timestamp
+            ON crawled (timestamp);
+
+        CREATE INDEX IF NOT EXISTS crawled_checkout
+            ON crawled (status_code, timestamp);
+
+        CREATE TABLE IF NOT EXISTS photos (
+            id TEXT PRIMARY KEY,
+            url_id TEXT NOT NULL,
+            refresh_rate TEXT NOT NULL,
+            captured_at TEXT NOT NULL,
+            filesize INTEGER NOT NULL,
+            filename TEXT NOT NULL,
+            directory TEXT NOT NULL,
+            domain TEXT NOT NULL,
+            timestamp INTEGER NOT NULL,
+            format TEXT NOT NULL,
+            blob TEXT NOT NULL DEFAULT '',
+            phash TEXT NOT NULL DEFAULT '',
+            change REAL
+        );
+
+        CREATE INDEX IF NOT EXISTS photos_path
+            ON photos (refresh_rate, domain, captured_at, directory, filename);
+
+        CREATE INDEX IF NOT EXISTS photos_recent
+            ON photos (refresh_rate, domain, timestamp);
+
+        CREATE INDEX IF NOT EXISTS photos_url
+            ON photos (url_id, refresh_rate, timestamp);
+
+        CREATE INDEX IF NOT EXISTS photos_timestamp
+            ON photos (timestamp);
+    '''
@@ -0,0 +1,298 @@
+"""Thumbnails module."""
+
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor, Future
+from saas.storage.datadir import DataDirectory
+from saas.photographer.photo import PhotoPath
+from saas.utils.files import write_file
+import saas.utils.console as console
+from collections import OrderedDict
+from threading import Thread, Lock
+from typing import Any, Optional
+from PIL import Image
+import multiprocessing
+import re
+import io
+import os
+
+
+# Image.LANCZOS
+RESAMPLE = 1  # type: Any
+
+
+class Thumbnails:
+    """Thumbnails class.
+
+    Makes thumbnails of photos in a pool of worker processes.
+    Thumbnails are stored beside the photo's file in the data
+    directory, a thumbnail of a blob is shared by every photo stored
+    in it. They are made when a photo is captured or when the
+    thumbnail is first accessed.
+
+    Thumbnails are a cache, the least recently used thumbnails are
+    removed once they take up more than the cache budget. Every
+    process keeps its own account of the thumbnails it knows about,
+    a thumbnail removed by another process is simply made again.
+    Thumbnails already in the data directory are accounted for by
+    scanning it in a thread once thumbnails are first used.
+    """
+
+    PROCESSES = 2
+
+    CACHE_SIZE = 1 << 30
+
+    # thumbnails are named <filename>.<width>w.<extension>
+    FILENAME = re.compile(r'^(.+)\.(\d+)w\.(\w+)$')
+
+    def __init__(
+        self,
+        datadir: DataDirectory,
+        sizes: list,
+        cache_size: int=CACHE_SIZE,
+        processes: int=PROCESSES
+    ):
+        """Create new thumbnails.
+
+        Args:
+            datadir: Data directory photos are stored in
+            sizes: widths of thumbnails in pixels
+            cache_size: max number of bytes thumbnails can take up
+                (default: {1 GiB})
+            processes: number of worker processes (default: {2})
+        """
+        self.datadir = datadir
+        self.sizes = sorted(sizes)
+        self.cache_size = cache_size
+        self.used = OrderedDict()  # type: OrderedDict
+        self.total = 0
+        self.pending = {}  # type: dict
+        self.lock = Lock()
+        self.scanner = None  # type: Optional[Thread]
+
+        # forking a process with running threads is unsafe,
+        # workers are started from a fresh interpreter instead
+        self.executor = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+
+    def filename(self, filename: str, width: int) -> str:
+        """Get filename of thumbnail.
+
+        Args:
+            filename: filename of photo eg. index.png
+            width: width of thumbnail
+
+        Returns:
+            Filename of thumbnail eg. index.320w.png
+            str
+        """
+        stem, extension = os.path.splitext(filename)
+        return f'{stem}.{width}w{extension}'
+
+    def parse(self, filename: str) -> tuple:
+        """Parse filename of thumbnail.
+
+        Args:
+            filename: filename that might be a thumbnail
+
+        Returns:
+            Filename of photo and width of thumbnail, width is 0 if
+            filename is not a thumbnail of one of the sizes
+            tuple
+        """
+        match = Thumbnails.FILENAME.match(filename)
+        if match is None or int(match.group(2)) not in self.sizes:
+            return filename, 0
+        return f'{match.group(1)}.{match.group(3)}', int(match.group(2))
+
+    def submit(self, path: PhotoPath):
+        """Make thumbnails of photo in the background.
+
+        Args:
+            path: path to photo
+        """
+        for width in self.sizes:
+            self._make(path, width)
+
+    def get(self, path: PhotoPath, width: int) -> str:
+        """Get thumbnail of photo.
+
+        The thumbnail is made if it does not exist.
+
+        Args:
+            path: path to photo
+            width: width of thumbnail
+
+        Returns:
+            Path to thumbnail in data directory
+            str
+        """
+        thumbnail = self.find(path, width)
+        if thumbnail is None:
+            self._make(path, width).result()
+            thumbnail = self.datadir.path_for_thumbnail(path, width)
+            self._use(thumbnail)
+        return thumbnail
+
+    def find(self, path: PhotoPath, width: int) -> Optional[str]:
+        """Find thumbnail of photo without waiting for it to be made.
+
+        The thumbnail is made in the background if it does not exist.
+
+        Args:
+            path: path to photo
+            width: width of thumbnail
+
+        Returns:
+            Path to thumbnail in data directory, None if it is
+            being made
+            Optional[str]
+        """
+        thumbnail = self.datadir.path_for_thumbnail(path, width)
+        if not os.path.exists(thumbnail):
+            # might have been removed by another process
+            with self.lock:
+                self.total -= self.used.pop(thumbnail, 0)
+            self._make(path, width)
+            return None
+        self._use(thumbnail)
+        return thumbnail
+
+    def close(self):
+        """Wait for pending thumbnails and stop workers."""
+        self.executor.shutdown(wait=True)
+        if self.scanner is not None:
+            self.scanner.join()
+
+    def _make(self, path: PhotoPath, width: int) -> Future:
+        """Make thumbnail in a worker process.
+
+        Args:
+            path: path to photo
+            width: width of thumbnail
+
+        Returns:
+            Future of thumbnail's size in bytes
+            Future
+        """
+        thumbnail = self.datadir.path_for_thumbnail(path, width)
+        with self.lock:
+            if thumbnail in self.pending:
+                pending = self.pending[thumbnail]  # type: Future
+                return pending
+            future = self.executor.submit(
+                _resize,
+                path.full_path(),
+                thumbnail,
+                width
+            )
+            self.pending[thumbnail] = future
+        future.add_done_callback(
+            lambda future: self._done(future, thumbnail)
+        )
+        return future
+
+    def _done(self, future: Future, thumbnail: str):
+        """Account for thumbnail that was made.
+
+        Args:
+            future: future of thumbnail
+            thumbnail: path to thumbnail
+        """
+        with self.lock:
+            self.pending.pop(thumbnail, None)
+        try:
+            future.result()
+        except Exception as e:
+            console.p(f'failed to make thumbnail {thumbnail}: {e}')
+            return
+        self._use(thumbnail)
+
+    def _use(self, thumbnail: str):
+        """Mark thumbnail as most recently used.
+
+        Least recently used thumbnails are removed if the cache
+        is over budget.
+
+        Args:
+            thumbnail: path to thumbnail
+        """
+        with self.lock:
+            if self.scanner is None:
+                self.scanner = Thread(target=self._scan, daemon=True)
+                self.scanner.start()
+            if thumbnail in self.used:
+                self.used.move_to_end(thumbnail)
+                return
+            try:
+                size = os.path.getsize(thumbnail)
+            except FileNotFoundError:
+                return
+            self.used[thumbnail] = size
+            self.total += size
+            self._evict()
+
+    def _evict(self):
+        """Remove least recently used thumbnails, lock must be held."""
+        while self.total > self.cache_size and len(self.used) > 1:
+            evicted, size = self.used.popitem(last=False)
+            self.total -= size
+            try:
+                os.remove(evicted)
+            except FileNotFoundError:
+                pass
+
+    def _scan(self):
+        """Account for thumbnails already in data directory.
+
+        The data directory is walked without holding the lock.
+        Thumbnails found are ordered by when they were modified,
+        and are less recently used than thumbnails used meanwhile.
+        """
+        found = []
+        for root, dirs, files in os.walk(self.datadir.root):
+            for name in files:
+                if Thumbnails.FILENAME.match(name) is None:
+                    continue
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except FileNotFoundError:
+                    continue
+                found.append((stat.st_mtime, name, root, stat.st_size))
+
+        with self.lock:
+            for mtime, name, root, size in sorted(found, reverse=True):
+                thumbnail = os.path.join(root, name)
+                if thumbnail in self.used:
+                    continue
+                self.used[thumbnail] = size
+                self.used.move_to_end(thumbnail, last=False)
+                self.total += size
+            self._evict()
+
+
+def _resize(source: str, target: str, width: int) -> int:
+    """Make thumbnail of image.
+
+    Runs in a worker process. Images narrower than width are
+    stored as is.
+
+    Args:
+        source: path to image
+        target: path to write thumbnail to
+        width: width of thumbnail
+
+    Returns:
+        Size of thumbnail in bytes
+        int
+    """
+    image = Image.open(source)
+    thumbnail = image  # type: Image.Image
+    if image.width > width:
+        height = max(1, round(image.height * width / image.width))
+        thumbnail = image.resize((width, height), RESAMPLE)
+
+    output = io.BytesIO()
+    thumbnail.save(output, image.format)
+    return write_file(target, output.getvalue())
@@ -1,14 +1,23 @@
 """Threads module."""
 
 from __future__ import annotations
-from saas.crawler.crawler import Crawler, UrlFileNotFoundError
+from saas.crawler.crawler import Crawler, AsyncCrawler, UrlFileNotFoundError
 from saas.storage.datadir import DataDirectory
+from saas.photographer.pool import BrowserPool
+from saas.storage.thumbnails import Thumbnails
+from saas.storage.optimizer import Optimizer
+from saas.crawler.frontier import Frontier
+from saas.storage.buffer import WriteBuffer
+from saas.mount.cache import AttributeCache
+from saas.mount.replica import Replica
+from saas.storage.changes import Changes
+from saas.storage.seen import SeenUrls
 import saas.photographer.photographer as p
 import saas.mount.filesystem as Filesystem
 from saas.utils.files import real_path
 import saas.storage.refresh as refresh
 import saas.utils.console as console
-from saas.storage.index import Index
+from saas.storage.index import Index, connect
 from typing import Type, Optional
 import saas.utils.stats as stats
 from threading import Thread
@@ -27,9 +36,32 @@ class Controller:
 
     FUSE_PID = None
 
+    frontier = None  # type: Optional[Frontier]
+
+    seen_urls = None  # type: Optional[SeenUrls]
+
+    write_buffer = None  # type: Optional[WriteBuffer]
+
+    changes = None  # type: Optional[Changes]
+
+    browser_pool = None  # type: Optional[BrowserPool]
+
+    optimizer = None  # type: Optional[Optimizer]
+
+    thumbnails = None  # type: Optional[Thumbnails]
+
     threads = {}  # type: dict
 
-    webdrivers = []  # type: list
+    @staticmethod
+    def start_write_buffer(elasticsearch_host: str):
+        """Start write buffer shared by crawlers and photographers.
+
+        Args:
+            elasticsearch_host: elasticsearch host
+        """
+        Controller.write_buffer = WriteBuffer(
+            Index(host=elasticsearch_host).es
+        )
 
     @staticmethod
     def start_crawlers(
@@ -37,8 +69,12 @@ class Controller:
         url_file: str,
         ignore_found_urls: bool,
         stay_at_domain: bool,
-        elasticsearch_host: str,
-        debug: bool
+        index_host: str,
+        debug: bool,
+        concurrency: int=0,
+        connections_per_host: int=2,
+        crawl_delay: float=1.0,
+        seen_urls_path: Optional[str]=None
     ):
         """Start crawler threads.
 
@@ -49,19 +85,46 @@ class Controller:
                 pages it crawls
             stay_at_domain: if crawler should ignore urls from a different
                 domain than the one it was found at
-            elasticsearch_host: elasticsearch host
+            index_host: elasticsearch host, or sqlite:// path of index
             debug: Display debugging information
+            concurrency: if greater than 0 a single async crawler
+                is started that crawls this many urls at the same
+                time, amount is then ignored (default: {0})
+            connections_per_host: max number of connections the async
+                crawler opens to a single host (default: {2})
+            crawl_delay: minimum number of seconds between two requests
+                to the same domain (default: {1.0})
+            seen_urls_path: where to snapshot the cache of crawled
+                urls (default: {None})
         """
-        console.p(f'starting {amount} crawler threads')
+        Controller.seen_urls = SeenUrls(seen_urls_path)
+        Controller.frontier = Frontier(
+            connect(
+                index_host,
+                seen_urls=Controller.seen_urls,
+                write_buffer=Controller.write_buffer
+            ),
+            crawl_delay
+        )
+        if concurrency > 0:
+            amount = 1
+            console.p(f'starting async crawler with {concurrency} workers')
+        else:
+            console.p(f'starting {amount} crawler threads')
         while amount > 0:
             thread_id = str(uuid.uuid4())
             thread = Thread(target=_crawler_thread, args=(
                 url_file,
                 ignore_found_urls,
                 stay_at_domain,
-                elasticsearch_host,
+                index_host,
                 debug,
-                thread_id
+                thread_id,
+                Controller.frontier,
+                Controller.seen_urls,
+                Controller.write_buffer,
+                concurrency,
+                connections_per_host
             ))
             thread.start()
             Controller.threads[thread_id] = {
@@ -70,13 +133,13 @@ class Controller:
             amount -= 1
 
     @staticmethod
-    def start_stats(elasticsearch_host: str):
+    def start_stats(index_host: str):
         """Start stats thread.
 
         Args:
-            elasticsearch_host: elasticsearch host
+            index_host: elasticsearch host, or sqlite:// path of index
         """
-        thread = Thread(target=_stats_thread, args=(elasticsearch_host,))
+        thread = Thread(target=_stats_thread, args=(index_host,))
         thread.start()
 
     @staticmethod
@@ -87,8 +150,19 @@ class Controller:
         viewport_width: int,
         viewport_height: int,
         viewport_max_height: Optional[int],
-        elasticsearch_host: str,
-        debug: bool
+        index_host: str,
+        debug: bool,
+        browser_max_pages: int=BrowserPool.MAX_PAGES,
+        browser_max_memory: int=BrowserPool.MAX_RSS >> 20,
+        quiet_window: float=0.5,
+        lazy_loading: str='activate',
+        capture: str='resize',
+        optimizer_processes: int=2,
+        image_format: str='png',
+        change_policy: str='store',
+        change_threshold: float=0.02,
+        thumbnail_sizes: list=[],
+        thumbnail_cache: int=Thumbnails.CACHE_SIZE >> 20
     ):
         """Start photographer threads.
 
@@ -101,11 +175,51 @@ class Controller:
             viewport_width: width of camera viewport
             viewport_height: height of camera viewport
             viewport_max_height: max height of camera viewport
-            elasticsearch_host: elasticsearch host
+            index_host: elasticsearch host, or sqlite:// path of index
             debug: Display debugging information
+            browser_max_pages: number of pages a browser loads before
+                it is restarted (default: {50})
+            browser_max_memory: number of megabytes of memory a browser
+                can use before it is restarted (default: {1024})
+            quiet_window: number of seconds a page must be quiet
+                before it is photographed (default: {0.5})
+            lazy_loading: how lazy loaded content is loaded, 'activate'
+                or 'scroll' (default: {'activate'})
+            capture: how full height screenshots are captured, 'resize'
+                or 'tiled' (default: {'resize'})
+            optimizer_processes: number of processes optimizing photos
+                if datadir optimizes storage (default: {2})
+            image_format: format to store optimized photos in, 'png',
+                'webp' or 'avif' (default: {'png'})
+            change_policy: what to do with photos that did not change
+                since previous capture, 'store', 'link' or 'skip'
+                (default: {'store'})
+            change_threshold: share of perceptual hash that must differ
+                for a photo to have changed (default: {0.02})
+            thumbnail_sizes: widths of thumbnails to make of photos when
+                they are captured, if empty thumbnails are made when
+                first accessed (default: {[]})
+            thumbnail_cache: number of megabytes thumbnails can take up
+                (default: {1024})
         """
         console.p(f'starting {amount} photographer threads')
         Controller.PHOTOGRAPHER_PROCESSES = amount
+        Controller.browser_pool = BrowserPool(
+            max_pages=browser_max_pages,
+            max_rss=browser_max_memory << 20
+        )
+        if len(thumbnail_sizes) > 0:
+            Controller.thumbnails = Thumbnails(
+                datadir,
+                thumbnail_sizes,
+                thumbnail_cache << 20
+            )
+        if datadir.optimize_storage:
+            Controller.optimizer = Optimizer(
+                optimizer_processes,
+                image_format,
+                Controller.thumbnails
+            )
         while amount > 0:
             thread_id = str(uuid.uuid4())
             thread = Thread(target=_photographer_thread, args=(
@@ -114,9 +228,19 @@ class Controller:
                 viewport_width,
                 viewport_height,
                 viewport_max_height,
-                elasticsearch_host,
+                index_host,
                 debug,
-                thread_id
+                thread_id,
+                Controller.write_buffer,
+                Controller.changes,
+                Controller.browser_pool,
+                quiet_window,
+                lazy_loading,
+                capture,
+                Controller.optimizer,
+                change_policy,
+                change_threshold,
+                Controller.thumbnails
             ))
             thread.start()
             Controller.threads[thread_id] = {
@@ -129,20 +253,48 @@ class Controller:
         mountpoint: str,
         datadir: DataDirectory,
         refresh_rate: Type[refresh.RefreshRate],
-        elasticsearch_host: str
+        index_host: str,
+        thumbnail_sizes: list=[],
+        thumbnail_cache: int=Thumbnails.CACHE_SIZE >> 20,
+        threads: int=10,
+        attribute_cache_age: float=AttributeCache.MAX_AGE,
+        replica_memory: int=Replica.MAX_MEMORY >> 20,
+        entry_timeout: float=1.0,
+        attr_timeout: float=1.0,
+        kernel_cache: str='auto'
     ):
         """Start filesystem process.
 
         FUSE python library will kill the main process,
         forking main process and mounts the filesystem
-        from that process instead.
+        from that process instead. Photos saved by the main process
+        are published to the filesystem process over a pipe, so it
+        can drop attributes it cached of their captures, and reload
+        captures photos were removed from in its replica of photos.
 
         Args:
             mountpoint: where to mount filesystem
             datadir: Data directory to store pictures in
             refresh_rate: Which refresh rate filesystem should use
                 for fetching photos
-            elasticsearch_host: elasticsearch host
+            index_host: elasticsearch host, or sqlite:// path of index
+            thumbnail_sizes: widths of thumbnails to expose beside
+                photos (default: {[]})
+            thumbnail_cache: number of megabytes thumbnails can take up
+                (default: {1024})
+            threads: max number of requests to the filesystem served
+                at once (default: {10})
+            attribute_cache_age: number of seconds attributes of files
+                are cached, 0 disables the cache (default: {10.0})
+            replica_memory: number of megabytes the in-memory replica
+                of photos can take up, 0 disables the replica
+                (default: {256})
+            entry_timeout: number of seconds the kernel caches names
+                in the filesystem (default: {1.0})
+            attr_timeout: number of seconds the kernel caches
+                attributes of files (default: {1.0})
+            kernel_cache: how the kernel caches content of files,
+                'off', 'auto' or 'always' (default: {'auto'})
 
         Returns:
             True if main process, False if the forked process
@@ -150,16 +302,51 @@ class Controller:
         """
         console.p(f'mounting filesystem at: {real_path(mountpoint)}')
 
+        read_end, write_end = os.pipe()
         pid = os.fork()
         if pid != 0:
+            os.close(read_end)
             Controller.FUSE_PID = pid
+            Controller.changes = Changes(write_end)
             return True
 
+        os.close(write_end)
         try:
+            index = connect(index_host, datadir)
+            cache = None  # type: Optional[AttributeCache]
+            if attribute_cache_age > 0:
+                cache = AttributeCache(max_age=attribute_cache_age)
+            replica = None  # type: Optional[Replica]
+            if replica_memory > 0:
+                replica = Replica(index, refresh_rate, replica_memory << 20)
+                replica.start()
+
+            def changed(domain: str, captured_at: str, removed: bool):
+                """Drop what is kept of changed capture."""
+                if cache is not None:
+                    cache.invalidate(domain, captured_at)
+                if replica is not None and removed:
+                    replica.invalidate(domain, captured_at)
+
+            Changes.subscribe(read_end, changed)
+            thumbnails = None  # type: Optional[Thumbnails]
+            if len(thumbnail_sizes) > 0:
+                thumbnails = Thumbnails(
+                    datadir,
+                    thumbnail_sizes,
+                    thumbnail_cache << 20
+                )
             Filesystem.mount(
                 mountpoint,
-                Index(datadir, host=elasticsearch_host),
-                refresh_rate
+                index,
+                refresh_rate,
+                thumbnails,
+                threads,
+                cache,
+                replica,
+                entry_timeout,
+                attr_timeout,
+                kernel_cache
             )
         except RuntimeError as e:
             console.p(f'failed to mount FUSE filesystem: {e}')
@@ -180,10 +367,19 @@ class Controller:
                 time.sleep(0.5)
 
             console.p('cleaning up')
+            if Controller.frontier:
+                Controller.frontier.close()
+            if Controller.seen_urls:
+                Controller.seen_urls.snapshot()
+            if Controller.optimizer:
+                Controller.optimizer.close()
+            if Controller.thumbnails:
+                Controller.thumbnails.close()
+            if Controller.write_buffer:
+                Controller.write_buffer.close()
+            if Controller.browser_pool:
+                Controller.browser_pool.close()
             try:
-                for pid in Controller.webdrivers:
-                    os.kill(pid, signal.SIGTERM)
-
                 if Controller.FUSE_PID:
                     os.kill(Controller.FUSE_PID, signal.SIGTERM)
             except ProcessLookupError:
@@ -209,9 +405,14 @@ def _crawler_thread(
     url_file: str,
     ignore_found_urls: bool,
     stay_at_domain: bool,
-    elasticsearch_host: str,
+    index_host: str,
     debug: bool,
-    thread_id: str
+    thread_id: str,
+    frontier: Frontier,
+    seen_urls: SeenUrls,
+    write_buffer: Optional[WriteBuffer],
+    concurrency: int,
+    connections_per_host: int
 ):
     """Crawler thread.
 
@@ -221,19 +422,49 @@ def _crawler_thread(
             pages it crawls
         stay_at_domain: if crawler should ignore urls from a different
             domain than the one it was found at
-        elasticsearch_host: elasticsearch host
+        index_host: elasticsearch host, or sqlite:// path of index
         debug: Display debugging information
         thread_id: id of thread
+        frontier: Frontier shared between crawlers
+        seen_urls: cache of crawled urls shared between crawlers
+        write_buffer: buffer to write documents through, shared between
+            crawlers and photographers
+        concurrency: number of urls to crawl at the same time, 0 to
+            crawl one url at a time without asyncio
+        connections_per_host: max number of connections to a single host
     """
     try:
-        crawler = Crawler(
-            url_file=url_file,
-            index=Index(host=elasticsearch_host),
-            ignore_found_urls=ignore_found_urls,
-            stay_at_domain=stay_at_domain,
-        )
-        while Controller.SHOULD_RUN:
-            crawler.tick()
+        if concurrency > 0:
+            async_crawler = AsyncCrawler(
+                url_file=url_file,
+                index=connect(
+                    index_host,
+                    seen_urls=seen_urls,
+                    write_buffer=write_buffer
+                ),
+                ignore_found_urls=ignore_found_urls,
+                stay_at_domain=stay_at_domain,
+                frontier=frontier,
+                concurrency=concurrency,
+                connections_per_host=connections_per_host,
+            )
+            async_crawler.run(lambda: Controller.SHOULD_RUN)
+            async_crawler.stop()
+        else:
+            crawler = Crawler(
+                url_file=url_file,
+                index=connect(
+                    index_host,
+                    seen_urls=seen_urls,
+                    write_buffer=write_buffer
+                ),
+                ignore_found_urls=ignore_found_urls,
+                stay_at_domain=stay_at_domain,
+                frontier=frontier,
+            )
+            while Controller.SHOULD_RUN:
+                crawler.tick()
+            crawler.stop()
     except UrlFileNotFoundError:
         console.p(f'ERROR: url_file was not found at \'{url_file}\'')
         time.sleep(2)
@@ -247,13 +478,13 @@ def _crawler_thread(
         Controller.threads[thread_id]['running'] = False
 
 
-def _stats_thread(elasticsearch_host: str):
+def _stats_thread(index_host: str):
     """Stats thread.
 
     Prints system and saas statistics every 5th minute
 
     Args:
-        elasticsearch_host: elasticsearch host
+        index_host: elasticsearch host, or sqlite:// path of index
     """
     start = time.time()
     last_print = 1
@@ -264,7 +495,7 @@ def _stats_thread(elasticsearch_host: str):
         if mins % 5 != 0 or mins <= last_print:
             continue
 
-        index = Index(host=elasticsearch_host)
+        index = connect(index_host)
         last_print = mins
 
         t = '[throughput]           5m: {}, 15m: {}, 30min: {}, 1h: {}'.format(
@@ -298,9 +529,19 @@ def _photographer_thread(
     viewport_width: int,
     viewport_height: int,
     viewport_max_height: Optional[int],
-    elasticsearch_host: str,
+    index_host: str,
     debug: bool,
-    thread_id: str
+    thread_id: str,
+    write_buffer: Optional[WriteBuffer],
+    changes: Optional[Changes],
+    browser_pool: Optional[BrowserPool],
+    quiet_window: float,
+    lazy_loading: str,
+    capture: str,
+    optimizer: Optional[Optimizer],
+    change_policy: str,
+    change_threshold: float,
+    thumbnails: Optional[Thumbnails]
 ):
     """Photographer thread.
 
@@ -310,18 +551,51 @@ def _photographer_thread(
         viewport_width: width of camera viewport
         viewport_height: height of camera viewport
         viewport_max_height: max height of camera viewport
-        elasticsearch_host: elasticsearch host
+        index_host: elasticsearch host, or sqlite:// path of index
         debug: Display debugging information
         thread_id: id of thread
+        write_buffer: buffer to write documents through, shared between
+            crawlers and photographers
+        changes: where saved photos are published to the mounted
+            filesystem, None if nothing is published
+        browser_pool: pool of browser sessions shared between
+            photographers
+        quiet_window: number of seconds a page must be quiet
+            before it is photographed
+        lazy_loading: how lazy loaded content is loaded, 'activate'
+            or 'scroll'
+        capture: how full height screenshots are captured, 'resize'
+            or 'tiled'
+        optimizer: optimizer shared between photographers, None if
+            photos should not be optimized
+        change_policy: what to do with photos that did not change
+            since previous capture, 'store', 'link' or 'skip'
+        change_threshold: share of perceptual hash that must differ
+            for a photo to have changed
+        thumbnails: thumbnails shared between photographers, None if
+            thumbnails are made when first accessed
     """
     try:
         photographer = p.Photographer(
-            Index(host=elasticsearch_host),
+            connect(
+                index_host,
+                datadir,
+                write_buffer=write_buffer,
+                changes=changes
+            ),
             refresh_rate,
             datadir,
             viewport_width,
             viewport_height,
-            viewport_max_height
+            viewport_max_height,
+            browser_pool,
+            quiet_window,
+            lazy_loading,
+            capture,
+            optimizer,
+            change_policy,
+            change_threshold,
+            thumbnails
         )
         while Controller.SHOULD_RUN:
             photographer.tick()
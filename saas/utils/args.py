@@ -62,6 +62,40 @@ def get_argument_parser():
         ''',
     )
 
+    parser.add_argument(
+        '--crawler-concurrency',
+        metavar='',
+        type=int,
+        default=0,
+        help='''
+            If greater than 0 a single asyncio crawler is started that
+            crawls this many urls at the same time, --crawler-threads
+            is then ignored (default: %(default)s)
+        ''',
+    )
+
+    parser.add_argument(
+        '--crawler-connections-per-host',
+        metavar='',
+        type=int,
+        default=2,
+        help='''
+            Max number of open connections the asyncio crawler
+            keeps to a single host (default: %(default)s)
+        ''',
+    )
+
+    parser.add_argument(
+        '--crawl-delay',
+        metavar='',
+        type=float,
+        default=1.0,
+        help='''
+            Minimum number of seconds between two requests
+            to the same domain (default: %(default)s)
+        ''',
+    )
+
     parser.add_argument(
         '--photographer-threads',
         metavar='',
@@ -74,6 +108,28 @@ def get_argument_parser():
         '''
     )
 
+    parser.add_argument(
+        '--browser-max-pages',
+        metavar='',
+        type=int,
+        default=50,
+        help='''
+            Number of pages a photographer's browser loads before
+            it is restarted (default: %(default)s)
+        ''',
+    )
+
+    parser.add_argument(
+        '--browser-max-memory',
+        metavar='',
+        type=int,
+        default=1024,
+        help='''
+            Megabytes of memory a photographer's browser can use
+            before it is restarted (default: %(default)s)
+        ''',
+    )
+
     parser.add_argument(
         '--data-dir',
         metavar='',
@@ -89,6 +145,19 @@ def get_argument_parser():
         help='Use flag to clear data directory on start',
     )
 
+    parser.add_argument(
+        '--index-backend',
+        metavar='',
+        type=str,
+        default='elasticsearch',
+        choices=['elasticsearch', 'sqlite'],
+        help='''
+            Where urls and photos are indexed, elasticsearch or
+            sqlite. The sqlite index is stored in the data directory
+            and needs no external service (default: %(default)s)
+        ''',
+    )
+
     parser.add_argument(
         '--elasticsearch-host',
         metavar='',
@@ -162,13 +231,213 @@ def get_argument_parser():
         ''',
     )
 
+    parser.add_argument(
+        '--quiet-window',
+        metavar='',
+        type=float,
+        default=0.5,
+        help='''
+            Number of seconds a page must have no network activity
+            and no loading images or fonts before it is photographed
+            (default: %(default)s)
+        ''',
+    )
+
+    parser.add_argument(
+        '--capture',
+        metavar='',
+        type=str,
+        default='resize',
+        choices=['resize', 'tiled'],
+        help='''
+            How full height screenshots are captured, 'resize' resizes
+            the viewport to the height of the page, 'tiled' stitches
+            together screenshots taken while scrolling down the page,
+            which uses far less memory on tall pages (default: %(default)s)
+        ''',
+    )
+
+    parser.add_argument(
+        '--lazy-loading',
+        metavar='',
+        type=str,
+        default='activate',
+        choices=['activate', 'scroll'],
+        help='''
+            How lazy loaded images are loaded in full height
+            screenshots, 'activate' loads them all at once and
+            scrolls through the page only if that fails, 'scroll'
+            always scrolls through the page (default: %(default)s)
+        ''',
+    )
+
     parser.add_argument(
         '--optimize-storage',
         action='store_true',
         default=False,
         help='''
             Image files should be optimized to take up
-            less storage (takes longer time to render)
+            less storage, files are optimized in the background
+            after they have been captured
+        ''',
+    )
+
+    parser.add_argument(
+        '--optimizer-processes',
+        metavar='',
+        type=int,
+        default=2,
+        help='''
+            Number of processes optimizing image files if
+            --optimize-storage is used (default: %(default)s)
+        ''',
+    )
+
+    parser.add_argument(
+        '--image-format',
+        metavar='',
+        type=str,
+        default='png',
+        choices=['png', 'webp', 'avif'],
+        help='''
+            Format optimized image files are stored in, 'png', 'webp'
+            or 'avif', only used with --optimize-storage
+            (default: %(default)s)
+        ''',
+    )
+
+    parser.add_argument(
+        '--change-policy',
+        metavar='',
+        type=str,
+        default='store',
+        choices=['store', 'link', 'skip'],
+        help='''
+            What to do with captures that look the same as the
+            previous capture of the url, 'store' stores them anyway,
+            'link' points them to the previous capture's file and
+            'skip' does not store them at all. Urls that do not
+            change are captured less often regardless of policy
+            (default: %(default)s)
+        ''',
+    )
+
+    parser.add_argument(
+        '--change-threshold',
+        metavar='',
+        type=float,
+        default=0.02,
+        help='''
+            Share of a capture's perceptual hash that must differ
+            from the previous capture for the page to have
+            changed, between 0 and 1 (default: %(default)s)
+        ''',
+    )
+
+    parser.add_argument(
+        '--thumbnail-sizes',
+        metavar='',
+        type=int,
+        nargs='+',
+        default=[],
+        help='''
+            Widths of thumbnails in pixels, eg. 320 640. Thumbnails
+            are shown beside every photo in the mounted filesystem,
+            eg. index.320w.png beside index.png, and made when they
+            are first accessed
+        ''',
+    )
+
+    parser.add_argument(
+        '--thumbnails-at-capture',
+        action='store_true',
+        default=False,
+        help='''
+            Use flag to make thumbnails when photos are captured
+            instead of when they are first accessed
+        ''',
+    )
+
+    parser.add_argument(
+        '--thumbnail-cache',
+        metavar='',
+        type=int,
+        default=1024,
+        help='''
+            Number of megabytes thumbnails can take up in the data
+            directory, least recently used thumbnails are removed
+            when it is exceeded (default: %(default)s)
+        ''',
+    )
+
+    parser.add_argument(
+        '--mount-threads',
+        metavar='',
+        type=int,
+        default=10,
+        help='''
+            Max number of requests to the mounted filesystem that are
+            served at once (default: %(default)s)
+        ''',
+    )
+
+    parser.add_argument(
+        '--mount-entry-timeout',
+        metavar='',
+        type=float,
+        default=1.0,
+        help='''
+            Number of seconds the kernel caches names in the mounted
+            filesystem (default: %(default)s)
+        ''',
+    )
+
+    parser.add_argument(
+        '--mount-attr-timeout',
+        metavar='',
+        type=float,
+        default=1.0,
+        help='''
+            Number of seconds the kernel caches attributes of files in
+            the mounted filesystem (default: %(default)s)
+        ''',
+    )
+
+    parser.add_argument(
+        '--mount-kernel-cache',
+        metavar='',
+        type=str,
+        default='auto',
+        choices=['off', 'auto', 'always'],
+        help='''
+            How the kernel caches content of files in the mounted
+            filesystem, 'off', 'auto' to drop it when a file's mtime
+            or size changes, or 'always' (default: %(default)s)
+        ''',
+    )
+
+    parser.add_argument(
+        '--attribute-cache-age',
+        metavar='',
+        type=float,
+        default=10.0,
+        help='''
+            Number of seconds attributes of files in the mounted
+            filesystem are cached, 0 disables the cache
+            (default: %(default)s)
+        ''',
+    )
+
+    parser.add_argument(
+        '--replica-memory',
+        metavar='',
+        type=int,
+        default=256,
+        help='''
+            Number of megabytes the in-memory replica of photos the
+            mounted filesystem looks up paths in can take up, domains
+            that do not fit are looked up in the index, 0 disables
+            the replica (default: %(default)s)
         ''',
     )
 
@@ -184,3 +453,25 @@ def get_argument_parser():
     )
 
     return parser
+
+
+def get_reindex_argument_parser():
+    """Get argument parser of reindex command."""
+    parser = argparse.ArgumentParser(
+        prog='saas reindex',
+        description='''
+            Reindex elasticsearch indices created by an older version
+            of saas into the current mappings, while saas is running
+        ''',
+        formatter_class=argparse.HelpFormatter,
+    )
+
+    parser.add_argument(
+        '--elasticsearch-host',
+        metavar='',
+        type=str,
+        default='localhost:9200',
+        help='Elasticsearch host (default: %(default)s)',
+    )
+
+    return parser
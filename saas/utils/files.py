@@ -1,5 +1,6 @@
 """Files helper module."""
 
+import threading
 import errno
 import os
 
@@ -41,3 +42,26 @@ def real_path(path: str) -> str:
     else:
         root = os.getcwd()
     return f'{root}/{path}'.replace('//', '/').replace('//', '/')
+
+
+def write_file(path: str, data: bytes) -> int:
+    """Write file atomically.
+
+    Data is written to a temporary file next to path which is then
+    renamed to path, so a partially written file is never visible.
+    The temporary file is named by the writing process and thread,
+    so threads writing the same file don't share it.
+
+    Args:
+        path: path to file
+        data: content of file
+
+    Returns:
+        Number of bytes written
+        int
+    """
+    tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp, 'wb') as file:
+        file.write(data)
+    os.replace(tmp, path)
+    return len(data)
@@ -1,12 +1,12 @@
 """Stats module."""
 
-from saas.storage.index import Index
+from saas.storage.index import IndexBackend
 import psutil
 import time
 import os
 
 
-def throughput(index: Index, timeframe: int) -> int:
+def throughput(index: IndexBackend, timeframe: int) -> int:
     """Get current throughput.
 
     Args:
@@ -3,9 +3,12 @@
 from __future__ import annotations
 from saas.web.url import Url, InvalidUrlException
 from html.parser import HTMLParser
+from typing import Optional
 from urllib.error import HTTPError
 from saas.web.page import Page
 import urllib.request
+import asyncio
+import aiohttp
 
 
 class Browser:
@@ -28,22 +31,48 @@ class Browser:
             The requested page if response is 200 otherwise None
             Page
         """
-        parser = LinkParser()
-        page = Page()
         try:
             with urllib.request.urlopen(url.to_string()) as response:
                 html = response.read()
         except HTTPError as error:
+            page = Page()
             page.status_code = error.getcode()
             return page
 
-        page.status_code = response.getcode()
-        headers = dict(response.headers)
+        return Browser.make_page(
+            url,
+            response.getcode(),
+            dict(response.headers),
+            str(html)
+        )
+
+    @staticmethod
+    def make_page(
+        url: Url,
+        status_code: int,
+        headers: dict,
+        html: str
+    ) -> Page:
+        """Make page from a response.
+
+        Args:
+            url: Url page is located at
+            status_code: status code of response
+            headers: response headers
+            html: response body
+
+        Returns:
+            A page with the links found in html
+            Page
+        """
+        parser = LinkParser()
+        page = Page()
+        page.status_code = status_code
         for header in headers:
             if header.lower() == 'content-type':
                 page.content_type = headers[header]
 
-        links = parser.parse(str(html))
+        links = parser.parse(html)
 
         for link in links:
             try:
@@ -56,6 +85,87 @@ class Browser:
         return page
 
 
+class AsyncBrowser:
+    """Async browser class.
+
+    Retrieves web pages using asyncio, many pages can be
+    in flight at once. Connections are kept alive and
+    reused between requests to the same host.
+    """
+
+    def __init__(
+        self,
+        connections: int=100,
+        connections_per_host: int=2,
+        timeout: int=30
+    ):
+        """Create new async browser.
+
+        Args:
+            connections: max number of open connections (default: {100})
+            connections_per_host: max number of open connections to a
+                single host (default: {2})
+            timeout: seconds before a request is aborted (default: {30})
+        """
+        self.connections = connections
+        self.connections_per_host = connections_per_host
+        self.timeout = timeout
+        self.session = None  # type: Optional[aiohttp.ClientSession]
+
+    async def open(self):
+        """Open browser session, must be called from a running loop."""
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=self.connections,
+                limit_per_host=self.connections_per_host,
+            ),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+
+    async def close(self):
+        """Close browser session."""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def get_page(self, url: Url) -> Page:
+        """Get page.
+
+        Fetch page at url, pages that fail to load will be
+        returned with a status code of 0
+
+        Args:
+            url: Url page is located at
+
+        Returns:
+            The requested page
+            Page
+
+        Raises:
+            ValueError: if browser session is not open
+        """
+        if self.session is None:
+            raise ValueError('browser must be opened before use')
+        try:
+            async with self.session.get(url.to_string()) as response:
+                headers = dict(response.headers)
+                if 'text/html' not in response.content_type:
+                    # skip downloading the body of pages that
+                    # will not be searched for links
+                    return Browser.make_page(
+                        url,
+                        response.status,
+                        headers,
+                        ''
+                    )
+                html = await response.text(errors='replace')
+                return Browser.make_page(url, response.status, headers, html)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+            page = Page()
+            page.status_code = 0
+            return page
+
+
 class LinkParser(HTMLParser):
     """Link parser."""
 
@@ -90,11 +90,14 @@ class Url:
         self.sha256 = hashlib.sha256(self.to_string().encode()).hexdigest()
         return self.sha256
 
-    def make_filename(self) -> str:
+    def make_filename(self, extension: str='png') -> str:
         """Make filename.
 
         Make the filename used in filesystem.
 
+        Args:
+            extension: file extension (default: {'png'})
+
         Returns:
             A safe filename to use in filesystem
             str
@@ -103,19 +106,21 @@ class Url:
             with_fragment_filename = ''  # type: str
             with_fragment_filename = self._safe_filename(
                 self.fragment
-            ) + '.png'
+            ) + '.' + extension
             return with_fragment_filename
 
         if self.query:
             with_query_filename = ''  # type: str
-            with_query_filename = self._safe_filename(self.query) + '.png'
+            with_query_filename = self._safe_filename(
+                self.query
+            ) + '.' + extension
             return with_query_filename
 
         filename = ''  # type: str
         filename = self._safe_filename(self.path.split('/')[-1:][0])
         if filename == '':
             filename = 'index'
-        return filename + '.png'
+        return filename + '.' + extension
 
     def make_directory(self) -> str:
         """Make directory.
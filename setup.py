@@ -20,12 +20,15 @@ setup(
     license='MIT',
     packages=find_packages(),
     include_package_data=True,
-    python_requires='>=3.7',
+    python_requires='>=3.8',
     install_requires=[
         'wheel==0.32.*',
+        'aiohttp==3.*',
         'beeprint==2.4.*',
         'elasticsearch==6.3.*',
         'fusepy==3.0.*',
+        'numpy==1.*',
+        'Pillow==6.*',
         'psutil==4.3.*',
         'selenium',
     ],
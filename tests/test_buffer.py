@@ -0,0 +1,175 @@
+"""Write buffer test."""
+
+from saas.storage.datadir import DataDirectory
+from saas.storage.buffer import WriteBuffer
+from saas.storage.index import Index
+import saas.storage.buffer as buffer
+from unittest.mock import MagicMock
+from saas.web.url import Url
+from os.path import dirname
+import unittest
+import time
+
+
+class TestWriteBuffer(unittest.TestCase):
+    """Test write buffer class."""
+
+    def setUp(self):
+        """Set up test."""
+        self.bulk = buffer.bulk
+        buffer.bulk = MagicMock(return_value=(0, []))
+        self.buffer = WriteBuffer(MagicMock(), max_size=3, max_age=60)
+
+    def tearDown(self):
+        """Tear down test."""
+        self.buffer.close()
+        buffer.bulk = self.bulk
+
+    def flushed_actions(self) -> list:
+        """Get actions of every flush.
+
+        Returns:
+            List of actions of each flush
+            list
+        """
+        return [call[0][1] for call in buffer.bulk.call_args_list]
+
+    def test_update_is_merged_into_pending_index(self):
+        """Test index followed by update is written as one action."""
+        self.buffer.index('crawled', 'url', 'abc', {'url': 'foo'})
+        self.buffer.update('crawled', 'url', 'abc', {'status_code': 200})
+        self.buffer.flush()
+
+        self.assertEqual([[{
+            '_op_type': 'index',
+            '_index': 'crawled',
+            '_type': 'url',
+            '_id': 'abc',
+            '_source': {'url': 'foo', 'status_code': 200},
+        }]], self.flushed_actions())
+
+    def test_updates_are_merged(self):
+        """Test updates of the same document are written as one action."""
+        self.buffer.update('crawled', 'url', 'abc', {'status_code': 200})
+        self.buffer.update('crawled', 'url', 'abc', {'lock_value': 'bar'})
+        self.buffer.flush()
+
+        actions = self.flushed_actions()[0]
+        self.assertEqual(1, len(actions))
+        self.assertEqual('update', actions[0]['_op_type'])
+        self.assertEqual(
+            {'status_code': 200, 'lock_value': 'bar'},
+            actions[0]['doc']
+        )
+
+    def test_nested_updates_are_merged_as_upsert(self):
+        """Test objects of updates are merged recursively."""
+        self.buffer.update('directories', 'directory', 'abc', {
+            'files': {'foo.png': 10}
+        }, upsert=True)
+        self.buffer.update('directories', 'directory', 'abc', {
+            'files': {'bar.png': 10}
+        })
+        self.buffer.update('directories', 'directory', 'abc', {
+            'files': {'foo.png': 12300}
+        })
+        self.buffer.flush()
+
+        actions = self.flushed_actions()[0]
+        self.assertEqual(1, len(actions))
+        self.assertTrue(actions[0]['doc_as_upsert'])
+        self.assertEqual(
+            {'files': {'foo.png': 12300, 'bar.png': 10}},
+            actions[0]['doc']
+        )
+
+    def test_index_replaces_pending_writes(self):
+        """Test index replaces pending writes to the same document."""
+        self.buffer.index('photos', 'photo', 'abc', {'filesize': 0})
+        self.buffer.index('photos', 'photo', 'abc', {'filesize': 100})
+        self.buffer.flush()
+
+        actions = self.flushed_actions()[0]
+        self.assertEqual(1, len(actions))
+        self.assertEqual({'filesize': 100}, actions[0]['_source'])
+
+    def test_delete_replaces_pending_writes(self):
+        """Test delete replaces pending writes to the same document."""
+        self.buffer.index('photos', 'photo', 'abc', {'filesize': 0})
+        self.buffer.delete('photos', 'photo', 'abc')
+        self.buffer.update('photos', 'photo', 'abc', {'filesize': 100})
+        self.buffer.flush()
+
+        self.assertEqual([[{
+            '_op_type': 'delete',
+            '_index': 'photos',
+            '_type': 'photo',
+            '_id': 'abc',
+        }]], self.flushed_actions())
+
+    def test_buffer_is_flushed_when_full(self):
+        """Test writing to a full buffer flushes it."""
+        self.buffer.index('crawled', 'url', 'a', {})
+        self.buffer.index('crawled', 'url', 'b', {})
+        buffer.bulk.assert_not_called()
+
+        self.buffer.index('crawled', 'url', 'c', {})
+        self.assertEqual(1, len(self.flushed_actions()))
+        self.assertEqual(3, len(self.flushed_actions()[0]))
+        self.assertEqual(0, len(self.buffer.pending))
+
+    def test_writes_are_kept_when_flush_fails(self):
+        """Test writes that failed to flush are flushed again."""
+        buffer.bulk = MagicMock(side_effect=[
+            ConnectionError('elasticsearch is down'),
+            (2, []),
+        ])
+        self.buffer.index('crawled', 'url', 'a', {'url': 'foo'})
+        self.buffer.update('crawled', 'url', 'b', {'status_code': 404})
+        with self.assertRaises(ConnectionError):
+            self.buffer.flush()
+        self.assertNotEqual(0.0, self.buffer.oldest)
+
+        self.buffer.update('crawled', 'url', 'a', {'status_code': 200})
+        self.buffer.flush()
+
+        actions = self.flushed_actions()[1]
+        self.assertEqual(['a', 'b'], [action['_id'] for action in actions])
+        self.assertEqual(
+            {'url': 'foo', 'status_code': 200},
+            actions[0]['_source']
+        )
+        self.assertEqual(0, len(self.buffer.pending))
+
+    def test_close_flushes_pending_writes(self):
+        """Test closing buffer flushes pending writes."""
+        self.buffer.index('crawled', 'url', 'a', {})
+        self.buffer.close()
+
+        self.assertEqual(1, len(self.flushed_actions()))
+
+    def test_old_writes_are_flushed(self):
+        """Test pending writes are flushed once they reach max age."""
+        self.buffer.close()
+        self.buffer = WriteBuffer(MagicMock(), max_size=3, max_age=0.01)
+        self.buffer.index('crawled', 'url', 'a', {})
+        time.sleep(0.2)
+
+        self.assertEqual(1, len(self.flushed_actions()))
+
+    def test_index_writes_through_buffer(self):
+        """Test index writes url documents through write buffer."""
+        datadir = DataDirectory(dirname(__file__) + '/datadir')
+        index = Index(datadir, MagicMock(), write_buffer=self.buffer)
+        url = Url.from_string('https://example.com/foo')
+        index.add_crawled_url(url)
+        index.set_status_code_for_crawled_url(url, 200)
+
+        index.es.update.assert_not_called()
+        buffer.bulk.assert_not_called()
+        self.buffer.flush()
+
+        actions = self.flushed_actions()[0]
+        self.assertEqual(1, len(actions))
+        self.assertEqual(url.hash(), actions[0]['_id'])
+        self.assertEqual(200, actions[0]['_source']['status_code'])
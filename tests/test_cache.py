@@ -0,0 +1,122 @@
+"""Attribute cache test."""
+
+from saas.mount.cache import AttributeCache
+from saas.storage.changes import Changes
+from unittest.mock import MagicMock
+from threading import Event
+import unittest
+import time
+import os
+
+
+class TestAttributeCache(unittest.TestCase):
+    """Test attribute cache class."""
+
+    def setUp(self):
+        """Set up test."""
+        self.time = time.time
+        self.settle_time = AttributeCache.SETTLE_TIME
+        time.time = MagicMock(return_value=1000000)
+        self.cache = AttributeCache(max_size=3, max_age=10)
+
+    def tearDown(self):
+        """Tear down test."""
+        time.time = self.time
+        AttributeCache.SETTLE_TIME = self.settle_time
+
+    def test_attributes_and_missing_paths_are_cached(self):
+        """Test both attributes and missing paths can be cached."""
+        self.cache.set('/example.com', {'st_size': 0})
+        self.cache.set('/missing.com', None)
+
+        self.assertEqual(
+            (True, {'st_size': 0}),
+            self.cache.get('/example.com')
+        )
+        self.assertEqual((True, None), self.cache.get('/missing.com'))
+        self.assertEqual((False, None), self.cache.get('/other.com'))
+
+    def test_entries_expire(self):
+        """Test entries are not used once they reach max age."""
+        self.cache.set('/example.com', {'st_size': 0})
+        time.time = MagicMock(return_value=1000011)
+
+        self.assertEqual((False, None), self.cache.get('/example.com'))
+        self.assertEqual(0, len(self.cache.entries))
+        self.assertEqual({}, self.cache.groups)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """Test least recently used entry is evicted when full."""
+        self.cache.set('/a.com', {})
+        self.cache.set('/b.com', {})
+        self.cache.set('/c.com', {})
+        self.cache.get('/a.com')
+        self.cache.set('/d.com', {})
+
+        self.assertEqual((False, None), self.cache.get('/b.com'))
+        for path in ['/a.com', '/c.com', '/d.com']:
+            self.assertTrue(self.cache.get(path)[0])
+        self.assertNotIn(('b.com', None), self.cache.groups)
+
+    def test_change_drops_domain_and_capture(self):
+        """Test change drops paths of its domain, capture and latest."""
+        self.cache = AttributeCache(max_size=10, max_age=10)
+        paths = [
+            '/example.com',
+            '/example.com/2019-01-13H20:00',
+            '/example.com/2019-01-13H20:00/foo.png',
+            '/example.com/latest/foo.png',
+            '/example.com/2019-01-13H19:00/foo.png',
+            '/other.com/2019-01-13H20:00/foo.png',
+        ]
+        for path in paths:
+            self.cache.set(path, None)
+
+        self.cache.invalidate('example.com', '2019-01-13H20:00')
+
+        self.assertEqual(
+            [False, False, False, False, True, True],
+            [self.cache.get(path)[0] for path in paths]
+        )
+
+    def test_nothing_is_cached_until_change_settles(self):
+        """Test paths of a change are not cached while it settles."""
+        AttributeCache.SETTLE_TIME = 2
+        self.cache.invalidate('example.com', '2019-01-13H20:00')
+
+        self.cache.set('/example.com/2019-01-13H20:00/foo.png', None)
+        self.assertFalse(
+            self.cache.get('/example.com/2019-01-13H20:00/foo.png')[0]
+        )
+
+        time.time = MagicMock(return_value=1000003)
+        self.cache.set('/example.com/2019-01-13H20:00/foo.png', None)
+        self.assertTrue(
+            self.cache.get('/example.com/2019-01-13H20:00/foo.png')[0]
+        )
+
+    def test_changes_are_published_over_pipe(self):
+        """Test changes published by one end are invalidated by other."""
+        time.time = self.time
+        read_end, write_end = os.pipe()
+        changed = Event()
+        removals = []
+
+        def invalidate(domain: str, captured_at: str, removed: bool):
+            self.cache.invalidate(domain, captured_at)
+            removals.append(removed)
+            changed.set()
+
+        self.cache.set('/example.com', None)
+        thread = Changes.subscribe(read_end, invalidate)
+        Changes(write_end).publish('example.com', '2019-01-13H20:00', True)
+        os.close(write_end)
+
+        self.assertTrue(changed.wait(5))
+        thread.join(5)
+        self.assertFalse(self.cache.get('/example.com')[0])
+        self.assertEqual([True], removals)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,16 +1,17 @@
 """Camera test."""
 
-from saas.photographer.camera import Camera, Limits
-from saas.photographer.javascript import JavascriptSnippets
 from selenium.webdriver.firefox.firefox_binary import FirefoxBinary
+from saas.photographer.javascript import JavascriptSnippets
+from selenium.common.exceptions import TimeoutException
 from saas.storage.datadir import DataDirectory
-from saas.photographer.photo import PhotoPath
-from unittest.mock import MagicMock, call
+from saas.photographer.camera import Camera
+from unittest.mock import MagicMock
 from selenium import webdriver
 from saas.web.url import Url
 from os.path import dirname
+from PIL import Image
 import unittest
-import time
+import io
 
 
 class TestCamera(unittest.TestCase):
@@ -87,101 +88,154 @@ class TestCamera(unittest.TestCase):
         self.camera._set_resolution(100, 200)
         self.camera.webdriver.set_window_size.assert_called_with(100, 200)
 
-    def test_camera_can_get_document_height(self):
-        """Test camera can get document size."""
+    def probes_page(self):
+        """Test probes page.
+
+        Add mock of page probe to webdriver.
+        """
+        self.camera.webdriver.execute_script = MagicMock(return_value={
+            'height': 10000,
+            'images': 123,
+            'scripts': 20,
+            'stylesheets': 10,
+            'images_loaded': 0.5,
+        })
+
+    def test_camera_can_probe_page(self):
+        """Test camera gets all page metrics in one round trip."""
         self.creates_webdriver()
         self.uses_javascript_snippets()
-        self.camera.webdriver.execute_script = MagicMock(return_value=10000)
-
-        self.camera._document_height()
-        self.camera.webdriver.execute_script.assert_called_with(
-            JavascriptSnippets.DOCUMENT_HEIGHT
+        self.probes_page()
+
+        self.assertEqual(10000, self.camera._document_height())
+        self.assertEqual(123, self.camera._image_count())
+        self.assertEqual(20, self.camera._script_count())
+        self.assertEqual(10, self.camera._stylesheet_count())
+        self.assertEqual(0.5, self.camera.probe()['images_loaded'])
+        self.camera.webdriver.execute_script.assert_called_once_with(
+            JavascriptSnippets.PAGE_PROBE
         )
 
-    def test_camera_can_get_image_count(self):
-        """Test camera can get image count."""
+    def test_camera_probes_page_again_after_navigation(self):
+        """Test page metrics are not cached between navigations."""
         self.creates_webdriver()
         self.uses_javascript_snippets()
-        self.camera.webdriver.execute_script = MagicMock(return_value=123)
+        self.routes_to_url()
+        self.probes_page()
 
-        images = self.camera._image_count()
-        self.assertEqual(123, images)
-        self.camera.webdriver.execute_script.assert_called_with(
-            JavascriptSnippets.IMAGE_COUNT
-        )
+        self.camera.probe()
+        self.camera._route(self.url)
+        self.camera.probe()
+        self.assertEqual(2, self.camera.webdriver.execute_script.call_count)
 
-    def test_camera_can_get_script_count(self):
-        """Test camera can get script count."""
+    def test_camera_waits_until_page_is_ready(self):
+        """Test camera waits for page in a single async script."""
         self.creates_webdriver()
         self.uses_javascript_snippets()
-        self.camera.webdriver.execute_script = MagicMock(return_value=20)
+        timings = {
+            'document': 120,
+            'fonts': 130,
+            'images': 900,
+            'network': 850,
+            'total': 1400,
+            'timed_out': False,
+        }
+        self.camera.webdriver.set_script_timeout = MagicMock()
+        self.camera.webdriver.execute_async_script = MagicMock(
+            return_value=timings
+        )
 
-        scripts = self.camera._script_count()
-        self.assertEqual(20, scripts)
-        self.camera.webdriver.execute_script.assert_called_with(
-            JavascriptSnippets.SCRIPT_COUNT
+        self.assertEqual(timings, self.camera._wait_until_ready('load'))
+        self.camera.webdriver.execute_async_script.assert_called_once_with(
+            JavascriptSnippets.PAGE_READY,
+            500,
+            30000
         )
+        self.assertEqual({'load': timings}, self.camera.readiness)
 
-    def test_camera_can_get_stylesheet_count(self):
-        """Test camera can get stylesheet count."""
+    def test_camera_continues_if_page_never_is_ready(self):
+        """Test camera records timeout if page ready script times out."""
         self.creates_webdriver()
         self.uses_javascript_snippets()
-        self.camera.webdriver.execute_script = MagicMock(return_value=10)
-
-        stylesheets = self.camera._stylesheet_count()
-        self.assertEqual(10, stylesheets)
-        self.camera.webdriver.execute_script.assert_called_with(
-            JavascriptSnippets.STYLESHEET_COUNT
+        self.camera.webdriver.set_script_timeout = MagicMock()
+        self.camera.webdriver.execute_async_script = MagicMock(
+            side_effect=TimeoutException()
         )
 
-    def test_camera_can_start_images_monitor(self):
-        """Test camera can start images monitor."""
+        timings = self.camera._wait_until_ready('resize')
+        self.assertTrue(timings['timed_out'])
+        self.assertIsNone(timings['images'])
+        self.assertEqual(timings, self.camera.readiness['resize'])
+
+    def loads_lazy_content(self, activated: int, height: int, loaded: float):
+        """Test loads lazy content.
+
+        Add mocks of lazy activation to camera.
+
+        Args:
+            activated: number of elements activated by attributes
+            height: height of document
+            loaded: ratio of images loaded after activation
+        """
+        self.camera.webdriver.set_window_size = MagicMock()
+        self.camera.webdriver.execute_script = MagicMock(
+            return_value=activated
+        )
+        self.camera.probe = MagicMock(return_value={
+            'height': height,
+            'images_loaded': loaded,
+        })
+        self.camera._wait_until_ready = MagicMock()
+        self.camera._scroll_through_page = MagicMock()
+        self.camera._set_resolution(1920, 1080)
+
+    def test_camera_activates_lazy_content_by_expanding_viewport(self):
+        """Test camera expands viewport to load lazy content."""
         self.creates_webdriver()
         self.uses_javascript_snippets()
-        self.camera.webdriver.execute_script = MagicMock()
+        self.loads_lazy_content(activated=3, height=5000, loaded=1)
 
-        self.camera._start_images_monitor()
+        self.camera._load_lazy_content()
+        self.assertEqual('viewport', self.camera.lazy_strategy)
         self.camera.webdriver.execute_script.assert_called_with(
-            JavascriptSnippets.IMAGES_MONITOR
+            JavascriptSnippets.LAZY_ACTIVATE
         )
+        self.camera.webdriver.set_window_size.assert_called_with(1920, 5000)
+        self.camera._wait_until_ready.assert_called_with('activate')
+        self.camera._scroll_through_page.assert_not_called()
 
-    def test_camera_can_check_if_all_images_have_loaded(self):
-        """Test camera can check if all images have finished loading."""
+    def test_camera_activates_lazy_content_by_attributes(self):
+        """Test camera only rewrites attributes if page fits viewport."""
         self.creates_webdriver()
         self.uses_javascript_snippets()
-        time.sleep = MagicMock()
-        self.camera.webdriver.execute_script = MagicMock()
-        self.camera.webdriver.execute_script.side_effect = [
-            None,  # start images monitor
-            0,
-            0,
-            0,
-            1,
-            1,
-            2,
-            3,
-            4,
-            Limits.ALL_IMAGES_LOADED,  # All images loaded at this limit
-        ]
-
-        self.camera._start_images_monitor()
-        self.camera.webdriver.execute_script.assert_called_with(
-            JavascriptSnippets.IMAGES_MONITOR
-        )
+        self.loads_lazy_content(activated=3, height=900, loaded=1)
 
-        self.camera._wait_for_images_to_load()
-        calls = [
-            call(JavascriptSnippets.IMAGES_LOADED),
-            call(JavascriptSnippets.IMAGES_LOADED),
-            call(JavascriptSnippets.IMAGES_LOADED),
-            call(JavascriptSnippets.IMAGES_LOADED),
-            call(JavascriptSnippets.IMAGES_LOADED),
-            call(JavascriptSnippets.IMAGES_LOADED),
-            call(JavascriptSnippets.IMAGES_LOADED),
-            call(JavascriptSnippets.IMAGES_LOADED),
-            call(JavascriptSnippets.IMAGES_LOADED),
-        ]
-        self.camera.webdriver.execute_script.assert_has_calls(calls)
+        self.camera._load_lazy_content()
+        self.assertEqual('attributes', self.camera.lazy_strategy)
+        self.camera._scroll_through_page.assert_not_called()
+
+    def test_camera_scrolls_if_lazy_content_did_not_load(self):
+        """Test camera falls back to scrolling through page."""
+        self.creates_webdriver()
+        self.uses_javascript_snippets()
+        self.loads_lazy_content(activated=0, height=5000, loaded=0.5)
+
+        self.camera._load_lazy_content()
+        self.assertEqual('scroll', self.camera.lazy_strategy)
+        self.camera.webdriver.set_window_size.assert_called_with(1920, 1080)
+        self.camera._scroll_through_page.assert_called_once()
+
+    def test_camera_can_be_set_to_always_scroll(self):
+        """Test camera scrolls without activation in scroll mode."""
+        self.camera = Camera(lazy_loading='scroll')
+        self.creates_webdriver()
+        self.uses_javascript_snippets()
+        self.loads_lazy_content(activated=3, height=5000, loaded=1)
+
+        self.camera._load_lazy_content()
+        self.assertEqual('scroll', self.camera.lazy_strategy)
+        self.camera.webdriver.execute_script.assert_not_called()
+        self.camera._scroll_through_page.assert_called_once()
 
     def test_camera_can_scroll_page(self):
         """Test camera can scroll page."""
@@ -196,42 +250,46 @@ class TestCamera(unittest.TestCase):
             script
         )
 
-    def test_camera_can_wait_for_resize_of_document(self):
-        """Test camera can wait for resize in proportion to doc height."""
-        time.sleep = MagicMock()
-        self.creates_webdriver()
-        self.camera.webdriver.execute_script = MagicMock()
-        self.camera.webdriver.set_window_size = MagicMock()
-        self.camera._image_count = MagicMock(return_value=50)
-        self.camera._script_count = MagicMock(return_value=3)
-        self.camera._stylesheet_count = MagicMock(return_value=2)
-
-        self.camera._set_resolution(200, 10000)
-        self.camera._wait_for_resize()
-
-        calls = [
-            call(Limits.RESIZE_WAIT_TIME),
-            call(Limits.RESIZE_WAIT_TIME),
-            call(Limits.RESIZE_WAIT_TIME),
-            call(Limits.RESIZE_WAIT_TIME),
-            call(Limits.RESIZE_WAIT_TIME),
-            call(Limits.RESIZE_WAIT_TIME),
-        ]
-        time.sleep.assert_has_calls(calls)
-
-    def test_camera_can_save_screenshot(self):
-        """Test camera can save screenshot."""
+    def test_camera_captures_screenshot_in_memory(self):
+        """Test camera captures screenshot without writing it to disk."""
         self.creates_webdriver()
         self.camera.webdriver.get_window_size = MagicMock()
-        self.camera.webdriver.save = MagicMock()
+        self.camera.webdriver.get_screenshot_as_png = MagicMock(
+            return_value=b'png'
+        )
         self.camera.webdriver.save_screenshot = MagicMock()
 
-        path = PhotoPath(self.datadir)
-        self.camera._save(path)
+        self.assertEqual(b'png', self.camera._capture())
+        self.camera.webdriver.save_screenshot.assert_not_called()
 
-        self.camera.webdriver.save_screenshot.assert_called_with(
-            path.full_path()
+    def test_camera_can_capture_tiled_screenshot(self):
+        """Test camera stitches tiles of page into one png."""
+        self.creates_webdriver()
+        self.uses_javascript_snippets()
+        tiles = []
+        for color in ['red', 'green', 'blue']:
+            file = io.BytesIO()
+            Image.new('RGBA', (10, 100), color).save(file, 'PNG')
+            tiles.append(file.getvalue())
+        self.camera.webdriver.get_screenshot_as_png = MagicMock(
+            side_effect=tiles
         )
+        self.camera.webdriver.execute_script = MagicMock(side_effect=[
+            {'height': 250},
+            [0, 100],
+            [100, 100],
+            3,  # hide fixed elements
+            [150, 100],  # page can't be scrolled further than 150px
+        ])
+        self.camera._wait_until_ready = MagicMock()
+
+        image = Image.open(io.BytesIO(self.camera._capture_tiled()))
+        self.assertEqual((10, 250), image.size)
+        self.assertEqual((255, 0, 0), image.getpixel((0, 99)))
+        self.assertEqual((0, 128, 0), image.getpixel((0, 100)))
+        self.assertEqual((0, 128, 0), image.getpixel((0, 199)))
+        self.assertEqual((0, 0, 255), image.getpixel((0, 200)))
+        self.assertEqual((0, 0, 255), image.getpixel((0, 249)))
 
 
 if __name__ == '__main__':
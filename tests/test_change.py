@@ -0,0 +1,67 @@
+"""Change test."""
+
+from saas.photographer.change import perceptual_hash, difference
+from PIL import Image, ImageDraw
+import unittest
+import io
+
+
+class TestChange(unittest.TestCase):
+    """Test change module."""
+
+    def page(self, height: int=3000, footer: str='') -> bytes:
+        """Make screenshot of a page.
+
+        Args:
+            height: height of page in pixels (default: {3000})
+            footer: optional color of a footer at the bottom of page
+
+        Returns:
+            Screenshot encoded as png
+            bytes
+        """
+        image = Image.new('RGB', (1000, height), 'white')
+        draw = ImageDraw.Draw(image)
+        for y in range(0, height, 150):
+            draw.rectangle((50, y, 600, y + 60), fill='black')
+        if footer:
+            draw.rectangle((0, height - 500, 1000, height), fill=footer)
+        file = io.BytesIO()
+        image.save(file, 'PNG')
+        return file.getvalue()
+
+    def test_page_is_hashed_in_bands(self):
+        """Test every square band of page gets 64 bits of hash."""
+        self.assertEqual(3 * 16, len(perceptual_hash(self.page(3000))))
+        self.assertEqual(16, len(perceptual_hash(self.page(500))))
+
+    def test_identical_pages_do_not_differ(self):
+        """Test identical captures have no difference."""
+        self.assertEqual(0.0, difference(
+            perceptual_hash(self.page()),
+            perceptual_hash(self.page())
+        ))
+
+    def test_change_at_bottom_of_page_is_detected(self):
+        """Test change far down a tall page changes its hash."""
+        change = difference(
+            perceptual_hash(self.page()),
+            perceptual_hash(self.page(footer='red'))
+        )
+        self.assertGreater(change, 0.02)
+        self.assertLess(change, 0.5)
+
+    def test_missing_bands_count_as_changed(self):
+        """Test bands only one of the pages has are entirely changed."""
+        self.assertEqual(0.75, difference('ff00ff00ff00ff00', '0' * 32))
+        self.assertAlmostEqual(
+            1 / 3,
+            difference(
+                perceptual_hash(self.page(3000)),
+                perceptual_hash(self.page(2000))
+            )
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
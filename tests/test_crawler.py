@@ -1,12 +1,14 @@
 """Crawler test."""
 
-from saas.storage.index import Index, EmptySearchResultException
+from saas.storage.index import Index
+from saas.crawler.crawler import Crawler, AsyncCrawler
+from unittest.mock import MagicMock, AsyncMock
 import saas.utils.console as console
-from saas.crawler.crawler import Crawler
 from os.path import dirname, realpath
-from unittest.mock import MagicMock
+from saas.web.page import Page
 from saas.web.url import Url
 import unittest
+import asyncio
 import os
 
 
@@ -23,6 +25,7 @@ class TestCrawler(unittest.TestCase):
         """Tear down test."""
         self.crawler.stop()
         os.remove(self.path_to_url_source)
+        os.remove(self.crawler.source.journal_path)
 
     def add_url_source(self, url: str):
         """Add a url to source list.
@@ -41,7 +44,7 @@ class TestCrawler(unittest.TestCase):
         self.crawler = Crawler(self.path_to_url_source, Index())
         self.assertEqual(
             Url.from_string('https://example.com').to_string(),
-            self.crawler._next_url().to_string()
+            self.crawler._next_url()[0].to_string()
         )
 
     def test_crawler_removes_urls_read_from_source(self):
@@ -55,50 +58,308 @@ class TestCrawler(unittest.TestCase):
         # first line should now be https://example.com
         self.assertEqual(
             Url.from_string('https://example.com').to_string(),
-            self.crawler._next_url().to_string()
+            self.crawler._next_url()[0].to_string()
         )
 
         # first line should now be https://example.com/foo
         self.assertEqual(
             Url.from_string('https://example.com/foo').to_string(),
-            self.crawler._next_url().to_string()
+            self.crawler._next_url()[0].to_string()
         )
 
         # first line should now be https://example.com/bar
         self.assertEqual(
             Url.from_string('https://example.com/bar').to_string(),
-            self.crawler._next_url().to_string()
+            self.crawler._next_url()[0].to_string()
         )
 
         self.crawler = Crawler(self.path_to_url_source, Index())
 
+    def test_crawler_reads_urls_appended_to_source(self):
+        """Test crawler reads urls appended while running."""
+        index = Index()
+        index.checkout_uncrawled_urls = MagicMock(return_value=[])
+        self.add_url_source('https://example.com')
+
+        self.crawler = Crawler(self.path_to_url_source, index)
+        self.assertEqual(
+            Url.from_string('https://example.com').to_string(),
+            self.crawler._next_url()[0].to_string()
+        )
+        self.assertEqual((None, False), self.crawler._next_url())
+
+        self.add_url_source('https://example.com/foo')
+        self.assertEqual(
+            Url.from_string('https://example.com/foo').to_string(),
+            self.crawler._next_url()[0].to_string()
+        )
+
+    def test_crawler_resumes_reading_source_after_restart(self):
+        """Test crawler resumes at the offset stored in journal."""
+        self.add_url_source('https://example.com')
+        self.add_url_source('https://example.com/foo')
+
+        self.crawler = Crawler(self.path_to_url_source, Index())
+        self.crawler._next_url()
+        self.crawler.stop()
+
+        self.crawler = Crawler(self.path_to_url_source, Index())
+        self.assertEqual(
+            Url.from_string('https://example.com/foo').to_string(),
+            self.crawler._next_url()[0].to_string()
+        )
+
+    def test_crawlers_sharing_source_do_not_read_same_url(self):
+        """Test crawlers sharing url file consume each url once."""
+        self.add_url_source('https://example.com')
+        self.add_url_source('https://example.com/foo')
+
+        other = Crawler(self.path_to_url_source, Index())
+        self.crawler = Crawler(self.path_to_url_source, Index())
+
+        self.assertEqual(
+            Url.from_string('https://example.com').to_string(),
+            other._next_url()[0].to_string()
+        )
+        self.assertEqual(
+            Url.from_string('https://example.com/foo').to_string(),
+            self.crawler._next_url()[0].to_string()
+        )
+        other.stop()
+
+    def test_crawler_starts_over_if_source_is_truncated(self):
+        """Test crawler starts from the top of a truncated url file."""
+        self.add_url_source('https://example.com/foo')
+
+        self.crawler = Crawler(self.path_to_url_source, Index())
+        self.crawler._next_url()
+
+        open(self.path_to_url_source, 'w').close()
+        self.add_url_source('https://example.com/bar/baz/qux')
+        self.assertEqual(
+            Url.from_string('https://example.com/bar/baz/qux').to_string(),
+            self.crawler._next_url()[0].to_string()
+        )
+
     def test_crawler_can_read_next_url_from_index(self):
         """Test crawler can read next url from source."""
         index = Index()
         url = Url.from_string('https://example.com/foo')
-        index.remove_uncrawled_url = MagicMock()
-        index.random_uncrawled_url = MagicMock(return_value=url)
+        index.checkout_uncrawled_urls = MagicMock(return_value=[url])
 
         self.crawler = Crawler(self.path_to_url_source, index)
 
         self.assertEqual(
             Url.from_string('https://example.com/foo').to_string(),
-            self.crawler._next_url().to_string()
+            self.crawler._next_url()[0].to_string()
         )
-        index.remove_uncrawled_url.assert_called_with(url.hash())
+        index.checkout_uncrawled_urls.assert_called()
 
     def test_next_url_returns_none_if_no_url_was_found(self):
         """Test _next_url() returns None if no url was found."""
         index = Index()
-        index.random_uncrawled_url = MagicMock()
-        index.random_uncrawled_url.side_effect = EmptySearchResultException()
+        index.checkout_uncrawled_urls = MagicMock(return_value=[])
         self.crawler = Crawler(self.path_to_url_source, index)
 
         self.assertEqual(
-            None,
+            (None, False),
             self.crawler._next_url()
         )
 
+    def test_crawler_reports_where_next_url_came_from(self):
+        """Test _next_url() reports if url was handed out by frontier."""
+        index = Index()
+        url = Url.from_string('https://example.com/foo')
+        index.checkout_uncrawled_urls = MagicMock(return_value=[url])
+        self.add_url_source('https://example.com')
+
+        self.crawler = Crawler(self.path_to_url_source, index)
+
+        self.assertFalse(self.crawler._next_url()[1])
+        self.assertTrue(self.crawler._next_url()[1])
+
+    def crawls_url_file_url_while_frontier_url_is_in_flight(
+        self,
+        crawler: type
+    ) -> Url:
+        """Check out frontier url, then queue url file url of same domain.
+
+        Args:
+            crawler: Crawler class to crawl with
+
+        Returns:
+            The frontier url, still in flight
+            Url
+        """
+        index = Index()
+        index.add_crawled_url = MagicMock()
+        index.set_status_code_for_crawled_url = MagicMock()
+        index.checkout_uncrawled_urls = MagicMock(side_effect=[
+            [
+                Url.from_string('https://example.com/1'),
+                Url.from_string('https://example.com/2'),
+            ],
+            [],
+        ])
+        self.crawler = crawler(self.path_to_url_source, index)
+
+        url, from_frontier = self.crawler._next_url()
+        self.assertTrue(from_frontier)
+        self.add_url_source('https://example.com/from-file')
+        return url
+
+    def test_crawler_keeps_domain_in_flight_after_url_file_url(self):
+        """Test url file url doesn't release domain of frontier url."""
+        url = self.crawls_url_file_url_while_frontier_url_is_in_flight(
+            Crawler
+        )
+        self.crawler.index.add_crawled_url = MagicMock(
+            side_effect=ConnectionError('index is down')
+        )
+
+        with self.assertRaises(ConnectionError):
+            self.crawler.tick()
+
+        self.assertIn('example.com', self.crawler.frontier.in_flight)
+        self.assertEqual((None, False), self.crawler._next_url())
+
+        self.crawler.frontier.done(url, 0)
+        self.assertNotIn('example.com', self.crawler.frontier.in_flight)
+
+    def test_async_crawler_keeps_domain_in_flight_after_url_file_url(self):
+        """Test async crawl of url file url doesn't release domain."""
+        self.crawls_url_file_url_while_frontier_url_is_in_flight(
+            AsyncCrawler
+        )
+        page = Page()
+        page.status_code = 404
+        page.content_type = 'text/html'
+        browser = MagicMock()
+        browser.get_page = AsyncMock(return_value=page)
+
+        from_file, from_frontier = self.crawler._next_url()
+        self.assertEqual(
+            'https://example.com/from-file',
+            from_file.to_string()
+        )
+        asyncio.run(self.crawler._crawl(from_file, browser, from_frontier))
+
+        self.assertIn('example.com', self.crawler.frontier.in_flight)
+        self.assertEqual((None, False), self.crawler._next_url())
+
+    def test_crawler_releases_domain_of_failed_url(self):
+        """Test domain of url that failed to be crawled is not blocked."""
+        index = Index()
+        url = Url.from_string('https://example.com/foo')
+        index.checkout_uncrawled_urls = MagicMock(return_value=[url])
+        index.add_crawled_url = MagicMock(
+            side_effect=ConnectionError('index is down')
+        )
+        self.crawler = Crawler(self.path_to_url_source, index)
+
+        with self.assertRaises(ConnectionError):
+            self.crawler.tick()
+
+        self.assertNotIn('example.com', self.crawler.frontier.in_flight)
+
+    def test_async_crawler_releases_domain_of_failed_url(self):
+        """Test domain of url that failed async crawl is not blocked."""
+        index = Index()
+        index.add_crawled_url = MagicMock()
+        index.checkout_uncrawled_urls = MagicMock(side_effect=[
+            [Url.from_string('https://example.com/foo')],
+            [],
+        ])
+        browser = MagicMock()
+        browser.open = AsyncMock()
+        browser.close = AsyncMock()
+        browser.get_page = AsyncMock(
+            side_effect=RuntimeError('connection reset')
+        )
+
+        self.crawler = AsyncCrawler(
+            self.path_to_url_source,
+            index,
+            concurrency=1
+        )
+        asyncio.run(self.crawler._run(
+            lambda: browser.get_page.call_count < 1,
+            browser
+        ))
+
+        self.assertNotIn('example.com', self.crawler.frontier.in_flight)
+
+    def test_async_crawler_crawls_urls_concurrently(self):
+        """Test async crawler crawls urls with concurrent workers."""
+        index = Index()
+        index.add_crawled_url = MagicMock()
+        index.set_status_code_for_crawled_url = MagicMock()
+        index.add_uncrawled_urls = MagicMock()
+        index.checkout_uncrawled_urls = MagicMock(return_value=[])
+        self.add_url_source('https://example.com')
+        self.add_url_source('https://example.com/foo')
+        self.add_url_source('https://example.com/bar')
+
+        page = Page()
+        page.status_code = 200
+        page.content_type = 'text/html'
+        page.add_url(Url.from_string('https://example.com/baz'))
+        browser = MagicMock()
+        browser.open = AsyncMock()
+        browser.close = AsyncMock()
+        browser.get_page = AsyncMock(return_value=page)
+
+        self.crawler = AsyncCrawler(
+            self.path_to_url_source,
+            index,
+            concurrency=3
+        )
+        asyncio.run(self.crawler._run(
+            lambda: index.add_crawled_url.call_count < 3,
+            browser
+        ))
+
+        self.assertEqual(3, browser.get_page.call_count)
+        self.assertEqual(3, index.set_status_code_for_crawled_url.call_count)
+        index.add_uncrawled_urls.assert_called_with(page.urls)
+        browser.close.assert_called()
+
+    def test_async_crawler_worker_survives_failed_url(self):
+        """Test url that fails to be crawled doesn't stop the crawler."""
+        index = Index()
+        index.add_crawled_url = MagicMock()
+        index.set_status_code_for_crawled_url = MagicMock()
+        index.checkout_uncrawled_urls = MagicMock(return_value=[])
+        self.add_url_source('https://example.com')
+        self.add_url_source('https://example.com/foo')
+
+        page = Page()
+        page.status_code = 404
+        page.content_type = 'text/html'
+        browser = MagicMock()
+        browser.open = AsyncMock()
+        browser.close = AsyncMock()
+        browser.get_page = AsyncMock(side_effect=[
+            RuntimeError('connection reset'),
+            page,
+        ])
+
+        self.crawler = AsyncCrawler(
+            self.path_to_url_source,
+            index,
+            concurrency=1
+        )
+        asyncio.run(self.crawler._run(
+            lambda: browser.get_page.call_count < 2,
+            browser
+        ))
+
+        self.assertEqual(2, browser.get_page.call_count)
+        index.set_status_code_for_crawled_url.assert_called_once()
+        url, status_code = index.set_status_code_for_crawled_url.call_args[0]
+        self.assertEqual('https://example.com/foo', url.to_string())
+        self.assertEqual(404, status_code)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,14 +1,18 @@
 """Filesystem test."""
 
+from saas.storage.index import Index, PhotoNotFoundException
 from saas.photographer.photo import PhotoPath, Screenshot
-from saas.mount.file import Directory, File, LastCapture
+from saas.mount.file import Directory, File, LastCapture, inode
 from saas.storage.datadir import DataDirectory
+from saas.storage.thumbnails import Thumbnails
 from saas.mount.filesystem import Filesystem
+from saas.mount.cache import AttributeCache
 from unittest.mock import MagicMock, call
 import saas.storage.refresh as refresh
-from saas.storage.index import Index
 import saas.utils.console as console
 from saas.web.url import Url
+from threading import Thread
+from typing import Iterable
 from os.path import dirname
 import unittest
 import time
@@ -30,7 +34,7 @@ class TestFilesystem(unittest.TestCase):
         """Tear down test."""
         self.datadir.remove_data_dir()
 
-    def assertListOfFilesEqual(self, expected: list, actual: list):
+    def assertListOfFilesEqual(self, expected: list, actual: Iterable):
         """Assert list of files equal.
 
         Args:
@@ -38,6 +42,7 @@ class TestFilesystem(unittest.TestCase):
             actual: Actual list of files
         """
         msg = 'Failed asserting list of files where equal expected'
+        actual = list(actual)
         self.assertEqual(len(expected), len(actual), msg=msg)
         for i, file in enumerate(expected):
             self.assertEqual(file.filename, actual[i].filename, msg=msg)
@@ -141,12 +146,8 @@ class TestFilesystem(unittest.TestCase):
         """Test filesystem can get attributes of directory."""
         time.time = MagicMock(return_value=time.time())
         self.index.photos_directory_exists = MagicMock(return_value=True)
-        self.index.photos_unique_domains = MagicMock(
-            return_value=['example.com']
-        )
-        self.index.photos_unique_captures_of_domain = MagicMock(
-            return_value=['2019-01-13H20:00']
-        )
+        self.index.photos_domain_exists = MagicMock(return_value=True)
+        self.index.photos_capture_exists = MagicMock(return_value=True)
 
         expected = {
             'st_atime': time.time(),
@@ -158,22 +159,18 @@ class TestFilesystem(unittest.TestCase):
             'st_uid': os.getuid(),
         }
 
-        attr = self.filesystem._attributes('/')
-        self.assertEqual(expected, attr)
-
-        attr = self.filesystem._attributes('/example.com/')
-        self.assertEqual(expected, attr)
-
-        attr = self.filesystem._attributes('/example.com/2019-01-13H20:00')
-        self.assertEqual(expected, attr)
-
-        attr = self.filesystem._attributes('/example.com/2019-01-13H20:00/')
-        self.assertEqual(expected, attr)
+        paths = [
+            '/',
+            '/example.com/',
+            '/example.com/2019-01-13H20:00',
+            '/example.com/2019-01-13H20:00/',
+            '/example.com/2019-01-13H20:00/foo/bar',
+        ]
+        for path in paths:
+            attr, final = self.filesystem._attributes(path)
+            self.assertEqual(dict(expected, st_ino=inode(path)), attr)
+            self.assertTrue(final)
 
-        attr = self.filesystem._attributes(
-            '/example.com/2019-01-13H20:00/foo/bar'
-        )
-        self.assertEqual(expected, attr)
         self.index.photos_directory_exists.assert_called_with(
             domain='example.com',
             captured_at='2019-01-13H20:00',
@@ -181,37 +178,85 @@ class TestFilesystem(unittest.TestCase):
             refresh_rate=self.refresh_rate
         )
 
+    def photo_is_stored(self, filesize: int=123000) -> Screenshot:
+        """Store photo in index.
+
+        Mock photos_get_photo of self.index to return a photo
+        saved at 2019-01-13 20:00
+
+        Args:
+            filesize: size of photo (default: {123000})
+
+        Returns:
+            The stored photo
+            Screenshot
+        """
+        photo = Screenshot(
+            Url.from_string('https://example.com'),
+            PhotoPath(self.datadir),
+            self.refresh_rate,
+            index_filesize=filesize,
+            timestamp=1547409600
+        )
+        self.index.photos_get_photo = MagicMock(return_value=photo)
+        return photo
+
     def test_filesystem_can_get_attributes_of_file(self):
         """Test filesystem can get attributes of file."""
-        time.time = MagicMock(return_value=time.time())
         self.index.photos_directory_exists = MagicMock(return_value=False)
-        self.index.photos_file_exists = MagicMock(
-            return_value=123000  # returns filesize
-        )
+        photo = self.photo_is_stored()
 
         expected = {
-            'st_atime': time.time(),
-            'st_ctime': time.time(),
+            'st_atime': 1547409600,
+            'st_ctime': 1547409600,
             'st_gid': os.getgid(),
+            'st_ino': inode(photo.path.uuid),
             'st_mode': File('').ST_MODE,
-            'st_mtime': time.time(),
+            'st_mtime': 1547409600,
             'st_size': 123000,
             'st_uid': os.getuid(),
         }
 
-        attr = self.filesystem._attributes(
+        attr, final = self.filesystem._attributes(
             '/example.com/2019-01-13H20:00/index.png'
         )
         self.assertEqual(expected, attr)
-        self.index.photos_file_exists.assert_called_with(
+        self.assertTrue(final)
+        self.index.photos_get_photo.assert_called_with(
             domain='example.com',
             captured_at='2019-01-13H20:00',
             full_filename='/index.png',
             refresh_rate=self.refresh_rate
         )
 
-    def test_filesystem_can_translate_path_to_file_in_datadir(self):
-        """Test filesystem can translate path to file in datadir."""
+        attr, final = self.filesystem._attributes(
+            '/example.com/latest/index.png'
+        )
+        self.assertEqual(expected, attr)
+
+    def test_filesystem_caches_attributes_until_photo_is_saved(self):
+        """Test attributes are looked up once until a photo is saved."""
+        self.filesystem.cache = AttributeCache()
+        self.index.photos_directory_exists = MagicMock(return_value=False)
+        self.index.photos_get_photo = MagicMock(
+            side_effect=PhotoNotFoundException
+        )
+        path = '/example.com/2019-01-13H20:00/index.png'
+
+        for _ in range(3):
+            with self.assertRaises(FileNotFoundError):
+                self.filesystem.getattr(path)
+        self.assertEqual(1, self.index.photos_get_photo.call_count)
+
+        self.filesystem.cache.invalidate('example.com', '2019-01-13H20:00')
+        self.filesystem.cache.unsettled = {}
+        self.photo_is_stored()
+        self.assertEqual(123000, self.filesystem.getattr(path)['st_size'])
+        self.assertEqual(123000, self.filesystem.getattr(path)['st_size'])
+        self.assertEqual(1, self.index.photos_get_photo.call_count)
+
+    def test_filesystem_can_resolve_path_to_file_in_datadir(self):
+        """Test filesystem can resolve path to file in datadir."""
         datadir_path = PhotoPath(self.datadir)
         url = Url.from_string('https://example.com/foo/bar')
         photo = Screenshot(url, datadir_path, self.refresh_rate)
@@ -219,13 +264,181 @@ class TestFilesystem(unittest.TestCase):
         photo.path.filesize = MagicMock(return_value=10000)
         self.index.save_photo(photo)
 
-        self.index.photos_file_exists = MagicMock(return_value=123000)
         self.index.photos_get_photo = MagicMock(return_value=photo)
 
-        path = self.filesystem._translate_path(
+        path, attributes = self.filesystem._resolve(
             '/example.com/2019-01-13H20:00/foo/bar.png'
         )
         self.assertEqual(datadir_path.full_path(), path)
+        self.assertEqual(10000, attributes['st_size'])
+
+    def test_filesystem_lists_thumbnails_beside_photos(self):
+        """Test thumbnails are listed as sibling files of photos."""
+        thumbnails = MagicMock()
+        thumbnails.sizes = [320]
+        thumbnails.filename = Thumbnails.filename.__get__(thumbnails)
+        filesystem = Filesystem(self.index, self.refresh_rate, thumbnails)
+        self.index.photos_list_files_in_directory = MagicMock(return_value=[
+            'index.png',
+            'about.rendering.saas',
+        ])
+        self.index.photos_list_directories_in_directory = MagicMock(
+            return_value=[]
+        )
+
+        expected = [
+            Directory('.'),
+            Directory('..'),
+            File('index.png'),
+            File('index.320w.png'),
+            File('about.rendering.saas'),
+        ]
+
+        files = filesystem._list('/example.com/2019-01-13H20:00/')
+        self.assertListOfFilesEqual(expected, files)
+
+    def test_filesystem_can_resolve_path_to_thumbnail(self):
+        """Test filesystem can resolve path to thumbnail of photo."""
+        thumbnail = self.datadir.root + '/thumbnail.320w.png'
+        with open(thumbnail, 'wb') as f:
+            f.write(b'thumbnail')
+        thumbnails = MagicMock()
+        thumbnails.parse = MagicMock(return_value=('bar.png', 320))
+        thumbnails.get = MagicMock(return_value=thumbnail)
+        filesystem = Filesystem(self.index, self.refresh_rate, thumbnails)
+        photo = Screenshot(
+            Url.from_string('https://example.com/foo/bar'),
+            PhotoPath(self.datadir),
+            self.refresh_rate
+        )
+        self.index.photos_get_photo = MagicMock(return_value=photo)
+
+        path, attributes = filesystem._resolve(
+            '/example.com/2019-01-13H20:00/foo/bar.320w.png',
+            make=True
+        )
+        self.assertEqual(thumbnail, path)
+        self.assertEqual(9, attributes['st_size'])
+        thumbnails.parse.assert_called_once_with('/foo/bar.320w.png')
+        thumbnails.get.assert_called_once_with(photo.path, 320)
+
+    def test_thumbnail_being_made_is_not_waited_for_by_getattr(self):
+        """Test getattr estimates thumbnail size while it is made."""
+        thumbnail = self.datadir.root + '/thumbnail.320w.png'
+        thumbnails = MagicMock()
+        thumbnails.parse = MagicMock(return_value=('/index.png', 320))
+        thumbnails.find = MagicMock(return_value=None)
+
+        def get(path, width):
+            with open(thumbnail, 'wb') as f:
+                f.write(b'thumbnail')
+            return thumbnail
+        thumbnails.get = MagicMock(side_effect=get)
+        filesystem = Filesystem(
+            self.index,
+            self.refresh_rate,
+            thumbnails,
+            cache=AttributeCache()
+        )
+        self.index.photos_directory_exists = MagicMock(return_value=False)
+        self.photo_is_stored()
+        path = '/example.com/2019-01-13H20:00/index.320w.png'
+
+        self.assertEqual(123000, filesystem.getattr(path)['st_size'])
+        thumbnails.get.assert_not_called()
+        self.assertEqual((False, None), filesystem.cache.get(path))
+
+        fh = filesystem.open(path, os.O_RDONLY)
+        self.assertEqual(9, filesystem.getattr(path, fh)['st_size'])
+        filesystem.release(path, fh)
+        thumbnails.get.assert_called_once()
+
+    def test_filesystem_resolves_opened_file_once(self):
+        """Test file is looked up once by getattr, open and read."""
+        self.index.photos_directory_exists = MagicMock(return_value=False)
+        photo = self.photo_is_stored(filesize=5)
+        with open(photo.path.full_path(), 'wb') as f:
+            f.write(b'hello')
+        path = '/example.com/2019-01-13H20:00/index.png'
+
+        attributes = self.filesystem.getattr(path)
+        fh = self.filesystem.open(path, os.O_RDONLY)
+        self.assertEqual(attributes, self.filesystem.getattr(path, fh))
+        self.assertEqual(b'hello', self.filesystem.read(path, 5, 0, fh))
+        self.assertEqual(1, self.index.photos_get_photo.call_count)
+
+        self.filesystem.release(path, fh)
+        self.assertEqual({}, self.filesystem.handles)
+
+    def test_filesystem_resolves_file_again_once_resolution_is_old(self):
+        """Test file opened after RESOLVE_AGE is looked up again."""
+        photo = self.photo_is_stored()
+        with open(photo.path.full_path(), 'wb') as f:
+            f.write(b'hello')
+        path = '/example.com/2019-01-13H20:00/index.png'
+
+        self.filesystem._resolve(path)
+        resolved = self.filesystem.resolved[path]
+        self.filesystem.resolved[path] = (
+            resolved[0],
+            resolved[1],
+            resolved[2] - Filesystem.RESOLVE_AGE
+        )
+        self.filesystem.release(path, self.filesystem.open(path, 0))
+        self.assertEqual(2, self.index.photos_get_photo.call_count)
+
+    def test_filesystem_file_can_be_read_by_several_threads(self):
+        """Test reads of the same file descriptor don't share offset."""
+        filename = self.datadir.root + '/data.bin'
+        data = bytes(range(256)) * 64
+        with open(filename, 'wb') as f:
+            f.write(data)
+        fh = os.open(filename, os.O_RDONLY)
+        chunks = {}
+
+        def read(offset: int):
+            for _ in range(50):
+                chunks[offset] = self.filesystem.read('/', 256, offset, fh)
+
+        threads = [Thread(target=read, args=(i * 256 + i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.filesystem.release('/', fh)
+
+        for offset, chunk in chunks.items():
+            self.assertEqual(data[offset:offset + 256], chunk)
+
+    def test_last_capture_is_cached_for_all_threads(self):
+        """Test last capture is fetched once and shared by threads."""
+        LastCapture.captures = {}
+        self.index.photos_most_recent_capture_of_domain = MagicMock(
+            return_value='2019-01-13H20:00'
+        )
+        captures = []
+
+        def translate():
+            captures.append(LastCapture.translate(
+                LastCapture.FILENAME,
+                'example.com',
+                self.index,
+                self.refresh_rate
+            ))
+
+        translate()
+        threads = [Thread(target=translate) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(['2019-01-13H20:00'] * 9, captures)
+        self.assertEqual(
+            1,
+            self.index.photos_most_recent_capture_of_domain.call_count
+        )
+        LastCapture.captures = {}
 
 
 if __name__ == '__main__':
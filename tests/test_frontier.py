@@ -0,0 +1,87 @@
+"""Frontier test."""
+
+from saas.crawler.frontier import Frontier
+from unittest.mock import MagicMock
+from saas.storage.index import Index
+from saas.web.url import Url
+import unittest
+
+
+class TestFrontier(unittest.TestCase):
+    """Test frontier class."""
+
+    def setUp(self):
+        """Set up test."""
+        self.index = Index(es_client=MagicMock())
+        self.frontier = Frontier(self.index, crawl_delay=60)
+
+    def checkout_returns(self, urls: list):
+        """Checkout of uncrawled urls returns given urls.
+
+        Args:
+            urls: list of url strings
+        """
+        self.index.checkout_uncrawled_urls = MagicMock(
+            side_effect=[[Url.from_string(url) for url in urls], []]
+        )
+
+    def test_frontier_checks_out_urls_in_batches(self):
+        """Test frontier checks out a batch of urls from index."""
+        self.checkout_returns([
+            'https://example.com',
+            'https://example.net',
+        ])
+
+        self.assertEqual('example.com', self.frontier.next_url().domain)
+        self.assertEqual('example.net', self.frontier.next_url().domain)
+        self.index.checkout_uncrawled_urls.assert_called_once_with(
+            Frontier.BATCH_SIZE
+        )
+
+    def test_frontier_does_not_hand_out_domain_in_flight(self):
+        """Test frontier hands out one url per domain at a time."""
+        self.checkout_returns([
+            'https://example.com/foo',
+            'https://example.com/bar',
+            'https://example.net',
+        ])
+
+        first = self.frontier.next_url()
+        second = self.frontier.next_url()
+
+        self.assertEqual('example.com', first.domain)
+        self.assertEqual('example.net', second.domain)
+        self.assertEqual(None, self.frontier.next_url())
+
+    def test_frontier_waits_for_crawl_delay_of_domain(self):
+        """Test frontier holds domain back until crawl delay has passed."""
+        self.checkout_returns([
+            'https://example.com/foo',
+            'https://example.com/bar',
+        ])
+
+        url = self.frontier.next_url()
+        self.frontier.done(url, 0.1)
+        self.assertEqual(None, self.frontier.next_url())
+
+        self.frontier.ready_at['example.com'] = 0
+        self.frontier.heap = [(0, 'example.com')]
+        self.assertEqual('/bar', self.frontier.next_url().path)
+
+    def test_frontier_puts_pending_urls_back_on_close(self):
+        """Test frontier returns pending urls to index on close."""
+        self.checkout_returns([
+            'https://example.com/foo',
+            'https://example.com/bar',
+        ])
+        self.index.add_uncrawled_urls = MagicMock()
+
+        self.frontier.next_url()
+        self.frontier.close()
+
+        urls = self.index.add_uncrawled_urls.call_args[0][0]
+        self.assertEqual(['/bar'], [url.path for url in urls])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,13 @@
 """Index test."""
 
-from saas.photographer.photo import PhotoPath, LoadingPhoto
+from saas.storage.index import Index, Mappings, PhotoNotFoundException
+from elasticsearch.exceptions import RequestError
+from saas.photographer.photo import PhotoPath, LoadingPhoto, Screenshot
 from saas.storage.datadir import DataDirectory
 from saas.photographer.photo import Photo
 import saas.storage.refresh as refresh
-from saas.storage.index import Index
 from unittest.mock import MagicMock
+import saas.storage.index as index
 from saas.web.url import Url
 from os.path import dirname
 import unittest
@@ -19,10 +21,16 @@ class TestIndex(unittest.TestCase):
         """Set up test."""
         self.datadir = DataDirectory(dirname(__file__) + '/datadir')
         self.index = Index(self.datadir, MagicMock())
+        self.time = time.time
+        self.bulk = index.bulk
+        self.page_size = Index.PAGE_SIZE
 
     def tearDown(self):
         """Tear down test."""
         self.datadir.remove_data_dir()
+        time.time = self.time
+        index.bulk = self.bulk
+        Index.PAGE_SIZE = self.page_size
 
     def search_returns_doc(self, doc: dict):
         """Search to elastic search returns doc.
@@ -41,6 +49,29 @@ class TestIndex(unittest.TestCase):
             }
         })
 
+    def scan_returns_docs(self, docs: list):
+        """Scan of elasticsearch returns docs.
+
+        Mock search and scroll methods of self.index.es to return
+        given docs in a single page.
+
+        Args:
+            docs: documents to return
+        """
+        page = {
+            '_scroll_id': 'scroll-xxx...',
+            '_shards': {
+                'successful': 1,
+                'total': 1,
+            }
+        }
+        self.index.es.search = MagicMock(
+            return_value=dict(page, hits={'hits': docs})
+        )
+        self.index.es.scroll = MagicMock(
+            return_value=dict(page, hits={'hits': []})
+        )
+
     def search_returns_aggregation(self, index: str, buckets: list):
         """Search to elastic search returns aggregation.
 
@@ -58,6 +89,7 @@ class TestIndex(unittest.TestCase):
 
     def test_recently_crawled_url_can_be_fetched(self):
         """Test recently crawled url can be fetched."""
+        time.time = MagicMock(return_value=time.time())
         self.search_returns_doc({
             '_id': 'xxx...',
             '_source': {
@@ -85,6 +117,13 @@ class TestIndex(unittest.TestCase):
                                 'term': {
                                     'lock_value': refresh.Hourly().lock(),
                                 }
+                            },
+                            {
+                                'range': {
+                                    'next_capture': {
+                                        'gt': int(time.time())
+                                    }
+                                }
                             }
                         ]
                     }
@@ -99,6 +138,90 @@ class TestIndex(unittest.TestCase):
             }
         )
 
+    def test_uncrawled_urls_can_be_checked_out(self):
+        """Test uncrawled urls can be checked out in a batch."""
+        self.index.es.search = MagicMock(return_value={
+            'hits': {
+                'total': 2,
+                'hits': [
+                    {
+                        '_id': 'aaa...',
+                        '_source': {'url': 'http://example.com/foo'}
+                    },
+                    {
+                        '_id': 'bbb...',
+                        '_source': {'url': 'http://example.com/bar'}
+                    },
+                ]
+            }
+        })
+        self.index.es.bulk = MagicMock(return_value={
+            'items': [
+                {'delete': {'_id': 'aaa...', 'result': 'deleted'}},
+                {'delete': {'_id': 'bbb...', 'result': 'not_found'}},
+            ]
+        })
+
+        urls = self.index.checkout_uncrawled_urls(2)
+
+        self.assertEqual(['http://example.com/foo'], [
+            url.to_string() for url in urls
+        ])
+        self.index.es.bulk.assert_called_with(body=[
+            {
+                'delete': {
+                    '_index': 'uncrawled',
+                    '_type': 'url',
+                    '_id': 'aaa...',
+                }
+            },
+            {
+                'delete': {
+                    '_index': 'uncrawled',
+                    '_type': 'url',
+                    '_id': 'bbb...',
+                }
+            },
+        ])
+
+    def test_already_crawled_urls_are_removed(self):
+        """Test already crawled urls are removed from list of urls."""
+        foo = Url.from_string('http://example.com/foo')
+        bar = Url.from_string('http://example.com/bar')
+        self.index.es.mget = MagicMock(return_value={
+            'docs': [
+                {'_id': foo.hash(), 'found': True},
+                {'_id': bar.hash(), 'found': False},
+            ]
+        })
+
+        urls = self.index.remove_already_crawled_urls([foo, bar])
+
+        self.assertEqual([bar], urls)
+        self.index.es.mget.assert_called_with(
+            index='crawled',
+            doc_type='url',
+            body={'ids': [foo.hash(), bar.hash()]},
+            _source=False
+        )
+
+    def test_seen_urls_cache_is_checked_before_index(self):
+        """Test only uncertain urls are looked up in index."""
+        foo = Url.from_string('http://example.com/foo')
+        bar = Url.from_string('http://example.com/bar')
+        self.index.seen_urls = MagicMock()
+        self.index.seen_urls.partition = MagicMock(return_value=(
+            [bar.hash()],
+            [foo.hash()],
+            []
+        ))
+        self.index.es.mget = MagicMock()
+
+        urls = self.index.remove_already_crawled_urls([foo, bar])
+
+        self.assertEqual([bar], urls)
+        self.index.es.mget.assert_not_called()
+
     def test_lock_can_be_placed_on_crawled_url(self):
         """Test lock can be placed on crawled url."""
         url = Url.from_string('http://example.com')
@@ -134,36 +257,102 @@ class TestIndex(unittest.TestCase):
         )
 
         self.index.save_photo(photo)
-        self.index.es.index.assert_called_with(
+        body = {
+            'url_id': url.hash(),
+            'refresh_rate': refresh.Hourly.lock_format(),
+            'captured_at': refresh.Hourly().lock(),
+            'filesize': photo.filesize(),
+            'filename': photo.filename(),
+            'directory': photo.directory(),
+            'domain': photo.domain(),
+            'format': 'png',
+            'blob': '',
+            'phash': '',
+            'change': None,
+            'timestamp': int(time.time())
+        }
+        self.index.es.index.assert_any_call(
             index='photos',
             doc_type='photo',
             id=path.uuid,
-            body={
-                'url_id': url.hash(),
-                'refresh_rate': refresh.Hourly.lock_format(),
-                'captured_at': refresh.Hourly().lock(),
-                'filesize': photo.filesize(),
-                'filename': photo.filename(),
-                'directory': photo.directory(),
-                'domain': photo.domain(),
-                'timestamp': int(time.time())
+            body=body
+        )
+        self.index.es.index.assert_called_with(
+            index='photo_keys',
+            doc_type='photo',
+            id=Index.photo_key(
+                'example.com',
+                refresh.Hourly.lock_format(),
+                refresh.Hourly().lock(),
+                photo.directory(),
+                photo.filename()
+            ),
+            body=dict(body, photo_id=path.uuid)
+        )
+
+    def test_crawled_url_can_be_scheduled(self):
+        """Test index schedules next capture of url with a script."""
+        self.index.es.update = MagicMock()
+        time.time = MagicMock(return_value=time.time())
+
+        url = Url.from_string('http://example.com')
+        self.index.schedule_crawled_url(url, refresh.Hourly, False, 4)
+
+        kwargs = self.index.es.update.call_args[1]
+        self.assertEqual('crawled', kwargs['index'])
+        self.assertEqual(url.hash(), kwargs['id'])
+        self.assertEqual({
+            'changed': False,
+            'now': int(time.time()),
+            'interval': 3600,
+            'max_backoff': 4,
+        }, kwargs['body']['script']['params'])
+
+    def test_previous_capture_of_url_can_be_retrieved(self):
+        """Test most recent capture of url is retrieved."""
+        self.search_returns_doc({
+            '_id': 'uuid-xxx...',
+            '_source': {
+                'url_id': 'xxx...',
+                'filesize': 12300,
+                'format': 'webp',
+                'blob': 'abc123...',
+                'phash': 'ff00ff00ff00ff00',
+                'change': 0.5,
             }
+        })
+
+        url = Url.from_string('http://example.com')
+        photo = self.index.photos_previous_capture(url, refresh.Hourly)
+
+        self.assertEqual('ff00ff00ff00ff00', photo.phash)
+        self.assertEqual(0.5, photo.change)
+        self.assertEqual('abc123...', photo.path.blob)
+        self.assertEqual('webp', photo.path.extension)
+        query = self.index.es.search.call_args[1]['body']['query']
+        self.assertIn(
+            {'term': {'url_id': url.hash()}},
+            query['bool']['must']
+        )
+        self.assertEqual(
+            {'term': {'phash': ''}},
+            query['bool']['must_not']
         )
 
     def test_index_can_list_unique_photo_domains(self):
         """Test index can list unique photos."""
         self.search_returns_aggregation('photos', [
             {
-                'key': 'example.com',
+                'key': {'domain': 'example.com'},
             },
             {
-                'key': 'example.net',
+                'key': {'domain': 'example.net'},
             }
         ])
 
         domains = self.index.photos_unique_domains(refresh.Hourly)
 
-        self.assertEqual(['example.com', 'example.net'], domains)
+        self.assertEqual(['example.com', 'example.net'], list(domains))
         self.index.es.search.assert_called_with(
             index='photos',
             size=0,
@@ -179,9 +368,17 @@ class TestIndex(unittest.TestCase):
                 },
                 'aggs': {
                     'photos': {
-                        'terms': {
-                            'field': 'domain',
-                            'size': 10000
+                        'composite': {
+                            'size': Index.PAGE_SIZE,
+                            'sources': [
+                                {
+                                    'domain': {
+                                        'terms': {
+                                            'field': 'domain'
+                                        }
+                                    }
+                                }
+                            ]
                         }
                     }
                 }
@@ -192,10 +389,10 @@ class TestIndex(unittest.TestCase):
         """Test index can list unique captures of domain."""
         self.search_returns_aggregation('photos', [
             {
-                'key': '2019-01-13H20:00',
+                'key': {'captured_at': '2019-01-13H20:00'},
             },
             {
-                'key': '2019-01-13H21:00',
+                'key': {'captured_at': '2019-01-13H21:00'},
             }
         ])
 
@@ -205,7 +402,10 @@ class TestIndex(unittest.TestCase):
         )
 
         format = refresh.Hourly.lock_format()
-        self.assertEqual(['2019-01-13H20:00', '2019-01-13H21:00'], domains)
+        self.assertEqual(
+            ['2019-01-13H20:00', '2019-01-13H21:00'],
+            list(domains)
+        )
         self.index.es.search.assert_called_with(
             index='photos',
             size=0,
@@ -228,21 +428,110 @@ class TestIndex(unittest.TestCase):
                 },
                 'aggs': {
                     'photos': {
-                        'terms': {
-                            'field': 'captured_at',
-                            'size': 10000
+                        'composite': {
+                            'size': Index.PAGE_SIZE,
+                            'sources': [
+                                {
+                                    'captured_at': {
+                                        'terms': {
+                                            'field': 'captured_at'
+                                        }
+                                    }
+                                }
+                            ]
                         }
                     }
                 }
             }
         )
 
+    def test_unique_domains_are_paged_through(self):
+        """Test every domain is listed, a page at a time."""
+        Index.PAGE_SIZE = 2
+        pages = [
+            ['a.com', 'b.com'],
+            ['c.com', 'd.com'],
+            ['e.com'],
+        ]
+        self.index.es.search = MagicMock(side_effect=[{
+            'aggregations': {
+                'photos': {
+                    'buckets': [{'key': {'domain': d}} for d in page]
+                }
+            }
+        } for page in pages])
+
+        domains = self.index.photos_unique_domains(refresh.Hourly)
+
+        self.assertEqual('a.com', next(domains))
+        self.assertEqual(1, self.index.es.search.call_count)
+        self.assertEqual(['b.com', 'c.com', 'd.com', 'e.com'], list(domains))
+        self.assertEqual(3, self.index.es.search.call_count)
+        afters = [
+            call[1]['body']['aggs']['photos']['composite'].get('after')
+            for call in self.index.es.search.call_args_list
+        ]
+        self.assertEqual(
+            [None, {'domain': 'b.com'}, {'domain': 'd.com'}],
+            afters
+        )
+
+    def test_photos_since_are_paged_through_with_search_after(self):
+        """Test photos saved since timestamp are paged through."""
+        Index.PAGE_SIZE = 2
+        pages = [['a', 'b'], ['c', 'd'], []]
+        self.index.es.search = MagicMock(side_effect=[{
+            'hits': {
+                'hits': [{
+                    '_id': id,
+                    '_source': {'domain': 'example.com'},
+                    'sort': [1000000, id],
+                } for id in page]
+            }
+        } for page in pages])
+
+        photos = list(self.index.photos_since(
+            1000000,
+            refresh.Hourly,
+            domain='example.com'
+        ))
+
+        self.assertEqual(['a', 'b', 'c', 'd'], [id for id, _ in photos])
+        bodies = [
+            call[1]['body'] for call in self.index.es.search.call_args_list
+        ]
+        self.assertEqual(
+            [None, [1000000, 'b'], [1000000, 'd']],
+            [body.get('search_after') for body in bodies]
+        )
+        self.assertIn(
+            {'term': {'domain': 'example.com'}},
+            bodies[0]['query']['bool']['filter']
+        )
+
+    def test_domain_exists_without_listing_domains(self):
+        """Test domain is looked up with a single matching photo."""
+        self.index.es.search = MagicMock(return_value={
+            'hits': {
+                'total': 1,
+                'hits': []
+            }
+        })
+
+        self.assertTrue(
+            self.index.photos_domain_exists('example.com', refresh.Hourly)
+        )
+        kwargs = self.index.es.search.call_args[1]
+        self.assertEqual(1, kwargs['terminate_after'])
+        self.assertNotIn('aggs', kwargs['body'])
+
     def test_photo_can_be_retrieved(self):
-        """Test photo can be retrieved."""
+        """Test photo can be retrieved by its key."""
         format = refresh.Hourly.lock_format()
         capture = refresh.Hourly().lock()
-        self.search_returns_doc({
-            '_id': 'uuid-xxx...',
+        self.index.es.get = MagicMock(return_value={
+            '_id': 'key-xxx...',
+            'found': True,
             '_source': {
                 'url_id': 'xxx...',
                 'refresh_rate': format,
@@ -252,6 +541,9 @@ class TestIndex(unittest.TestCase):
                 'domain': 'example.com',
                 'filesize': 12300,
                 'timestamp': time.time(),
+                'format': 'png',
+                'blob': 'abc123...',
+                'photo_id': 'uuid-xxx...',
             }
         })
 
@@ -264,62 +556,73 @@ class TestIndex(unittest.TestCase):
 
         self.assertIsInstance(cls=Photo, obj=photo)
         self.assertEqual('uuid-xxx...', photo.path.uuid)
-        self.index.es.search.assert_called_with(
-            index='photos',
-            size=1,
-            body={
-                'query': {
-                    'bool': {
-                        'must': [
-                            {
-                                'term': {
-                                    'domain': 'example.com',
-                                }
-                            },
-                            {
-                                'term': {
-                                    'refresh_rate': format,
-                                }
-                            },
-                            {
-                                'term': {
-                                    'captured_at': capture,
-                                }
-                            },
-                            {
-                                'term': {
-                                    'directory': '/some/path/',
-                                }
-                            },
-                            {
-                                'term': {
-                                    'filename': 'some-filename.png',
-                                }
-                            }
-                        ],
-                    }
-                }
-            }
+        self.assertEqual(
+            self.datadir.path_for_blob('abc123...', 'png'),
+            photo.path.full_path()
+        )
+        self.index.es.get.assert_called_with(
+            index='photo_keys',
+            doc_type='photo',
+            id=Index.photo_key(
+                'example.com',
+                format,
+                capture,
+                '/some/path/',
+                'some-filename.png'
+            ),
+            ignore=404
+        )
+        self.index.es.search.assert_not_called()
+
+    def test_missing_photo_is_not_found(self):
+        """Test photo that has no key raises."""
+        self.index.es.get = MagicMock(return_value={
+            '_id': 'key-xxx...',
+            'found': False,
+        })
+
+        with self.assertRaises(PhotoNotFoundException):
+            self.index.photos_get_photo(
+                domain='example.com',
+                captured_at=refresh.Hourly().lock(),
+                full_filename='/some/path/some-filename.png',
+                refresh_rate=refresh.Hourly
+            )
+
+    def test_photo_key_is_unique_to_path(self):
+        """Test every part of a photo's path changes its key."""
+        parts = [
+            'example.com',
+            refresh.Hourly.lock_format(),
+            refresh.Hourly().lock(),
+            '/some/path/',
+            'some-filename.png',
+        ]
+        key = Index.photo_key(*parts)
+        self.assertEqual(key, Index.photo_key(*parts))
+        for i in range(len(parts)):
+            changed = parts[:i] + [parts[i] + 'x'] + parts[i + 1:]
+            self.assertNotEqual(key, Index.photo_key(*changed))
+        self.assertNotEqual(
+            Index.photo_key('a', 'b', 'c', '/d/', 'e'),
+            Index.photo_key('a', 'b', 'c', '/d', '/e')
         )
 
     def test_directories_within_a_directory_can_be_fetched(self):
         """Test directories within a directory can be fetched."""
         format = refresh.Hourly.lock_format()
         capture = refresh.Hourly().lock()
-        self.search_returns_aggregation('photos', [
-            {
-                'key': '/path/to/some/dir/',
-            },
-            {
-                'key': '/path/to/some/other/dir/',
-            },
-            {
-                'key': '/path/to/not/same/other/dir/',
-            },
-            {
-                'key': '/path/to/a/dir/',
+        self.index.es.get = MagicMock(return_value={
+            '_id': 'key-xxx...',
+            'found': True,
+            '_source': {
+                'dirs': {
+                    'some': True,
+                    'not': True,
+                    'a': True,
+                }
             }
-        ])
+        })
 
         directories = self.index.photos_list_directories_in_directory(
             domain='example.com',
@@ -328,47 +631,236 @@ class TestIndex(unittest.TestCase):
             refresh_rate=refresh.Hourly
         )
 
-        self.assertEqual(['some', 'not', 'a'], directories)
-        self.index.es.search.assert_called_with(
-            index='photos',
-            size=0,
-            body={
-                'query': {
-                    'bool': {
-                        'must': [
-                            {
-                                'term': {
-                                    'domain': 'example.com',
-                                }
-                            },
-                            {
-                                'term': {
-                                    'refresh_rate': format,
-                                }
-                            },
-                            {
-                                'term': {
-                                    'captured_at': capture,
-                                }
-                            },
-                            {
-                                'wildcard': {
-                                    'directory': '/path/to/*',
-                                }
-                            }
-                        ],
-                    }
-                },
-                'aggs': {
-                    'photos': {
-                        'terms': {
-                            'field': 'directory',
-                            'size': 10000
-                        }
-                    }
+        self.assertEqual(['some', 'not', 'a'], list(directories))
+        self.index.es.get.assert_called_with(
+            index='directories',
+            doc_type='directory',
+            id=Index.directory_key(
+                'example.com',
+                format,
+                capture,
+                '/path/to/'
+            ),
+            ignore=404
+        )
+        self.index.es.search.assert_not_called()
+
+    def test_files_within_a_directory_can_be_fetched(self):
+        """Test files within a directory are listed from its node."""
+        self.index.es.get = MagicMock(return_value={
+            '_id': 'key-xxx...',
+            'found': True,
+            '_source': {
+                'files': {
+                    'foo.png': 12300,
+                    'bar.png': 10,
+                    'removed.png': None,
                 }
             }
+        })
+
+        files = self.index.photos_list_files_in_directory(
+            domain='example.com',
+            captured_at=refresh.Hourly().lock(),
+            directory='/path/to/',
+            refresh_rate=refresh.Hourly
+        )
+
+        self.assertEqual(['foo.png', 'bar.png.rendering.saas'], list(files))
+
+    def test_missing_directory_does_not_exist(self):
+        """Test directory without a node doesn't exist."""
+        self.index.es.get = MagicMock(return_value={
+            '_id': 'key-xxx...',
+            'found': False,
+        })
+        arguments = {
+            'domain': 'example.com',
+            'captured_at': refresh.Hourly().lock(),
+            'directory': '/path/to/',
+            'refresh_rate': refresh.Hourly,
+        }
+
+        self.assertFalse(self.index.photos_directory_exists(**arguments))
+        self.assertEqual([], list(
+            self.index.photos_list_directories_in_directory(**arguments)
+        ))
+
+    def test_photo_is_added_to_directory_nodes(self):
+        """Test saved photo is added to its directory and its parents."""
+        url = Url.from_string('http://example.com/foo/bar/baz')
+        path = PhotoPath(self.datadir)
+        path.filesize = MagicMock(return_value=10000)
+        photo = LoadingPhoto(url=url, path=path, refresh_rate=refresh.Hourly)
+
+        self.index.save_photo(photo)
+
+        def node(directory: str) -> str:
+            return Index.directory_key(
+                'example.com',
+                refresh.Hourly.lock_format(),
+                refresh.Hourly().lock(),
+                directory
+            )
+        body = self.index.es.bulk.call_args[1]['body']
+        self.assertEqual(
+            [node('/foo/bar/'), node('/'), node('/foo/')],
+            [line['update']['_id'] for line in body[::2]]
+        )
+        self.assertEqual([
+            {'files': {'baz.png': photo.filesize()}},
+            {'dirs': {'foo': True}},
+            {'dirs': {'bar': True}},
+        ], [line['doc'] for line in body[1::2]])
+        self.assertTrue(all(line['doc_as_upsert'] for line in body[1::2]))
+
+    def test_replaced_filename_is_removed_from_directory_node(self):
+        """Test photo saved under a new filename drops its old one."""
+        url = Url.from_string('http://example.com/foo/bar')
+        path = PhotoPath(self.datadir)
+        loading = LoadingPhoto(
+            url=url,
+            path=path,
+            refresh_rate=refresh.Hourly,
+            index_filesize=7
         )
+        self.index.save_photo(loading)
+        photo = Screenshot(
+            url=url,
+            path=PhotoPath(self.datadir, path.uuid, extension='webp'),
+            refresh_rate=refresh.Hourly,
+            index_filesize=10000
+        )
+
+        self.index.save_photo(photo, replaces=loading)
+
+        body = self.index.es.bulk.call_args[1]['body']
+        self.assertEqual(
+            {'files': {'bar.webp': 10000, 'bar.png': None}},
+            body[1]['doc']
+        )
+
+    def test_indices_are_created_behind_aliases(self):
+        """Test indices are named by version of their mappings."""
+        self.scan_returns_docs([])
+        self.index.create_indices()
+
+        created = self.index.es.indices.create.call_args_list
+        self.assertEqual(len(Index.INDICES), len(created))
+        name, = created[2][0]
+        body = created[2][1]['body']
+        self.assertEqual(f'photos_v{Mappings.VERSION}', name)
+        self.assertEqual({'photos': {}}, body['aliases'])
+        self.assertEqual(
+            'keyword',
+            body['mappings']['photo']['properties']['directory']['type']
+        )
+
+    def test_photo_keys_are_added_for_existing_photos(self):
+        """Test photos saved before keys existed are given keys."""
+        source = {
+            'url_id': 'xxx...',
+            'refresh_rate': refresh.Hourly.lock_format(),
+            'captured_at': refresh.Hourly().lock(),
+            'filename': 'some-filename.png',
+            'directory': '/some/path/',
+            'domain': 'example.com',
+        }
+        self.scan_returns_docs([
+            {
+                '_index': 'photos',
+                '_type': 'photo',
+                '_id': 'uuid-xxx...',
+                '_source': source,
+            }
+        ])
+        def create(name: str, body: dict):
+            if not name.startswith('photo_keys'):
+                raise RequestError(400, 'resource_already_exists_exception')
+        self.index.es.indices.create = MagicMock(side_effect=create)
+        index.bulk = MagicMock(return_value=(1, []))
+
+        self.index.create_indices()
+
+        actions = index.bulk.call_args[0][1]
+        key = Index.photo_key(
+            'example.com',
+            refresh.Hourly.lock_format(),
+            refresh.Hourly().lock(),
+            '/some/path/',
+            'some-filename.png'
+        )
+        self.assertEqual([
+            {
+                '_index': 'photo_keys',
+                '_type': 'photo',
+                '_id': key,
+                '_source': dict(source, photo_id='uuid-xxx...'),
+            }
+        ], actions)
+
+    def test_unversioned_index_is_replaced_by_alias(self):
+        """Test index stored under its name is swapped for an alias."""
+        self.index.es.indices.exists_alias = MagicMock(return_value=False)
+        self.index.es.indices.exists = MagicMock(
+            side_effect=lambda index: index in Index.INDICES[:3]
+        )
+        self.index.es.reindex = MagicMock(return_value={
+            'created': 1,
+            'updated': 0,
+        })
+
+        self.index.reindex()
+
+        target = f'photos_v{Mappings.VERSION}'
+        self.assertEqual(6, self.index.es.reindex.call_count)
+        body = self.index.es.reindex.call_args[1]['body']
+        self.assertEqual({'index': 'photos'}, body['source'])
+        self.assertEqual('external', body['dest']['version_type'])
+        self.index.es.indices.update_aliases.assert_called_with(body={
+            'actions': [
+                {'add': {'index': target, 'alias': 'photos'}},
+                {'remove_index': {'index': 'photos'}},
+            ]
+        })
+        self.index.es.indices.delete.assert_not_called()
+
+    def test_outdated_alias_is_moved_to_new_index(self):
+        """Test alias is moved from old version and old index deleted."""
+        self.index.es.indices.exists_alias = MagicMock(return_value=True)
+        self.index.es.indices.get_alias = MagicMock(
+            side_effect=lambda name: {f'{name}_v1': {'aliases': {name: {}}}}
+        )
+        self.index.es.reindex = MagicMock(return_value={
+            'created': 1,
+            'updated': 0,
+        })
+
+        self.assertEqual(
+            ['uncrawled', 'crawled', 'photos', 'photo_keys', 'directories'],
+            self.index.outdated_indices()
+        )
+        self.index.reindex()
+
+        target = f'photos_v{Mappings.VERSION}'
+        self.index.es.indices.update_aliases.assert_any_call(body={
+            'actions': [
+                {'add': {'index': target, 'alias': 'photos'}},
+                {'remove': {'index': 'photos_v1', 'alias': 'photos'}},
+            ]
+        })
+        self.index.es.indices.delete.assert_any_call(index='photos_v1')
+
+    def test_current_indices_are_not_reindexed(self):
+        """Test indices with current mappings are left alone."""
+        self.index.es.indices.exists_alias = MagicMock(return_value=True)
+        self.index.es.indices.get_alias = MagicMock(
+            side_effect=lambda name: {Index.versioned(name): {}}
+        )
+
+        self.assertEqual([], self.index.outdated_indices())
+        self.index.reindex()
+        self.index.es.reindex.assert_not_called()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,130 @@
+"""Optimizer test."""
+
+from saas.photographer.photo import PhotoPath, Screenshot
+from saas.storage.datadir import DataDirectory
+from saas.storage.optimizer import Optimizer
+from saas.storage.index import Index
+import saas.storage.refresh as refresh
+from os.path import dirname, isfile
+from unittest.mock import MagicMock
+from saas.web.url import Url
+from PIL import Image
+import unittest
+import io
+
+
+class TestOptimizer(unittest.TestCase):
+    """Test optimizer class."""
+
+    def setUp(self):
+        """Set up test."""
+        self.datadir = DataDirectory(dirname(__file__) + '/datadir', True)
+        self.index = MagicMock()
+        self.path = PhotoPath(self.datadir)
+        image = Image.new('RGB', (200, 100))
+        for x in range(200):
+            for y in range(100):
+                image.putpixel((x, y), (x, y, (x * y) % 256))
+        png = io.BytesIO()
+        image.save(png, 'PNG')
+        with open(self.path.full_path(), 'w') as file:
+            file.write('loading')
+        self.photo = Screenshot(
+            url=Url.from_string('https://example.com/foo'),
+            path=self.path,
+            refresh_rate=refresh.Hourly,
+            image=png.getvalue()
+        )
+
+    def tearDown(self):
+        """Tear down test."""
+        self.datadir.remove_data_dir()
+
+    def saved_photo(self) -> Screenshot:
+        """Get photo optimizer saved in index.
+
+        Returns:
+            The optimized photo
+            Screenshot
+        """
+        self.index.save_photo.assert_called_once()
+        photo = self.index.save_photo.call_args[0][0]  # type: Screenshot
+        return photo
+
+    def test_optimizer_quantizes_png(self):
+        """Test png is quantized, stored as blob and saved in index."""
+        loading = self.path.full_path()
+        optimizer = Optimizer(processes=1)
+        optimizer.submit(self.photo, self.index)
+        optimizer.close()
+
+        photo = self.saved_photo()
+        self.assertFalse(isfile(loading))
+        self.assertEqual(self.path.uuid, photo.path.uuid)
+        self.assertEqual(64, len(photo.path.blob))
+        self.assertEqual(photo.path.filesize(), photo.filesize())
+        self.assertEqual('foo.png', photo.filename())
+        self.assertEqual('P', Image.open(photo.path.full_path()).mode)
+
+    def test_optimizer_can_store_webp(self):
+        """Test loading photo is replaced by webp file."""
+        optimizer = Optimizer(processes=1, image_format='webp')
+        optimizer.submit(self.photo, self.index)
+        optimizer.close()
+
+        photo = self.saved_photo()
+        self.assertTrue(photo.path.full_path().endswith('.webp'))
+        self.assertEqual('foo.webp', photo.filename())
+        self.assertEqual('WEBP', Image.open(photo.path.full_path()).format)
+        self.assertIs(
+            self.photo,
+            self.index.save_photo.call_args[1]['replaces']
+        )
+
+    def test_webp_replaces_png_path_in_index(self):
+        """Test key and file of png are dropped once stored as webp."""
+        index = Index(self.datadir, MagicMock())
+        optimizer = Optimizer(processes=1, image_format='webp')
+        optimizer.submit(self.photo, index)
+        optimizer.close()
+
+        index.es.delete.assert_called_once_with(
+            index=Index.PHOTO_KEYS,
+            doc_type='photo',
+            id=Index.photo_key(
+                'example.com',
+                refresh.Hourly.lock_format(),
+                refresh.Hourly().lock(),
+                '/',
+                'foo.png'
+            ),
+            ignore=404
+        )
+        key = index.es.index.call_args[1]
+        self.assertEqual('webp', key['body']['format'])
+        self.assertEqual('foo.webp', key['body']['filename'])
+        files = index.es.bulk.call_args[1]['body'][1]['doc']['files']
+        self.assertEqual(['foo.webp', 'foo.png'], list(files))
+        self.assertIsNone(files['foo.png'])
+
+    def test_optimizer_saves_photo_that_failed_as_is(self):
+        """Test image that could not be decoded is written unoptimized."""
+        self.photo.image = b'not a png'
+
+        optimizer = Optimizer(processes=1)
+        optimizer.submit(self.photo, self.index)
+        optimizer.close()
+
+        photo = self.saved_photo()
+        self.assertEqual(self.path.uuid, photo.path.uuid)
+        with open(photo.path.full_path(), 'rb') as file:
+            self.assertEqual(b'not a png', file.read())
+
+    def test_optimizer_only_supports_known_formats(self):
+        """Test optimizer does not support unknown formats."""
+        self.assertTrue(Optimizer.supports('png'))
+        self.assertFalse(Optimizer.supports('bmp'))
+
+
+if __name__ == '__main__':
+    unittest.main()
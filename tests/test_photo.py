@@ -1,11 +1,14 @@
 """Photo module test."""
 
-from saas.photographer.photo import PhotoPath, LoadingPhoto
+from saas.photographer.photo import PhotoPath, LoadingPhoto, Screenshot
 from saas.storage.datadir import DataDirectory
 import saas.storage.refresh as refresh
 from os.path import dirname, isfile
 from saas.web.url import Url
+from threading import Barrier, Thread
 import unittest
+import hashlib
+import os
 
 
 class TestPhoto(unittest.TestCase):
@@ -25,6 +28,14 @@ class TestPhoto(unittest.TestCase):
         self.assertGreater(len(path.uuid), 20)
         self.assertIn(member=self.datadir.root, container=path.full_path())
 
+    def test_photo_path_has_extension_of_image_format(self):
+        """Test photo path and filename ends with extension."""
+        path = PhotoPath(self.datadir, extension='webp')
+        url = Url.from_string('https://example.com/foo')
+        photo = LoadingPhoto(url=url, path=path, refresh_rate=refresh.Hourly)
+        self.assertTrue(path.full_path().endswith(path.uuid + '.webp'))
+        self.assertEqual('foo.webp', photo.filename())
+
     def test_loading_photo_can_be_saved_to_datadir(self):
         """Test a loading photo can be saved to data directory."""
         path = PhotoPath(self.datadir)
@@ -38,6 +49,74 @@ class TestPhoto(unittest.TestCase):
         self.assertTrue(isfile(path.full_path()))
         self.assertEqual('loading', photo.get_raw())
 
+    def test_screenshot_image_replaces_loading_photo(self):
+        """Test image held in memory is stored as blob."""
+        path = PhotoPath(self.datadir)
+        url = Url.from_string('https://example.com')
+        LoadingPhoto(
+            url=url,
+            path=path,
+            refresh_rate=refresh.Hourly
+        ).save_loading_text()
+        loading = path.full_path()
+        photo = Screenshot(
+            url=url,
+            path=path,
+            refresh_rate=refresh.Hourly,
+            image=b'png'
+        )
+        self.assertEqual(3, photo.filesize())
+
+        photo.save_image()
+        self.assertFalse(isfile(loading))
+        self.assertEqual(hashlib.sha256(b'png').hexdigest(), path.blob)
+        self.assertEqual('png', photo.get_raw())
+        self.assertEqual(3, path.filesize())
+
+    def test_identical_screenshots_share_blob(self):
+        """Test identical images are stored in one file."""
+        url = Url.from_string('https://example.com')
+        photos = []
+        for i in range(2):
+            photo = Screenshot(
+                url=url,
+                path=PhotoPath(self.datadir),
+                refresh_rate=refresh.Hourly,
+                image=b'png'
+            )
+            photo.save_image()
+            photos.append(photo)
+
+        self.assertNotEqual(photos[0].path.uuid, photos[1].path.uuid)
+        self.assertEqual(
+            photos[0].path.full_path(),
+            photos[1].path.full_path()
+        )
+
+    def test_identical_blobs_can_be_stored_by_several_threads(self):
+        """Test threads storing the same blob don't share a temp file."""
+        data = os.urandom(4 << 20)
+        barrier = Barrier(8)
+        errors = []
+
+        def store():
+            barrier.wait()
+            try:
+                self.datadir.store_blob(data, 'png')
+            except Exception as e:
+                errors.append(e)
+
+        threads = [Thread(target=store) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([], errors)
+        blob = hashlib.sha256(data).hexdigest()
+        with open(self.datadir.path_for_blob(blob, 'png'), 'rb') as file:
+            self.assertEqual(data, file.read())
+
 
 if __name__ == '__main__':
     unittest.main()
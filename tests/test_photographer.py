@@ -1,12 +1,15 @@
 """Photographer test."""
 
+from saas.storage.index import Index, EmptySearchResultException
 from saas.photographer.photographer import Photographer
+from saas.photographer.photo import PhotoPath, Screenshot
 from saas.storage.datadir import DataDirectory
+from saas.storage.sqlite import SqliteIndex
 import saas.storage.refresh as refresh
-from saas.storage.index import Index
 from unittest.mock import MagicMock
-from saas.web.url import Url
-from os.path import dirname
+from saas.web.url import Url, UrlId
+from os.path import dirname, isfile
+import saas.photographer.change as change
 import unittest
 
 
@@ -22,10 +25,12 @@ class TestPhotographer(unittest.TestCase):
             refresh.Hourly,
             self.datadir
         )
+        self.perceptual_hash = change.perceptual_hash
 
     def tearDown(self):
         """Tear down test."""
         self.datadir.remove_data_dir()
+        change.perceptual_hash = self.perceptual_hash
 
     def does_url_checkout(self):
         """Test does checkut of url.
@@ -54,6 +59,131 @@ class TestPhotographer(unittest.TestCase):
             refresh.Hourly
         )
 
+    def takes_picture(self, previous_phash: str=''):
+        """Take picture of a page that was captured with previous_phash.
+
+        Add mocks to camera and affected index methods.
+
+        Args:
+            previous_phash: perceptual hash of previous capture, if
+                empty url has not been captured before
+        """
+        self.does_url_checkout()
+        self.index.save_photo = MagicMock()
+        self.index.remove_photo = MagicMock()
+        self.index.schedule_crawled_url = MagicMock()
+        if previous_phash == '':
+            self.index.photos_previous_capture = MagicMock(
+                side_effect=EmptySearchResultException()
+            )
+        else:
+            self.previous = Screenshot(
+                url=UrlId('xxx...'),
+                path=PhotoPath(self.datadir, blob='abc123...'),
+                refresh_rate=refresh.Hourly,
+                index_filesize=12300,
+                phash=previous_phash
+            )
+            self.index.photos_previous_capture = MagicMock(
+                return_value=self.previous
+            )
+
+        def take_picture(url, path, refresh_rate):
+            return Screenshot(url, path, refresh_rate, image=b'png')
+        self.photographer.camera.take_picture = MagicMock(
+            side_effect=take_picture
+        )
+        change.perceptual_hash = MagicMock(return_value='ff00ff00ff00ff00')
+
+    def test_photographer_stores_changed_photo(self):
+        """Test photo of url that was not captured before is stored."""
+        self.takes_picture()
+        self.photographer.tick()
+
+        photo = self.index.save_photo.call_args[0][0]
+        self.assertIsNone(photo.change)
+        self.assertEqual('ff00ff00ff00ff00', photo.phash)
+        self.assertTrue(isfile(photo.path.full_path()))
+        self.index.schedule_crawled_url.assert_called_with(
+            photo.url,
+            refresh.Hourly,
+            True,
+            Photographer.MAX_BACKOFF
+        )
+
+    def test_photographer_skips_unchanged_photo(self):
+        """Test unchanged photo is removed with skip policy."""
+        self.photographer.change_policy = 'skip'
+        self.takes_picture(previous_phash='ff00ff00ff00ff00')
+        self.photographer.tick()
+
+        loading = self.index.save_photo.call_args[0][0]
+        self.assertEqual(1, self.index.save_photo.call_count)
+        self.assertFalse(isfile(loading.path.full_path()))
+        self.index.remove_photo.assert_called_once()
+        self.assertFalse(self.index.schedule_crawled_url.call_args[0][2])
+
+    def test_photographer_links_unchanged_photo(self):
+        """Test unchanged photo is stored in previous blob with link."""
+        self.photographer.change_policy = 'link'
+        self.takes_picture(previous_phash='ff00ff00ff00ff01')
+        self.photographer.tick()
+
+        photo = self.index.save_photo.call_args[0][0]
+        self.assertEqual(1 / 64, photo.change)
+        self.assertEqual('abc123...', photo.path.blob)
+        self.assertEqual(12300, photo.filesize())
+        replaces = self.index.save_photo.call_args[1]['replaces']
+        self.assertEqual(photo.path.uuid, replaces.path.uuid)
+
+    def captures_unchanged_page_twice(self) -> list:
+        """Capture the same unchanged page twice with a sqlite index.
+
+        Returns:
+            Photos of page in index after second capture
+            list
+        """
+        index = SqliteIndex(self.datadir.path_for_index(), self.datadir)
+        self.photographer.index = index
+        url = Url.from_string('https://example.com')
+        index.recently_crawled_url = MagicMock(return_value=url)
+        index.crawled_urls_count = MagicMock(return_value=1)
+        index.lock_crawled_url = MagicMock()
+
+        def take_picture(url, path, refresh_rate):
+            return Screenshot(url, path, refresh_rate, image=b'png')
+        self.photographer.camera.take_picture = MagicMock(
+            side_effect=take_picture
+        )
+        change.perceptual_hash = MagicMock(return_value='ff00ff00ff00ff00')
+
+        self.photographer.tick()
+        self.photographer.tick()
+        return list(index.photos_since(0, refresh.Hourly))
+
+    def test_photographer_links_second_capture_of_unchanged_page(self):
+        """Test second capture of page is linked to the first."""
+        self.photographer.change_policy = 'link'
+        photos = self.captures_unchanged_page_twice()
+
+        self.assertEqual(2, len(photos))
+        first, second = sorted(
+            [source for id, source in photos],
+            key=lambda source: source['change'] is not None
+        )
+        self.assertEqual(first['blob'], second['blob'])
+        self.assertNotEqual('', first['blob'])
+        self.assertIsNone(first['change'])
+        self.assertEqual(0, second['change'])
+
+    def test_photographer_skips_second_capture_of_unchanged_page(self):
+        """Test second capture of page is removed with skip policy."""
+        self.photographer.change_policy = 'skip'
+        photos = self.captures_unchanged_page_twice()
+
+        self.assertEqual(1, len(photos))
+        self.assertIsNone(photos[0][1]['change'])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,58 @@
+"""PNG test."""
+
+from saas.photographer.png import PngWriter
+from PIL import Image
+import unittest
+import io
+
+
+class TestPngWriter(unittest.TestCase):
+    """Test png writer class."""
+
+    def test_png_writer_writes_readable_png(self):
+        """Test rows written by png writer can be decoded."""
+        file = io.BytesIO()
+        writer = PngWriter(file, 2, 3)
+        writer.write_rows(bytes([255, 0, 0, 0, 255, 0]))
+        writer.write_rows(bytes([0, 0, 255] * 2 + [1, 2, 3] * 2))
+        writer.close()
+
+        image = Image.open(io.BytesIO(file.getvalue()))
+        self.assertEqual((2, 3), image.size)
+        self.assertEqual('RGB', image.mode)
+        self.assertEqual((255, 0, 0), image.getpixel((0, 0)))
+        self.assertEqual((0, 255, 0), image.getpixel((1, 0)))
+        self.assertEqual((0, 0, 255), image.getpixel((1, 1)))
+        self.assertEqual((1, 2, 3), image.getpixel((0, 2)))
+
+    def test_png_writer_fills_missing_rows_with_white(self):
+        """Test image is padded with white rows when closed early."""
+        file = io.BytesIO()
+        writer = PngWriter(file, 1, 2)
+        writer.write_rows(bytes([0, 0, 0]))
+        writer.close()
+
+        image = Image.open(io.BytesIO(file.getvalue()))
+        self.assertEqual((0, 0, 0), image.getpixel((0, 0)))
+        self.assertEqual((255, 255, 255), image.getpixel((0, 1)))
+
+    def test_png_writer_ignores_rows_past_height(self):
+        """Test rows past the height of the image are dropped."""
+        file = io.BytesIO()
+        writer = PngWriter(file, 1, 1)
+        writer.write_rows(bytes([0, 0, 0, 9, 9, 9]))
+        writer.close()
+
+        image = Image.open(io.BytesIO(file.getvalue()))
+        self.assertEqual((1, 1), image.size)
+        self.assertEqual((0, 0, 0), image.getpixel((0, 0)))
+
+    def test_png_writer_only_accepts_whole_rows(self):
+        """Test png writer raises error for partial rows."""
+        writer = PngWriter(io.BytesIO(), 2, 2)
+        with self.assertRaises(ValueError):
+            writer.write_rows(bytes([0, 0, 0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
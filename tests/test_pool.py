@@ -0,0 +1,102 @@
+"""Browser pool test."""
+
+from saas.photographer.pool import BrowserPool, BrowserSession
+from selenium.common.exceptions import WebDriverException
+from unittest.mock import MagicMock
+import unittest
+
+
+class TestBrowserPool(unittest.TestCase):
+    """Test browser pool class."""
+
+    def setUp(self):
+        """Set up test."""
+        self.rss = BrowserSession.rss
+        self.quit = BrowserSession.quit
+        BrowserSession.rss = MagicMock(return_value=0)
+        BrowserSession.quit = MagicMock()
+        self.pool = BrowserPool(max_pages=3, max_rss=1000)
+        self.launch = MagicMock(side_effect=self.driver)
+
+    def tearDown(self):
+        """Tear down test."""
+        BrowserSession.rss = self.rss
+        BrowserSession.quit = self.quit
+
+    def driver(self) -> MagicMock:
+        """Make a healthy webdriver mock.
+
+        Returns:
+            A webdriver mock
+            MagicMock
+        """
+        driver = MagicMock()
+        driver.execute_script = MagicMock(return_value=1)
+        return driver
+
+    def test_released_session_is_reused(self):
+        """Test a released session is handed out again."""
+        session = self.pool.acquire(self.launch)
+        self.pool.release(session)
+
+        self.assertIs(session, self.pool.acquire(self.launch))
+        self.assertEqual(1, self.launch.call_count)
+        session.webdriver.get.assert_called_with('about:blank')
+        session.webdriver.delete_all_cookies.assert_called()
+
+    def test_sessions_in_use_are_not_shared(self):
+        """Test a session is only handed out to one caller at a time."""
+        first = self.pool.acquire(self.launch)
+        second = self.pool.acquire(self.launch)
+
+        self.assertIsNot(first, second)
+        self.assertEqual(2, len(self.pool.sessions))
+
+    def test_session_is_recycled_after_max_pages(self):
+        """Test session is quit once it has loaded max pages."""
+        session = self.pool.acquire(self.launch)
+        for i in range(3):
+            self.pool.release(session)
+            self.pool.acquire(self.launch)
+
+        self.assertEqual(2, self.launch.call_count)
+        self.assertNotIn(session, self.pool.sessions)
+
+    def test_session_is_recycled_above_max_rss(self):
+        """Test session is quit once it uses too much memory."""
+        session = self.pool.acquire(self.launch)
+        BrowserSession.rss = MagicMock(return_value=1001)
+        self.pool.release(session)
+
+        self.assertIsNot(session, self.pool.acquire(self.launch))
+        BrowserSession.quit.assert_called_once()
+
+    def test_broken_session_is_recycled(self):
+        """Test session released as broken is not reused."""
+        session = self.pool.acquire(self.launch)
+        self.pool.release(session, broken=True)
+
+        self.assertIsNot(session, self.pool.acquire(self.launch))
+
+    def test_unhealthy_session_is_recycled(self):
+        """Test idle session that fails health check is not handed out."""
+        session = self.pool.acquire(self.launch)
+        self.pool.release(session)
+        session.webdriver.execute_script.side_effect = WebDriverException()
+
+        self.assertIsNot(session, self.pool.acquire(self.launch))
+        self.assertNotIn(session, self.pool.sessions)
+
+    def test_close_quits_every_session(self):
+        """Test closing pool quits idle sessions and sessions in use."""
+        idle = self.pool.acquire(self.launch)
+        self.pool.acquire(self.launch)
+        self.pool.release(idle)
+        self.pool.close()
+
+        self.assertEqual(2, BrowserSession.quit.call_count)
+        self.assertEqual([], self.pool.sessions)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,259 @@
+"""Replica test."""
+
+from saas.photographer.photo import PhotoPath, Screenshot
+from saas.storage.index import PhotoNotFoundException
+from saas.storage.datadir import DataDirectory
+from saas.storage.sqlite import SqliteIndex
+from saas.mount.replica import Replica
+import saas.storage.refresh as refresh
+from unittest.mock import MagicMock
+from saas.web.url import Url
+from os.path import dirname
+import unittest
+
+
+class TestReplica(unittest.TestCase):
+    """Test replica class."""
+
+    def setUp(self):
+        """Set up test."""
+        self.datadir = DataDirectory(dirname(__file__) + '/datadir')
+        self.index = SqliteIndex(self.datadir.path_for_index(), self.datadir)
+        self.replica = Replica(self.index, refresh.Hourly)
+        self.settle_time = Replica.SETTLE_TIME
+        Replica.SETTLE_TIME = 0
+        self.captured_at = refresh.Hourly().lock()
+
+    def tearDown(self):
+        """Tear down test."""
+        self.datadir.remove_data_dir()
+        Replica.SETTLE_TIME = self.settle_time
+
+    def photo(self, url: str, filesize: int=12300) -> Screenshot:
+        """Save photo in index.
+
+        Args:
+            url: url photo was taken of
+            filesize: size of photo (default: {12300})
+
+        Returns:
+            The saved photo
+            Screenshot
+        """
+        photo = Screenshot(
+            url=Url.from_string(url),
+            path=PhotoPath(self.datadir, blob='abc123'),
+            refresh_rate=refresh.Hourly,
+            index_filesize=filesize
+        )
+        self.index.save_photo(photo)
+        return photo
+
+    def test_lookups_are_answered_from_memory(self):
+        """Test paths are looked up in replica once it is loaded."""
+        saved = self.photo('http://example.com/foo/bar')
+        self.photo('http://example.com/foo/baz/qux', filesize=10)
+        self.photo('http://other.com')
+        self.replica.sync()
+        self.replica.index = MagicMock(wraps=self.index)
+
+        self.assertEqual(
+            ['example.com', 'other.com'],
+            list(self.replica.photos_unique_domains(refresh.Hourly))
+        )
+        self.assertEqual(
+            [self.captured_at],
+            list(self.replica.photos_unique_captures_of_domain(
+                'example.com',
+                refresh.Hourly
+            ))
+        )
+        self.assertEqual(
+            ['bar.png'],
+            list(self.replica.photos_list_files_in_directory(
+                'example.com',
+                'latest',
+                '/foo/',
+                refresh.Hourly
+            ))
+        )
+        self.assertEqual(
+            ['qux.png.rendering.saas'],
+            list(self.replica.photos_list_files_in_directory(
+                'example.com',
+                self.captured_at,
+                '/foo/baz/',
+                refresh.Hourly
+            ))
+        )
+        self.assertEqual(
+            ['baz'],
+            list(self.replica.photos_list_directories_in_directory(
+                'example.com',
+                self.captured_at,
+                '/foo/',
+                refresh.Hourly
+            ))
+        )
+        self.assertTrue(self.replica.photos_directory_exists(
+            'example.com',
+            self.captured_at,
+            '/foo/baz/',
+            refresh.Hourly
+        ))
+        self.assertFalse(self.replica.photos_directory_exists(
+            'example.com',
+            self.captured_at,
+            '/nope/',
+            refresh.Hourly
+        ))
+        self.assertFalse(
+            self.replica.photos_domain_exists('missing.com', refresh.Hourly)
+        )
+
+        photo = self.replica.photos_get_photo(
+            'example.com',
+            self.captured_at,
+            '/foo/bar.png',
+            refresh.Hourly
+        )
+        self.assertEqual(saved.path.uuid, photo.path.uuid)
+        self.assertEqual('abc123', photo.path.blob)
+        self.assertEqual(12300, photo.filesize())
+        with self.assertRaises(PhotoNotFoundException):
+            self.replica.photos_get_photo(
+                'example.com',
+                self.captured_at,
+                '/foo/nope.png',
+                refresh.Hourly
+            )
+        queried = [
+            name for name, args, kwargs in self.replica.index.method_calls
+            if name.startswith('photos_')
+        ]
+        self.assertEqual([], queried)
+
+    def test_new_photos_are_polled(self):
+        """Test photos saved after replica was loaded are added."""
+        self.photo('http://example.com/foo')
+        self.replica.sync()
+        self.photo('http://example.com/bar')
+        self.replica.sync()
+
+        self.assertEqual(
+            ['bar.png', 'foo.png'],
+            list(self.replica.photos_list_files_in_directory(
+                'example.com',
+                self.captured_at,
+                '/',
+                refresh.Hourly
+            ))
+        )
+        self.assertEqual(2, self.replica.photos)
+
+    def test_capture_is_reloaded_when_photo_is_removed(self):
+        """Test removed photo is dropped once its capture is reloaded."""
+        self.photo('http://example.com/foo')
+        removed = self.photo('http://example.com/bar')
+        self.replica.sync()
+        memory = self.replica.memory
+
+        self.index.remove_photo(removed)
+        self.replica.invalidate('example.com', self.captured_at)
+        self.assertFalse(self.replica.photos_file_exists(
+            'example.com',
+            self.captured_at,
+            '/bar.png',
+            refresh.Hourly
+        ))
+
+        self.replica.sync()
+        self.assertEqual({}, self.replica.stale)
+        self.assertEqual(1, self.replica.photos)
+        self.assertLess(self.replica.memory, memory)
+        self.assertEqual(
+            ['foo.png'],
+            list(self.replica.photos_list_files_in_directory(
+                'example.com',
+                self.captured_at,
+                '/',
+                refresh.Hourly
+            ))
+        )
+
+    def test_photo_saved_under_new_filename_replaces_old_entry(self):
+        """Test photo optimized to webp is only listed by new filename."""
+        loading = self.photo('http://example.com/bar', filesize=7)
+        self.replica.sync()
+        self.index.save_photo(Screenshot(
+            url=loading.url,
+            path=PhotoPath(self.datadir, loading.path.uuid, 'webp', 'abc'),
+            refresh_rate=refresh.Hourly,
+            index_filesize=12300
+        ), replaces=loading)
+        self.replica.sync()
+
+        self.assertEqual(
+            ['bar.webp'],
+            list(self.replica.photos_list_files_in_directory(
+                'example.com',
+                self.captured_at,
+                '/',
+                refresh.Hourly
+            ))
+        )
+        self.assertEqual(1, self.replica.photos)
+        self.assertEqual(1, len(self.replica.ids))
+
+    def test_memory_of_dropped_domain_is_released(self):
+        """Test estimated memory is back at zero once domain is dropped."""
+        self.photo('http://example.com/foo/bar')
+        self.photo('http://example.com/foo/baz/qux')
+        self.replica.sync()
+        self.assertGreater(self.replica.memory, 0)
+
+        with self.replica.lock:
+            self.replica._drop('example.com')
+        self.assertEqual(0, self.replica.memory)
+        self.assertEqual({}, self.replica.sizes)
+        self.assertEqual({}, self.replica.ids)
+        self.assertEqual(0, self.replica.photos)
+
+    def test_domains_that_do_not_fit_are_looked_up_in_index(self):
+        """Test domains exceeding max memory are passed on to index."""
+        self.photo('http://example.com')
+        self.replica.sync()
+        self.replica.max_memory = self.replica.memory + 1
+        self.photo('http://other.com/foo')
+        self.photo('http://other.com/bar')
+        self.replica.sync()
+
+        self.assertEqual({'other.com'}, self.replica.cold)
+        self.assertEqual(['example.com'], list(self.replica.domains))
+        self.assertEqual(
+            ['example.com', 'other.com'],
+            list(self.replica.photos_unique_domains(refresh.Hourly))
+        )
+        self.assertEqual(
+            ['bar.png', 'foo.png'],
+            list(self.replica.photos_list_files_in_directory(
+                'other.com',
+                self.captured_at,
+                '/',
+                refresh.Hourly
+            ))
+        )
+        self.assertIn('1 domains looked up in index', self.replica.report())
+
+    def test_lookups_are_passed_on_until_loaded(self):
+        """Test index is queried before replica is loaded."""
+        self.photo('http://example.com')
+
+        self.assertTrue(
+            self.replica.photos_domain_exists('example.com', refresh.Hourly)
+        )
+        self.assertEqual({}, self.replica.domains)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+"""Seen urls test."""
+
+from saas.storage.seen import SeenUrls, BloomFilter
+from saas.storage.datadir import DataDirectory
+from unittest.mock import MagicMock
+from saas.web.url import Url
+from os.path import dirname
+import unittest
+
+
+class TestSeenUrls(unittest.TestCase):
+    """Test seen urls class."""
+
+    def setUp(self):
+        """Set up test."""
+        self.datadir = DataDirectory(dirname(__file__) + '/datadir')
+        self.path = self.datadir.path_for_seen_urls()
+        self.capacity = SeenUrls.CAPACITY
+        SeenUrls.CAPACITY = 1000
+        self.index = MagicMock()
+        self.index.crawled_url_ids_since = MagicMock(return_value=[])
+
+    def tearDown(self):
+        """Tear down test."""
+        SeenUrls.CAPACITY = self.capacity
+        self.datadir.remove_data_dir()
+
+    def hashes(self, *paths) -> list:
+        """Make hashes of urls at example.com.
+
+        Args:
+            paths: paths of urls
+
+        Returns:
+            List of url hashes
+            list
+        """
+        return [
+            Url.from_string('https://example.com' + path).hash()
+            for path in paths
+        ]
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        """Test bloom filter contains everything added to it."""
+        bloom = BloomFilter(1000, 0.01)
+        hashes = self.hashes(*[f'/{i}' for i in range(1000)])
+        for digest in hashes:
+            bloom.add(digest)
+
+        for digest in hashes:
+            self.assertIn(digest, bloom)
+
+    def test_cache_is_uncertain_until_it_has_synced(self):
+        """Test all hashes are uncertain before first sync."""
+        seen = SeenUrls()
+        hashes = self.hashes('/foo', '/bar')
+
+        self.assertEqual(([], [], hashes), seen.partition(hashes))
+
+    def test_cache_partitions_hashes(self):
+        """Test cache partitions hashes by what it knows."""
+        seen = SeenUrls()
+        foo, bar, baz = self.hashes('/foo', '/bar', '/baz')
+        self.index.crawled_url_ids_since = MagicMock(return_value=[bar])
+        seen.sync(self.index)
+        seen.add([foo])
+
+        self.assertEqual(([baz], [foo], [bar]), seen.partition([
+            foo,
+            bar,
+            baz
+        ]))
+        self.index.crawled_url_ids_since.assert_called_with(0)
+
+    def test_cache_is_warm_when_loaded_from_snapshot(self):
+        """Test cache can be snapshotted and loaded."""
+        seen = SeenUrls(self.path)
+        foo, bar = self.hashes('/foo', '/bar')
+        seen.sync(self.index)
+        seen.add([foo])
+        seen.snapshot()
+
+        seen = SeenUrls(self.path)
+        unseen, known, uncertain = seen.partition([foo, bar])
+        self.assertEqual([bar], unseen)
+        self.assertEqual([foo], uncertain)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,334 @@
+"""Sqlite index test."""
+
+from saas.photographer.photo import PhotoPath, Screenshot
+from saas.storage.index import EmptySearchResultException
+from saas.storage.datadir import DataDirectory
+from saas.storage.sqlite import SqliteIndex
+import saas.storage.refresh as refresh
+from unittest.mock import MagicMock
+from saas.web.url import Url
+from threading import Thread
+from os.path import dirname
+import unittest
+import time
+
+
+class TestSqliteIndex(unittest.TestCase):
+    """Test sqlite index class."""
+
+    def setUp(self):
+        """Set up test."""
+        self.datadir = DataDirectory(dirname(__file__) + '/datadir')
+        self.index = SqliteIndex(self.datadir.path_for_index(), self.datadir)
+        self.time = time.time
+        self.page_size = SqliteIndex.PAGE_SIZE
+
+    def tearDown(self):
+        """Tear down test."""
+        self.datadir.remove_data_dir()
+        time.time = self.time
+        SqliteIndex.PAGE_SIZE = self.page_size
+
+    def crawled(self, url: str, status_code: int=200) -> Url:
+        """Add crawled url to index.
+
+        Args:
+            url: url that was crawled
+            status_code: status code of url (default: {200})
+
+        Returns:
+            The crawled url
+            Url
+        """
+        crawled = Url.from_string(url)
+        self.index.add_crawled_url(crawled)
+        self.index.set_status_code_for_crawled_url(crawled, status_code)
+        return crawled
+
+    def photo(
+        self,
+        url: str,
+        phash: str='ff00ff00ff00ff00',
+        filesize: int=12300
+    ) -> Screenshot:
+        """Save photo in index.
+
+        Args:
+            url: url photo was taken of
+            phash: perceptual hash of photo, empty if loading
+                (default: {'ff00ff00ff00ff00'})
+            filesize: size of photo (default: {12300})
+
+        Returns:
+            The saved photo
+            Screenshot
+        """
+        photo = Screenshot(
+            url=Url.from_string(url),
+            path=PhotoPath(self.datadir, blob='abc123'),
+            refresh_rate=refresh.Hourly,
+            index_filesize=filesize,
+            phash=phash
+        )
+        self.index.save_photo(photo)
+        return photo
+
+    def test_index_is_created_with_tables(self):
+        """Test database is set up when index is opened."""
+        self.assertTrue(self.index.ping())
+        self.assertTrue(self.index.verify())
+        with self.assertRaises(EmptySearchResultException):
+            self.index.timestamp_of_most_recent_document(SqliteIndex.PHOTOS)
+
+    def test_uncrawled_urls_are_checked_out_once(self):
+        """Test checked out urls are removed from uncrawled urls."""
+        self.crawled('http://example.com/crawled')
+        self.index.add_uncrawled_urls([
+            Url.from_string(f'http://example.com/{i}') for i in range(10)
+        ] + [Url.from_string('http://example.com/crawled')])
+
+        first = self.index.checkout_uncrawled_urls(6)
+        second = self.index.checkout_uncrawled_urls(6)
+
+        self.assertEqual(6, len(first))
+        self.assertEqual(4, len(second))
+        self.assertEqual(
+            set(f'http://example.com/{i}' for i in range(10)),
+            set(url.to_string() for url in first + second)
+        )
+        self.assertEqual([], self.index.checkout_uncrawled_urls(6))
+
+    def test_locked_and_failed_urls_are_not_checked_out(self):
+        """Test only unlocked urls with status code 200 are checked out."""
+        self.crawled('http://example.com/missing', 404)
+        locked = self.crawled('http://example.com/locked')
+        self.index.lock_crawled_url(locked, refresh.Hourly)
+        ok = self.crawled('http://example.com/ok')
+
+        self.assertEqual(1, self.index.crawled_urls_count(refresh.Hourly))
+        self.assertEqual(
+            ok.to_string(),
+            self.index.recently_crawled_url(refresh.Hourly).to_string()
+        )
+        self.assertEqual(2, self.index.crawled_urls_count(refresh.Daily))
+
+    def test_unchanged_urls_are_scheduled_with_backoff(self):
+        """Test every unchanged capture doubles the refreshes skipped."""
+        url = self.crawled('http://example.com')
+        time.time = MagicMock(return_value=1000000)
+
+        self.index.schedule_crawled_url(url, refresh.Hourly, False, 4)
+        self.index.schedule_crawled_url(url, refresh.Hourly, False, 4)
+        row = self.index._query('SELECT * FROM crawled')[0]
+        self.assertEqual(2, row['unchanged'])
+        self.assertEqual(1000000 + 3 * 3600, row['next_capture'])
+        self.assertEqual(0, self.index.crawled_urls_count(refresh.Hourly))
+
+        self.index.schedule_crawled_url(url, refresh.Hourly, True, 4)
+        row = self.index._query('SELECT * FROM crawled')[0]
+        self.assertEqual(0, row['unchanged'])
+        self.assertEqual(1000000, row['next_capture'])
+        self.assertEqual(1, self.index.crawled_urls_count(refresh.Hourly))
+
+    def test_photos_can_be_listed_like_a_filesystem(self):
+        """Test photos can be found by domain, capture and directory."""
+        self.photo('http://example.com')
+        self.photo('http://example.com/foo/bar')
+        self.photo('http://example.com/foo/baz/qux', filesize=10)
+        self.photo('http://other.com')
+        captured_at = refresh.Hourly().lock()
+
+        self.assertEqual(
+            ['example.com', 'other.com'],
+            list(self.index.photos_unique_domains(refresh.Hourly))
+        )
+        self.assertEqual(
+            [captured_at],
+            list(self.index.photos_unique_captures_of_domain(
+                'example.com',
+                refresh.Hourly
+            ))
+        )
+        self.assertEqual(
+            ['bar.png'],
+            list(self.index.photos_list_files_in_directory(
+                'example.com',
+                captured_at,
+                '/foo/',
+                refresh.Hourly
+            ))
+        )
+        self.assertEqual(
+            ['baz'],
+            list(self.index.photos_list_directories_in_directory(
+                'example.com',
+                captured_at,
+                '/foo/',
+                refresh.Hourly
+            ))
+        )
+        self.assertTrue(self.index.photos_directory_exists(
+            'example.com',
+            captured_at,
+            '/foo/',
+            refresh.Hourly
+        ))
+        self.assertFalse(self.index.photos_directory_exists(
+            'example.com',
+            captured_at,
+            '/nope/',
+            refresh.Hourly
+        ))
+        self.assertEqual(
+            ['qux.png.rendering.saas'],
+            list(self.index.photos_list_files_in_directory(
+                'example.com',
+                captured_at,
+                '/foo/baz/',
+                refresh.Hourly
+            ))
+        )
+
+    def test_listings_are_paged_through(self):
+        """Test listings larger than a page are listed in full."""
+        SqliteIndex.PAGE_SIZE = 2
+        for path in ['a', 'a/x', 'a/y', 'a-b/x', 'b', 'c/x/y', 'd']:
+            self.photo(f'http://example.com/{path}/index')
+        for domain in ['a.com', 'b.com', 'c.com']:
+            self.photo(f'http://{domain}')
+        captured_at = refresh.Hourly().lock()
+
+        self.assertEqual(
+            ['a.com', 'b.com', 'c.com', 'example.com'],
+            list(self.index.photos_unique_domains(refresh.Hourly))
+        )
+        self.assertEqual(
+            ['a-b', 'a', 'b', 'c', 'd'],
+            list(self.index.photos_list_directories_in_directory(
+                'example.com',
+                captured_at,
+                '/',
+                refresh.Hourly
+            ))
+        )
+        self.assertTrue(
+            self.index.photos_domain_exists('example.com', refresh.Hourly)
+        )
+        self.assertFalse(
+            self.index.photos_domain_exists('other.com', refresh.Hourly)
+        )
+        self.assertTrue(self.index.photos_capture_exists(
+            'example.com',
+            captured_at,
+            refresh.Hourly
+        ))
+
+    def test_domain_and_capture_are_checked_without_listing(self):
+        """Test existence checks look up a single photo."""
+        for domain in ['a.com', 'b.com', 'example.com']:
+            self.photo(f'http://{domain}')
+        captured_at = refresh.Hourly().lock()
+        self.index._pages = MagicMock()
+
+        self.assertTrue(
+            self.index.photos_domain_exists('b.com', refresh.Hourly)
+        )
+        self.assertFalse(
+            self.index.photos_domain_exists('other.com', refresh.Hourly)
+        )
+        self.assertTrue(self.index.photos_capture_exists(
+            'example.com',
+            captured_at,
+            refresh.Hourly
+        ))
+        self.assertFalse(self.index.photos_capture_exists(
+            'example.com',
+            '2019-01-13H20:00',
+            refresh.Hourly
+        ))
+        self.assertFalse(self.index.photos_capture_exists(
+            'other.com',
+            captured_at,
+            refresh.Hourly
+        ))
+        self.index._pages.assert_not_called()
+
+    def test_reads_are_not_blocked_by_writes(self):
+        """Test threads read committed rows during a write."""
+        self.crawled('http://example.com')
+        counts = []
+
+        def count():
+            counts.append(self.index.crawled_urls_count(refresh.Hourly))
+
+        with self.index._transaction() as db:
+            db.execute('DELETE FROM crawled')
+            thread = Thread(target=count)
+            thread.start()
+            thread.join(5)
+
+        self.assertEqual([1], counts)
+        self.assertEqual(0, self.index.crawled_urls_count(refresh.Hourly))
+
+    def test_photo_can_be_retrieved(self):
+        """Test photo can be retrieved by its full filename."""
+        saved = self.photo('http://example.com/foo/bar')
+        captured_at = refresh.Hourly().lock()
+
+        photo = self.index.photos_get_photo(
+            'example.com',
+            captured_at,
+            '/foo/bar.png',
+            refresh.Hourly
+        )
+        self.assertEqual(saved.path.uuid, photo.path.uuid)
+        self.assertEqual('abc123', photo.path.blob)
+        self.assertLessEqual(photo.timestamp, time.time())
+        self.assertEqual(12300, self.index.photos_file_exists(
+            'example.com',
+            captured_at,
+            '/foo/bar.png',
+            refresh.Hourly
+        ))
+
+        self.index.remove_photo(saved)
+        self.assertFalse(self.index.photos_file_exists(
+            'example.com',
+            captured_at,
+            '/foo/bar.png',
+            refresh.Hourly
+        ))
+
+    def test_saved_and_removed_photos_are_published(self):
+        """Test capture of saved and removed photos is published."""
+        self.index.changes = MagicMock()
+        photo = self.photo('http://example.com/foo')
+        self.index.remove_photo(photo)
+
+        captured_at = refresh.Hourly().lock()
+        self.assertEqual(
+            [
+                (('example.com', captured_at, False),),
+                (('example.com', captured_at, True),),
+            ],
+            self.index.changes.publish.call_args_list
+        )
+
+    def test_previous_capture_ignores_loading_photos(self):
+        """Test photos that are still loading are not compared to."""
+        url = Url.from_string('http://example.com')
+        time.time = MagicMock(return_value=1000000)
+        captured = self.photo('http://example.com')
+        time.time = MagicMock(return_value=1000060)
+        self.photo('http://example.com', phash='', filesize=7)
+
+        photo = self.index.photos_previous_capture(url, refresh.Hourly)
+        self.assertEqual(captured.path.uuid, photo.path.uuid)
+        self.assertEqual('ff00ff00ff00ff00', photo.phash)
+
+        with self.assertRaises(EmptySearchResultException):
+            self.index.photos_previous_capture(url, refresh.Daily)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+"""Thumbnails test."""
+
+from saas.storage.datadir import DataDirectory
+from saas.storage.thumbnails import Thumbnails
+from saas.photographer.photo import PhotoPath
+from os.path import dirname, isfile
+from PIL import Image
+import unittest
+import io
+
+
+class TestThumbnails(unittest.TestCase):
+    """Test thumbnails class."""
+
+    def setUp(self):
+        """Set up test."""
+        self.datadir = DataDirectory(dirname(__file__) + '/datadir', True)
+
+    def tearDown(self):
+        """Tear down test."""
+        self.datadir.remove_data_dir()
+
+    def photo(self, color: str='red') -> PhotoPath:
+        """Store photo as blob in data directory.
+
+        Args:
+            color: color of photo (default: {'red'})
+
+        Returns:
+            Path to photo
+            PhotoPath
+        """
+        png = io.BytesIO()
+        Image.new('RGB', (1000, 2000), color).save(png, 'PNG')
+        blob = self.datadir.store_blob(png.getvalue(), 'png')
+        return PhotoPath(self.datadir, blob=blob)
+
+    def test_thumbnail_filename_can_be_parsed(self):
+        """Test filename of thumbnail can be parsed back to photo."""
+        thumbnails = Thumbnails(self.datadir, [320, 640], processes=1)
+        filename = thumbnails.filename('index.png', 320)
+        self.assertEqual('index.320w.png', filename)
+        self.assertEqual(('index.png', 320), thumbnails.parse(filename))
+        self.assertEqual(('index.png', 0), thumbnails.parse('index.png'))
+        self.assertEqual(
+            ('index.100w.png', 0),
+            thumbnails.parse('index.100w.png')
+        )
+        thumbnails.close()
+
+    def test_thumbnail_is_made_beside_photo(self):
+        """Test thumbnail is scaled to width and stored beside photo."""
+        thumbnails = Thumbnails(self.datadir, [320], processes=1)
+        path = self.photo()
+        thumbnail = thumbnails.get(path, 320)
+        thumbnails.close()
+
+        self.assertEqual(self.datadir.path_for_thumbnail(path, 320), thumbnail)
+        self.assertEqual(
+            dirname(path.full_path()),
+            dirname(thumbnail)
+        )
+        image = Image.open(thumbnail)
+        self.assertEqual((320, 640), image.size)
+        self.assertEqual('PNG', image.format)
+
+    def test_thumbnail_is_found_without_waiting_for_it(self):
+        """Test find makes missing thumbnail in the background."""
+        thumbnails = Thumbnails(self.datadir, [320], processes=1)
+        path = self.photo()
+
+        self.assertIsNone(thumbnails.find(path, 320))
+        thumbnails.close()
+        thumbnail = self.datadir.path_for_thumbnail(path, 320)
+        self.assertTrue(isfile(thumbnail))
+
+        thumbnails = Thumbnails(self.datadir, [320], processes=1)
+        self.assertEqual(thumbnail, thumbnails.find(path, 320))
+        thumbnails.close()
+        self.assertEqual([thumbnail], list(thumbnails.used))
+
+    def test_least_recently_used_thumbnails_are_removed(self):
+        """Test thumbnails over cache budget are evicted."""
+        thumbnails = Thumbnails(self.datadir, [320], processes=1)
+        first = thumbnails.get(self.photo('red'), 320)
+        second = thumbnails.get(self.photo('blue'), 320)
+        thumbnails.close()
+
+        thumbnails = Thumbnails(
+            self.datadir,
+            [320],
+            cache_size=thumbnails.total + 1,
+            processes=1
+        )
+        thumbnails.get(self.photo('red'), 320)
+        third = thumbnails.get(self.photo('green'), 320)
+        thumbnails.close()
+
+        self.assertTrue(isfile(first))
+        self.assertFalse(isfile(second))
+        self.assertTrue(isfile(third))
+
+
+if __name__ == '__main__':
+    unittest.main()